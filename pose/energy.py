@@ -1,38 +1,487 @@
 #!/usr/bin/env python3
 # SPDX-License-Identifier: Apache-2.0
 
+import os
 import re
+import json
 import math
 import copy
+import time
 import base64
+import shutil
+import tempfile
+import hashlib
 import warnings
 import numpy as np
 from operator import itemgetter
 from . import tools
 from .pose import DBLoad
 
+def _fullhash(pose):
+	'''
+	Hash of the bond graph, atom records and amino-acid assignments
+	Arguments:
+	----------
+		pose: Pose - molecule source protein, DNA, RNA, or Molecule pose
+	Returns:
+	--------
+		int: O(N) hash over every topology record of the pose
+	'''
+	bonds_key = tuple((int(k), tuple(sorted(int(j) for j in v)))
+		for k, v in sorted(pose.data['Bonds'].items()))
+	atoms_key = tuple((int(k), tuple(a))
+		for k, a in sorted(pose.data['Atoms'].items()))
+	aas = pose.data.get('Amino Acids')
+	aas_key = None if aas is None else tuple(
+		(int(k), info[0], info[1], tuple(info[2]))
+		for k, info in sorted(aas.items()))
+	return hash((bonds_key, atoms_key, aas_key))
+
+def _topologykey(pose):
+	'''
+	Cheap topology fingerprint used to decide cache reuse
+	Arguments:
+	----------
+		pose: Pose - molecule source protein, DNA, RNA, or Molecule pose
+	Returns:
+	--------
+		tuple: ('version', n) from the topology version counter that every
+		mutator bumps, or ('hash', h) from _fullhash for objects that
+		carry no counter
+	'''
+	version = getattr(pose, '_topology', None)
+	if version is not None: return ('version', version)
+	return ('hash', _fullhash(pose))
+
+def _ragged(counts):
+	'''
+	Flatten a ragged enumeration given per-item counts
+	Arguments:
+	----------
+		counts: ndarray (m,) - non-negative number of entries per item
+	Returns:
+	--------
+		tuple: (owner, offset) int64 arrays of length counts.sum(),
+		the item each entry belongs to and its rank within that item
+	'''
+	counts = np.asarray(counts, dtype=np.int64)
+	owner = np.repeat(np.arange(len(counts)), counts)
+	offset = np.arange(len(owner)) - np.repeat(
+		np.cumsum(counts) - counts, counts)
+	return owner, offset
+
+def _cellpairs(coords, cutoff, box=None):
+	'''
+	All atom pairs i < j within a distance cutoff, found with a cell
+	list so the search is O(N) rather than O(N^2)
+	Arguments:
+	----------
+		coords: ndarray (n, 3) - atom coordinates in Å
+		cutoff: float - pair distance cutoff in Å
+		box:    None for no PBC; (3,) orthorhombic; (3, 3) triclinic
+	Returns:
+	--------
+		tuple: (i, j) int64 arrays of pair indices with i < j
+	'''
+	x = np.asarray(coords, dtype=np.float64)
+	n = len(x)
+	empty = np.empty(0, dtype=np.int64)
+	if n < 2: return empty, empty
+	if box is None:
+		lo = x.min(axis=0)
+		cell = np.floor((x - lo) / cutoff).astype(np.int64)
+		ncell = cell.max(axis=0) + 1
+		steps = [np.array([-1, 0, 1])] * 3
+	else:
+		B = np.asarray(box, dtype=np.float64)
+		if B.ndim == 1: B = np.diag(B)
+		f = x @ np.linalg.inv(B)
+		f -= np.floor(f)
+		vol = abs(float(np.linalg.det(B)))
+		width = np.array([vol / np.linalg.norm(
+			np.cross(B[(d + 1) % 3], B[(d + 2) % 3]))
+			for d in range(3)])
+		ncell = np.maximum(np.floor(width / cutoff), 1).astype(np.int64)
+		cell = np.minimum((f * ncell).astype(np.int64), ncell - 1)
+		steps = [np.arange(min(int(m), 3)) - (int(m) >= 3)
+			for m in ncell]
+	cid = (cell[:, 0] * ncell[1] + cell[:, 1]) * ncell[2] + cell[:, 2]
+	order = np.argsort(cid, kind='stable')
+	occupied, start, count = np.unique(cid[order], return_index=True,
+		return_counts=True)
+	atoms = np.arange(n, dtype=np.int64)
+	out_i, out_j = [], []
+	for dx in steps[0]:
+		for dy in steps[1]:
+			for dz in steps[2]:
+				nb = cell + np.array([dx, dy, dz])
+				if box is None:
+					ok = np.all((nb >= 0) & (nb < ncell), axis=1)
+				else:
+					nb %= ncell
+					ok = np.ones(n, dtype=bool)
+				nid = (nb[:, 0] * ncell[1] + nb[:, 1]) * ncell[2] \
+					+ nb[:, 2]
+				k = np.minimum(np.searchsorted(occupied, nid),
+					len(occupied) - 1)
+				ok &= occupied[k] == nid
+				ii, k = atoms[ok], k[ok]
+				own, pos = _ragged(count[k])
+				if len(own) == 0: continue
+				jj = order[start[k][own] + pos]
+				ii = ii[own]
+				keep = ii < jj
+				out_i.append(ii[keep]); out_j.append(jj[keep])
+	if not out_i: return empty, empty
+	i_idx = np.concatenate(out_i); j_idx = np.concatenate(out_j)
+	dvec = x[i_idx] - x[j_idx]
+	if box is not None:
+		f = dvec @ np.linalg.inv(B)
+		dvec = (f - np.round(f)) @ B
+	keep = np.einsum('ij,ij->i', dvec, dvec) <= cutoff * cutoff
+	return i_idx[keep], j_idx[keep]
+
+def _cellgrid(ids, points, size):
+	'''
+	Bin points into cubic cells once so that the points near a few moved
+	ones can be found later without a pass over all of them
+	Arguments:
+	----------
+		ids:    ndarray (n,) - point identifiers
+		points: ndarray (n, 3) - their coordinates in Å
+		size:   float - cell edge in Å, at least the search cutoff
+	Returns:
+	--------
+		dict: 'size', 'bins' {cell: set of ids} and 'cell' {id: cell}
+	'''
+	grid = {'size': float(size), 'bins': {}, 'cell': {}}
+	_cellmove(grid, ids, points)
+	return grid
+
+def _cellmove(grid, ids, points):
+	'''
+	Re-bin points of a cell grid at new coordinates
+	Arguments:
+	----------
+		grid:   dict - from _cellgrid, updated in place
+		ids:    ndarray (m,) - point identifiers, new or already binned
+		points: ndarray (m, 3) - their new coordinates in Å
+	Returns:
+	--------
+		No return value
+	'''
+	bins, cellof = grid['bins'], grid['cell']
+	cells = np.floor(np.asarray(points) / grid['size']).astype(np.int64)
+	for i, c in zip(np.asarray(ids).tolist(), map(tuple, cells.tolist())):
+		old = cellof.get(i)
+		if old == c: continue
+		if old is not None: bins[old].discard(i)
+		bins.setdefault(c, set()).add(i)
+		cellof[i] = c
+
+def _cellfocus(grid, pos, focus, cutoff):
+	'''
+	Pairs within a cutoff that have at least one point in a focus set,
+	from the grid cells around the focus points only. The grid may hold
+	stale cells for the focus points; every other point must be binned
+	where pos puts it
+	Arguments:
+	----------
+		grid:   dict - from _cellgrid
+		pos:    ndarray (n, 3) - current coordinates, indexed by id
+		focus:  ndarray (m,) - ids of the focus points
+		cutoff: float - pair distance cutoff in Å, at most the cell size
+	Returns:
+	--------
+		tuple: (a, b) int64 arrays, a a focus id; pairs of two focus ids
+		are given once with a < b
+	'''
+	focus = np.unique(np.asarray(focus, dtype=np.int64))
+	empty = np.empty(0, dtype=np.int64)
+	if len(focus) == 0: return empty, empty
+	bins = grid['bins']
+	fset = set(focus.tolist())
+	cells = np.floor(pos[focus] / grid['size']).astype(np.int64)
+	near = {}
+	out_a, out_b = [], []
+	for a, c in zip(focus.tolist(), map(tuple, cells.tolist())):
+		if c not in near:
+			near[c] = np.array([j for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+				for dz in (-1, 0, 1) for j in bins.get((c[0] + dx,
+				c[1] + dy, c[2] + dz), ()) if j not in fset], dtype=np.int64)
+		out_b.append(near[c])
+		out_a.append(np.full(len(near[c]), a, dtype=np.int64))
+	a = np.concatenate(out_a); b = np.concatenate(out_b)
+	fa, fb = np.triu_indices(len(focus), 1)
+	a = np.concatenate([a, focus[fa]]); b = np.concatenate([b, focus[fb]])
+	d = pos[a] - pos[b]
+	keep = np.einsum('ij,ij->i', d, d) < cutoff * cutoff
+	return a[keep], b[keep]
+
+class NeighbourList():
+	'''
+	Verlet pair list padded by a skin, rebuilt on large displacements
+	'''
+	def __init__(self, cutoff, skin=2.0):
+		'''
+		Initialise an empty neighbour list
+		Arguments:
+		----------
+			cutoff: float - interaction cutoff in Å
+			skin:   float - padding in Å added to the cutoff when the list
+				is built; the list stays valid until some atom has moved
+				more than skin / 2 from its position at the last build
+		Returns:
+		--------
+			None: instance is configured in-place
+		'''
+		if skin < 0.0:
+			raise ValueError('NeighbourList: skin must be non-negative')
+		self.cutoff   = float(cutoff)
+		self.skin     = float(skin)
+		self.pairs    = None
+		self.n_builds = 0
+		self.n_calls  = 0
+		self._ref     = None
+		self._box     = None
+	def reset(self):
+		'''
+		Discard the current list so the next update rebuilds it
+		Returns:
+		--------
+			None: the stored pairs and reference coordinates are cleared
+		'''
+		self.pairs = None
+		self._ref  = None
+		self._box  = None
+	def stale(self, coords, box=None):
+		'''
+		Whether the stored list must be rebuilt for these coordinates
+		Arguments:
+		----------
+			coords: ndarray (n, 3) - current atom coordinates
+			box:    None for no PBC; (3,) orthorhombic; (3, 3) triclinic
+		Returns:
+		--------
+			bool: True when empty, the atom count or box changed, or the
+			largest displacement since the last build exceeds skin / 2
+		'''
+		if self.pairs is None or self._ref.shape != coords.shape:
+			return True
+		if (box is None) != (self._box is None):
+			return True
+		if box is not None and not np.array_equal(
+			np.asarray(box, dtype=np.float64), self._box):
+			return True
+		d2 = np.einsum('ij,ij->i', coords - self._ref, coords - self._ref)
+		return float(d2.max()) > (0.5 * self.skin)**2
+	def store(self, i_idx, j_idx, coords, box=None):
+		'''
+		Record a freshly built pair list and its reference frame
+		Arguments:
+		----------
+			i_idx:  ndarray - first atom index of every pair
+			j_idx:  ndarray - second atom index of every pair
+			coords: ndarray (n, 3) - coordinates the list was built from
+			box:    None for no PBC; (3,) orthorhombic; (3, 3) triclinic
+		Returns:
+		--------
+			None: the list and build counter are updated in place
+		'''
+		self.pairs = (i_idx, j_idx)
+		self._ref  = np.array(coords, dtype=np.float64)
+		self._box  = (None if box is None
+			else np.array(box, dtype=np.float64))
+		self.n_builds += 1
+	def restore(self, i_idx, j_idx, coords, box=None):
+		'''
+		Reinstate a list saved in a checkpoint without counting a build,
+		so a resumed run sums its pairs in the same order
+		Arguments:
+		----------
+			i_idx:  ndarray - first atom index of every pair
+			j_idx:  ndarray - second atom index of every pair
+			coords: ndarray (n, 3) - coordinates the list was built from
+			box:    None for no PBC; (3,) orthorhombic; (3, 3) triclinic
+		Returns:
+		--------
+			None: the list is replaced in place
+		'''
+		n_builds = self.n_builds
+		self.store(i_idx, j_idx, coords, box)
+		self.n_builds = n_builds
+	def stats(self):
+		'''
+		Rebuild and pair counts for run logs
+		Returns:
+		--------
+			dict: 'builds', 'calls', 'pairs' (current list length) and
+			'skin'
+		'''
+		return {
+			'builds': int(self.n_builds),
+			'calls':  int(self.n_calls),
+			'pairs':  0 if self.pairs is None else int(len(self.pairs[0])),
+			'skin':   self.skin}
+
+class GridMap():
+	'''
+	Receptor potential maps of an XS-typed Score on a regular box, one
+	grid per term and ligand atom type, read by trilinear interpolation
+	'''
+	def __init__(self, origin, spacing, maps, types, terms, name,
+			slope=1e6):
+		'''
+		Wrap precomputed maps; built and loaded through Score.Grid
+		Arguments:
+		----------
+			origin:  ndarray (3,) - Cartesian position of grid point
+				(0, 0, 0) in Å
+			spacing: float - distance between grid points in Å
+			maps:    ndarray (T, K, nx, ny, nz) - raw receptor energy of a
+				probe atom of each mapped type at each grid point, per term;
+				may be a read-only np.memmap
+			types:   list of int - XS type index of each of the K maps
+			terms:   list of str - term method name of each of the T maps
+			name:    str - Score parameter set the maps were built from
+			slope:   float - penalty per Å, in the score's native unit,
+				for a ligand atom outside the box
+		Returns:
+		--------
+			None: instance is configured in-place
+		'''
+		self.origin  = np.asarray(origin, dtype=np.float64)
+		self.spacing = float(spacing)
+		self.maps    = maps
+		self.types   = [int(t) for t in types]
+		self.terms   = list(terms)
+		self.name    = name
+		self.slope   = float(slope)
+		self.shape   = np.array(maps.shape[2:], dtype=np.int64)
+		self._slot   = np.full(max(self.types, default=-1) + 1, -1,
+			dtype=np.int64)
+		self._slot[self.types] = np.arange(len(self.types))
+	def Interpolate(self, xs, X, grad=False):
+		'''
+		Trilinear interpolation of every term's map at the ligand atoms.
+		Atoms outside the box read the nearest box point
+		Arguments:
+		----------
+			xs:   ndarray (L,) - XS type index of each atom, -1 for none
+			X:    ndarray (L, 3) - atom coordinates in Å
+			grad: bool - if True also return the gradients
+		Returns:
+		--------
+			tuple: (E, out) - (T, L) raw energies per term and atom and
+			(L, 3) displacement of each atom from the box; with grad=True
+			(E, dE, out) where dE is (T, L, 3) dE/dx, zero along an axis
+			on which the atom is outside the box
+		'''
+		X = np.asarray(X, dtype=np.float64)
+		xs = np.asarray(xs, dtype=np.int64)
+		slot = np.full(len(xs), -1, dtype=np.int64)
+		ok = (xs >= 0) & (xs < len(self._slot))
+		slot[ok] = self._slot[xs[ok]]
+		miss = (xs >= 0) & (slot < 0)
+		if miss.any():
+			raise ValueError('GridMap: no map for XS type %d'
+				% int(xs[miss][0]))
+		live = np.flatnonzero(slot >= 0)
+		g = (X[live] - self.origin) / self.spacing
+		top = (self.shape - 1).astype(np.float64)
+		gc = np.clip(g, 0.0, top)
+		out = np.zeros_like(X)
+		out[live] = (g - gc) * self.spacing
+		i0 = np.minimum(np.floor(gc).astype(np.int64), self.shape - 2)
+		f = gc - i0
+		k = slot[live]
+		Ev = np.zeros((len(self.terms), len(live)))
+		dEv = np.zeros((len(self.terms), len(live), 3)) if grad else None
+		wf = (1.0 - f, f)
+		for corner in range(8):
+			b = ((corner >> 2) & 1, (corner >> 1) & 1, corner & 1)
+			wx, wy, wz = wf[b[0]][:, 0], wf[b[1]][:, 1], wf[b[2]][:, 2]
+			v = self.maps[:, k, i0[:, 0] + b[0], i0[:, 1] + b[1],
+				i0[:, 2] + b[2]]
+			Ev += v * (wx * wy * wz)
+			if not grad: continue
+			sx, sy, sz = (1.0 if c else -1.0 for c in b)
+			dEv[:, :, 0] += v * (sx * wy * wz)
+			dEv[:, :, 1] += v * (wx * sy * wz)
+			dEv[:, :, 2] += v * (wx * wy * sz)
+		E = np.zeros((len(self.terms), len(X)))
+		E[:, live] = Ev
+		if not grad: return E, out
+		dE = np.zeros((len(self.terms), len(X), 3))
+		dE[:, live] = dEv * ((g == gc) / self.spacing)
+		return E, dE, out
+
 class ForceField():
 	'''
 	Configurable molecular mechanics force field assembled from energy terms
 	'''
-	def __init__(self, name='Default', strict=False):
+	def __init__(self, name='Default', strict=False, cutoff=None,
+			switch='shift', r_switch=None, skin=2.0, precision='double'):
 		'''
 		Initialise the force field with a named parameter set from database.json
 		Arguments:
 		----------
-			name:   str - key into database.json['Energy Parameters']
+			name:     str - key into database.json['Energy Parameters']
 				(e.g. 'Default', 'OpenFF'); matched case-insensitively
 				(e.g. 'default', 'OPENFF', 'oPeNfF' all resolve correctly).
 				Selects both the SMIRKS-keyed parameter sections and the
 				list of potential methods to evaluate (from `Terms`
 				sub-key)
-			strict: if True, raise RuntimeError on any SMIRKS coverage gap
+			strict:   if True, raise RuntimeError on any SMIRKS coverage gap
 				(unmatched bond/angle/torsion/improper centre/atom). If
 				False (default), warn but continue with K=0 fall-through.
+			cutoff:   float or None - non-bonded cutoff in Å. None (default)
+				sums every atom pair through dense (n, n) arrays; a float
+				switches the non-bonded terms to a sparse cell-list pair
+				list with only per-atom parameters and exclusion lists
+				cached, O(N) in both memory and time
+			switch:   str - how pair terms are taken to zero at the cutoff,
+				'shift' (shifted-force, energy and force both vanish at
+				the cutoff) or 'switch' (quintic switching function
+				between r_switch and the cutoff)
+			r_switch: float or None - switching onset in Å for
+				switch='switch'; defaults to cutoff - 1.5
+			skin:     float - Verlet neighbour-list padding in Å; the pair
+				list is built out to cutoff + skin and only rebuilt once
+				some atom has moved more than skin / 2
+			precision: str - floating point used by the VDW and
+				electrostatic pair kernels: 'double' (float64 throughout),
+				'mixed' (float32 distances and kernels, float64 energy and
+				force accumulation) or 'single' (float32 throughout)
 		Returns:
 		--------
 			None: instance is configured in-place
 		'''
+		if switch not in ('shift', 'switch'):
+			raise ValueError(
+				"ForceField: unknown switch=%r (allowed: 'shift', 'switch')"
+				% (switch,))
+		if precision not in ('double', 'mixed', 'single'):
+			raise ValueError(
+				"ForceField: unknown precision=%r "
+				"(allowed: 'double', 'mixed', 'single')" % (precision,))
+		self.precision = precision
+		self._kdtype = np.float64 if precision == 'double' else np.float32
+		self._acc = np.float32 if precision == 'single' else np.float64
+		if cutoff is not None:
+			cutoff = float(cutoff)
+			if cutoff <= 0.0:
+				raise ValueError('ForceField: cutoff must be positive')
+			if r_switch is None:
+				r_switch = max(0.0, cutoff - 1.5)
+			if not 0.0 <= float(r_switch) < cutoff:
+				raise ValueError(
+					'ForceField: r_switch must lie in [0, cutoff)')
+		self.cutoff = cutoff
+		self.switch = switch
+		self.r_switch = None if r_switch is None else float(r_switch)
+		self.nlist = (None if cutoff is None
+			else NeighbourList(cutoff, skin))
 		self.strict = strict
 		EP = DBLoad()['Energy Parameters']
 		key_map = {k.upper(): k for k in EP}
@@ -64,9 +513,29 @@ class ForceField():
 		self.Parameters = ff_db
 		self._cache = None
 		self._cache_hash = None
+		self._cache_full = None
+		self.check_topology = False
+		self.profile = False
+		self._built_seconds = None
+		self.ResetCounters()
 		self._warned_poses = set()
 		self._EPS = 1e-12
-	def __call__(self, pose, grad=False, box=None, v=False):
+	def ResetCounters(self):
+		'''
+		Zero the cumulative profiling counters
+		Arguments:
+		----------
+			No arguments taken
+		Returns:
+		--------
+			None: self.counters holds 'calls', 'cache_builds',
+			'cache_seconds' and per-term {'calls', 'seconds', 'energy'}
+			under 'terms'; they accumulate only while self.profile is True
+		'''
+		self.counters = {'calls': 0, 'cache_builds': 0,
+			'cache_seconds': 0.0, 'terms': {}}
+	def __call__(self, pose, grad=False, box=None, v=False, decompose=False,
+			terms=None):
 		'''
 		Calculates the total potential energy summed over configured terms
 		Arguments:
@@ -75,43 +544,174 @@ class ForceField():
 			grad: bool - if True, also return per-atom forces (N, 3) array
 			box:  None for no PBC; (3,) for orthorhombic; (3, 3) for triclinic
 			v:    verbosity, if True will print error for missing SMIRKS
+			decompose: bool - if True, also return a per-term dict of
+				{'energy', 'seconds'} plus '_cache' {'built', 'seconds'}
+			terms: None for every configured term, or a collection of term
+				method names to restrict the sum to (as the RESPA
+				integrator does for its fast and slow groups)
 		Returns:
 		--------
 			float: potential energy in kJ/mol  (when grad=False)
 			(float, ndarray): energy and (N, 3) forces  (when grad=True)
+			decompose=True appends the per-term dict to either return
 		'''
 		if len(pose.data.get('Atoms', {})) == 0:
+			if decompose:
+				return (0.0, np.zeros((0, 3)), {}) if grad else (0.0, {})
 			return (0.0, np.zeros((0, 3))) if grad else 0.0
 		c = np.asarray(pose.data['Coordinates'], float)
 		if not np.isfinite(c).all():
 			bad = int(np.flatnonzero(~np.isfinite(c).all(1))[0])
 			raise FloatingPointError(f'Non-finite coordinate at atom {bad}')
-		self._repairbonds(pose)
-		bonds_key = tuple((int(k), tuple(sorted(int(j) for j in v)))
-			for k, v in sorted(pose.data['Bonds'].items()))
-		atoms_key = tuple((int(k), tuple(a))
-			for k, a in sorted(pose.data['Atoms'].items()))
-		aas = pose.data.get('Amino Acids')
-		aas_key = None if aas is None else tuple(
-			(int(k), info[0], info[1], tuple(info[2]))
-			for k, info in sorted(aas.items()))
-		h = hash((bonds_key, atoms_key, aas_key))
-		if self._cache is None or self._cache_hash != h:
-			self._cache = self._buildcache(pose, v)
-			self._cache_hash = h
+		self._ensurecache(pose, v)
 		n = self._cache['n']
+		self._cache['nb_pairs'] = None
 		E, F = 0.0, np.zeros((n, 3))
+		per_term = {}
 		with np.errstate(over='ignore', invalid='ignore',
 			divide='ignore'):
 			for method_name, kwargs in self.terms:
+				if terms is not None and method_name not in terms: continue
 				fn = getattr(self, method_name)
+				t0 = time.perf_counter()
 				if grad:
 					e, f = fn(pose, cache=self._cache, grad=True,
 						box=box, **kwargs)
-					E += e; F += f
+					F += f
 				else:
-					E += fn(pose, cache=self._cache, grad=False,
+					e = fn(pose, cache=self._cache, grad=False,
 						box=box, **kwargs)
+				E += e
+				rec = per_term.setdefault(method_name,
+					{'energy': 0.0, 'seconds': 0.0})
+				rec['energy'] += float(e)
+				rec['seconds'] += time.perf_counter() - t0
+		if self.profile:
+			self.counters['calls'] += 1
+			tally = self.counters['terms']
+			for method_name, rec in per_term.items():
+				rec0 = tally.setdefault(method_name,
+					{'calls': 0, 'seconds': 0.0, 'energy': 0.0})
+				rec0['calls'] += 1
+				rec0['seconds'] += rec['seconds']
+				rec0['energy'] = rec['energy']
+		if decompose:
+			per_term['_cache'] = {'built': self._built_seconds is not None,
+				'seconds': self._built_seconds or 0.0}
+			return (E, F, per_term) if grad else (E, per_term)
+		return (E, F) if grad else E
+	def _ensurecache(self, pose, v=False):
+		'''
+		Build the topology/parameter cache if the pose's topology changed
+		Arguments:
+		----------
+			pose: Pose - molecule source protein, DNA, RNA, or Molecule pose
+			v:    verbosity, if True will print error for missing SMIRKS
+		Returns:
+		--------
+			dict: self._cache, rebuilt only when the topology key moved
+		'''
+		h = _topologykey(pose)
+		self._built_seconds = None
+		if self._cache is None or self._cache_hash != h:
+			t0 = time.perf_counter()
+			self._repairbonds(pose)
+			h = _topologykey(pose)
+			self._cache = self._buildcache(pose, v)
+			self._cache_hash = h
+			self._cache_full = (_fullhash(pose) if self.check_topology
+				else None)
+			if self.nlist is not None: self.nlist.reset()
+			self._built_seconds = time.perf_counter() - t0
+			if self.profile:
+				self.counters['cache_builds'] += 1
+				self.counters['cache_seconds'] += self._built_seconds
+		elif self.check_topology:
+			full = _fullhash(pose)
+			if self._cache_full is None: self._cache_full = full
+			elif full != self._cache_full:
+				raise RuntimeError(
+					'ForceField: topology changed without a version bump; '
+					'call pose._bumptopology() after editing pose.data')
+		return self._cache
+	def evaluate_batch(self, pose, coords, grad=False, box=None,
+			max_bytes=2**28, v=False):
+		'''
+		Energies (and forces) of many conformers of one pose in a few
+		vectorised passes. The cache is built once; bonded terms and the
+		dense non-bonded terms run over a leading conformer axis in chunks
+		sized to max_bytes, the remaining terms (cutoff/PME non-bonded,
+		polarisation, CMAP) are evaluated conformer by conformer
+		Arguments:
+		----------
+			pose:      Pose - topology source shared by every conformer
+			coords:    ndarray - (K, N, 3) conformer coordinates in Å
+			grad:      bool - if True, also return (K, N, 3) forces
+			box:       None for no PBC; (3,) for orthorhombic; (3, 3) for
+				triclinic, shared by every conformer
+			max_bytes: int - working-memory budget per chunk
+			v:         verbosity, if True will print error for missing SMIRKS
+		Returns:
+		--------
+			ndarray: (K,) potential energies in kJ/mol  (when grad=False)
+			(ndarray, ndarray): energies and (K, N, 3) forces  (when grad=True)
+		'''
+		coords = np.asarray(coords, dtype=np.float64)
+		n = len(pose.data.get('Atoms', {}))
+		if coords.ndim != 3 or coords.shape[1:] != (n, 3):
+			raise ValueError(
+				'ForceField: coords must have shape (K, %d, 3), got %r'
+				% (n, coords.shape))
+		K = coords.shape[0]
+		E, F = np.zeros(K), np.zeros((K, n, 3))
+		if K == 0 or n == 0: return (E, F) if grad else E
+		if not np.isfinite(coords).all():
+			bad = np.argwhere(~np.isfinite(coords))[0]
+			raise FloatingPointError(
+				f'Non-finite coordinate at conformer {bad[0]} atom {bad[1]}')
+		cache = self._ensurecache(pose, v)
+		BATCHED = {'BondPotential', 'AnglePotential', 'UBPotential',
+			'ProperTorsionPotential', 'ImproperTorsionPotential'}
+		if self.cutoff is None:
+			BATCHED |= {'VDWPotential', 'ElectrostaticPotential'}
+		batched, single = [], []
+		for method_name, kwargs in self.terms:
+			if method_name in BATCHED and kwargs.get('alg') != 'pme':
+				batched.append((method_name, kwargs))
+			else: single.append((method_name, kwargs))
+		dense = any(m in ('VDWPotential', 'ElectrostaticPotential')
+			for m, kw in batched)
+		per = 8 * (16 * n * n if dense
+			else 64 * n + 16 * len(cache['quartets']))
+		chunk = int(max(1, min(K, max_bytes // max(per, 1))))
+		view = copy.copy(pose)
+		view.data = dict(pose.data)
+		with np.errstate(over='ignore', invalid='ignore',
+			divide='ignore'):
+			for a in range(0, K, chunk):
+				b = min(K, a + chunk)
+				view.data['Coordinates'] = coords[a:b]
+				for method_name, kwargs in batched:
+					fn = getattr(self, method_name)
+					if grad:
+						e, f = fn(view, cache=cache, grad=True, box=box,
+							**kwargs)
+						E[a:b] += e; F[a:b] += f
+					else:
+						E[a:b] += fn(view, cache=cache, grad=False, box=box,
+							**kwargs)
+			for k in range(K if single else 0):
+				view.data['Coordinates'] = coords[k]
+				cache['nb_pairs'] = None
+				for method_name, kwargs in single:
+					fn = getattr(self, method_name)
+					if grad:
+						e, f = fn(view, cache=cache, grad=True, box=box,
+							**kwargs)
+						E[k] += e; F[k] += f
+					else:
+						E[k] += fn(view, cache=cache, grad=False, box=box,
+							**kwargs)
 		return (E, F) if grad else E
 	def _buildcache(self, pose, v):
 		'''
@@ -136,96 +736,74 @@ class ForceField():
 		cache['pairs'] = pairs
 		flat = (np.concatenate([pairs, pairs[:, ::-1]])
 			if len(pairs) else np.empty((0, 2), dtype=np.int64))
-		nbrs = ({int(a): np.sort(flat[flat[:, 0] == a, 1])
-			for a in np.unique(flat[:, 0])} if len(flat) else {})
-		cache['nbrs'] = nbrs
-		cache['triplets'] = np.array(
-			[(int(i), j, int(k)) for j, ns in nbrs.items()
-			for p, i in enumerate(ns) for k in ns[p+1:]],
-			dtype=np.int64).reshape(-1, 3)
-		cache['excl_13'] = np.array(
-			[(int(i), int(k)) for j, ns in nbrs.items()
-			for p, i in enumerate(ns) for k in ns[p+1:]],
-			dtype=np.int64).reshape(-1, 2)
-		quartets = np.array(
-			[(int(i), int(j), int(k), int(l)) for j, k in pairs
-			for i in nbrs[int(j)] if i != k
-			for l in nbrs[int(k)] if l != j and l != i],
-			dtype=np.int64).reshape(-1, 4)
+		flat = flat[np.lexsort((flat[:, 1], flat[:, 0]))]
+		m = max(n, int(flat.max()) + 1 if len(flat) else 0)
+		deg = np.bincount(flat[:, 0], minlength=m)
+		indptr = np.concatenate([[0], np.cumsum(deg)])
+		indices = flat[:, 1]
+		cache['csr_indptr']  = indptr
+		cache['csr_indices'] = indices
+		cache['nbrs'] = {int(a): indices[indptr[a]:indptr[a + 1]]
+			for a in np.flatnonzero(deg)}
+		row = flat[:, 0]
+		later = deg[row] - (np.arange(len(flat)) - indptr[row]) - 1
+		e1, off = _ragged(later)
+		e2 = e1 + 1 + off
+		triplets = np.stack([indices[e1], row[e1], indices[e2]], axis=1)
+		cache['triplets'] = triplets
+		cache['excl_13']  = triplets[:, [0, 2]]
+		bj, bk = pairs[:, 0], pairs[:, 1]
+		b, off = _ragged(deg[bj] * deg[bk])
+		qj, qk = bj[b], bk[b]
+		qi = indices[indptr[qj] + off // np.maximum(deg[qk], 1)]
+		ql = indices[indptr[qk] + off % np.maximum(deg[qk], 1)]
+		ok = (qi != qk) & (ql != qj) & (ql != qi)
+		raw_quartets = np.stack([qi, qj, qk, ql], axis=1)[ok]
+		quartets = raw_quartets
 		if len(quartets):
-			rev = quartets[:, ::-1]
-			swap = (quartets[:, 0] > rev[:, 0]) | (
-				(quartets[:,0] == rev[:,0]) & (quartets[:,1] > rev[:,1]))
-			quartets = np.where(swap[:, None], rev, quartets)
+			swap = quartets[:, 0] > quartets[:, 3]
+			quartets = np.where(swap[:, None], quartets[:, ::-1], quartets)
 			quartets = np.unique(quartets, axis=0)
 		cache['quartets'] = quartets
-		excl_14 = np.array(
-			[(int(i), int(l)) for j, k in pairs
-			for i in nbrs[int(j)] if i != k
-			for l in nbrs[int(k)] if l != j and l != i],
-			dtype=np.int64).reshape(-1, 2)
+		excl_14 = raw_quartets[:, [0, 3]]
 		if len(excl_14):
-			excl_14.sort(axis=1)
-			excl_14 = np.unique(
-				excl_14[excl_14[:, 0] != excl_14[:, 1]], axis=0)
+			excl_14 = np.unique(np.sort(excl_14, axis=1), axis=0)
 		cache['excl_14'] = excl_14
 		with warnings.catch_warnings():
 			warnings.simplefilter('always' if v else 'ignore')
-			assigns = tools.SMIRKSMatch(pose, self.mol)
-		atoms_set = set(pose.data['Atoms'].keys())
-		bonds_dict = pose.data['Bonds']
-		nbr_local = {i: [j for j in bonds_dict.get(i, [])
-			if j in atoms_set and j != i] for i in atoms_set}
+			assigns = tools.SMIRKSMatch(pose, self.mol, name=self.name)
 		atoms = pose.data['Atoms']
-		nms = {i: '%s/%s[%s]' % (atoms[i][0], atoms[i][1],
-			''.join(sorted(atoms[j][1] for j in nbr_local[i])))
-			for i in atoms_set}
+		def nm(i):
+			return '%s/%s[%s]' % (atoms[i][0], atoms[i][1], ''.join(sorted(
+				atoms[int(j)][1] for j in indices[indptr[i]:indptr[i + 1]])))
+		def keyrows(d, width):
+			return np.array(list(d), dtype=np.int64).reshape(-1, width)
 		gaps = []
-		for i in atoms_set:
-			for j in nbr_local[i]:
-				if i >= j: continue
-				if (int(i), int(j)) not in assigns['bonds']:
-					gaps.append(f'bond {nms[i]}-{nms[j]}')
-		matched_angles = {(min(t[0], t[2]), t[1], max(t[0], t[2]))
-			for t in assigns['angles']}
-		for j in atoms_set:
-			ns = nbr_local[j]
-			for x in range(len(ns)):
-				for y in range(x + 1, len(ns)):
-					i, k = ns[x], ns[y]
-					tup = (min(i, k), j, max(i, k))
-					if tup not in matched_angles:
-						gaps.append(f'angle {nms[i]}-{nms[j]}-{nms[k]}')
-		matched_propers = set()
-		for tup in assigns['propers']:
-			ti, tj, tk, tl = tup
-			matched_propers.add((ti, tj, tk, tl) if tj < tk
-				else (tl, tk, tj, ti))
-		for i in atoms_set:
-			for j in nbr_local[i]:
-				if i >= j: continue
-				for x in nbr_local[i]:
-					if x == j: continue
-					for y in nbr_local[j]:
-						if y == i or y == x: continue
-						quad = (x, i, j, y) if i < j else (y, j, i, x)
-						if quad not in matched_propers:
-							gaps.append(f'torsion {nms[x]}-{nms[i]}-{nms[j]}-{nms[y]}')
+		bond_hit = self._rowindex(pairs, keyrows(assigns['bonds'], 2))
+		gaps += [f'bond {nm(a)}-{nm(b)}' for a, b in pairs[bond_hit < 0]]
+		akeys = keyrows(assigns['angles'], 3)
+		akeys = np.where((akeys[:, 0] > akeys[:, 2])[:, None],
+			akeys[:, ::-1], akeys)
+		miss = self._rowindex(triplets, akeys) < 0
+		gaps += [f'angle {nm(i)}-{nm(j)}-{nm(k)}'
+			for i, j, k in triplets[miss]]
+		pkeys = keyrows(assigns['propers'], 4)
+		pkeys = np.where((pkeys[:, 1] > pkeys[:, 2])[:, None],
+			pkeys[:, ::-1], pkeys)
+		miss = self._rowindex(raw_quartets, pkeys) < 0
+		gaps += [f'torsion {nm(x)}-{nm(i)}-{nm(j)}-{nm(y)}'
+			for x, i, j, y in raw_quartets[miss]]
 		if self.Parameters.get('improper_style',
 			'smirnoff') == 'smirnoff':
-			matched_centres = {tup[0]
-				for tup in assigns['impropers']}
-			matched_centres |= {tup[2]
-				for tup in assigns['impropers']}
-			for c in atoms_set:
-				if (len(nbr_local[c]) == 3
-					and c not in matched_centres):
-					gaps.append(f'improper centre {nms[c]}')
-		for i in atoms_set:
-			if assigns['vdw'].get(i) is None:
-				gaps.append(f'vdW atom {nms[i]}')
+			centres = np.array([t[c] for t in assigns['impropers']
+				for c in (0, 2)], dtype=np.int64)
+			miss = np.flatnonzero(deg[:n] == 3)
+			miss = miss[~np.isin(miss, centres)]
+			gaps += [f'improper centre {nm(c)}' for c in miss]
+		vdw = assigns['vdw']
+		gaps += [f'vdW atom {nm(i)}' for i in atoms if vdw.get(i) is None]
 		if gaps:
-			n_h = sum(1 for i in atoms_set if atoms[i][1] == 'H')
+			n_h = sum(1 for i in atoms if atoms[i][1] == 'H')
 			if n_h == 0:
 				msg=(f'Force field is missing ~{len(gaps)} H bonded terms. '
 					f'Call ReBuild() after Import() to add hydrogens.')
@@ -239,64 +817,47 @@ class ForceField():
 			if id(pose) not in self._warned_poses:
 				if v: print(msg)
 				self._warned_poses.add(id(pose))
-		constraints = assigns.get('constraints', set())
-		bond_Kb = np.zeros(len(pairs)); bond_r0 = np.zeros(len(pairs))
-		for p, (a, b) in enumerate(pairs):
-			par = assigns['bonds'].get((int(a), int(b)))
-			if par is not None:
-				bond_r0[p] = par[0]
-				if (int(a), int(b)) not in constraints:
-					bond_Kb[p] = par[1]
-		cache['bond_Kb'] = bond_Kb
-		cache['bond_r0'] = bond_r0
+		ckeys = keyrows(assigns.get('constraints', set()), 2)
+		def scatter(d, hit, cols):
+			vals = np.array([[par[c] for c in cols] for par in d.values()],
+				dtype=np.float64).reshape(-1, len(cols))
+			out = np.zeros((len(hit), len(cols)))
+			out[hit >= 0] = vals[hit[hit >= 0]]
+			return out
+		par = scatter(assigns['bonds'], bond_hit, (0, 1))
+		free = self._rowindex(pairs, ckeys) < 0
+		cache['bond_Kb'] = np.where(free, par[:, 1], 0.0)
+		cache['bond_r0'] = par[:, 0]
 		cache['bond_De'] = np.zeros(len(pairs))
 		cache['bond_a']  = np.zeros(len(pairs))
-		triplets = cache['triplets']
-		angle_Kt = np.zeros(len(triplets))
-		angle_t0 = np.zeros(len(triplets))
-		for p, (i, j, k) in enumerate(triplets):
-			ii = (int(i), int(j), int(k))
-			canon = (min(ii[0], ii[2]), ii[1], max(ii[0], ii[2]))
-			par = assigns['angles'].get(canon)
-			if par is not None:
-				angle_t0[p] = par[0]
-				if (canon[0], canon[2]) not in constraints:
-					angle_Kt[p] = par[1]
-		cache['angle_K_theta'] = angle_Kt
-		cache['angle_theta0']  = np.deg2rad(angle_t0)
+		par = scatter(assigns['angles'], self._rowindex(triplets,
+			keyrows(assigns['angles'], 3)), (0, 1))
+		free = self._rowindex(triplets[:, [0, 2]], ckeys) < 0
+		cache['angle_K_theta'] = np.where(free, par[:, 1], 0.0)
+		cache['angle_theta0']  = np.deg2rad(par[:, 0])
 		ub_assigns = assigns.get('ub', {})
-		ub_K_ub = np.zeros(len(triplets))
-		ub_s0   = np.zeros(len(triplets))
-		for p, (i, j, k) in enumerate(triplets):
-			canon = (min(int(i), int(k)), int(j), max(int(i), int(k)))
-			par = ub_assigns.get(canon)
-			if par is not None:
-				ub_s0[p]   = par[0]
-				ub_K_ub[p] = par[1]
-		cache['ub_K_ub'] = ub_K_ub
-		cache['ub_s0']   = ub_s0
-		comp_lists = []
-		for q in cache['quartets']:
-			i, j, k, l = (int(q[0]), int(q[1]), int(q[2]), int(q[3]))
-			canon = (i, j, k, l) if (i, j, k, l) <= (l, k, j, i) \
-				else (l, k, j, i)
-			comp = assigns['propers'].get(canon)
-			comp_lists.append(comp if comp is not None
-				else [[1, 0.0, 0.0, 1.0]])
-		counts = np.array([len(c) for c in comp_lists], dtype=np.int64)
-		flat_p = (np.array([row for cl in comp_lists for row in cl],
-			dtype=np.float64).reshape(-1, 4) if comp_lists
-			else np.empty((0, 4), dtype=np.float64))
+		par = scatter(ub_assigns, self._rowindex(triplets,
+			keyrows(ub_assigns, 3)), (0, 1))
+		cache['ub_K_ub'] = par[:, 1]
+		cache['ub_s0']   = par[:, 0]
+		comps = list(assigns['propers'].values())
+		pcount = np.array([len(c) for c in comps], dtype=np.int64)
+		prows = np.array([r for c in comps for r in c] + [[1, 0.0, 0.0, 1.0]],
+			dtype=np.float64).reshape(-1, 4)
+		hit = self._rowindex(quartets, keyrows(assigns['propers'], 4))
+		counts = np.where(hit >= 0, pcount[np.maximum(hit, 0)]
+			if len(pcount) else 0, 1).astype(np.int64)
+		q_idx, off = _ragged(counts)
+		first = np.cumsum(pcount) - pcount
+		src = np.where(hit[q_idx] >= 0, (first[np.maximum(hit[q_idx], 0)]
+			if len(first) else 0) + off, len(prows) - 1)
+		flat_p = prows[src]
 		cache['dihedral_counts'] = counts
-		cache['dihedral_q_idx']  = np.repeat(np.arange(len(counts)), counts)
-		cache['dihedral_k_phi']  = flat_p[:, 2] if len(flat_p) \
-			else np.zeros(0)
-		cache['dihedral_n_mult'] = flat_p[:, 0] if len(flat_p) \
-			else np.zeros(0)
-		cache['dihedral_phi0']   = (np.deg2rad(flat_p[:, 1])
-			if len(flat_p) else np.zeros(0))
-		cache['dihedral_idivf']  = (flat_p[:, 3] if len(flat_p)
-			else np.ones(0))
+		cache['dihedral_q_idx']  = q_idx
+		cache['dihedral_k_phi']  = flat_p[:, 2]
+		cache['dihedral_n_mult'] = flat_p[:, 0]
+		cache['dihedral_phi0']   = np.deg2rad(flat_p[:, 1])
+		cache['dihedral_idivf']  = flat_p[:, 3]
 		imps = assigns['impropers']
 		imp_arr = (np.array([(t[0], t[1], t[2], t[3]) for t in imps],
 			dtype=np.int64).reshape(-1, 4) if imps
@@ -308,80 +869,63 @@ class ForceField():
 			dtype=np.float64) if imps else np.zeros(0)
 		cache['imp_psi0'] = (np.deg2rad(np.array([t[5] for t in imps],
 			dtype=np.float64)) if imps else np.zeros(0))
-		sig = np.zeros(n); eps = np.zeros(n)
-		for i in range(n):
-			par = assigns['vdw'].get(i)
-			if par is not None:
-				eps[i], sig[i] = par[0], par[1]
+		def peratom(d, cols, base):
+			out = np.array(base, dtype=np.float64)
+			rows = [(i, *[p[c] for c in cols]) for i, p in d.items()
+				if p is not None and 0 <= i < n]
+			if rows:
+				rows = np.array(rows, dtype=np.float64)
+				out[rows[:, 0].astype(np.int64)] = rows[:, 1:]
+			return out
+		par = peratom(vdw, (0, 1), np.zeros((n, 2)))
+		eps, sig = par[:, 0].copy(), par[:, 1].copy()
 		cache['lj_sig']    = sig
 		cache['lj_eps']    = eps
-		pol_assigns = assigns.get('polarisation', {})
-		alpha = np.zeros(n)
-		for i in range(n):
-			a = pol_assigns.get(i)
-			if a is not None:
-				alpha[i] = a
-		cache['lj_alpha']  = alpha
-		cache['lj_sigma']  = 0.5 * (sig[:, None] + sig[None, :])
-		cache['lj_eps_ij'] = np.sqrt(eps[:, None] * eps[None, :])
+		cache['lj_alpha']  = peratom({i: (a,) for i, a in
+			assigns.get('polarisation', {}).items() if a is not None},
+			(0,), np.zeros((n, 1)))[:, 0]
+		vdw14 = assigns.get('vdw14', {})
+		par = peratom(vdw14, (0, 1), np.stack([eps, sig], axis=1))
+		eps14, sig14 = par[:, 0].copy(), par[:, 1].copy()
+		cache['lj_sig14'] = sig14
+		cache['lj_eps14'] = eps14
 		try: nagl_q = self.NAGLCharges(pose)
 		except Exception: nagl_q = None
-		q = np.zeros(n, dtype=np.float64)
+		q = peratom({i: (c,) for i, c in assigns['charges'].items()
+			if c is not None}, (0,), np.full((n, 1), np.nan))[:, 0]
+		rest = np.isnan(q)
 		used_nagl = False
-		n_fallback = 0
-		fallback_mask = np.zeros(n, dtype=bool)
-		for i in range(n):
-			if assigns['charges'][i] is not None:
-				q[i] = assigns['charges'][i]
-			elif nagl_q is not None and i < len(nagl_q):
-				q[i] = nagl_q[i]; used_nagl = True
-			else:
-				q[i] = atoms[i][2]
-				fallback_mask[i] = True
-				n_fallback += 1
+		if nagl_q is not None:
+			use = np.flatnonzero(rest)
+			use = use[use < len(nagl_q)]
+			q[use] = np.asarray(nagl_q, dtype=np.float64)[use]
+			rest[use] = False
+			used_nagl = len(use) > 0
+		fallback_mask = rest
+		n_fallback = int(rest.sum())
+		q[rest] = [atoms[int(i)][2] for i in np.flatnonzero(rest)]
 		if not used_nagl and n_fallback > 0:
 			fc_dict = getattr(pose, '_formal_charges', {}) or {}
 			Q = float(sum(int(fc_dict.get(i, 0)) for i in atoms))
 			shift = (Q - float(q.sum())) / n_fallback
 			q[fallback_mask] += shift
 		cache['charges'] = q
-		cache['qq']      = q[:, None] * q[None, :]
-		excl = np.eye(n, dtype=bool)
-		if len(pairs):
-			excl[pairs[:, 0], pairs[:, 1]] = True
-			excl[pairs[:, 1], pairs[:, 0]] = True
-		if len(cache['excl_13']):
-			excl[cache['excl_13'][:, 0], cache['excl_13'][:, 1]] = True
-			excl[cache['excl_13'][:, 1], cache['excl_13'][:, 0]] = True
-		scal14 = np.zeros((n, n), dtype=bool)
-		if len(excl_14):
-			scal14[excl_14[:, 0], excl_14[:, 1]] = True
-			scal14[excl_14[:, 1], excl_14[:, 0]] = True
-			scal14 &= ~excl
-		upper = np.triu(np.ones((n, n), dtype=bool), k=1)
-		cache['mask_far']    = (~excl) & (~scal14) & upper
-		cache['mask_14']     = scal14 & upper
-		f_lj   = self.Parameters['Constants']['f_lj']
-		f_elec = self.Parameters['Constants']['f_elec']
-		cache['weight_lj']   = np.where(excl, 0.0,
-			np.where(scal14, f_lj,  1.0))
-		cache['weight_elec'] = np.where(excl, 0.0,
-			np.where(scal14, f_elec, 1.0))
-		cache['scal14_bool'] = scal14
-		cache['excl_bool']   = excl
-		vdw14 = assigns.get('vdw14', {})
-		if vdw14:
-			sig14 = sig.copy(); eps14 = eps.copy()
-			for i in range(n):
-				p14 = vdw14.get(i)
-				if p14 is not None:
-					eps14[i], sig14[i] = p14[0], p14[1]
-			ls14 = 0.5 * (sig14[:, None] + sig14[None, :])
-			le14 = np.sqrt(eps14[:, None] * eps14[None, :])
-			cache['lj_sigma']  = np.where(scal14, ls14,
-				cache['lj_sigma'])
-			cache['lj_eps_ij'] = np.where(scal14, le14,
-				cache['lj_eps_ij'])
+		nb_excl = np.concatenate([pairs, cache['excl_13']])
+		if len(nb_excl):
+			nb_excl = np.sort(nb_excl, axis=1)
+			nb_excl = np.unique(
+				nb_excl[nb_excl[:, 0] != nb_excl[:, 1]], axis=0)
+		pairs_14 = excl_14
+		if len(pairs_14) and len(nb_excl):
+			pairs_14 = pairs_14[~np.isin(pairs_14[:, 0] * n
+				+ pairs_14[:, 1], nb_excl[:, 0] * n + nb_excl[:, 1])]
+		cache['nb_excl']  = nb_excl
+		cache['pairs_14'] = pairs_14
+		cache['nb_skip']  = np.unique(np.concatenate([
+			nb_excl[:, 0] * n + nb_excl[:, 1],
+			pairs_14[:, 0] * n + pairs_14[:, 1]]))
+		if self.cutoff is None:
+			self._densecache(cache, sig, eps, sig14, eps14, bool(vdw14))
 		cache['cmap_phi_q']  = np.empty((0, 4), dtype=np.int64)
 		cache['cmap_psi_q']  = np.empty((0, 4), dtype=np.int64)
 		cache['cmap_tables'] = np.empty((0, 24, 24), dtype=np.float64)
@@ -449,25 +993,90 @@ class ForceField():
 		cache['cmap_d12'] = np.einsum('mab,cb->mac',
 			cache['cmap_d1'], D)
 		return cache
+	def _rowindex(self, rows, keys):
+		'''
+		Position of every integer row among a set of key rows
+		Arguments:
+		----------
+			rows: ndarray (m, w) - query rows
+			keys: ndarray (k, w) - key rows, e.g. the tuple keys of a
+				SMIRKSMatch assignment dict in iteration order
+		Returns:
+		--------
+			ndarray (m,): index of the first equal key row, -1 when absent
+		'''
+		rows = np.asarray(rows, dtype=np.int64)
+		keys = np.asarray(keys, dtype=np.int64)
+		if len(rows) == 0 or len(keys) == 0:
+			return np.full(len(rows), -1, dtype=np.int64)
+		_, inv = np.unique(np.concatenate([keys, rows]), axis=0,
+			return_inverse=True)
+		inv = inv.ravel()
+		first = np.full(int(inv.max()) + 1, -1, dtype=np.int64)
+		first[inv[:len(keys)][::-1]] = np.arange(len(keys))[::-1]
+		return first[inv[len(keys):]]
+	def _densecache(self, cache, sig, eps, sig14, eps14, has14):
+		'''
+		Add the dense (n, n) non-bonded parameter and mask arrays used
+		when the force field runs without a cutoff
+		Arguments:
+		----------
+			cache: dict - the cache being built by _buildcache, edited
+				in place
+			sig:   ndarray (n,) - per-atom LJ sigma
+			eps:   ndarray (n,) - per-atom LJ epsilon
+			sig14: ndarray (n,) - per-atom LJ sigma for 1-4 pairs
+			eps14: ndarray (n,) - per-atom LJ epsilon for 1-4 pairs
+			has14: bool - True when the force field carries 1-4 vdW
+				overrides
+		Returns:
+		--------
+			None: the dense arrays are written into cache
+		'''
+		n = cache['n']
+		q = cache['charges']
+		nb_excl  = cache['nb_excl']
+		pairs_14 = cache['pairs_14']
+		cache['lj_sigma']  = 0.5 * (sig[:, None] + sig[None, :])
+		cache['lj_eps_ij'] = np.sqrt(eps[:, None] * eps[None, :])
+		cache['qq']        = q[:, None] * q[None, :]
+		excl = np.eye(n, dtype=bool)
+		if len(nb_excl):
+			excl[nb_excl[:, 0], nb_excl[:, 1]] = True
+			excl[nb_excl[:, 1], nb_excl[:, 0]] = True
+		scal14 = np.zeros((n, n), dtype=bool)
+		if len(pairs_14):
+			scal14[pairs_14[:, 0], pairs_14[:, 1]] = True
+			scal14[pairs_14[:, 1], pairs_14[:, 0]] = True
+		upper = np.triu(np.ones((n, n), dtype=bool), k=1)
+		cache['mask_far']    = (~excl) & (~scal14) & upper
+		cache['mask_14']     = scal14 & upper
+		f_lj   = self.Parameters['Constants']['f_lj']
+		f_elec = self.Parameters['Constants']['f_elec']
+		cache['weight_lj']   = np.where(excl, 0.0,
+			np.where(scal14, f_lj,  1.0))
+		cache['weight_elec'] = np.where(excl, 0.0,
+			np.where(scal14, f_elec, 1.0))
+		cache['scal14_bool'] = scal14
+		cache['excl_bool']   = excl
+		if has14:
+			ls14 = 0.5 * (sig14[:, None] + sig14[None, :])
+			le14 = np.sqrt(eps14[:, None] * eps14[None, :])
+			cache['lj_sigma']  = np.where(scal14, ls14,
+				cache['lj_sigma'])
+			cache['lj_eps_ij'] = np.where(scal14, le14,
+				cache['lj_eps_ij'])
 	def _topologyhash(self, pose):
 		'''
-		Deterministic hash of bond graph, atom records and AA assignments
+		Topology fingerprint of a pose, as compared against _cache_hash
 		Arguments:
 		----------
 			pose: Pose - molecule source protein, DNA, RNA, or Molecule pose
 		Returns:
 		--------
-			int: hash used by tools.py callers to detect cache invalidation
+			tuple: key used by tools.py callers to detect cache invalidation
 		'''
-		bonds_key = tuple((int(k), tuple(sorted(int(j) for j in v)))
-			for k, v in sorted(pose.data['Bonds'].items()))
-		atoms_key = tuple((int(k), tuple(a))
-			for k, a in sorted(pose.data['Atoms'].items()))
-		aas = pose.data.get('Amino Acids')
-		aas_key = None if aas is None else tuple(
-			(int(k), info[0], info[1], tuple(info[2]))
-			for k, info in sorted(aas.items()))
-		return hash((bonds_key, atoms_key, aas_key))
+		return _topologykey(pose)
 	def _repairbonds(self, pose):
 		'''
 		Complete an under-specified bond graph in place: bond every
@@ -480,7 +1089,8 @@ class ForceField():
 			pose: Pose - the pose whose data['Bonds'] may be incomplete
 		Returns:
 		--------
-			int: number of bonds added (0 when nothing needed repair)
+			int: number of bonds added (0 when nothing needed repair); the
+			pose topology version is bumped when any bond was added
 		'''
 		atoms  = pose.data['Atoms']
 		bonds  = pose.data['Bonds']
@@ -511,6 +1121,8 @@ class ForceField():
 					if np.linalg.norm(coords[i] - coords[j]) <= 2.5:
 						self._addbond(bonds, orders, bondset, i, j)
 						added += 1
+		if added and hasattr(pose, '_bumptopology'):
+			pose._bumptopology()
 		return added
 	def _addbond(self, bonds, orders, bondset, i, j):
 		'''
@@ -555,13 +1167,117 @@ class ForceField():
 			dvec wrapped to its minimum-image representation.
 		'''
 		if box is None: return dvec
-		box = np.asarray(box, dtype=np.float64)
+		box = np.asarray(box, dtype=dvec.dtype)
 		if box.ndim == 1:
 			return dvec - box * np.round(dvec / box)
 		inv_B = np.linalg.inv(box)
 		f = dvec @ inv_B
 		f -= np.round(f)
 		return f @ box
+	def _esum(self, x, dtype=None):
+		'''
+		Sum per-term energies over the last axis
+		Arguments:
+		----------
+			x:     ndarray - per-term energies, optionally with leading
+				conformer axes
+			dtype: accumulator dtype, None to sum in x's own dtype
+		Returns:
+		--------
+			float for a single conformer, else ndarray of the leading shape
+		'''
+		total = np.sum(x, axis=-1, dtype=dtype)
+		return float(total) if np.ndim(total) == 0 else total
+	def _lowp(self, cache, key):
+		'''
+		Cache array in the pair-kernel precision, converted once per
+		cache build and kept alongside the float64 original
+		Arguments:
+		----------
+			cache: dict - precomputed topology + parameter cache
+			key:   str  - cache entry to convert
+		Returns:
+		--------
+			ndarray: cache[key] as float32 under 'mixed'/'single' precision,
+			cache[key] itself under 'double'
+		'''
+		if self._kdtype is np.float64: return cache[key]
+		lk = '_f32_' + key
+		if lk not in cache: cache[lk] = cache[key].astype(np.float32)
+		return cache[lk]
+	def _scatter(self, forces, idx, f):
+		'''
+		Accumulate per-term force rows onto atoms, with any number of
+		leading conformer axes
+		Arguments:
+		----------
+			forces: ndarray - (..., N, 3) force array updated in place
+			idx:    ndarray - (M,) atom index per term
+			f:      ndarray - (..., M, 3) force per term
+		Returns:
+		--------
+			No return value; forces is updated in place
+		'''
+		np.add.at(forces, (..., idx, slice(None)), f)
+	def _pairlist(self, pose, cache, box=None):
+		'''
+		Sparse non-bonded pair list for the current coordinates: every
+		pair within cutoff + skin minus the 1-2, 1-3 and 1-4 pairs, which
+		are excluded or handled explicitly through cache['pairs_14'].
+		Served from the Verlet neighbour list, which is only rebuilt once
+		some atom has moved more than half the skin; pairs beyond the
+		cutoff are zeroed by the kernels
+		Arguments:
+		----------
+			pose:  Pose - molecule source protein, DNA, RNA, or Molecule pose
+			cache: dict - precomputed topology + parameter cache
+			box:   None for no PBC; (3,) for orthorhombic; (3, 3) for triclinic
+		Returns:
+		--------
+			tuple: (i, j) int64 arrays of non-excluded pairs with i < j
+		'''
+		if cache.get('nb_pairs') is not None: return cache['nb_pairs']
+		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		nl = self.nlist
+		nl.n_calls += 1
+		if nl.stale(coords, box):
+			i_idx, j_idx = _cellpairs(coords, nl.cutoff + nl.skin, box)
+			skip = cache['nb_skip']
+			if len(skip) and len(i_idx):
+				key = i_idx * cache['n'] + j_idx
+				k = np.minimum(np.searchsorted(skip, key), len(skip) - 1)
+				keep = skip[k] != key
+				i_idx, j_idx = i_idx[keep], j_idx[keep]
+			nl.store(i_idx, j_idx, coords, box)
+		cache['nb_pairs'] = nl.pairs
+		return cache['nb_pairs']
+	def _cutoffpair(self, kernel, r):
+		'''
+		Apply the configured cutoff treatment to a pair kernel
+		Arguments:
+		----------
+			kernel: callable - maps distances (m,) to (U, dU/dr) arrays
+				for the same m pairs
+			r:      ndarray (m,) - pair distances in Å
+		Returns:
+		--------
+			tuple: (U, dU/dr) arrays, zero beyond the cutoff
+		'''
+		rc = self.cutoff
+		U, dU = kernel(r)
+		if self.switch == 'shift':
+			Uc, dUc = kernel(np.full_like(r, rc))
+			U  = U - Uc - (r - rc) * dUc
+			dU = dU - dUc
+		else:
+			rs = self.r_switch
+			x = np.clip((r - rs) / (rc - rs), 0.0, 1.0)
+			S  = 1.0 - x**3 * (10.0 - 15.0 * x + 6.0 * x * x)
+			dS = -30.0 * x * x * (1.0 - x)**2 / (rc - rs)
+			dU = dU * S + U * dS
+			U  = U * S
+		inside = r <= rc
+		return np.where(inside, U, 0.0), np.where(inside, dU, 0.0)
 	def NAGLCharges(self, pose):
 		'''
 		NAGL AM1-BCC partial charges, NumPy reimplementation of the
@@ -858,19 +1574,19 @@ class ForceField():
 			return (0.0, np.zeros((n, 3))) if grad else 0.0
 		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
 		i_idx, j_idx = pairs[:, 0], pairs[:, 1]
-		dvec = self._wrap(coords[i_idx] - coords[j_idx], box)
-		r = np.linalg.norm(dvec, axis=1)
+		dvec = self._wrap(coords[..., i_idx, :] - coords[..., j_idx, :], box)
+		r = np.linalg.norm(dvec, axis=-1)
 		Kb, De, a, r0 = (cache['bond_Kb'], cache['bond_De'],
 			cache['bond_a'], cache['bond_r0'])
 		if   alg.upper() == 'HARMONIC':
 			dr = r - r0
-			energy = float(np.sum(Kb * dr**2))
+			energy = self._esum(Kb * dr**2)
 			if not grad: return energy
 			coef = -2.0 * Kb * dr / np.maximum(r, self._EPS)
 		elif alg.upper() == 'MORSE':
 			dr = r - r0
 			e_decay = np.exp(-a * dr)
-			energy = float(np.sum(De * (1 - e_decay)**2))
+			energy = self._esum(De * (1 - e_decay)**2)
 			if not grad: return energy
 			coef = -2.0 * De * (1 - e_decay) * a * e_decay \
 				/ np.maximum(r, self._EPS)
@@ -878,10 +1594,10 @@ class ForceField():
 			raise ValueError(
 				"BondPotential: unknown alg=%r (allowed: 'harmonic', 'morse')"
 				% (alg,))
-		forces = np.zeros((n, 3), dtype=np.float64)
-		fij = coef[:, None] * dvec
-		np.add.at(forces, i_idx, fij)
-		np.add.at(forces, j_idx, -fij)
+		forces = np.zeros(coords.shape, dtype=np.float64)
+		fij = coef[..., None] * dvec
+		self._scatter(forces, i_idx, fij)
+		self._scatter(forces, j_idx, -fij)
 		return energy, forces
 	def AnglePotential(self, pose, cache, grad=True, box=None):
 		'''
@@ -903,30 +1619,30 @@ class ForceField():
 			return (0.0, np.zeros((n, 3))) if grad else 0.0
 		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
 		i_idx, j_idx, k_idx = triplets[:, 0], triplets[:, 1], triplets[:, 2]
-		v1 = self._wrap(coords[i_idx] - coords[j_idx], box)
-		v2 = self._wrap(coords[k_idx] - coords[j_idx], box)
-		mag1 = np.maximum(np.linalg.norm(v1, axis=1), self._EPS)
-		mag2 = np.maximum(np.linalg.norm(v2, axis=1), self._EPS)
-		cos = np.einsum('ij,ij->i', v1, v2) / (mag1 * mag2)
+		v1 = self._wrap(coords[..., i_idx, :] - coords[..., j_idx, :], box)
+		v2 = self._wrap(coords[..., k_idx, :] - coords[..., j_idx, :], box)
+		mag1 = np.maximum(np.linalg.norm(v1, axis=-1), self._EPS)
+		mag2 = np.maximum(np.linalg.norm(v2, axis=-1), self._EPS)
+		cos = np.einsum('...i,...i->...', v1, v2) / (mag1 * mag2)
 		cos = np.clip(cos, -1.0, 1.0)
 		theta = np.arccos(cos)
 		K_theta = cache['angle_K_theta']
 		theta0  = cache['angle_theta0']
-		energy = float(np.sum(K_theta * (theta - theta0)**2))
+		energy = self._esum(K_theta * (theta - theta0)**2)
 		if not grad: return energy
-		forces = np.zeros((n, 3), dtype=np.float64)
+		forces = np.zeros(coords.shape, dtype=np.float64)
 		dU_dth = 2.0 * K_theta * (theta - theta0)
 		sin_th = np.sqrt(np.clip(1.0 - cos**2, self._EPS, None))
-		u1 = v1 / mag1[:, None]
-		u2 = v2 / mag2[:, None]
-		factor_i = (dU_dth / (sin_th * mag1))[:, None]
-		factor_k = (dU_dth / (sin_th * mag2))[:, None]
-		Fi = factor_i * (u2 - cos[:, None] * u1)
-		Fk = factor_k * (u1 - cos[:, None] * u2)
+		u1 = v1 / mag1[..., None]
+		u2 = v2 / mag2[..., None]
+		factor_i = (dU_dth / (sin_th * mag1))[..., None]
+		factor_k = (dU_dth / (sin_th * mag2))[..., None]
+		Fi = factor_i * (u2 - cos[..., None] * u1)
+		Fk = factor_k * (u1 - cos[..., None] * u2)
 		Fj = -(Fi + Fk)
-		np.add.at(forces, i_idx, Fi)
-		np.add.at(forces, j_idx, Fj)
-		np.add.at(forces, k_idx, Fk)
+		self._scatter(forces, i_idx, Fi)
+		self._scatter(forces, j_idx, Fj)
+		self._scatter(forces, k_idx, Fk)
 		return energy, forces
 	def VDWPotential(self, pose, cache, alg='12-6', grad=True, box=None):
 		'''
@@ -944,15 +1660,23 @@ class ForceField():
 			(float, ndarray): energy and (N, 3) forces  (when grad=True)
 		'''
 		n = cache['n']
-		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
-		sigma    = cache['lj_sigma']
-		epsilon  = cache['lj_eps_ij']
+		if alg not in ('12-6', '9-6'):
+			raise ValueError(
+				"VDWPotential: unknown alg=%r (allowed: '12-6', '9-6')"
+				% (alg,))
+		if self.cutoff is not None:
+			return self._sparsevdw(pose, cache, alg, grad, box)
+		coords = np.asarray(pose.data['Coordinates'], dtype=self._kdtype)
+		sigma    = self._lowp(cache, 'lj_sigma')
+		epsilon  = self._lowp(cache, 'lj_eps_ij')
 		mask_far = cache['mask_far']
 		mask14   = cache['mask_14']
-		weight   = cache['weight_lj']
-		dvec = self._wrap(coords[:, None, :] - coords[None, :, :], box)
+		weight   = self._lowp(cache, 'weight_lj')
+		dvec = self._wrap(coords[..., :, None, :] - coords[..., None, :, :],
+			box)
 		r = np.linalg.norm(dvec, axis=-1)
-		np.fill_diagonal(r, 1.0)
+		diag = np.arange(n)
+		r[..., diag, diag] = 1.0
 		r = np.maximum(r, self._EPS)
 		f_lj = self.Parameters['Constants']['f_lj']
 		if   alg == '12-6':
@@ -969,37 +1693,55 @@ class ForceField():
 			raise ValueError(
 				"VDWPotential: unknown alg=%r (allowed: '12-6', '9-6')"
 				% (alg,))
-		energy = float(np.sum(lj[mask_far]) + f_lj * np.sum(lj[mask14]))
+		energy = self._esum(lj[..., mask_far], self._acc) + \
+			f_lj * self._esum(lj[..., mask14], self._acc)
 		if not grad: return energy
 		coef = -dU_dr / r * weight
-		fij_per_pair = coef[:, :, None] * dvec
-		forces = np.sum(fij_per_pair, axis=1)
+		fij_per_pair = coef[..., None] * dvec
+		forces = np.sum(fij_per_pair, axis=-2, dtype=self._acc)
 		return energy, forces
-	def ElectrostaticPotential(self,pose,cache,alg='constant',grad=True,box=None):
+	def ElectrostaticPotential(self,pose,cache,alg='constant',grad=True,box=None,
+			ewald_tol=1e-5, grid_spacing=1.0, order=4):
 		'''
 		Calculates the Electrostatic non-bonded potential for all atom pairs
 		Arguments:
 		----------
 			pose:  Pose - molecule source protein, DNA, RNA, or Molecule pose
 			cache: dict - precomputed topology + parameter from _compile()
-			alg:   Str algorithm type either 'constant' (uniform εr) or 'ddd'
-				(distance-dependent dielectric, ε(r) = εr·r)
+			alg:   Str algorithm type either 'constant' (uniform εr), 'ddd'
+				(distance-dependent dielectric, ε(r) = εr·r) or 'pme'
+				(smooth particle-mesh Ewald; needs a box and a cutoff)
 			grad:  bool - if True, also return per-atom forces (N, 3) array
 			box:   None for no PBC; (3,) for orthorhombic; (3, 3) for triclinic
+			ewald_tol:    float - 'pme' only, erfc(β·cutoff) target that
+				sets the Ewald splitting parameter β
+			grid_spacing: float - 'pme' only, target mesh spacing in Å
+			order:        int - 'pme' only, B-spline interpolation order
 		Returns:
 		--------
 			float: potential energy in kJ/mol  (when grad=False)
 			(float, ndarray): energy and (N, 3) forces  (when grad=True)
 		'''
 		n        = cache['n']
-		qq       = cache['qq']
+		if alg not in ('constant', 'ddd', 'pme'):
+			raise ValueError(
+				"ElectrostaticPotential: unknown alg=%r "
+				"(allowed: 'constant', 'ddd', 'pme')" % (alg,))
+		if alg == 'pme':
+			return self._pmeelec(pose, cache, grad, box, ewald_tol,
+				grid_spacing, order)
+		if self.cutoff is not None:
+			return self._sparseelec(pose, cache, alg, grad, box)
+		qq       = self._lowp(cache, 'qq')
 		mask_far = cache['mask_far']
 		mask_14  = cache['mask_14']
-		weight   = cache['weight_elec']
-		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
-		dvec = self._wrap(coords[:, None, :] - coords[None, :, :], box)
+		weight   = self._lowp(cache, 'weight_elec')
+		coords = np.asarray(pose.data['Coordinates'], dtype=self._kdtype)
+		dvec = self._wrap(coords[..., :, None, :] - coords[..., None, :, :],
+			box)
 		r = np.linalg.norm(dvec, axis=-1)
-		np.fill_diagonal(r, 1.0)
+		diag = np.arange(n)
+		r[..., diag, diag] = 1.0
 		r = np.maximum(r, self._EPS)
 		epsilon_r = self.Parameters['Constants']['epsilon_r']
 		if alg == 'constant':
@@ -1013,12 +1755,315 @@ class ForceField():
 				"ElectrostaticPotential: unknown alg=%r "
 				"(allowed: 'constant', 'ddd')" % (alg,))
 		f_elec = self.Parameters['Constants']['f_elec']
-		energy = float(np.sum(elec[mask_far]) + f_elec * np.sum(elec[mask_14]))
+		energy = self._esum(elec[..., mask_far], self._acc) + \
+			f_elec * self._esum(elec[..., mask_14], self._acc)
 		if not grad: return energy
 		coef = -dU_dr / r * weight
-		fij_per_pair = coef[:, :, None] * dvec
-		forces = np.sum(fij_per_pair, axis=1)
+		fij_per_pair = coef[..., None] * dvec
+		forces = np.sum(fij_per_pair, axis=-2, dtype=self._acc)
 		return energy, forces
+	def _sparsevdw(self, pose, cache, alg, grad, box):
+		'''
+		Cutoff Lennard-Jones over the sparse pair list plus the explicit
+		1-4 pairs, called by VDWPotential when the force field has a cutoff
+		Arguments:
+		----------
+			pose:  Pose - molecule source protein, DNA, RNA, or Molecule pose
+			cache: dict - precomputed topology + parameter cache
+			alg:   Str algorithm type either '12-6' or '9-6'
+			grad:  bool - if True, also return per-atom forces (N, 3) array
+			box:   None for no PBC; (3,) for orthorhombic; (3, 3) for triclinic
+		Returns:
+		--------
+			float: potential energy in kJ/mol  (when grad=False)
+			(float, ndarray): energy and (N, 3) forces  (when grad=True)
+		'''
+		n = cache['n']
+		coords = np.asarray(pose.data['Coordinates'], dtype=self._kdtype)
+		f_lj = self.Parameters['Constants']['f_lj']
+		i_far, j_far = self._pairlist(pose, cache, box)
+		p14 = cache['pairs_14']
+		sig, eps = self._lowp(cache, 'lj_sig'), self._lowp(cache, 'lj_eps')
+		sig14 = self._lowp(cache, 'lj_sig14')
+		eps14 = self._lowp(cache, 'lj_eps14')
+		def lj(r, sigma, epsilon):
+			if alg == '12-6':
+				ratio_6  = (sigma / r)**6
+				ratio_12 = ratio_6**2
+				return (4.0 * epsilon * (ratio_12 - ratio_6),
+					-24.0 * epsilon * (2*ratio_12 - ratio_6) / r)
+			ratio_6 = (sigma / r)**6
+			ratio_9 = (sigma / r)**9
+			return (epsilon * (2*ratio_9 - 3*ratio_6),
+				-18.0 * epsilon * (ratio_9 - ratio_6) / r)
+		dv_far = self._wrap(coords[i_far] - coords[j_far], box)
+		r_far = np.maximum(np.linalg.norm(dv_far, axis=1), self._EPS)
+		s_far = 0.5 * (sig[i_far] + sig[j_far])
+		e_far = np.sqrt(eps[i_far] * eps[j_far])
+		U_far, dU_far = self._cutoffpair(
+			lambda r: lj(r, s_far, e_far), r_far)
+		dv_14 = self._wrap(coords[p14[:, 0]] - coords[p14[:, 1]], box)
+		r_14 = np.maximum(np.linalg.norm(dv_14, axis=1), self._EPS)
+		U_14, dU_14 = lj(r_14, 0.5 * (sig14[p14[:, 0]] + sig14[p14[:, 1]]),
+			np.sqrt(eps14[p14[:, 0]] * eps14[p14[:, 1]]))
+		energy = float(np.sum(U_far, dtype=self._acc)
+			+ f_lj * np.sum(U_14, dtype=self._acc))
+		if not grad: return energy
+		forces = np.zeros((n, 3), dtype=self._acc)
+		fij = (-dU_far / r_far)[:, None] * dv_far
+		np.add.at(forces, i_far, fij)
+		np.add.at(forces, j_far, -fij)
+		fij = (-f_lj * dU_14 / r_14)[:, None] * dv_14
+		np.add.at(forces, p14[:, 0], fij)
+		np.add.at(forces, p14[:, 1], -fij)
+		return energy, forces
+	def _sparseelec(self, pose, cache, alg, grad, box):
+		'''
+		Cutoff Coulomb over the sparse pair list plus the explicit 1-4
+		pairs, called by ElectrostaticPotential when the force field has
+		a cutoff
+		Arguments:
+		----------
+			pose:  Pose - molecule source protein, DNA, RNA, or Molecule pose
+			cache: dict - precomputed topology + parameter cache
+			alg:   Str algorithm type either 'constant' or 'ddd'
+			grad:  bool - if True, also return per-atom forces (N, 3) array
+			box:   None for no PBC; (3,) for orthorhombic; (3, 3) for triclinic
+		Returns:
+		--------
+			float: potential energy in kJ/mol  (when grad=False)
+			(float, ndarray): energy and (N, 3) forces  (when grad=True)
+		'''
+		n = cache['n']
+		q = self._lowp(cache, 'charges')
+		coords = np.asarray(pose.data['Coordinates'], dtype=self._kdtype)
+		epsilon_r = self.Parameters['Constants']['epsilon_r']
+		f_elec = self.Parameters['Constants']['f_elec']
+		i_far, j_far = self._pairlist(pose, cache, box)
+		p14 = cache['pairs_14']
+		def coulomb(r, qq):
+			if alg == 'constant':
+				elec = (1389.35458 * qq) / (epsilon_r * r)
+				return elec, -elec / r
+			elec = (1389.35458 * qq) / (epsilon_r * r * r)
+			return elec, -2.0 * elec / r
+		dv_far = self._wrap(coords[i_far] - coords[j_far], box)
+		r_far = np.maximum(np.linalg.norm(dv_far, axis=1), self._EPS)
+		qq_far = q[i_far] * q[j_far]
+		U_far, dU_far = self._cutoffpair(
+			lambda r: coulomb(r, qq_far), r_far)
+		dv_14 = self._wrap(coords[p14[:, 0]] - coords[p14[:, 1]], box)
+		r_14 = np.maximum(np.linalg.norm(dv_14, axis=1), self._EPS)
+		U_14, dU_14 = coulomb(r_14, q[p14[:, 0]] * q[p14[:, 1]])
+		energy = float(np.sum(U_far, dtype=self._acc)
+			+ f_elec * np.sum(U_14, dtype=self._acc))
+		if not grad: return energy
+		forces = np.zeros((n, 3), dtype=self._acc)
+		fij = (-dU_far / r_far)[:, None] * dv_far
+		np.add.at(forces, i_far, fij)
+		np.add.at(forces, j_far, -fij)
+		fij = (-f_elec * dU_14 / r_14)[:, None] * dv_14
+		np.add.at(forces, p14[:, 0], fij)
+		np.add.at(forces, p14[:, 1], -fij)
+		return energy, forces
+	def _pmeelec(self, pose, cache, grad, box, ewald_tol, grid_spacing,
+			order):
+		'''
+		Smooth particle-mesh Ewald electrostatics (Essmann et al. 1995):
+		erfc-screened real-space sum over the sparse pair list, B-spline
+		charge spreading with an FFT reciprocal-space sum, self and
+		net-charge terms, and corrections for the 1-2/1-3 exclusions and
+		scaled 1-4 pairs, which the reciprocal sum includes in full
+		Arguments:
+		----------
+			pose:         Pose - molecule source protein, DNA, RNA, or Molecule
+			cache:        dict - precomputed topology + parameter cache
+			grad:         bool - if True, also return per-atom forces
+			box:          (3,) orthorhombic or (3, 3) triclinic, in Å
+			ewald_tol:    float - erfc(β·cutoff) target
+			grid_spacing: float - target mesh spacing in Å
+			order:        int - B-spline interpolation order (>= 3)
+		Returns:
+		--------
+			float: potential energy in kJ/mol  (when grad=False)
+			(float, ndarray): energy and (N, 3) forces  (when grad=True)
+		'''
+		if box is None:
+			raise ValueError(
+				"ElectrostaticPotential: alg='pme' needs a periodic box")
+		if self.cutoff is None:
+			raise ValueError(
+				"ElectrostaticPotential: alg='pme' needs a ForceField "
+				"cutoff for the real-space sum")
+		if int(order) < 3:
+			raise ValueError('ElectrostaticPotential: order must be >= 3')
+		n = cache['n']
+		q = cache['charges']
+		order = int(order)
+		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		B = np.asarray(box, dtype=np.float64)
+		if B.ndim == 1: B = np.diag(B)
+		ke = 1389.35458 / self.Parameters['Constants']['epsilon_r']
+		f_elec = self.Parameters['Constants']['f_elec']
+		rc = self.cutoff
+		beta = math.sqrt(-math.log(2.0 * ewald_tol)) / rc
+		key = (B.tobytes(), beta, float(grid_spacing), order)
+		pme = cache.get('pme')
+		if pme is None or pme['key'] != key:
+			pme = self._pmegrid(B, beta, ke, grid_spacing, order)
+			pme['key'] = key
+			cache['pme'] = pme
+		K, Binv, G, V = pme['K'], pme['Binv'], pme['G'], pme['V']
+		forces = np.zeros((n, 3), dtype=np.float64)
+		i_far, j_far = self._pairlist(pose, cache, box)
+		dv = self._wrap(coords[i_far] - coords[j_far], box)
+		r = np.maximum(np.linalg.norm(dv, axis=1), self._EPS)
+		qq = ke * q[i_far] * q[j_far] * (r <= rc)
+		erfc = self._erfc(beta * r)
+		gauss = (2.0 * beta / math.sqrt(math.pi)) * np.exp(-(beta * r)**2)
+		E_real = float(np.sum(qq * erfc / r))
+		if grad:
+			dU = -qq * (erfc / r**2 + gauss / r)
+			fij = (-dU / r)[:, None] * dv
+			np.add.at(forces, i_far, fij)
+			np.add.at(forces, j_far, -fij)
+		pe = np.concatenate([cache['nb_excl'], cache['pairs_14']])
+		w = np.concatenate([np.zeros(len(cache['nb_excl'])),
+			np.full(len(cache['pairs_14']), f_elec)])
+		dv = self._wrap(coords[pe[:, 0]] - coords[pe[:, 1]], box)
+		r = np.maximum(np.linalg.norm(dv, axis=1), self._EPS)
+		qq = ke * q[pe[:, 0]] * q[pe[:, 1]]
+		erf = 1.0 - self._erfc(beta * r)
+		gauss = (2.0 * beta / math.sqrt(math.pi)) * np.exp(-(beta * r)**2)
+		E_excl = float(np.sum(qq * (w - erf) / r))
+		if grad:
+			dU = qq * (-(w - erf) / r**2 - gauss / r)
+			fij = (-dU / r)[:, None] * dv
+			np.add.at(forces, pe[:, 0], fij)
+			np.add.at(forces, pe[:, 1], -fij)
+		u = (coords @ Binv) * K
+		g = np.floor(u).astype(np.int64)
+		theta, dtheta = self._bspline((u - g).ravel(), order)
+		theta  = theta.reshape(n, 3, order)
+		dtheta = dtheta.reshape(n, 3, order)
+		idx = (g[:, :, None] - np.arange(order)) % K[None, :, None]
+		flat = ((idx[:, 0, :, None, None] * K[1]
+			+ idx[:, 1, None, :, None]) * K[2] + idx[:, 2, None, None, :])
+		t1, t2, t3 = theta[:, 0], theta[:, 1], theta[:, 2]
+		W = (q[:, None, None, None] * t1[:, :, None, None]
+			* t2[:, None, :, None] * t3[:, None, None, :])
+		N = int(np.prod(K))
+		Q = np.bincount(flat.ravel(), weights=W.ravel(),
+			minlength=N).reshape(tuple(K))
+		conv = np.fft.irfftn(G * np.fft.rfftn(Q), s=tuple(K)) * N
+		E_rec = float(np.sum(Q * conv))
+		E_self = -ke * beta / math.sqrt(math.pi) * float(np.sum(q * q))
+		E_net = -ke * math.pi * float(np.sum(q))**2 / (2.0 * V * beta**2)
+		energy = E_real + E_excl + E_rec + E_self + E_net
+		if not grad: return energy
+		C = conv.ravel()[flat]
+		d1, d2, d3 = dtheta[:, 0], dtheta[:, 1], dtheta[:, 2]
+		dEdu = 2.0 * q[:, None] * np.stack([
+			np.einsum('nabc,na,nb,nc->n', C, d1, t2, t3),
+			np.einsum('nabc,na,nb,nc->n', C, t1, d2, t3),
+			np.einsum('nabc,na,nb,nc->n', C, t1, t2, d3)], axis=1)
+		forces -= (dEdu * K) @ Binv.T
+		return energy, forces
+	def _pmegrid(self, B, beta, ke, grid_spacing, order):
+		'''
+		Mesh size and reciprocal-space influence function for SPME
+		Arguments:
+		----------
+			B:            ndarray (3, 3) - box vectors as rows, in Å
+			beta:         float - Ewald splitting parameter in 1/Å
+			ke:           float - Coulomb constant over εr, kJ·Å/mol/e²
+			grid_spacing: float - target mesh spacing in Å
+			order:        int - B-spline interpolation order
+		Returns:
+		--------
+			dict: 'K' mesh dimensions, 'Binv' inverse box, 'V' volume and
+			'G' the (K1, K2, K3//2+1) influence function for rfftn
+		'''
+		K = np.array([self._fftsize(max(order, math.ceil(
+			np.linalg.norm(B[d]) / grid_spacing))) for d in range(3)])
+		Binv = np.linalg.inv(B)
+		V = abs(float(np.linalg.det(B)))
+		ms = [np.fft.fftfreq(K[0]) * K[0], np.fft.fftfreq(K[1]) * K[1],
+			np.fft.rfftfreq(K[2]) * K[2]]
+		mvec = (ms[0][:, None, None, None] * Binv[:, 0]
+			+ ms[1][None, :, None, None] * Binv[:, 1]
+			+ ms[2][None, None, :, None] * Binv[:, 2])
+		msq = np.einsum('abcd,abcd->abc', mvec, mvec)
+		Mint = self._bspline(np.zeros(1), order)[0][0]
+		bsq = []
+		for d in range(3):
+			m = np.arange(K[d])
+			den = np.sum(Mint[1:, None] * np.exp(2j * np.pi * np.outer(
+				np.arange(order - 1), m) / K[d]), axis=0)
+			den2 = np.abs(den)**2
+			bsq.append(np.where(den2 > 1e-10, 1.0 / np.maximum(den2,
+				1e-10), 0.0))
+		b3 = bsq[2][:K[2] // 2 + 1]
+		msq[0, 0, 0] = 1.0
+		G = (ke / (2.0 * math.pi * V)) * np.exp(
+			-(math.pi**2) * msq / beta**2) / msq
+		G *= (bsq[0][:, None, None] * bsq[1][None, :, None]
+			* b3[None, None, :])
+		G[0, 0, 0] = 0.0
+		return {'K': K, 'Binv': Binv, 'V': V, 'G': G}
+	def _bspline(self, w, order):
+		'''
+		Cardinal B-spline weights M_p(w + j), j = 0..p-1, and derivatives
+		Arguments:
+		----------
+			w:     ndarray (m,) - fractional offsets in [0, 1)
+			order: int - spline order p
+		Returns:
+		--------
+			tuple: (M, dM) arrays of shape (m, p)
+		'''
+		X = w[:, None] + np.arange(order)
+		M = [np.maximum(0.0, 1.0 - np.abs(X - s - 1.0))
+			for s in range(order - 1)]
+		for k in range(3, order + 1):
+			prev = M
+			M = [((X - s) * M[s] + (k - (X - s)) * M[s + 1]) / (k - 1)
+				for s in range(order - k + 1)]
+		return M[0], prev[0] - prev[1]
+	def _fftsize(self, n):
+		'''
+		Smallest 2-3-5-smooth integer >= n, a fast FFT length
+		Arguments:
+		----------
+			n: int - minimum mesh size
+		Returns:
+		--------
+			int: the mesh size to use
+		'''
+		k = int(n)
+		while True:
+			m = k
+			for f in (2, 3, 5):
+				while m % f == 0: m //= f
+			if m == 1: return k
+			k += 1
+	def _erfc(self, x):
+		'''
+		Vectorised complementary error function (Chebyshev fit, fractional
+		error below 1.2e-7 everywhere)
+		Arguments:
+		----------
+			x: ndarray - non-negative arguments
+		Returns:
+		--------
+			ndarray: erfc(x)
+		'''
+		t = 1.0 / (1.0 + 0.5 * x)
+		poly = (-1.26551223 + t * (1.00002368 + t * (0.37409196
+			+ t * (0.09678418 + t * (-0.18628806 + t * (0.27886807
+			+ t * (-1.13520398 + t * (1.48851587 + t * (-0.82215223
+			+ t * 0.17087277)))))))))
+		return t * np.exp(-x * x + poly)
 	def ProperTorsionPotential(self, pose, cache, grad=True, box=None):
 		'''
 		Calculates the Proper Dihedral (torsion) potential for i-j-k-l atoms
@@ -1039,42 +2084,42 @@ class ForceField():
 			return (0.0, np.zeros((n, 3))) if grad else 0.0
 		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
 		i_idx, j_idx, k_idx, l_idx = quartets.T
-		b1 = self._wrap(coords[j_idx] - coords[i_idx], box)
-		b2 = self._wrap(coords[k_idx] - coords[j_idx], box)
-		b3 = self._wrap(coords[l_idx] - coords[k_idx], box)
+		b1 = self._wrap(coords[..., j_idx, :] - coords[..., i_idx, :], box)
+		b2 = self._wrap(coords[..., k_idx, :] - coords[..., j_idx, :], box)
+		b3 = self._wrap(coords[..., l_idx, :] - coords[..., k_idx, :], box)
 		n1 = np.cross(b1, b2)
 		n2 = np.cross(b2, b3)
-		b2_mag = np.maximum(np.linalg.norm(b2, axis=1), self._EPS)
-		b2n = b2 / b2_mag[:, None]
+		b2_mag = np.maximum(np.linalg.norm(b2, axis=-1), self._EPS)
+		b2n = b2 / b2_mag[..., None]
 		phi = np.arctan2(
-			np.einsum('ij,ij->i', np.cross(n1, b2n), n2),
-			np.einsum('ij,ij->i', n1, n2))
+			np.einsum('...i,...i->...', np.cross(n1, b2n), n2),
+			np.einsum('...i,...i->...', n1, n2))
 		q_idx  = cache['dihedral_q_idx']
 		k_phi  = cache['dihedral_k_phi']
 		n_mult = cache['dihedral_n_mult']
 		phi0   = cache['dihedral_phi0']
 		idivf  = cache.get('dihedral_idivf')
 		k_eff  = k_phi / idivf if idivf is not None else k_phi
-		phi_flat = phi[q_idx]
-		energy = float(np.sum(k_eff * (1 + np.cos(n_mult * phi_flat - phi0))))
+		phi_flat = phi[..., q_idx]
+		energy = self._esum(k_eff * (1 + np.cos(n_mult * phi_flat - phi0)))
 		if not grad: return energy
 		dU_dphi_flat = -k_eff * n_mult * np.sin(n_mult * phi_flat - phi0)
-		dU_dphi = np.zeros(len(quartets), dtype=np.float64)
-		np.add.at(dU_dphi, q_idx, dU_dphi_flat)
-		forces = np.zeros((n, 3), dtype=np.float64)
-		n1_sq = np.maximum(np.einsum('ij,ij->i', n1, n1), self._EPS)
-		n2_sq = np.maximum(np.einsum('ij,ij->i', n2, n2), self._EPS)
-		Fi = -(dU_dphi * b2_mag / n1_sq)[:, None] * n1
-		Fl =  (dU_dphi * b2_mag / n2_sq)[:, None] * n2
-		b1_dot_b2 = np.einsum('ij,ij->i', b1, b2)
-		b3_dot_b2 = np.einsum('ij,ij->i', b3, b2)
+		dU_dphi = np.zeros(phi.shape, dtype=np.float64)
+		np.add.at(dU_dphi, (..., q_idx), dU_dphi_flat)
+		forces = np.zeros(coords.shape, dtype=np.float64)
+		n1_sq = np.maximum(np.einsum('...i,...i->...', n1, n1), self._EPS)
+		n2_sq = np.maximum(np.einsum('...i,...i->...', n2, n2), self._EPS)
+		Fi = -(dU_dphi * b2_mag / n1_sq)[..., None] * n1
+		Fl =  (dU_dphi * b2_mag / n2_sq)[..., None] * n2
+		b1_dot_b2 = np.einsum('...i,...i->...', b1, b2)
+		b3_dot_b2 = np.einsum('...i,...i->...', b3, b2)
 		b2_sq = np.maximum(b2_mag**2, self._EPS)
-		Fj = -((b1_dot_b2/b2_sq+1.0)[:,None]*Fi) + (b3_dot_b2/b2_sq)[:,None]*Fl
+		Fj = -((b1_dot_b2/b2_sq+1.0)[..., None]*Fi) + (b3_dot_b2/b2_sq)[..., None]*Fl
 		Fk = -(Fi + Fj + Fl)
-		np.add.at(forces, i_idx, Fi)
-		np.add.at(forces, j_idx, Fj)
-		np.add.at(forces, k_idx, Fk)
-		np.add.at(forces, l_idx, Fl)
+		self._scatter(forces, i_idx, Fi)
+		self._scatter(forces, j_idx, Fj)
+		self._scatter(forces, k_idx, Fk)
+		self._scatter(forces, l_idx, Fl)
 		return energy, forces
 	def ImproperTorsionPotential(self, pose, cache, alg='harmonic',
 			grad=True, box=None):
@@ -1098,45 +2143,45 @@ class ForceField():
 			return (0.0, np.zeros((n, 3))) if grad else 0.0
 		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
 		i_idx, j_idx, k_idx, l_idx = impropers.T
-		b1 = self._wrap(coords[j_idx] - coords[i_idx], box)
-		b2 = self._wrap(coords[k_idx] - coords[j_idx], box)
-		b3 = self._wrap(coords[l_idx] - coords[k_idx], box)
+		b1 = self._wrap(coords[..., j_idx, :] - coords[..., i_idx, :], box)
+		b2 = self._wrap(coords[..., k_idx, :] - coords[..., j_idx, :], box)
+		b3 = self._wrap(coords[..., l_idx, :] - coords[..., k_idx, :], box)
 		n1 = np.cross(b1, b2)
 		n2 = np.cross(b2, b3)
-		b2_mag = np.maximum(np.linalg.norm(b2, axis=1), self._EPS)
-		b2n = b2 / b2_mag[:, None]
+		b2_mag = np.maximum(np.linalg.norm(b2, axis=-1), self._EPS)
+		b2n = b2 / b2_mag[..., None]
 		psi = np.arctan2(
-			np.einsum('ij,ij->i', np.cross(n1, b2n), n2),
-			np.einsum('ij,ij->i', n1, n2))
+			np.einsum('...i,...i->...', np.cross(n1, b2n), n2),
+			np.einsum('...i,...i->...', n1, n2))
 		k_imp  = cache['imp_k']
 		n_mult = cache['imp_n']
 		psi0   = cache['imp_psi0']
 		if   alg == 'harmonic':
 			delta = ((psi - psi0 + np.pi) % (2 * np.pi)) - np.pi
-			energy = float(np.sum(k_imp * delta**2))
+			energy = self._esum(k_imp * delta**2)
 			dU_dphi = 2.0 * k_imp * delta
 		elif alg == 'fourier':
-			energy = float(np.sum(k_imp * (1 + np.cos(n_mult * psi - psi0))))
+			energy = self._esum(k_imp * (1 + np.cos(n_mult * psi - psi0)))
 			dU_dphi = -k_imp * n_mult * np.sin(n_mult * psi - psi0)
 		else:
 			raise ValueError(
 				"ImproperTorsionPotential: unknown alg=%r "
 				"(allowed: 'harmonic', 'fourier')" % (alg,))
 		if not grad: return energy
-		forces = np.zeros((n, 3), dtype=np.float64)
-		n1_sq = np.maximum(np.einsum('ij,ij->i', n1, n1), self._EPS)
-		n2_sq = np.maximum(np.einsum('ij,ij->i', n2, n2), self._EPS)
-		Fi = -(dU_dphi * b2_mag / n1_sq)[:, None] * n1
-		Fl =  (dU_dphi * b2_mag / n2_sq)[:, None] * n2
-		b1_dot_b2 = np.einsum('ij,ij->i', b1, b2)
-		b3_dot_b2 = np.einsum('ij,ij->i', b3, b2)
+		forces = np.zeros(coords.shape, dtype=np.float64)
+		n1_sq = np.maximum(np.einsum('...i,...i->...', n1, n1), self._EPS)
+		n2_sq = np.maximum(np.einsum('...i,...i->...', n2, n2), self._EPS)
+		Fi = -(dU_dphi * b2_mag / n1_sq)[..., None] * n1
+		Fl =  (dU_dphi * b2_mag / n2_sq)[..., None] * n2
+		b1_dot_b2 = np.einsum('...i,...i->...', b1, b2)
+		b3_dot_b2 = np.einsum('...i,...i->...', b3, b2)
 		b2_sq = np.maximum(b2_mag**2, self._EPS)
-		Fj = -((b1_dot_b2/b2_sq+1.0)[:,None]*Fi) + (b3_dot_b2/b2_sq)[:,None]*Fl
+		Fj = -((b1_dot_b2/b2_sq+1.0)[..., None]*Fi) + (b3_dot_b2/b2_sq)[..., None]*Fl
 		Fk = -(Fi + Fj + Fl)
-		np.add.at(forces, i_idx, Fi)
-		np.add.at(forces, j_idx, Fj)
-		np.add.at(forces, k_idx, Fk)
-		np.add.at(forces, l_idx, Fl)
+		self._scatter(forces, i_idx, Fi)
+		self._scatter(forces, j_idx, Fj)
+		self._scatter(forces, k_idx, Fk)
+		self._scatter(forces, l_idx, Fl)
 		return energy, forces
 	def UBPotential(self, pose, cache, grad=True, box=None):
 		'''
@@ -1158,17 +2203,17 @@ class ForceField():
 			return (0.0, np.zeros((n, 3))) if grad else 0.0
 		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
 		i_idx, j_idx, k_idx = triplets[:, 0], triplets[:, 1], triplets[:, 2]
-		dvec = self._wrap(coords[i_idx] - coords[k_idx], box)
-		r = np.linalg.norm(dvec, axis=1)
+		dvec = self._wrap(coords[..., i_idx, :] - coords[..., k_idx, :], box)
+		r = np.linalg.norm(dvec, axis=-1)
 		k_ub = cache['ub_K_ub']
 		s0   = cache['ub_s0']
-		energy = float(np.sum(k_ub * (r - s0)**2))
+		energy = self._esum(k_ub * (r - s0)**2)
 		if not grad: return energy
-		forces = np.zeros((n, 3), dtype=np.float64)
+		forces = np.zeros(coords.shape, dtype=np.float64)
 		coef = -2.0 * k_ub * (r - s0) / np.maximum(r, self._EPS)
-		fik = coef[:, None] * dvec
-		np.add.at(forces, i_idx, fik)
-		np.add.at(forces, k_idx, -fik)
+		fik = coef[..., None] * dvec
+		self._scatter(forces, i_idx, fik)
+		self._scatter(forces, k_idx, -fik)
 		return energy, forces
 	def PolarisationPotential(self,pose,cache,alg='constant',grad=True,box=None):
 		'''
@@ -1186,6 +2231,12 @@ class ForceField():
 			(float, ndarray): energy and (N, 3) forces  (when grad=True)
 		'''
 		n      = cache['n']
+		if alg not in ('constant', 'ddd'):
+			raise ValueError(
+				"PolarisationPotential: unknown alg=%r "
+				"(allowed: 'constant', 'ddd')" % (alg,))
+		if self.cutoff is not None:
+			return self._sparsepolarisation(pose, cache, alg, grad, box)
 		q      = cache['charges']
 		alpha  = cache['lj_alpha']
 		weight = cache['weight_elec']
@@ -1216,6 +2267,57 @@ class ForceField():
 		M = A[:, :, None] * G
 		forces = (np.sum(M, axis=1) - np.sum(M, axis=0)) / 1389.35458
 		return energy, forces
+	def _sparsepolarisation(self, pose, cache, alg, grad, box):
+		'''
+		Induced-dipole polarisation with the per-atom field summed over
+		the sparse pair list (truncated at the cutoff) plus the 1-4 pairs,
+		called by PolarisationPotential when the force field has a cutoff
+		Arguments:
+		----------
+			pose:  Pose - molecule source protein, DNA, RNA, or Molecule pose
+			cache: dict - precomputed topology + parameter cache
+			alg:   Str algorithm type either 'constant' or 'ddd'
+			grad:  bool - if True, also return per-atom forces (N, 3) array
+			box:   None for no PBC; (3,) for orthorhombic; (3, 3) for triclinic
+		Returns:
+		--------
+			float: potential energy in kJ/mol  (when grad=False)
+			(float, ndarray): energy and (N, 3) forces  (when grad=True)
+		'''
+		n     = cache['n']
+		q     = cache['charges']
+		alpha = cache['lj_alpha']
+		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		epsilon_r = self.Parameters['Constants']['epsilon_r']
+		f_elec = self.Parameters['Constants']['f_elec']
+		i_far, j_far = self._pairlist(pose, cache, box)
+		p14 = cache['pairs_14']
+		pi = np.concatenate([i_far, p14[:, 0]])
+		pj = np.concatenate([j_far, p14[:, 1]])
+		dr = self._wrap(coords[pi] - coords[pj], box)
+		r = np.maximum(np.linalg.norm(dr, axis=1), self._EPS)
+		w = np.concatenate([(r[:len(i_far)] <= self.cutoff).astype(float),
+			np.full(len(p14), f_elec)])
+		p_pow = 3.0 if alg == 'constant' else 4.0
+		base = 1389.35458 * w / (epsilon_r * r**p_pow)
+		c_ij = base * q[pj]
+		c_ji = base * q[pi]
+		E = np.zeros((n, 3), dtype=np.float64)
+		np.add.at(E, pi, c_ij[:, None] * dr)
+		np.add.at(E, pj, -c_ji[:, None] * dr)
+		E_sq = np.sum(E**2, axis=1)
+		energy = float(-0.5 * np.sum(alpha * E_sq) / 1389.35458)
+		if not grad: return energy
+		rhat = dr / r[:, None]
+		E_i, E_j = E[pi], E[pj]
+		G_ij = E_i - p_pow * np.einsum('ij,ij->i', E_i, rhat)[:, None] * rhat
+		G_ji = E_j - p_pow * np.einsum('ij,ij->i', E_j, rhat)[:, None] * rhat
+		M_ij = (alpha[pi] * c_ij)[:, None] * G_ij
+		M_ji = (alpha[pj] * c_ji)[:, None] * G_ji
+		forces = np.zeros((n, 3), dtype=np.float64)
+		np.add.at(forces, pi, M_ij - M_ji)
+		np.add.at(forces, pj, M_ji - M_ij)
+		return energy, forces / 1389.35458
 	def CMAPPotential(self, pose, cache, alg='catmullrom', grad=True, box=None):
 		'''
 		Calculates the CMAP backbone (phi, psi) cross-term correction energy
@@ -1347,10 +2449,35 @@ class ForceField():
 		np.add.at(forces, l_idx, Fl)
 		return energy, forces
 
+_GRAPH_TERMS = {
+	'FaAtrPotential':            'inter',
+	'FaRepPotential':            'inter',
+	'FaSolPotential':            'inter',
+	'FaElecPotential':           'inter',
+	'LkBallWtdPotential':        'inter',
+	'FaIntraRepPotential':       'intra',
+	'FaIntraSolXover4Potential': 'intra',
+	'HBondSrBbPotential':        'intra',
+	'HBondLrBbPotential':        'intra',
+	'HBondBbScPotential':        'intra',
+	'HBondScPotential':          'intra',
+	'FaDunPotential':            'intra',
+	'YhhPlanarityPotential':     'intra',
+	'RefPotential':              'intra'}
+_GRAPH_ONEBODY = ('FaDunPotential', 'YhhPlanarityPotential', 'RefPotential')
+_GRAPH_TAGS = {
+	'atr':   'FaAtrPotential',
+	'rep':   'FaRepPotential',
+	'SR_BB': 'HBondSrBbPotential',
+	'LR_BB': 'HBondLrBbPotential',
+	'BB_SC': 'HBondBbScPotential',
+	'SC':    'HBondScPotential'}
+
 class Score():
 	'''
 	Configurable scoring function for protein design and docking
 	'''
+	SEMI_ROT = ('ASP', 'ASN', 'GLU', 'GLN', 'PHE', 'TYR', 'TRP', 'HIS')
 	def __init__(self, name='Default', strict=False):
 		'''
 		Initialise a named scoring function from database.json
@@ -1384,10 +2511,14 @@ class Score():
 		self.scale = float(
 			self.Parameters.get('Constants', {}).get('scale', 1.0))
 		self._cache = None
+		self.graph = None
 		self._topo_cache = None
 		self._topo_hash = None
 		self._topo_refX = None
+		self._topo_full = None
+		self.check_topology = False
 		self._skin = 1.5
+		self._grid_lig = None
 		c = self.Parameters.setdefault('Constants', {})
 		if 'fa_max_dis' in c:
 			c['fa_max_dis'] = float(c['fa_max_dis']) + self._skin
@@ -1395,7 +2526,7 @@ class Score():
 			for v in DBLoad()['Amino Acids'].values()
 			if 'Parent' in v and 'Tricode' in v}
 	def __call__(self, pose, ligand=None, decompose=False,
-			xs_override=None, nrot_override=None):
+			xs_override=None, nrot_override=None, grad=False, grid=None):
 		'''
 		Evaluate the score function for a pose (optionally with a ligand)
 		Arguments:
@@ -1406,28 +2537,384 @@ class Score():
 			xs_override:   dict or None - validation hook; combined-index
 				to XS type name, bypassing derived typing
 			nrot_override: int or None - validation hook
+			grad:          bool - if True also return the analytic forces
+			grid:          GridMap or None - receptor maps from self.Grid;
+				the receptor-ligand terms are then interpolated at the
+				ligand atoms and the forces carry the ligand rows only
 		Returns:
 		--------
 			float OR (float, dict): total score in the score\'s native
 			unit (REU, kcal/mol, or dimensionless); when decompose=True
-			also returns a per-term breakdown
+			also returns a per-term breakdown. With grad=True the total
+			is followed by the (N, 3) forces, -dE/dx in native unit per
+			Angstrom (receptor rows then ligand rows), and each term of
+			the breakdown carries its own share under 'forces'
+		'''
+		if grid is not None:
+			return self._gridcall(pose, ligand, grid, decompose,
+				xs_override, nrot_override, grad)
+		self._prepare(pose, ligand, xs_override, nrot_override)
+		if grad: self._cache['_forces'] = {}
+		try:
+			per_term, torsional = self._terms(pose, ligand)
+		finally:
+			forces = self._cache.pop('_forces', None)
+		total_native = self._summarise(per_term, torsional)
+		if not grad:
+			if decompose:
+				return float(total_native), per_term
+			return float(total_native)
+		F = self._forces(forces, per_term, torsional)
+		if decompose:
+			return float(total_native), F, per_term
+		return float(total_native), F
+	def _gridcall(self, pose, ligand, grid, decompose=False,
+			xs_override=None, nrot_override=None, grad=False):
+		'''
+		Score a ligand against precomputed receptor maps: the intra-ligand
+		pairs are summed directly and the receptor-ligand terms read from
+		the maps, plus grid.slope per Å for atoms outside the box
+		Arguments:
+		----------
+			pose:          Pose or None - receptor, only used to shift
+				xs_override from combined to ligand indices
+			ligand:        Molecule - ligand inside the mapped box
+			grid:          GridMap - maps built by self.Grid
+			decompose:     bool - if True also return the per-term dict
+			xs_override:   dict or None - validation hook
+			nrot_override: int or None - validation hook
+			grad:          bool - if True also return the ligand forces
+		Returns:
+		--------
+			as __call__, with (L, 3) forces on the ligand atoms
+		'''
+		if ligand is None:
+			raise ValueError('Score: grid scoring needs a ligand')
+		if grid.name != self.name:
+			raise ValueError('Score: maps built by %r cannot score %r'
+				% (grid.name, self.name))
+		plain = xs_override is None and nrot_override is None
+		if xs_override is not None:
+			n_r = 0 if pose is None else len(pose.data['Atoms'])
+			xs_override = {int(k) - n_r: v
+				for k, v in xs_override.items() if int(k) >= n_r}
+		key = _topologykey(ligand)
+		X = np.asarray(ligand.data['Coordinates'], dtype=np.float64)
+		if plain and self._grid_lig is not None \
+				and self._grid_lig[0] == key:
+			cache = self._grid_lig[1]
+			cache['coords'] = X
+			cand = cache['intra_candidates']
+			d = np.linalg.norm(X[cand[:, 0]] - X[cand[:, 1]], axis=1)
+			cutoff = float(self.Parameters['Constants'].get('cutoff', 8.0))
+			cache['intra_ligand_pairs'] = cand[d < cutoff]
+		else:
+			cache = tools.ScoreMatch(None, self.Parameters, ligand,
+				xs_override, nrot_override, self.name)
+			if plain: self._grid_lig = (key, cache)
+		self._cache = cache
+		if grad: cache['_forces'] = {}
+		try:
+			per_term, torsional = self._terms(pose, ligand)
+		finally:
+			forces = cache.pop('_forces', None)
+		got = grid.Interpolate(cache['xs_types'], X, grad)
+		E, out = got[0], got[-1]
+		for k, name in enumerate(grid.terms):
+			if name not in per_term: continue
+			raw = float(E[k].sum())
+			w = float(self.Parameters[name[:-len('Potential')]]['weight'])
+			per_term[name]['inter_raw'] += raw
+			per_term[name]['inter_weighted'] += raw * w
+			if grad:
+				f = forces.setdefault((name, 'inter'), np.zeros_like(X))
+				f -= got[1][k]
+		total_native = self._summarise(per_term, torsional)
+		dist = np.linalg.norm(out, axis=1)
+		outside = grid.slope * float(dist.sum())
+		per_term['_summary']['outside'] = outside
+		total_native += outside
+		if not grad:
+			if decompose:
+				return float(total_native), per_term
+			return float(total_native)
+		F = self._forces(forces, per_term, torsional)
+		away = dist > 0.0
+		F[away] -= grid.slope * out[away] / dist[away, None]
+		if decompose:
+			return float(total_native), F, per_term
+		return float(total_native), F
+	def Grid(self, pose=None, center=None, size=None, spacing=0.375,
+			path=None, types=None):
+		'''
+		Precompute receptor potential maps for docking. For every
+		intermolecular term and ligand XS type the maps hold the raw
+		receptor energy of a probe atom at each point of a box, so that
+		self(pose, ligand, grid=maps) costs O(ligand atoms) for the
+		receptor-ligand part. With a path the maps are written there and
+		memory-mapped; a later call for the same receptor, box and score
+		set maps the files instead of rebuilding them
+		Arguments:
+		----------
+			pose:    Pose or Molecule or None - receptor; None loads the
+				maps already at path
+			center:  array (3,) - box centre in Å
+			size:    float or array (3,) - box edge lengths in Å
+			spacing: float - distance between grid points in Å
+			path:    str or None - directory holding the maps on disk;
+				it must be new, empty or earlier Grid output, which is
+				replaced when the receptor, box or score set changed
+			types:   list of str or None - XS type names to map; None
+				maps every type of the parameter set
+		Returns:
+		--------
+			GridMap: the maps, read-only np.memmap when path is given
+		'''
+		if 'XS_atom_types' not in self.Parameters:
+			raise ValueError(
+				'Score.Grid: needs an XS-typed score function (%s is not)'
+				% self.name)
+		if pose is None:
+			if path is None:
+				raise ValueError('Score.Grid: give a receptor or a path')
+			return self._gridload(path)
+		names = sorted(self.Parameters['XS_atom_types'])
+		if types is None: types = names
+		unknown = [t for t in types if t not in names]
+		if unknown:
+			raise ValueError('Score.Grid: unknown XS types %r' % unknown)
+		tsel = [names.index(t) for t in types]
+		terms = [t for t, kw in self.terms if t != 'TorsionalPenalty']
+		spacing = float(spacing)
+		size = np.broadcast_to(np.asarray(size, dtype=np.float64), (3,))
+		n = np.maximum(np.ceil(size / spacing).astype(np.int64) + 1, 2)
+		shape = (len(terms), len(tsel)) + tuple(int(v) for v in n)
+		origin = (np.asarray(center, dtype=np.float64).reshape(3)
+			- 0.5 * (n - 1) * spacing)
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		key = hashlib.sha1(repr((self.name,
+			json.dumps(self.Parameters, sort_keys=True, default=str),
+			sorted(pose.data['Atoms'].items()),
+			sorted(pose.data['Bonds'].items()), X.tobytes(),
+			origin.tobytes(), n.tolist(), spacing, tsel,
+			terms)).encode()).hexdigest()
+		owned = False
+		if path is not None:
+			meta = os.path.join(path, 'grid.json')
+			if os.path.exists(meta):
+				with open(meta) as f:
+					old = json.load(f)
+				if old.get('key') == key: return self._gridload(path)
+				owned = 'key' in old
+			if os.path.exists(path) and not owned and (
+					not os.path.isdir(path) or os.listdir(path)):
+				raise ValueError('Score.Grid: %r exists and does not hold '
+					'grid maps; give a new or empty directory' % path)
+			parent = os.path.dirname(os.path.abspath(path))
+			os.makedirs(parent, exist_ok=True)
+			tmp = tempfile.mkdtemp(dir=parent,
+				prefix='.%s.' % os.path.basename(os.path.abspath(path)))
+			maps = np.lib.format.open_memmap(
+				os.path.join(tmp, 'maps.npy'), mode='w+',
+				dtype=np.float64, shape=shape)
+		else:
+			maps = np.zeros(shape)
+		base = tools.ScoreMatch(pose, self.Parameters, name=self.name)
+		cutoff = float(self.Parameters['Constants'].get('cutoff', 8.0))
+		lo = origin - cutoff
+		hi = origin + (n - 1) * spacing + cutoff
+		xs_r = base['xs_types']
+		near = np.flatnonzero((xs_r >= 0)
+			& np.all((X >= lo) & (X <= hi), axis=1))
+		Xn = X[near]; R = len(near)
+		total = int(n.prod())
+		chunk = max(1, 2**22 // max(R, 1))
+		flat = maps.reshape(len(terms), len(tsel), total)
+		cache = dict(base)
+		cache['intra_ligand_pairs'] = np.empty((0, 2), dtype=np.int64)
+		saved = self._cache
+		try:
+			for start in range(0, total, chunk):
+				stop = min(start + chunk, total); P = stop - start
+				ijk = np.stack(np.unravel_index(
+					np.arange(start, stop), shape[2:]), axis=1)
+				pts = origin + spacing * ijk
+				d2 = ((pts * pts).sum(1)[:, None] + (Xn * Xn).sum(1)[None]
+					- 2.0 * pts @ Xn.T)
+				p, r = np.nonzero(d2 < (cutoff + 1e-6) ** 2)
+				cache['coords'] = np.vstack([Xn, pts])
+				cache['inter_pairs'] = np.stack([r, R + p], axis=1)
+				cache['atom_res'] = np.concatenate(
+					[np.full(R, -1), np.arange(P)])
+				for slot, t in enumerate(tsel):
+					cache['xs_types'] = np.concatenate(
+						[xs_r[near], np.full(P, t, dtype=np.int64)])
+					cache['_tally'] = []
+					self._cache = cache
+					try:
+						per_term, _ = self._terms(pose)
+					finally:
+						tally = cache.pop('_tally')
+					binned = dict.fromkeys(terms, 0.0)
+					for tag, ra, rb, e in tally:
+						name = _GRAPH_TAGS.get(tag, tag)
+						if name not in binned: continue
+						sums = np.bincount(rb, weights=e, minlength=P)
+						flat[terms.index(name), slot, start:stop] += sums
+						binned[name] += float(sums.sum())
+					for name in terms:
+						raw = per_term[name].get('inter_raw', 0.0)
+						if abs(binned[name] - raw) > 1e-6 * max(1.0, abs(raw)):
+							raise ValueError(
+								'Score.Grid: %s is not a receptor-ligand '
+								'pair sum and cannot be mapped' % name)
+		finally:
+			self._cache = saved
+		if path is None:
+			return GridMap(origin, spacing, maps, tsel, terms, self.name)
+		maps.flush()
+		del maps, flat
+		with open(os.path.join(tmp, 'grid.json'), 'w') as f:
+			json.dump({'key': key, 'name': self.name,
+				'origin': origin.tolist(), 'spacing': spacing,
+				'types': tsel, 'terms': terms}, f)
+		if owned: shutil.rmtree(path, ignore_errors=True)
+		elif os.path.isdir(path): os.rmdir(path)
+		os.replace(tmp, path)
+		return self._gridload(path)
+	def _gridload(self, path):
+		'''
+		Memory-map maps written by Grid
+		Arguments:
+		----------
+			path: str - directory holding grid.json and maps.npy
+		Returns:
+		--------
+			GridMap: the maps as a read-only np.memmap
+		'''
+		with open(os.path.join(path, 'grid.json')) as f:
+			meta = json.load(f)
+		if meta['name'] != self.name:
+			raise ValueError('Score.Grid: maps at %r were built by %r, '
+				'not %r' % (path, meta['name'], self.name))
+		maps = np.load(os.path.join(path, 'maps.npy'), mmap_mode='r')
+		return GridMap(meta['origin'], meta['spacing'], maps,
+			meta['types'], meta['terms'], meta['name'])
+	def _forces(self, forces, per_term, torsional):
+		'''
+		Combine the raw per-term forces the terms recorded into the
+		forces on the total score, weighted as _summarise weighs the
+		energies, and file each term's share in per_term
+		Arguments:
+		----------
+			forces:    dict - (tag, 'inter' or 'intra') to (N, 3) raw forces
+			per_term:  dict - term results by method name, updated in place
+			torsional: bool - only intermolecular forces count, divided by
+				the rotatable-bond penalty
+		Returns:
+		--------
+			np.ndarray: (N, 3) forces in the score's native unit per Angstrom
+		'''
+		F = np.zeros((len(self._cache['coords']), 3))
+		for name, out in per_term.items():
+			if name != '_summary': out['forces'] = np.zeros_like(F)
+		denom = per_term['_summary'].get('denom', 1.0) or 1.0
+		for (tag, kind), f in forces.items():
+			name = _GRAPH_TAGS.get(tag, tag)
+			if name not in per_term: continue
+			if torsional and kind == 'intra': continue
+			w = float(self.Parameters[name[:-len('Potential')]]['weight'])
+			w *= self.scale / denom if torsional else self.scale
+			per_term[name]['forces'] += w * f
+			F += w * f
+		return F
+	def GradCheck(self, pose, atoms=None, h=1e-4, ligand=None):
+		'''
+		Compare the analytic forces of grad=True with central differences
+		of the score, in total and per term
+		Arguments:
+		----------
+			pose:   Pose or Molecule - receptor / source pose
+			atoms:  iterable of int or None - rows of the force array to
+				check (ligand atoms follow the receptor's); None takes
+				the ten atoms with the largest analytic forces
+			h:      float - finite-difference step in Angstrom
+			ligand: Molecule or None - optional ligand
+		Returns:
+		--------
+			dict: 'atoms', the 'analytic' and 'numeric' (k, 3) forces,
+				their 'max_error', and per term the largest error under
+				'terms'
+		'''
+		E, F, per_term = self(pose, ligand, decompose=True, grad=True)
+		names = [k for k in per_term if k != '_summary']
+		if atoms is None:
+			atoms = np.argsort(-np.linalg.norm(F, axis=1))[:10]
+		atoms = np.asarray(list(atoms), dtype=np.int64)
+		n_r = len(pose.data['Coordinates'])
+		def native(per_term):
+			S = per_term['_summary']
+			if 'denom' in S:
+				return {k: per_term[k].get('inter_weighted', 0.0)
+					/ S['denom'] * self.scale for k in names}
+			return {k: (per_term[k].get('inter_weighted', 0.0)
+				+ per_term[k].get('intra_weighted', 0.0)) * self.scale
+				for k in names}
+		numeric = np.zeros((len(atoms), 3))
+		term_num = {k: np.zeros((len(atoms), 3)) for k in names}
+		for row, a in enumerate(atoms.tolist()):
+			mol, i = (pose, a) if a < n_r else (ligand, a - n_r)
+			X0 = mol.data['Coordinates']
+			for l in range(3):
+				side = []
+				for step in (h, -h):
+					X = np.array(X0, dtype=np.float64)
+					X[i, l] += step
+					mol.data['Coordinates'] = X
+					e, pt = self(pose, ligand, decompose=True)
+					side.append((e, native(pt)))
+				mol.data['Coordinates'] = X0
+				numeric[row, l] = -(side[0][0] - side[1][0]) / (2 * h)
+				for k in names:
+					term_num[k][row, l] = -(side[0][1][k]
+						- side[1][1][k]) / (2 * h)
+		analytic = F[atoms]
+		return {'atoms': atoms, 'analytic': analytic, 'numeric': numeric,
+			'max_error': float(np.max(np.abs(analytic - numeric)))
+				if len(atoms) else 0.0,
+			'terms': {k: float(np.max(np.abs(
+				per_term[k]['forces'][atoms] - term_num[k])))
+				if len(atoms) else 0.0 for k in names}}
+	def _prepare(self, pose, ligand=None, xs_override=None,
+			nrot_override=None):
+		'''
+		Point self._cache at a ScoreMatch cache valid for the pose,
+		refreshing distances and waters of the kept topology cache when
+		no atom has moved more than half the skin
+		Arguments:
+		----------
+			pose:          Pose or Molecule - receptor / source pose
+			ligand:        Molecule or None - optional ligand
+			xs_override:   dict or None - validation hook
+			nrot_override: int or None - validation hook
+		Returns:
+		--------
+			None: self._cache is set in place
 		'''
 		plain = (ligand is None and xs_override is None
 			and nrot_override is None)
 		h = None
-		if plain:
-			bonds_key = tuple((int(k), tuple(sorted(int(j) for j in v)))
-				for k, v in sorted(pose.data['Bonds'].items()))
-			atoms_key = tuple((int(k), tuple(a))
-				for k, a in sorted(pose.data['Atoms'].items()))
-			aas = pose.data.get('Amino Acids')
-			aas_key = None if aas is None else tuple(
-				(int(k), info[0], info[1], tuple(info[2]))
-				for k, info in sorted(aas.items()))
-			h = hash((bonds_key, atoms_key, aas_key))
+		if plain: h = _topologykey(pose)
 		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
 		reuse = False
 		if plain and self._topo_cache is not None and self._topo_hash == h:
+			if self.check_topology:
+				full = _fullhash(pose)
+				if self._topo_full is None: self._topo_full = full
+				elif full != self._topo_full:
+					raise RuntimeError(
+						'Score: topology changed without a version bump; '
+						'call pose._bumptopology() after editing pose.data')
 			disp = np.sqrt(((X - self._topo_refX) ** 2).sum(1)).max()
 			reuse = disp < 0.5 * self._skin
 		if reuse:
@@ -1443,12 +2930,32 @@ class Score():
 			self._cache = cache
 		else:
 			self._cache = tools.ScoreMatch(pose, self.Parameters, ligand,
-				xs_override, nrot_override)
+				xs_override, nrot_override, self.name)
 			if plain and 'pairs_i' in self._cache:
 				self._topo_cache = self._cache
 				self._topo_hash = h
 				self._topo_refX = X.copy()
+				self._topo_full = (_fullhash(pose) if self.check_topology
+					else None)
+	def _terms(self, pose, ligand=None, names=None, onebody=None,
+			residues=None):
+		'''
+		Run the energy terms on self._cache
+		Arguments:
+		----------
+			pose:     Pose or Molecule - receptor / source pose
+			ligand:   Molecule or None - optional ligand
+			names:    set or None - only run these term methods
+			onebody:  dict or None - per-residue collectors, keyed by term
+				name, handed to the one-body terms as per_res
+			residues: set or None - residues the one-body terms evaluate
+		Returns:
+		--------
+			tuple: (per_term, torsional) - term results by method name and
+				whether the TorsionalPenalty marker term is present
+		'''
 		self._cache['_hbond_memo'] = None
+		self._cache['_lj_memo'] = {}
 		self._cache['_dihedral_memo'] = {}
 		per_term = {}
 		torsional = False
@@ -1456,12 +2963,31 @@ class Score():
 			if method_name == 'TorsionalPenalty':
 				torsional = True
 				continue
+			if names is not None and method_name not in names: continue
 			fn = getattr(self, method_name, None)
 			if fn is None:
 				raise Exception(
 					'Score: method %s not found' % method_name)
+			if onebody is not None and method_name in _GRAPH_ONEBODY:
+				kwargs = dict(kwargs, residues=residues,
+					per_res=onebody.setdefault(method_name, {}))
+			self._cache['_tally_term'] = method_name
 			out = fn(pose, cache=self._cache, ligand=ligand, **kwargs)
 			per_term[method_name] = out
+		self._cache['_lj_memo'] = None
+		return per_term, torsional
+	def _summarise(self, per_term, torsional):
+		'''
+		Combine term results into the native total and add '_summary'
+		Arguments:
+		----------
+			per_term:  dict - term results by method name, updated in place
+			torsional: bool - divide the intermolecular total by the
+				rotatable-bond penalty
+		Returns:
+		--------
+			float: total score in the score's native unit
+		'''
 		inter_kj = sum(v.get('inter_weighted', 0.0)
 			for v in per_term.values())
 		intra_kj = sum(v.get('intra_weighted', 0.0)
@@ -1484,9 +3010,279 @@ class Score():
 				'inter_total_kJ': inter_kj,
 				'intra_total_kJ': intra_kj,
 				'total_native': total_native}
-		if decompose:
-			return float(total_native), per_term
-		return float(total_native)
+		return total_native
+	def _graphbin(self, tally, onebody):
+		'''
+		Bin tallied per-pair energies and one-body energies into residue
+		pairs, per owning term
+		Arguments:
+		----------
+			tally:   list - (owner, res_i, res_j, energies) records from
+				ScoreMatch's tallypairs
+			onebody: dict - term name to {residue: energy}
+		Returns:
+		--------
+			dict: term name to {(a, b): raw energy} with a <= b
+		'''
+		out = {}
+		for owner, ra, rb, e in tally:
+			term = _GRAPH_TAGS.get(owner, owner)
+			lo = np.minimum(ra, rb); hi = np.maximum(ra, rb)
+			keys, inv = np.unique(np.stack([lo, hi], axis=1), axis=0,
+				return_inverse=True)
+			sums = np.bincount(inv.ravel(), weights=e, minlength=len(keys))
+			edges = out.setdefault(term, {})
+			for (a, b), v in zip(keys.tolist(), sums.tolist()):
+				edges[(a, b)] = edges.get((a, b), 0.0) + v
+		for term, per_res in onebody.items():
+			edges = out.setdefault(term, {})
+			for r, v in per_res.items():
+				edges[(int(r), int(r))] = edges.get((int(r), int(r)), 0.0) + v
+		return out
+	def Graph(self, pose):
+		'''
+		Score a pose and keep its residue-pair energy graph: per term, the
+		one-body (a, a) and two-body (a, b) raw energies. Terms that do not
+		decompose into residue pairs are kept as whole-term totals and
+		re-evaluated in full by Update
+		Arguments:
+		----------
+			pose: Pose - protein pose scored by a full-atom score function
+		Returns:
+		--------
+			float: total score in the score's native unit, equal to
+				self(pose)
+		'''
+		self._prepare(pose)
+		cache = self._cache
+		if 'pairs_i' not in cache:
+			raise ValueError(
+				'Score.Graph: needs a full-atom score function (%s is not)'
+				% self.name)
+		cache['_tally'] = []
+		onebody = {}
+		try:
+			per_term, torsional = self._terms(pose, onebody=onebody)
+		finally:
+			tally = cache.pop('_tally')
+		if torsional:
+			raise ValueError(
+				'Score.Graph: TorsionalPenalty does not decompose')
+		binned = self._graphbin(tally, onebody)
+		terms = {}
+		for name, out in per_term.items():
+			raw = out.get('inter_raw', 0.0) + out.get('intra_raw', 0.0)
+			edges = binned.get(name, {})
+			mode = 'full'
+			if name in _GRAPH_TERMS and abs(sum(edges.values()) - raw) \
+					<= 1e-6 * max(1.0, abs(raw)):
+				mode = 'pair'
+			entry = {'mode': mode, 'result': out}
+			if mode == 'pair':
+				nbr = {}
+				for (a, b), e in edges.items():
+					nbr.setdefault(a, {})[b] = e
+					nbr.setdefault(b, {})[a] = e
+				entry.update({'edges': nbr, 'raw': raw,
+					'slot': _GRAPH_TERMS[name],
+					'weight': float(self.Parameters[
+						name[:-len('Potential')]]['weight'])})
+			terms[name] = entry
+		bonded = {}
+		adj = cache['adj']; atom_res = cache['atom_res']
+		for a, nbrs in adj.items():
+			for b in nbrs:
+				ra, rb = int(atom_res[a]), int(atom_res[b])
+				if ra >= 0 and rb >= 0 and ra != rb:
+					bonded.setdefault(ra, set()).add(rb)
+		total = self._summarise(per_term, False)
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		focus = cache['focusgrid'](X)
+		focus['water_xyz'] = np.array(cache['lkb_water_xyz'], copy=True)
+		focus['hbond'] = cache.pop('_hbond_graph', None)
+		self.graph = {'terms': terms, 'total': float(total),
+			'hash': _topologykey(pose), 'cache': cache, 'bonded': bonded,
+			'focus': focus}
+		return float(total)
+	def Update(self, pose, residues, decompose=False):
+		'''
+		Re-score only what a change to some residues touches: the graph
+		edges of every pair term with an end in residues, the one-body
+		energies of residues and their bonded neighbours, and the terms
+		kept whole. Every atom that moved since the last Graph/Update must
+		belong to residues. A topology change rebuilds the graph
+		Arguments:
+		----------
+			pose:      Pose - the pose given to Graph, after the change
+			residues:  iterable of int - residues whose atoms moved
+			decompose: bool - if True also return the per-term breakdown of
+				the new total, as self(pose, decompose=True) reports it
+		Returns:
+		--------
+			float OR (float, dict): change of the total score in the
+			score's native unit; with decompose=True also the per-term
+			dict of the updated totals
+		'''
+		g = getattr(self, 'graph', None)
+		if g is None:
+			raise ValueError('Score.Update: call Score.Graph(pose) first')
+		E0 = g['total']
+		if _topologykey(pose) != g['hash']:
+			dE = self.Graph(pose) - E0
+			if decompose: return dE, self._graphterms()
+			return dE
+		S = set(int(r) for r in residues)
+		halo = set(S)
+		for r in S: halo |= g['bonded'].get(r, set())
+		terms = g['terms']
+		pair = set(k for k, v in terms.items() if v['mode'] == 'pair')
+		whole = set(terms) - pair
+		binned = self._graphfocus(pose, S, halo, commit=True)
+		dE = 0.0
+		for name in pair:
+			t = terms[name]
+			edges = t['edges']
+			own = halo if name in _GRAPH_ONEBODY else S
+			old = 0.0
+			for a in own:
+				for b, e in list(edges.get(a, {}).items()):
+					if name in _GRAPH_ONEBODY and b != a: continue
+					old += e
+					if b != a: del edges[b][a]
+					del edges[a][b]
+			new = 0.0
+			for (a, b), e in binned.get(name, {}).items():
+				edges.setdefault(a, {})[b] = e
+				edges.setdefault(b, {})[a] = e
+				new += e
+			t['raw'] += new - old
+			dE += t['weight'] * (new - old)
+		if whole:
+			if any(k in _GRAPH_TERMS for k in whole):
+				self._prepare(pose)
+			per_term, _ = self._terms(pose, names=whole)
+			for name, out in per_term.items():
+				prev = terms[name]['result']
+				dE += (out.get('inter_weighted', 0.0)
+					+ out.get('intra_weighted', 0.0)
+					- prev.get('inter_weighted', 0.0)
+					- prev.get('intra_weighted', 0.0))
+				terms[name]['result'] = out
+		dE *= self.scale
+		g['total'] = E0 + dE
+		if decompose: return dE, self._graphterms()
+		return dE
+	def _graphfocus(self, pose, residues, halo, commit=False):
+		'''
+		Run the pair terms of the graph on pairs with an end in some
+		residues and bin them into residue pairs. Pairs, waters and
+		hydrogen bonds are searched around the atoms of residues only, in
+		the search state Graph kept; commit moves that state to the new
+		coordinates
+		Arguments:
+		----------
+			pose:     Pose - the pose given to Graph, after the change
+			residues: set - residues whose atoms moved
+			halo:     set - residues the one-body terms evaluate
+			commit:   bool - keep the new coordinates of residues in the
+				search state (Update) or leave it as it was (Edges)
+		Returns:
+		--------
+			dict: term name to {(a, b): raw energy} with a <= b
+		'''
+		g = self.graph
+		cache = g['cache']
+		state = g['focus']
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		cache['coords'] = X
+		empty = np.empty(0, dtype=np.int64)
+		ids = np.concatenate([empty] + [state['atoms'][r]
+			for r in residues if r in state['atoms']])
+		rows = np.unique(np.concatenate([empty] + [state['waters'][r]
+			for r in residues if r in state['waters']]))
+		atoms = np.zeros(len(X), dtype=bool)
+		atoms[ids] = True
+		wx = state['water_xyz']
+		keep = wx[rows].copy()
+		cache['move_waters'](X, rows, wx)
+		cache['lkb_water_xyz'] = wx
+		focus = cache['focuspairs'](X, ids, state['grid'])
+		focus.update(atoms=atoms, ids=ids, hbond=state['hbond'],
+			commit=commit)
+		pair = set(k for k, v in g['terms'].items() if v['mode'] == 'pair')
+		self._cache = cache
+		cache['_focus'] = focus
+		cache['_tally'] = []
+		onebody = {}
+		try:
+			self._terms(pose, names=pair, onebody=onebody, residues=halo)
+		finally:
+			cache['_focus'] = None
+			tally = cache.pop('_tally')
+			if commit:
+				typed = ids[cache['has_score'][ids]]
+				_cellmove(state['grid'], typed, X[typed])
+			else:
+				wx[rows] = keep
+		return self._graphbin(tally, onebody)
+	def Edges(self, pose, residues, moved=()):
+		'''
+		Weighted residue-pair energies of the graph's pair terms around
+		some residues, evaluated on the graph cache without changing the
+		graph: every pair (a, b) with an end in residues and the one-body
+		(a, a) of each of them. Every residue moved since the last
+		Graph/Update must be in residues or moved; the pair search and the
+		LK-ball waters only follow those
+		Arguments:
+		----------
+			pose:     Pose - the pose given to Graph, with residues and
+				moved moved
+			residues: iterable of int - residues to evaluate
+			moved:    iterable of int - other residues whose atoms moved;
+				searched with residues but only their pairs with residues
+				are returned
+		Returns:
+		--------
+			dict: (a, b) with a <= b to energy in the score's native unit
+		'''
+		g = getattr(self, 'graph', None)
+		if g is None:
+			raise ValueError('Score.Edges: call Score.Graph(pose) first')
+		if _topologykey(pose) != g['hash']:
+			raise ValueError('Score.Edges: topology changed since Graph')
+		S = set(int(r) for r in residues)
+		M = set(int(r) for r in moved) | S
+		out = {}
+		for name, edges in self._graphfocus(pose, M, S).items():
+			w = g['terms'][name]['weight'] * self.scale
+			for (a, b), e in edges.items():
+				if a not in S and b not in S: continue
+				out[(a, b)] = out.get((a, b), 0.0) + w * e
+		return out
+	def _graphterms(self):
+		'''
+		Per-term breakdown of the graph totals in the layout of
+		self(pose, decompose=True)
+		Returns:
+		--------
+			dict: term name to inter/intra raw and weighted values, plus
+				'_summary'
+		'''
+		per_term = {}
+		for name, t in self.graph['terms'].items():
+			if t['mode'] != 'pair':
+				per_term[name] = t['result']
+				continue
+			raw = t['raw']
+			inter = t['slot'] == 'inter'
+			per_term[name] = {
+				'inter_raw': raw if inter else 0.0,
+				'intra_raw': 0.0 if inter else raw,
+				'inter_weighted': raw * t['weight'] if inter else 0.0,
+				'intra_weighted': 0.0 if inter else raw * t['weight'],
+				'raw': raw}
+		self._summarise(per_term, False)
+		return per_term
 	def Gauss1Potential(self, pose, cache, ligand=None, **kw):
 		'''
 		Small-molecule pair Gaussian centred at d=0 Å, exp(-(d/0.5)^2)
@@ -1529,7 +3325,7 @@ class Score():
 		inter_raw, intra_raw = cache['evalpairs'](
 			cache, 'both', self.repulsionkernel)
 		return cache['termresult'](inter_raw, intra_raw, weight)
-	def repulsionkernel(self, ai, aj, rij, c):
+	def repulsionkernel(self, ai, aj, rij, c, grad=False):
 		'''
 		Per-pair kernel for the repulsion typed-pair sum
 		Arguments:
@@ -1538,9 +3334,11 @@ class Score():
 			aj: np.ndarray - per-pair second-atom indices
 			rij: np.ndarray - per-pair distance
 			c: dict - the ScoreMatch cache
+			grad: bool - if True also return the derivative in rij
 		Returns:
 		--------
-			np.ndarray: per-pair repulsion contribution
+			np.ndarray: per-pair repulsion contribution; with grad=True a
+			tuple (contribution, d/drij)
 		'''
 		p = self.Parameters['Repulsion']
 		offset = float(p['offset']); cutoff = float(p['cutoff'])
@@ -1548,7 +3346,9 @@ class Score():
 		ri = radii[xs[ai]]; rj = radii[xs[aj]]
 		d = rij - (ri + rj + offset)
 		gate = ((xs[ai] >= 0) & (xs[aj] >= 0) & (rij < cutoff))
-		return np.where(gate & (d < 0), d * d, 0.0)
+		e = np.where(gate & (d < 0), d * d, 0.0)
+		if not grad: return e
+		return e, np.where(gate & (d < 0), 2.0 * d, 0.0)
 	def HydrophobicPotential(self, pose, cache, ligand=None, **kw):
 		'''
 		Small-molecule hydrophobic-pair slope-step contact
@@ -1668,7 +3468,12 @@ class Score():
 			return {'inter_raw': 0.0, 'intra_raw': 0.0,
 				'inter_weighted': 0.0, 'intra_weighted': 0.0,
 				'raw': 0.0}
-		_, repE = cache['ljpair'](cache, pi, pj, r)
+		if cache.get('_forces') is not None:
+			_, repE, _, dRep = cache['ljpair'](cache, pi, pj, r, grad=True)
+			cache['tallyforces'](cache, None, pi, pj, w * dRep)
+		else:
+			_, repE = cache['ljpair'](cache, pi, pj, r)
+		cache['tallypairs'](cache, None, pi, pj, w * repE)
 		raw = float(np.sum(w * repE))
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
@@ -1722,12 +3527,13 @@ class Score():
 		pi, pj, r, w = cache['fullatompairs'](cache, same_res=False, cp='cp4',
 			use_cp_rep=True)
 		raw = self.elecpairsum(pi, pj, r, w, C0, D, D0, S,
-			d_max, d_min, hi_end, hi_start, low_end, low_start, q)
+			d_max, d_min, hi_end, hi_start, low_end, low_start, q,
+			cache=cache)
 		return {'inter_raw': raw, 'intra_raw': 0.0,
 			'inter_weighted': raw * weight, 'intra_weighted': 0.0,
 			'raw': raw}
 	def elecpairsum(self, pi, pj, r, w, C0, D, D0, S, d_max, d_min,
-			hi_end, hi_start, low_end, low_start, q):
+			hi_end, hi_start, low_end, low_start, q, cache=None):
 		'''
 		Per-pair Coulomb summation kernel for FaElec
 		Arguments:
@@ -1747,6 +3553,9 @@ class Score():
 			low_end: float - end of the lower fade window
 			low_start: float - start of the lower fade window
 			q: np.ndarray - per-atom partial charges
+			cache: dict or None - ScoreMatch cache; per-pair energies are
+				tallied into it for the residue-pair energy graph, and
+				their forces when Score asks for them
 		Returns:
 		--------
 			np.ndarray: per-pair electrostatic contribution
@@ -1761,6 +3570,12 @@ class Score():
 		e_min_clamp = (C0 * qq / (self.dielectric(d_min, D, D0, S) * d_min)
 			- base_at_max)
 		e = np.where(r < d_min, e_min_clamp, e)
+		grad = cache is not None and cache.get('_forces') is not None
+		if grad:
+			eps_d = self.dielectricderivative(r, D, D0, S)
+			rr = np.maximum(r, 1e-9)
+			de = -C0 * qq * (eps_r + rr * eps_d) / (rr * rr * eps_r * eps_r)
+			de = np.where((r >= d_max) | (r < d_min), 0.0, de)
 		in_low = (r >= low_start) & (r < low_end)
 		if np.any(in_low):
 			h_low = low_end - low_start
@@ -1776,6 +3591,10 @@ class Score():
 				+ (-2*t3 + 3*t2) * v1_low
 				+ (t3 - t2) * h_low * d1_low)
 			e = np.where(in_low, H, e)
+			if grad:
+				dH = ((6*t2 - 6*t) * v0_low + (-6*t2 + 6*t) * v1_low
+					+ (3*t2 - 2*t) * h_low * d1_low) / h_low
+				de = np.where(in_low, dH, de)
 		in_hi = (r >= hi_start) & (r < hi_end)
 		if np.any(in_hi):
 			h_hi = hi_end - hi_start
@@ -1789,6 +3608,14 @@ class Score():
 			H = ((2*t3 - 3*t2 + 1) * v0_hi
 				+ (t3 - 2*t2 + t) * h_hi * d0_hi)
 			e = np.where(in_hi, H, e)
+			if grad:
+				dH = ((6*t2 - 6*t) * v0_hi
+					+ (3*t2 - 4*t + 1) * h_hi * d0_hi) / h_hi
+				de = np.where(in_hi, dH, de)
+		if cache is not None:
+			cache['tallypairs'](cache, None, pi, pj, w * e)
+		if grad:
+			cache['tallyforces'](cache, None, pi, pj, w * de)
 		return float(np.sum(w * e))
 	def dielectricderivative(self, d, D, D0, S):
 		'''
@@ -1858,7 +3685,13 @@ class Score():
 		water_cnt = cache['lkb_water_cnt']
 		ramp_w2 = float(cache['lkb_ramp_w2'])
 		X = cache['coords']
-		lk_iso_i, lk_iso_j = cache['lkisopair'](cache, pi, pj, r)
+		grad = cache.get('_forces') is not None
+		if grad:
+			lk_iso_i, lk_iso_j, dlk_i, dlk_j = cache['lkisopair'](cache,
+				pi, pj, r, grad=True)
+			Fw = np.zeros_like(water_xyz)
+		else:
+			lk_iso_i, lk_iso_j = cache['lkisopair'](cache, pi, pj, r)
 		lk_iso_i = lk_iso_i * w
 		lk_iso_j = lk_iso_j * w
 		w_iso_i = w_iso[pi]; w_ball_i = w_ball[pi]
@@ -1866,22 +3699,42 @@ class Score():
 		w_iso_j = w_iso[pj]; w_ball_j = w_ball[pj]
 		nonzero_j = water_cnt[pj] > 0
 		total = 0.0
+		sides = []
 		if np.any(nonzero_i):
-			frac_i = self.ballfraction(pi, pj, X, d2_low, ramp_w2,
-				water_cnt, water_off, water_xyz)
-			total += float(np.sum(
-				w_iso_i * lk_iso_i + w_ball_i * lk_iso_i * frac_i))
+			sides.append((pi, pj, w_iso_i, w_ball_i, lk_iso_i,
+				dlk_i if grad else None))
 		if np.any(nonzero_j):
-			frac_j = self.ballfraction(pj, pi, X, d2_low, ramp_w2,
-				water_cnt, water_off, water_xyz)
-			total += float(np.sum(
-				w_iso_j * lk_iso_j + w_ball_j * lk_iso_j * frac_j))
+			sides.append((pj, pi, w_iso_j, w_ball_j, lk_iso_j,
+				dlk_j if grad else None))
+		for polar, other, wi, wb, lk, dlk in sides:
+			if not grad:
+				frac = self.ballfraction(polar, other, X, d2_low, ramp_w2,
+					water_cnt, water_off, water_xyz)
+			else:
+				frac, g_other, widx, g_water = self.ballfraction(polar,
+					other, X, d2_low, ramp_w2, water_cnt, water_off,
+					water_xyz, grad=True)
+				cache['tallyforces'](cache, None, pi, pj,
+					(wi + wb * frac) * w * dlk)
+				c = (wb * lk)[:, None]
+				cache['tallyatoms'](cache, None, other, -c * g_other)
+				np.add.at(Fw, widx.ravel(),
+					(-c[:, None] * g_water).reshape(-1, 3))
+			e = wi * lk + wb * lk * frac
+			cache['tallypairs'](cache, None, pi, pj, e)
+			total += float(np.sum(e))
+		if grad and sides:
+			# Waters ride on their owning atom's frame; carry their forces
+			# back onto the atoms that place them.
+			atoms, J = cache['water_jacobian'](X)
+			cache['tallyatoms'](cache, None, atoms.ravel(),
+				np.einsum('wk,wrkl->wrl', Fw, J).reshape(-1, 3))
 		raw = total
 		return {'inter_raw': raw, 'intra_raw': 0.0,
 			'inter_weighted': raw * weight, 'intra_weighted': 0.0,
 			'raw': raw}
 	def ballfraction(self, p_polar, p_other, X, d2_low, ramp_w2, water_cnt,
-			water_off, water_xyz):
+			water_off, water_xyz, grad=False):
 		'''
 		Fractional water-occupancy weight for one LkBallWtd water site
 		Arguments:
@@ -1893,13 +3746,22 @@ class Score():
 			water_cnt: np.ndarray - per-atom virtual water count
 			water_off: np.ndarray - per-atom offset into water_xyz
 			water_xyz: np.ndarray - virtual water coordinates
+			grad: bool - if True also return the fraction's derivatives
 		Returns:
 		--------
-			float: occupancy fraction in [0, 1]
+			float: occupancy fraction in [0, 1]; with grad=True a tuple
+			(fraction, d/d other atom (n, 3), water index (n, s),
+			d/d water (n, s, 3)), zero on padding slots
 		'''
 		out = np.zeros(len(p_polar), dtype=np.float64)
 		cnt = water_cnt[p_polar]
+		if grad:
+			s = max(int(cnt.max()) if len(cnt) else 0, 1)
+			g_other = np.zeros((len(p_polar), 3))
+			g_widx = np.zeros((len(p_polar), s), dtype=np.int64)
+			g_water = np.zeros((len(p_polar), s, 3))
 		if not np.any(cnt > 0):
+			if grad: return out, g_other, g_widx, g_water
 			return out
 		has = cnt > 0
 		idx = np.where(has)[0]
@@ -1908,25 +3770,32 @@ class Score():
 		polar_cnt = water_cnt[p_polar[idx]]
 		d2_low_other = d2_low[p_other[idx]]
 		MFADE = 1.0
-		frac_loc = np.zeros(len(idx), dtype=np.float64)
-		for k in range(len(idx)):
-			off = int(polar_off[k])
-			n_w = int(polar_cnt[k])
-			ws = water_xyz[off:off + n_w]
-			diff = ws - other_xyz[k]
-			d2_arr = np.einsum('ij,ij->i', diff, diff)
-			weighted = -MFADE * math.log(
-				float(np.sum(np.exp(
-					-(d2_arr - d2_low_other[k]) / MFADE))))
-			if weighted >= ramp_w2:
-				frac_loc[k] = 0.0
-			elif weighted <= 0.0:
-				frac_loc[k] = 1.0
-			else:
-				xprime = weighted / ramp_w2
-				frac_loc[k] = (1 - xprime * xprime) ** 2
+		slot = np.arange(int(polar_cnt.max()))
+		live = slot[None, :] < polar_cnt[:, None]
+		widx = np.where(live, polar_off[:, None] + slot[None, :], 0)
+		diff = water_xyz[widx] - other_xyz[:, None, :]
+		d2_arr = np.einsum('kwj,kwj->kw', diff, diff)
+		expo = np.where(live,
+			np.exp(-(d2_arr - d2_low_other[:, None]) / MFADE), 0.0)
+		with np.errstate(divide='ignore'):
+			weighted = -MFADE * np.log(expo.sum(axis=1))
+		xprime = weighted / ramp_w2
+		frac_loc = np.where(weighted >= ramp_w2, 0.0,
+			np.where(weighted <= 0.0, 1.0, (1 - xprime * xprime) ** 2))
 		out[idx] = frac_loc
-		return out
+		if not grad: return out
+		ramp = (weighted > 0.0) & (weighted < ramp_w2)
+		dfrac = np.where(ramp, -4.0 * xprime * (1 - xprime * xprime)
+			/ ramp_w2, 0.0)
+		with np.errstate(divide='ignore', invalid='ignore'):
+			soft = np.where(live, expo / expo.sum(axis=1)[:, None], 0.0)
+		gw = (np.nan_to_num(dfrac[:, None] * soft) * 2.0 / MFADE)[:, :,
+			None] * diff
+		n = gw.shape[1]
+		g_other[idx] = -gw.sum(axis=1)
+		g_widx[idx, :n] = widx
+		g_water[idx, :n] = gw
+		return out, g_other, g_widx, g_water
 	def FaDunPotential(self, pose, cache, ligand=None, **kw):
 		'''
 		Fa_dun - Dunbrack rotamer probability.
@@ -1935,7 +3804,8 @@ class Score():
 			pose:   Pose or Molecule - receptor structure being scored
 			cache:  dict - cache returned by ScoreMatch()
 			ligand: Molecule or None - optional small-molecule ligand
-			**kw:   absorbed; per-term methods take no extra kwargs
+			**kw:   per_res (dict, filled with per-residue energies) and
+				residues (set, limits the residues scored); rest absorbed
 		Returns:
 		--------
 			dict: per-term contribution with inter and intra raw and
@@ -1959,15 +3829,310 @@ class Score():
 		psi_n = int(rl.get('psi_n', 36))
 		aas = pose.data.get('Amino Acids') or {}
 		SIG_MIN = 0.5
-		LOG_2PI = math.log(2.0 * math.pi)
+		residues = kw.get('residues')
 		raw = 0.0
-		for ri, info in aas.items():
-			raw = self.residuerotamer(raw, ri, info, cache, pose,
-				per_res, residues_db, phi_n, phi_start, phi_step,
-				psi_n, psi_start, psi_step, SIG_MIN)
+		if not aas:
+			return {'inter_raw': 0.0, 'intra_raw': 0.0,
+				'inter_weighted': 0.0, 'intra_weighted': 0.0, 'raw': 0.0}
+		tor = cache['residuetorsions'](pose)
+		if residues is not None:
+			want = np.array(sorted(residues), dtype=np.int64)
+			k = np.minimum(np.searchsorted(tor['res'], want),
+				len(tor['res']) - 1)
+			sel = k[tor['res'][k] == want]
+			tor = {key: v[sel] for key, v in tor.items()}
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		phi = cache['torsionangles'](X, tor['phi'])
+		psi = cache['torsionangles'](X, tor['psi'])
+		chi = cache['torsionangles'](X, tor['chi'])
+		# A missing backbone atom makes cdih raise for the whole residue.
+		lost = (tor['phi'] == -2).any(axis=1) | (tor['psi'] == -2).any(axis=1)
+		grad = cache.get('_forces') is not None
+		if grad:
+			# The -90/130 stand-ins for an unmeasured phi/psi are constants
+			phi_ok = ~(np.isnan(phi) | lost); psi_ok = ~(np.isnan(psi) | lost)
+		phi[np.isnan(phi) | lost] = -90.0
+		psi[np.isnan(psi) | lost] = 130.0
+		groups = {}
+		for k, ri in enumerate(tor['res'].tolist()):
+			info = aas[ri]
+			tri = info[5] if len(info) >= 6 else None
+			if tri == 'HIS_D': tri = 'HIS'
+			groups.setdefault(tri, []).append(k)
+		for tri, rows in groups.items():
+			entry = residues_db.get(tri)
+			if entry is None: continue
+			n_chi = int(entry.get('n_chi', 0))
+			if n_chi <= 0 or n_chi > chi.shape[1]: continue
+			rows = np.array(rows)
+			rows = rows[np.isfinite(chi[rows, :n_chi]).all(axis=1)]
+			if not len(rows): continue
+			if tri in self.SEMI_ROT:
+				out = self.fadunsemirotameric(cache, tri, n_chi,
+					phi[rows], psi[rows], chi[rows, :n_chi], grad)
+				steps = (10.0, 10.0)
+			else:
+				out = self.fadunrotameric(cache, tri, n_chi,
+					residues_db, (phi[rows] - phi_start) / phi_step,
+					(psi[rows] - psi_start) / psi_step,
+					chi[rows, :n_chi], SIG_MIN, grad)
+				steps = (phi_step, psi_step)
+			e, ok = out[0], out[1]
+			if grad:
+				# Residues left to residuerotamer carry no force
+				d_fp, d_fs, d_chi = out[2]
+				cache['torsionforces'](cache, None, tor['phi'][rows],
+					np.where(ok & phi_ok[rows], d_fp / steps[0], 0.0))
+				cache['torsionforces'](cache, None, tor['psi'][rows],
+					np.where(ok & psi_ok[rows], d_fs / steps[1], 0.0))
+				cache['torsionforces'](cache, None, tor['chi'][rows, :n_chi],
+					np.where(ok[:, None], d_chi, 0.0))
+			for k, v, good in zip(rows.tolist(), e.tolist(), ok.tolist()):
+				ri = int(tor['res'][k])
+				if not good:
+					raw = self.residuerotamer(raw, ri, aas[ri], cache, pose,
+						per_res, residues_db, phi_n, phi_start, phi_step,
+						psi_n, psi_start, psi_step, SIG_MIN)
+					continue
+				raw += v
+				if per_res is not None: per_res[ri] = v
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
 			'raw': raw}
+	def binchis(self, chi):
+		'''
+		Place chi angles into rotamer wells, as binchi does one at a time
+		Arguments:
+		----------
+			chi: np.ndarray - chi angles in degrees
+		Returns:
+		--------
+			np.ndarray: well indices (1, 2 or 3), shaped like chi
+		'''
+		c = ((chi + 180.0) % 360.0) - 180.0
+		return np.where((c >= 0.0) & (c <= 120.0), 1,
+			np.where(np.abs(c) >= 120.0, 2, 3))
+	def fadunrotameric(self, cache, tri, n_chi, residues_db, fp, fs, chi,
+			SIG_MIN, grad=False):
+		'''
+		Rotameric FaDun energies of many residues of one amino acid from
+		the shared spline table: the bicubic -log(P) of each residue's
+		rotamer well plus the chi deviation from the bilinear well means
+		Arguments:
+		----------
+			cache: dict - cache returned by ScoreMatch()
+			tri: str - 3-letter amino acid code
+			n_chi: int - number of chi angles
+			residues_db: dict - the rotamer library residue table
+			fp: np.ndarray - (N,) fractional phi grid positions
+			fs: np.ndarray - (N,) fractional psi grid positions
+			chi: np.ndarray - (N, n_chi) chi angles in degrees
+			SIG_MIN: float - lower clamp on a rotamer sigma
+			grad: bool - if True also return the energy derivatives
+		Returns:
+		--------
+			tuple: (energies, ok) - (N,) energies and a mask of the
+				residues whose well has data; the rest need residuerotamer.
+				With grad=True a third item (d/dfp, d/dfs, d/dchi), chi
+				per degree
+		'''
+		N = len(fp)
+		T = cache['fadun_tables'](tri, n_chi, residues_db)
+		if not T or not len(T['wells']):
+			if grad:
+				return (np.zeros(N), np.zeros(N, dtype=bool),
+					(np.zeros(N), np.zeros(N), np.zeros((N, n_chi))))
+			return np.zeros(N), np.zeros(N, dtype=bool)
+		if tri == 'PRO':
+			bins = np.ones((N, n_chi), dtype=np.int64)
+			bins[:, 0] = np.where(chi[:, 0] > 0, 1, 2)
+		else:
+			bins = self.binchis(chi)
+		rot_idx = (bins * 10 ** (3 - np.arange(n_chi))).sum(axis=1)
+		wells = T['wells']
+		w = np.minimum(np.searchsorted(wells, rot_idx), len(wells) - 1)
+		ok = (wells[w] == rot_idx) & T['any'][w]
+		if grad:
+			neg_log_P, d_fp, d_fs = cache['fadun_bicubic'](T['coef'], w,
+				fp, fs, True)
+			cap = neg_log_P >= math.log(1e6)
+			d_fp = np.where(cap, 0.0, d_fp); d_fs = np.where(cap, 0.0, d_fs)
+		else:
+			neg_log_P = cache['fadun_bicubic'](T['coef'], w, fp, fs)
+		neg_log_P = np.minimum(math.log(1e6), neg_log_P)
+		ip0 = np.floor(fp).astype(np.int64)
+		js0 = np.floor(fs).astype(np.int64)
+		tp = (fp - ip0)[:, None]
+		ts = (fs - js0)[:, None]
+		ip0m = ip0 % 36; ip1m = (ip0 + 1) % 36
+		js0m = js0 % 36; js1m = (js0 + 1) % 36
+		ci = np.arange(n_chi)[None, :]
+		wc = w[:, None]
+		def corner(g, i, j):
+			return g[wc, ci, i[:, None], j[:, None]]
+		a = corner(T['mu'], ip0m, js0m)
+		b = corner(T['mu'], ip1m, js0m)
+		c = corner(T['mu'], ip0m, js1m)
+		d = corner(T['mu'], ip1m, js1m)
+		b = a + ((b - a + 180.0) % 360.0 - 180.0)
+		c = a + ((c - a + 180.0) % 360.0 - 180.0)
+		d = a + ((d - a + 180.0) % 360.0 - 180.0)
+		w00 = (1 - tp) * (1 - ts); w10 = tp * (1 - ts)
+		w01 = (1 - tp) * ts; w11 = tp * ts
+		mus = w00 * a + w10 * b + w01 * c + w11 * d
+		sigs = np.maximum(w00 * corner(T['sd'], ip0m, js0m)
+			+ w10 * corner(T['sd'], ip1m, js0m)
+			+ w01 * corner(T['sd'], ip0m, js1m)
+			+ w11 * corner(T['sd'], ip1m, js1m), SIG_MIN)
+		# As in residuerotamer: the deviation only counts where all four
+		# corners carry data for the well.
+		hd = T['has']
+		corners = (hd[w, ip0m, js0m] & hd[w, ip1m, js0m]
+			& hd[w, ip0m, js1m] & hd[w, ip1m, js1m])
+		dev = ((((chi - mus + 180.0) % 360.0) - 180.0) / sigs) ** 2
+		dev = np.where(corners, dev.sum(axis=1), 0.0)
+		if not grad: return neg_log_P + 0.5 * dev, ok
+		sd = [corner(T['sd'], ip0m, js0m), corner(T['sd'], ip1m, js0m),
+			corner(T['sd'], ip0m, js1m), corner(T['sd'], ip1m, js1m)]
+		d_chi, g_fp, g_fs = self.fadundeviation(chi, mus, sigs, SIG_MIN,
+			(a, b, c, d), sd, tp, ts)
+		m = corners[:, None]
+		return neg_log_P + 0.5 * dev, ok, (
+			d_fp + np.where(corners, g_fp, 0.0),
+			d_fs + np.where(corners, g_fs, 0.0), np.where(m, d_chi, 0.0))
+	def fadundeviation(self, chi, mus, sigs, sig_min, mu_c, sd_c, tp, ts):
+		'''
+		Derivatives of the chi deviation half-sum 0.5*((chi - mu)/sig)^2
+		with mu and sig bilinear over the four grid corners
+		Arguments:
+		----------
+			chi:     np.ndarray - (N, k) chi angles in degrees
+			mus:     np.ndarray - (N, k) interpolated well means
+			sigs:    np.ndarray - (N, k) interpolated, clamped sigmas
+			sig_min: float - the clamp applied to sigs
+			mu_c:    tuple - the four (N, k) corner means, unwrapped
+			sd_c:    tuple - the four (N, k) corner sigmas
+			tp, ts:  np.ndarray - (N, 1) fractional cell positions
+		Returns:
+		--------
+			tuple: (d/dchi (N, k), d/dfp (N,), d/dfs (N,))
+		'''
+		a, b, c, d = mu_c
+		delta = ((chi - mus + 180.0) % 360.0) - 180.0
+		d_mu = -delta / (sigs * sigs)
+		d_sig = np.where(sigs > sig_min, -delta * delta / sigs ** 3, 0.0)
+		s00, s10, s01, s11 = sd_c
+		mu_p = (1 - ts) * (b - a) + ts * (d - c)
+		mu_s = (1 - tp) * (c - a) + tp * (d - b)
+		sig_p = (1 - ts) * (s10 - s00) + ts * (s11 - s01)
+		sig_s = (1 - tp) * (s01 - s00) + tp * (s11 - s10)
+		return (-d_mu, (d_mu * mu_p + d_sig * sig_p).sum(axis=1),
+			(d_mu * mu_s + d_sig * sig_s).sum(axis=1))
+	def fadunsemirotameric(self, cache, tri, n_chi, phi, psi, chi,
+			grad=False):
+		'''
+		Semi-rotameric FaDun energies of many residues of one amino acid
+		from the shared FaDunNrchiDensities table: bicubic -log(P_rot),
+		the deviation of the rotameric chis from the bilinear well means
+		and the -log density of chi_last, spline-interpolated over its
+		bins
+		Arguments:
+		----------
+			cache: dict - cache returned by ScoreMatch()
+			tri: str - 3-letter amino acid code
+			n_chi: int - number of chi angles, the last non-rotameric
+			phi: np.ndarray - (N,) phi in degrees
+			psi: np.ndarray - (N,) psi in degrees
+			chi: np.ndarray - (N, n_chi) chi angles in degrees
+			grad: bool - if True also return the energy derivatives
+		Returns:
+		--------
+			tuple: (energies, ok) - (N,) energies and a mask of the
+				residues whose well is in the table; the rest need
+				residuerotamer. With grad=True a third item (d/dfp,
+				d/dfs, d/dchi), chi per degree
+		'''
+		N = len(phi)
+		none = (np.zeros(N), np.zeros(N, dtype=bool))
+		if grad:
+			none += ((np.zeros(N), np.zeros(N), np.zeros((N, n_chi))),)
+		T = cache['fadun_nrchi_tables'](tri)
+		if not T or not len(T['wells']): return none
+		n_rot = n_chi - 1
+		n_disc, cn, clow, cstep = T['meta'].tolist()
+		n_disc = int(n_disc); cn = int(cn)
+		if n_rot > n_disc: return none
+		bins = self.binchis(chi[:, :n_rot])
+		code = 10000 * n_rot + (bins * 10 ** (3 - np.arange(n_rot))).sum(1)
+		wells = T['wells']
+		w = np.minimum(np.searchsorted(wells, code), len(wells) - 1)
+		ok = wells[w] == code
+		chi_last = chi[:, n_chi - 1].copy()
+		chigh = clow + cn * cstep
+		if (chigh - clow) < 360.0 - 1e-6:
+			while np.any(chi_last < clow):
+				chi_last = np.where(chi_last < clow, chi_last + 180.0,
+					chi_last)
+			while np.any(chi_last >= chigh):
+				chi_last = np.where(chi_last >= chigh, chi_last - 180.0,
+					chi_last)
+		else:
+			chi_last = ((chi_last + 180.0) % 360.0) - 180.0
+		fp = (phi + 180.0) / 10.0
+		fs = (psi + 180.0) / 10.0
+		neg_log_rot = cache['fadun_bicubic'](T['coef_rot'], w, fp, fs, grad)
+		if grad: neg_log_rot, d_fp, d_fs = neg_log_rot
+		ip0 = np.floor(fp).astype(np.int64)
+		js0 = np.floor(fs).astype(np.int64)
+		tp = (fp - ip0)[:, None]
+		ts = (fs - js0)[:, None]
+		ip0m = ip0 % 36; ip1m = (ip0 + 1) % 36
+		js0m = js0 % 36; js1m = (js0 + 1) % 36
+		ci = np.arange(n_rot)[None, :]
+		wc = w[:, None]
+		def corner(g, i, j):
+			return g[wc, ci, i[:, None], j[:, None]]
+		a = corner(T['chi_means'], ip0m, js0m)
+		b = a + ((corner(T['chi_means'], ip1m, js0m) - a + 180.0)
+			% 360.0 - 180.0)
+		c = a + ((corner(T['chi_means'], ip0m, js1m) - a + 180.0)
+			% 360.0 - 180.0)
+		d = a + ((corner(T['chi_means'], ip1m, js1m) - a + 180.0)
+			% 360.0 - 180.0)
+		w00 = (1 - tp) * (1 - ts); w10 = tp * (1 - ts)
+		w01 = (1 - tp) * ts; w11 = tp * ts
+		mus = w00 * a + w10 * b + w01 * c + w11 * d
+		sigs = np.maximum(w00 * corner(T['chi_sigmas'], ip0m, js0m)
+			+ w10 * corner(T['chi_sigmas'], ip1m, js0m)
+			+ w01 * corner(T['chi_sigmas'], ip0m, js1m)
+			+ w11 * corner(T['chi_sigmas'], ip1m, js1m), 0.5)
+		dev = (((((chi[:, :n_rot] - mus + 180.0) % 360.0) - 180.0)
+			/ sigs) ** 2).sum(axis=1)
+		fc = (chi_last - clow) / cstep
+		fc_mod = fc - cn * np.floor(fc / cn)
+		dens = cache['fadun_bicubic'](T['coef_dens'], w, fp, fs, grad)
+		if grad: dens, dd_fp, dd_fs = dens
+		P = cache['periodic_matrices'](cn)[1].T
+		coef = dens @ P
+		st = cache['bspline_stencil'](fc_mod, cn, grad)
+		idx, wt = st[0], st[1]
+		neg_log_dens = (np.take_along_axis(coef, idx, axis=1) * wt).sum(1)
+		e = neg_log_rot + neg_log_dens + 0.5 * dev
+		if not grad: return e, ok
+		dwt = st[2]
+		sd = [corner(T['chi_sigmas'], i, j) for i, j in ((ip0m, js0m),
+			(ip1m, js0m), (ip0m, js1m), (ip1m, js1m))]
+		d_dev, g_fp, g_fs = self.fadundeviation(chi[:, :n_rot], mus, sigs,
+			0.5, (a, b, c, d), sd, tp, ts)
+		d_fp = d_fp + g_fp + (np.take_along_axis(dd_fp @ P, idx, axis=1)
+			* wt).sum(1)
+		d_fs = d_fs + g_fs + (np.take_along_axis(dd_fs @ P, idx, axis=1)
+			* wt).sum(1)
+		d_chi = np.zeros((N, n_chi))
+		d_chi[:, :n_rot] = d_dev
+		d_chi[:, n_chi - 1] = (np.take_along_axis(coef, idx, axis=1)
+			* dwt).sum(1) / cstep
+		return e, ok, (d_fp, d_fs, d_chi)
 	def residuerotamer(self, raw, ri, info, cache, pose, per_res,
 			residues_db, phi_n, phi_start, phi_step, psi_n, psi_start,
 			psi_step, SIG_MIN):
@@ -2026,7 +4191,7 @@ class Score():
 			if math.isnan(v): bad = True; break
 			chi_now.append(v)
 		if bad: return raw
-		SEMI_ROT = ('ASP','ASN','GLU','GLN','PHE','TYR','TRP','HIS')
+		SEMI_ROT = self.SEMI_ROT
 		n_rot = n_chi - 1 if tri in SEMI_ROT else n_chi
 		if tri in SEMI_ROT:
 			nrdata = cache['fadun_nrchi_data'](tri)
@@ -2433,33 +4598,37 @@ class Score():
 			return cache['fullatomstubterm']('RamaPreProTerm')
 		aas = pose.data.get('Amino Acids') or {}
 		raw = 0.0
-		sorted_ris = sorted(int(r) for r in aas.keys())
-		next_tri = {}
-		for k, ri in enumerate(sorted_ris):
-			if k + 1 < len(sorted_ris):
-				nxt = sorted_ris[k+1]
-				nxt_info = aas.get(nxt)
-				if nxt_info and len(nxt_info) >= 6:
-					next_tri[ri] = nxt_info[5]
-		for ri in sorted_ris:
-			info = aas.get(ri)
-			if info is None: continue
-			tri = info[5] if len(info) >= 6 else None
-			if tri == 'HIS_D': tri = 'HIS'
-			if tri in self.NCAA_PARENT: tri = self.NCAA_PARENT[tri]
-			try:
-				phi = cache['cdih'](pose, ri, 'PHI')
-				psi = cache['cdih'](pose, ri, 'PSI')
-			except Exception: continue
-			if math.isnan(phi) or math.isnan(psi): continue
-			use_pre = (next_tri.get(ri) == 'PRO'
-				and tri in pre_t and pre_t[tri])
-			table = pre_t[tri] if use_pre else all_t.get(tri)
-			if table is None: continue
+		if not aas:
+			return {'inter_raw': 0.0, 'intra_raw': 0.0,
+				'inter_weighted': 0.0, 'intra_weighted': 0.0, 'raw': 0.0}
+		groups = cache.get('_rama_groups')
+		if groups is None:
+			tor = cache['residuetorsions'](pose)
+			res = tor['res'].tolist()
+			groups = {}
+			for k, ri in enumerate(res):
+				tri = self.basetri(aas[ri])
+				nxt = aas[res[k + 1]] if k + 1 < len(res) else None
+				nxt_tri = nxt[5] if nxt and len(nxt) >= 6 else None
+				use_pre = bool(nxt_tri == 'PRO'
+					and tri in pre_t and pre_t[tri])
+				if not use_pre and all_t.get(tri) is None: continue
+				groups.setdefault((use_pre, tri), []).append(k)
+			groups = [(key, np.array(rows)) for key, rows in groups.items()]
+			cache['_rama_groups'] = groups
+		tor = cache['residuetorsions'](pose)
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		phi = cache['torsionangles'](X, tor['phi'])
+		psi = cache['torsionangles'](X, tor['psi'])
+		if not hasattr(self, '_rama_entropy'):
+			self._rama_entropy = {}
+			self._rama_logshift = {}
+			self._rama_coef = {}
+		for (use_pre, tri), rows in groups:
+			table = pre_t[tri] if use_pre else all_t[tri]
+			rows = rows[~(np.isnan(phi[rows]) | np.isnan(psi[rows]))]
+			if not len(rows): continue
 			cache_key = id(table)
-			if not hasattr(self, '_rama_entropy'):
-				self._rama_entropy = {}
-				self._rama_logshift = {}
 			ent_cache = self._rama_entropy
 			shift_cache = self._rama_logshift
 			ent = ent_cache.get(cache_key)
@@ -2477,14 +4646,61 @@ class Score():
 						if p_norm > 0:
 							ent += p_norm * math.log(p_norm)
 				ent_cache[cache_key] = ent
+				self._rama_coef[cache_key] = cache['spline_grids'](
+					np.asarray(table, dtype=np.float64))[1][None]
 			log_shift = shift_cache[cache_key]
-			fp = (phi + 180.0) / 10.0
-			fs = (psi + 180.0) / 10.0
-			e = cache['rama_spline_eval'](table, fp, fs)
-			raw += (e + log_shift + ent)
+			fp = (phi[rows] + 180.0) / 10.0
+			fs = (psi[rows] + 180.0) / 10.0
+			if cache.get('_forces') is not None:
+				e, d_fp, d_fs = cache['fadun_bicubic'](
+					self._rama_coef[cache_key],
+					np.zeros(len(rows), dtype=np.int64), fp, fs, True)
+				cache['torsionforces'](cache, None, tor['phi'][rows],
+					d_fp / 10.0)
+				cache['torsionforces'](cache, None, tor['psi'][rows],
+					d_fs / 10.0)
+			else:
+				e = cache['fadun_bicubic'](self._rama_coef[cache_key],
+					np.zeros(len(rows), dtype=np.int64), fp, fs)
+			raw += float(np.sum(e + log_shift + ent))
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
 			'raw': raw}
+	def basetri(self, info):
+		'''
+		Tricode a backbone statistical term scores a residue as: HIS_D
+		as HIS and a non-canonical amino acid as its parent
+		Arguments:
+		----------
+			info: list - the residue record from data['Amino Acids']
+		Returns:
+		--------
+			str or None: 3-letter code
+		'''
+		tri = info[5] if len(info) >= 6 else None
+		if tri == 'HIS_D': tri = 'HIS'
+		if tri in self.NCAA_PARENT: tri = self.NCAA_PARENT[tri]
+		return tri
+	def chainends(self, aas):
+		'''
+		First and last residue of every chain
+		Arguments:
+		----------
+			aas: dict - data['Amino Acids']
+		Returns:
+		--------
+			tuple: (nterm, cterm) - sets of residue indices
+		'''
+		nterm = set(); cterm = set()
+		ch_map = {}
+		for ri, info in aas.items():
+			ch = info[1] if len(info) > 1 else ''
+			ch_map.setdefault(ch, []).append(int(ri))
+		for ris in ch_map.values():
+			ris.sort()
+			if ris:
+				nterm.add(ris[0]); cterm.add(ris[-1])
+		return nterm, cterm
 	def PAaPpPotential(self, pose, cache, ligand=None, **kw):
 		'''
 		P_aa_pp - P(aa|phi,psi) propensity.
@@ -2505,16 +4721,6 @@ class Score():
 		if not paa or not paapp:
 			return cache['fullatomstubterm']('PAaPp')
 		aas = pose.data.get('Amino Acids') or {}
-		nterm = set(); cterm = set()
-		if aas:
-			ch_map = {}
-			for ri, info in aas.items():
-				ch = info[1] if len(info) > 1 else ''
-				ch_map.setdefault(ch, []).append(int(ri))
-			for ris in ch_map.values():
-				ris.sort()
-				if ris:
-					nterm.add(ris[0]); cterm.add(ris[-1])
 		raw = 0.0
 		if not hasattr(self, '_paapp_spline_cache'):
 			self._paapp_spline_cache = {}
@@ -2522,32 +4728,47 @@ class Score():
 		if not cache_pp:
 			MAXE = math.log(1e6)
 			for aa, tbl in paapp.items():
-				grid = np.zeros((36, 36))
-				for i in range(36):
-					for j in range(36):
-						v = tbl[i][j]
-						grid[i, j] = (-math.log(v)
-							if v > 0 else MAXE)
-				ypp_psi = np.stack(
-					[cache['periodic_cubic_spline'](grid[i])
-						for i in range(36)])
-				cache_pp[aa] = (grid, ypp_psi)
-		for ri, info in aas.items():
-			if int(ri) in nterm or int(ri) in cterm: continue
-			tri = info[5] if len(info) >= 6 else None
-			if tri == 'HIS_D': tri = 'HIS'
-			if tri in self.NCAA_PARENT: tri = self.NCAA_PARENT[tri]
-			if tri not in cache_pp: continue
-			try:
-				phi = cache['cdih'](pose, int(ri), 'PHI')
-				psi = cache['cdih'](pose, int(ri), 'PSI')
-			except Exception: continue
-			if math.isnan(phi) or math.isnan(psi): continue
-			fp = (phi + 175.0) / 10.0
-			fs = (psi + 175.0) / 10.0
-			grid, ypp_psi = cache_pp[tri]
-			neg_log_pp = cache['fadun_spline_eval'](grid, ypp_psi, fp, fs)
-			raw += neg_log_pp + math.log(paa.get(tri, 1.0))
+				v = np.asarray(tbl, dtype=np.float64)
+				grid = np.full((36, 36), MAXE)
+				grid[v > 0] = -np.log(v[v > 0])
+				ypp_psi, coef = cache['spline_grids'](grid)
+				cache_pp[aa] = (grid, ypp_psi, coef[None])
+		if not aas:
+			return {'inter_raw': 0.0, 'intra_raw': 0.0,
+				'inter_weighted': 0.0, 'intra_weighted': 0.0, 'raw': 0.0}
+		groups = cache.get('_paapp_groups')
+		if groups is None:
+			nterm, cterm = self.chainends(aas)
+			tor = cache['residuetorsions'](pose)
+			groups = {}
+			for k, ri in enumerate(tor['res'].tolist()):
+				if ri in nterm or ri in cterm: continue
+				tri = self.basetri(aas[ri])
+				if tri not in cache_pp: continue
+				groups.setdefault(tri, []).append(k)
+			groups = [(tri, np.array(rows)) for tri, rows in groups.items()]
+			cache['_paapp_groups'] = groups
+		tor = cache['residuetorsions'](pose)
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		phi = cache['torsionangles'](X, tor['phi'])
+		psi = cache['torsionangles'](X, tor['psi'])
+		for tri, rows in groups:
+			rows = rows[~(np.isnan(phi[rows]) | np.isnan(psi[rows]))]
+			if not len(rows): continue
+			fp = (phi[rows] + 175.0) / 10.0
+			fs = (psi[rows] + 175.0) / 10.0
+			if cache.get('_forces') is not None:
+				neg_log_pp, d_fp, d_fs = cache['fadun_bicubic'](
+					cache_pp[tri][2], np.zeros(len(rows), dtype=np.int64),
+					fp, fs, True)
+				cache['torsionforces'](cache, None, tor['phi'][rows],
+					d_fp / 10.0)
+				cache['torsionforces'](cache, None, tor['psi'][rows],
+					d_fs / 10.0)
+			else:
+				neg_log_pp = cache['fadun_bicubic'](cache_pp[tri][2],
+					np.zeros(len(rows), dtype=np.int64), fp, fs)
+			raw += float(np.sum(neg_log_pp + math.log(paa.get(tri, 1.0))))
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
 			'raw': raw}
@@ -2571,15 +4792,6 @@ class Score():
 		if not omega_tab:
 			return cache['fullatomstubterm']('Omega')
 		aas = pose.data.get('Amino Acids') or {}
-		cterm = set()
-		if aas:
-			ch_map = {}
-			for ri, info in aas.items():
-				ch = info[1] if len(info) > 1 else ''
-				ch_map.setdefault(ch, []).append(int(ri))
-			for ris in ch_map.values():
-				ris.sort()
-				if ris: cterm.add(ris[-1])
 		raw = 0.0
 		normalization = math.log(1.0 / (6.0 * math.sqrt(2 * math.pi)))
 		if not hasattr(self, '_omega_spline_cache'):
@@ -2589,57 +4801,82 @@ class Score():
 			for key, t in omega_tab.items():
 				mu_g = np.array(t['mu'])
 				sig_g = np.array(t['sigma'])
-				mu_ypp = np.stack(
-					[cache['periodic_cubic_spline'](mu_g[i])
-						for i in range(36)])
-				sig_ypp = np.stack(
-					[cache['periodic_cubic_spline'](sig_g[i])
-						for i in range(36)])
-				cache_o[key] = (mu_g, mu_ypp, sig_g, sig_ypp)
-		for ri in sorted(aas):
-			if int(ri) in cterm: continue
-			tri = aas[ri][5] if len(aas[ri]) >= 6 else None
-			if tri == 'HIS_D': tri = 'HIS'
-			if tri in self.NCAA_PARENT: tri = self.NCAA_PARENT[tri]
-			try:
-				om = pose.GetDihedral(int(ri), 'OMEGA')
-				phi = cache['cdih'](pose, int(ri), 'PHI')
-				psi = cache['cdih'](pose, int(ri), 'PSI')
-			except Exception: continue
-			if math.isnan(om): continue
-			om_nn = om
-			while om_nn < 0: om_nn += 360
-			while om_nn >= 360: om_nn -= 360
-			om_p = om_nn
-			while om_p < -90: om_p += 360
-			while om_p > 270: om_p -= 360
-			if om_p < 90:
-				dangle = ((om_p - 0 + 180) % 360) - 180
-				raw += omega_k * dangle * dangle
-				continue
-			und = float(self.Parameters['Omega']['undefined_torsion'])
-			if math.isnan(phi): phi = und
-			if math.isnan(psi): psi = und
-			if tri == 'GLY': key = 'gly'
-			elif tri == 'PRO': key = 'pro'
-			elif tri in ('ILE', 'VAL'): key = 'valile'
-			else: key = 'all'
-			mu_g, mu_ypp, sig_g, sig_ypp = cache_o[key]
-			phi_nn = phi
-			while phi_nn < 0: phi_nn += 360
-			psi_nn = psi
-			while psi_nn < 0: psi_nn += 360
-			fp = (phi_nn - 5.0) / 10.0
-			fs = (psi_nn - 5.0) / 10.0
-			fp = fp % 36.0
-			fs = fs % 36.0
-			mu = cache['fadun_spline_eval'](mu_g, mu_ypp, fp, fs)
-			sigma = cache['fadun_spline_eval'](sig_g, sig_ypp, fp, fs)
-			if sigma < 1e-6: continue
-			entropy = -math.log(1.0 / (sigma * math.sqrt(2 * math.pi)))
-			offset = ((om_p - mu + 180) % 360) - 180
+				mu_ypp, mu_c = cache['spline_grids'](mu_g)
+				sig_ypp, sig_c = cache['spline_grids'](sig_g)
+				cache_o[key] = (mu_g, mu_ypp, sig_g, sig_ypp,
+					np.stack([mu_c, sig_c])[None])
+		if not aas:
+			return {'inter_raw': 0.0, 'intra_raw': 0.0,
+				'inter_weighted': 0.0, 'intra_weighted': 0.0, 'raw': 0.0}
+		tor = cache['residuetorsions'](pose)
+		keys = cache.get('_omega_keys')
+		if keys is None:
+			nterm, cterm = self.chainends(aas)
+			keys = []
+			for ri in tor['res'].tolist():
+				tri = self.basetri(aas[ri])
+				if ri in cterm: key = None
+				elif tri == 'GLY': key = 'gly'
+				elif tri == 'PRO': key = 'pro'
+				elif tri in ('ILE', 'VAL'): key = 'valile'
+				else: key = 'all'
+				keys.append(key)
+			keys = np.array(keys, dtype=object)
+			cache['_omega_keys'] = keys
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		om = cache['torsionangles'](X, tor['omega'])
+		phi = cache['torsionangles'](X, tor['phi'])
+		psi = cache['torsionangles'](X, tor['psi'])
+		# GetDihedral/cdih raise on a missing atom and skip the residue.
+		lost = ((tor['omega'] == -2).any(axis=1)
+			| (tor['phi'] == -2).any(axis=1) | (tor['psi'] == -2).any(axis=1))
+		live = np.not_equal(keys, None) & ~lost & ~np.isnan(om)
+		om_p = np.where(om < 0, om + 360, om)
+		om_p = np.where(om_p >= 360, om_p - 360, om_p)
+		om_p = np.where(om_p > 270, om_p - 360, om_p)
+		cis = live & (om_p < 90)
+		dangle = ((om_p[cis] - 0 + 180) % 360) - 180
+		raw += float(np.sum(omega_k * dangle * dangle))
+		grad = cache.get('_forces') is not None
+		if grad:
+			cache['torsionforces'](cache, None, tor['omega'][cis],
+				2.0 * omega_k * dangle)
+			# phi and psi fall back to undefined_torsion when not measured,
+			# so they carry no force there
+			phi_ok = ~np.isnan(phi); psi_ok = ~np.isnan(psi)
+		und = float(self.Parameters['Omega']['undefined_torsion'])
+		phi = np.where(np.isnan(phi), und, phi)
+		psi = np.where(np.isnan(psi), und, psi)
+		while np.any(phi < 0): phi = np.where(phi < 0, phi + 360, phi)
+		while np.any(psi < 0): psi = np.where(psi < 0, psi + 360, psi)
+		fp = ((phi - 5.0) / 10.0) % 36.0
+		fs = ((psi - 5.0) / 10.0) % 36.0
+		trans = live & ~cis
+		for key in ('gly', 'pro', 'valile', 'all'):
+			rows = np.flatnonzero(trans & (keys == key))
+			if not len(rows): continue
+			ms = cache['fadun_bicubic'](cache_o[key][4],
+				np.zeros(len(rows), dtype=np.int64), fp[rows], fs[rows],
+				grad)
+			if grad: ms, d_fp, d_fs = ms
+			mu, sigma = ms[:, 0], ms[:, 1]
+			ok = sigma >= 1e-6
+			mu, sigma = mu[ok], sigma[ok]
+			entropy = -np.log(1.0 / (sigma * math.sqrt(2 * math.pi)))
+			offset = ((om_p[rows][ok] - mu + 180) % 360) - 180
 			logprob = offset * offset / (2 * sigma * sigma)
-			raw += normalization + entropy + logprob
+			raw += float(np.sum(normalization + entropy + logprob))
+			if grad:
+				rows = rows[ok]
+				d_om = offset / (sigma * sigma)
+				d_sig = 1.0 / sigma - offset * offset / sigma ** 3
+				d_phi = (-d_om * d_fp[ok, 0] + d_sig * d_fp[ok, 1]) / 10.0
+				d_psi = (-d_om * d_fs[ok, 0] + d_sig * d_fs[ok, 1]) / 10.0
+				cache['torsionforces'](cache, None, tor['omega'][rows], d_om)
+				cache['torsionforces'](cache, None, tor['phi'][rows],
+					np.where(phi_ok[rows], d_phi, 0.0))
+				cache['torsionforces'](cache, None, tor['psi'][rows],
+					np.where(psi_ok[rows], d_psi, 0.0))
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
 			'raw': raw}
@@ -2688,19 +4925,25 @@ class Score():
 				for a in info[2] + info[3]}
 			needed = ('N', 'CA', 'CG', 'CD')
 			if not all(nm in name_to_idx for nm in needed): continue
+			ring = [name_to_idx[nm] for nm in ('N', 'CA', 'CG', 'CD')]
 			n = coords[name_to_idx['N']]
-			ca = coords[name_to_idx['CA']]
-			cg = coords[name_to_idx['CG']]
-			cd = coords[name_to_idx['CD']]
-			nv = self.place(cd, cg, n, float(PC['nv_d']),
-				math.radians(float(PC['nv_theta'])), 0.0)
-			d2_n_nv = float(np.sum((nv - n) ** 2))
-			raw += d2_n_nv / sd_sq
-			if int(ri) in n_term_set:
-				cav = self.place(nv, cd, ca, float(PC['cav_d']),
-					math.radians(float(PC['cav_theta'])), 0.0)
-				d2_ca_cav = float(np.sum((cav - ca) ** 2))
-				raw += d2_ca_cav / sd_sq
+			nterm = int(ri) in n_term_set
+			raw += self.proclosering(coords[ring], nterm, PC, sd_sq)
+			grad = cache.get('_forces') is not None
+			if grad:
+				# The virtual atoms hang off three ring atoms each; central
+				# differences of this few-atom closure are plenty
+				h = 1e-5
+				g = np.zeros((4, 3))
+				for a in range(4):
+					for l in range(3):
+						P = coords[ring].astype(np.float64)
+						P[a, l] += h
+						hi = self.proclosering(P, nterm, PC, sd_sq)
+						P[a, l] -= 2 * h
+						lo = self.proclosering(P, nterm, PC, sd_sq)
+						g[a, l] = (hi - lo) / (2 * h)
+				cache['tallyatoms'](cache, None, np.array(ring), -g)
 			prev = ri_to_prev.get(int(ri))
 			if prev is None: continue
 			prev_info = aas.get(prev)
@@ -2716,12 +4959,41 @@ class Score():
 			if chi4 > math.pi / 2:
 				diff = chi4 - trans_mean
 				raw += diff * diff / (trans_sd * trans_sd)
+				sd2 = trans_sd * trans_sd
 			else:
 				diff = chi4 - cis_mean
 				raw += diff * diff / (cis_sd * cis_sd)
+				sd2 = cis_sd * cis_sd
+			if grad:
+				cache['torsionforces'](cache, None, [[name_to_idx['CD'],
+					name_to_idx['N'], prev_atoms['C'], prev_atoms['O']]],
+					[2.0 * diff / sd2 * math.pi / 180.0])
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
 			'raw': raw}
+	def proclosering(self, P, nterm, PC, sd_sq):
+		'''
+		Ring-closure part of Pro_close: the distance of N from its virtual
+		NV atom and, at a chain start, of CA from its virtual CAV atom
+		Arguments:
+		----------
+			P:     np.ndarray - (4, 3) N, CA, CG and CD coordinates
+			nterm: bool - True if the proline starts a chain
+			PC:    dict - the ProClose parameters
+			sd_sq: float - squared planar standard deviation
+		Returns:
+		--------
+			float: the raw ring-closure energy
+		'''
+		n, ca, cg, cd = P
+		nv = self.place(cd, cg, n, float(PC['nv_d']),
+			math.radians(float(PC['nv_theta'])), 0.0)
+		e = float(np.sum((nv - n) ** 2)) / sd_sq
+		if nterm:
+			cav = self.place(nv, cd, ca, float(PC['cav_d']),
+				math.radians(float(PC['cav_theta'])), 0.0)
+			e += float(np.sum((cav - ca) ** 2)) / sd_sq
+		return e
 	def dihedralradians(self, a, b, c, d):
 		'''
 		Dihedral angle of four points in degrees
@@ -2827,9 +5099,8 @@ class Score():
 				if ssdist > 3.0: continue
 				score = -shift
 				z = (ssdist - d_location) / d_scale
-				score_d = (z * z / 2.0
-					- math.log(math.erfc(-d_shape * z / math.sqrt(2.0))
-						+ mest))
+				u = -d_shape * z / math.sqrt(2.0)
+				score_d = z * z / 2.0 - math.log(math.erfc(u) + mest)
 				score += wt_len * score_d
 				csang1 = self.angle(coords[cb1], coords[sg1], coords[sg2])
 				csang2 = self.angle(coords[cb2], coords[sg2], coords[sg1])
@@ -2844,6 +5115,23 @@ class Score():
 				e2 = (math.exp(dss_logA2) * math.exp(dss_kappa2
 					* math.cos(PI/180 * (ss_dih - dss_mu2))))
 				score += wt_dihSS * (-math.log(e1 + e2 + mest))
+				grad = cache.get('_forces') is not None
+				if grad:
+					d_len = wt_len * (z - math.sqrt(2.0 / PI) * d_shape
+						* math.exp(-u * u) / (math.erfc(u) + mest)) / d_scale
+					cache['tallyforces'](cache, None, np.array([sg1]),
+						np.array([sg2]), [d_len])
+					cache['angleforces'](cache, None,
+						[[cb1, sg1, sg2], [cb2, sg2, sg1]],
+						[wt_ang * a_kappa * PI / 180
+							* math.sin(PI / 180 * (v - a_mu))
+							for v in (csang1, csang2)])
+					de = (e1 * dss_kappa1 * math.sin(PI/180
+						* (ss_dih - dss_mu1)) + e2 * dss_kappa2
+						* math.sin(PI/180 * (ss_dih - dss_mu2)))
+					cache['torsionforces'](cache, None,
+						[[cb1, sg1, sg2, cb2]],
+						[wt_dihSS * PI / 180 * de / (e1 + e2 + mest)])
 				for ca_, cb_, sg_, sgo_ in (
 						(ca1, cb1, sg1, sg2),
 						(ca2, cb2, sg2, sg1)):
@@ -2860,6 +5148,14 @@ class Score():
 							PI/180 * (ang - dcs_mu3))))
 					score += wt_dihCS * (-math.log(
 						e1 + e2 + e3 + mest))
+					if grad:
+						de = sum(e_ * k_ * math.sin(PI/180 * (ang - m_))
+							for e_, k_, m_ in ((e1, dcs_kappa1, dcs_mu1),
+								(e2, dcs_kappa2, dcs_mu2),
+								(e3, dcs_kappa3, dcs_mu3)))
+						cache['torsionforces'](cache, None,
+							[[ca_, cb_, sg_, sgo_]], [wt_dihCS * PI / 180
+								* de / (e1 + e2 + e3 + mest)])
 				raw += score
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
@@ -2910,7 +5206,8 @@ class Score():
 			pose:   Pose or Molecule - receptor structure being scored
 			cache:  dict - cache returned by ScoreMatch()
 			ligand: Molecule or None - optional small-molecule ligand
-			**kw:   absorbed; per-term methods take no extra kwargs
+			**kw:   per_res (dict, filled with per-residue energies) and
+				residues (set, limits the residues scored); rest absorbed
 		Returns:
 		--------
 			dict: per-term contribution with inter and intra raw and
@@ -2920,7 +5217,11 @@ class Score():
 		aas = pose.data.get('Amino Acids') or {}
 		atoms = pose.data['Atoms']
 		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		per_res = kw.get('per_res')
+		residues = kw.get('residues')
 		raw = 0.0
+		if residues is not None:
+			aas = {ri: aas[ri] for ri in sorted(residues) if ri in aas}
 		for ri, info in aas.items():
 			tri = info[5] if len(info) >= 6 else None
 			if tri != 'TYR': continue
@@ -2935,7 +5236,18 @@ class Score():
 			x = float(np.dot(n1, n2))
 			y = float(np.dot(m1, n2))
 			chi3 = np.arctan2(y, x)
-			raw += 0.5 * (np.cos(np.pi - 2 * chi3) + 1.0)
+			e = 0.5 * (np.cos(np.pi - 2 * chi3) + 1.0)
+			raw += e
+			if cache.get('_forces') is not None:
+				# e is even in chi3, so its slope in the standard dihedral
+				# of the quartet is sin(2 chi) whichever way chi3 turns
+				q = np.array([[name_to_idx[nm] for nm in needed]])
+				phi = math.radians(float(
+					cache['torsionangles'](coords, q)[0]))
+				cache['torsionforces'](cache, None, q,
+					[math.sin(2 * phi) * math.pi / 180.0])
+			if per_res is not None:
+				per_res[int(ri)] = float(e)
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
 			'raw': raw}
@@ -2947,7 +5259,8 @@ class Score():
 			pose:   Pose or Molecule - receptor structure being scored
 			cache:  dict - cache returned by ScoreMatch()
 			ligand: Molecule or None - optional small-molecule ligand
-			**kw:   absorbed; per-term methods take no extra kwargs
+			**kw:   per_res (dict, filled with per-residue energies) and
+				residues (set, limits the residues scored); rest absorbed
 		Returns:
 		--------
 			dict: per-term contribution with inter and intra raw and
@@ -2961,12 +5274,18 @@ class Score():
 		ref_by_tri = {tri: float(refs[i])
 			for i, tri in enumerate(order) if i < len(refs)}
 		aas = pose.data.get('Amino Acids') or {}
+		per_res = kw.get('per_res')
+		residues = kw.get('residues')
 		raw = 0.0
+		if residues is not None:
+			aas = {ri: aas[ri] for ri in sorted(residues) if ri in aas}
 		for ri, info in aas.items():
 			tri = info[5] if len(info) >= 6 else None
 			if tri == 'HIS_D': tri = 'HIS'
 			if tri in self.NCAA_PARENT: tri = self.NCAA_PARENT[tri]
 			raw += ref_by_tri.get(tri, 0.0)
+			if per_res is not None:
+				per_res[int(ri)] = ref_by_tri.get(tri, 0.0)
 		return {'inter_raw': 0.0, 'intra_raw': raw,
 			'inter_weighted': 0.0, 'intra_weighted': raw * weight,
 			'raw': raw}
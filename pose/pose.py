@@ -9,9 +9,12 @@ import math
 import copy
 import datetime
 import functools
+import itertools
 import numpy as np
 from collections import defaultdict
 
+_TOPOLOGY = itertools.count(1)
+
 @functools.lru_cache(maxsize=1)
 def DBLoad():
 	'''
@@ -40,7 +43,8 @@ class Pose():
 			self.aminoacids and self.nucleotides loaded from database.json,
 			element masses cached in self.masses,
 			protein and nucleic-acid backbone atom-name sets cached,
-			self.data initialised as an empty pose
+			self.data initialised as an empty pose,
+			self._topology set to a fresh topology version
 		'''
 		db = DBLoad()
 		self.aminoacids  = db['Amino Acids']
@@ -83,6 +87,19 @@ class Pose():
 		'FASTA':{}, 'SS':{}, 'Nucleotides':None, 'Amino Acids':None,
 		'Atoms':{}, 'Bonds':{}, 'BondOrders':{},
 		'Coordinates':np.zeros((0, 3))}
+		self._bumptopology()
+	def _bumptopology(self):
+		'''
+		Mark the bond graph, atom records or residue assignments changed
+		Arguments:
+		----------
+			No arguments taken
+		Returns:
+		--------
+			self._topology set to a new process-wide unique version, so
+			ForceField and Score rebuild their caches on the next call
+		'''
+		self._topology = next(_TOPOLOGY)
 	def _rotmat(self, theta, u):
 		'''
 		Build a 3×3 rotation matrix about axis u by theta (Rodrigues)
@@ -1174,8 +1191,9 @@ class Pose():
 		--------
 			self.data['Mass'], ['Size'], ['FASTA'], ['Rg'] all
 			recomputed, self.data['SS'] recomputed for proteins but cleared
-			for nucleic acids
+			for nucleic acids, and the topology version bumped
 		'''
+		self._bumptopology()
 		self.CalcMass()
 		self.CalcSize()
 		self.CalcFASTA()
@@ -1321,6 +1339,7 @@ class Pose():
 					delta[acceptor] -= dq
 			for i in ids: charges[i] += delta[i]
 		for i in ids: self.data['Atoms'][i][2] = round(charges[i], 4)
+		self._bumptopology()
 	def CalcDSSP(self):
 		'''
 		Assign DSSP secondary structure labels to every amino acid
@@ -3183,7 +3202,8 @@ class Molecule():
 			self.masses and self.elements populated; self.data
 			initialised as an empty Molecule (no atoms, bonds, or coordinates),
 			self.data['BondOrders'] initialised empty (populated by Import),
-			self._formal_charges initialised empty
+			self._formal_charges initialised empty,
+			self._topology set to a fresh topology version
 		'''
 		self.masses = {
 			'H' :1.008  , 'He':4.003  , 'Li':6.941  , 'Be':9.012  ,
@@ -3217,6 +3237,19 @@ class Molecule():
 			'Atoms':{}, 'Bonds':{}, 'BondOrders':{},
 			'Coordinates':np.zeros((0, 3))}
 		self._formal_charges = {}
+		self._bumptopology()
+	def _bumptopology(self):
+		'''
+		Mark the bond graph or atom records changed
+		Arguments:
+		----------
+			No arguments taken
+		Returns:
+		--------
+			self._topology set to a new process-wide unique version, so
+			ForceField and Score rebuild their caches on the next call
+		'''
+		self._topology = next(_TOPOLOGY)
 	def _invalidate(self):
 		'''
 		Mark cached scalar properties stale after a coordinate change
@@ -3793,6 +3826,7 @@ class Molecule():
 		for i, v in self.data['Atoms'].items():
 			bos = self.data['BondOrders'].get(i, [])
 			v.append(self._inferhybridisation(v[1], bos))
+		self._bumptopology()
 		self._formal_charges = {}
 		metals = {'Li', 'Na', 'K', 'Mg', 'Ca', 'Cu', 'Fe', 'Zn', 'Mn', 'Co',
 			'Ni', 'Al', 'Ag', 'Cd', 'Hg', 'Pb', 'Sn', 'Cr'}
@@ -4203,6 +4237,7 @@ class Molecule():
 					delta[donor] += dq; delta[acc] -= dq
 			for i in ids: charges[i] += delta[i]
 		for i in ids: A[i][2] = round(charges[i], 4)
+		self._bumptopology()
 	def CalcMass(self):
 		'''
 		Sum atomic masses to compute the total molecular mass
@@ -5,22 +5,506 @@ import re
 import io
 import os
 import sys
+import copy
 import json
+import hashlib
 import math
 import time
 import shutil
+import tempfile
 import base64
 import pickle
 import zipfile
+import atexit
 import itertools
+import multiprocessing
 import numpy as np
 import urllib.request
 import xml.etree.ElementTree as ET
 from .pose import DBLoad
-from .energy import ForceField
+from .energy import ForceField, Score, _ragged, _cellpairs, _cellgrid, \
+	_cellmove, _cellfocus
 from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+
+SMIRKS_CACHE_MAX = 20000
+SMIRKS_CACHE_FLUSH = 30.0
+_SMIRKS_CACHE = {'sig': None, 'rows': None, 'dirty': False,
+	'touched': False, 'saved': 0.0}
+_SMIRKS_PATTERNS = {}
+_SMIRKS_FFSIG = {}
+_SMIRKS_TERMS = (('bonds', 2), ('angles', 3), ('ub', 3), ('propers', 4),
+	('impropers', 4), ('constraints', 2), ('vdw', 1), ('vdw14', 1),
+	('polarisation', 1), ('charges', 1))
+FADUN_MEMMAP = False
+_FADUN_STORE = {'sig': None, 'rot': {}, 'nrchi': {}}
+_PERIODIC_M = {}
+
+def _smirksanchor(expr, inv):
+	'''
+	Three-valued test of a parsed SMIRKS atom expression against atom
+	invariants alone, used to prune anchor candidates
+	Arguments:
+	----------
+		expr: tuple - parsed atom AST
+		inv:  tuple - (atomic number, degree, aromatic) of an atom
+	Returns:
+	--------
+		bool or None: True/False when the invariants decide the expression,
+		None when it depends on anything else (rings, H count, charge)
+	'''
+	k = expr[0]
+	if k == 'wild': return True
+	if k == 'Z':    return inv[0] == expr[1]
+	if k == 'X':    return inv[1] == expr[1]
+	if k == 'arom': return inv[2] == expr[1]
+	if k == 'not':
+		a = _smirksanchor(expr[1], inv)
+		return None if a is None else not a
+	if k in ('and', 'or'):
+		a = _smirksanchor(expr[1], inv)
+		b = _smirksanchor(expr[2], inv)
+		if k == 'and':
+			if a is False or b is False: return False
+			return True if a and b else None
+		if a or b: return True
+		return False if a is False and b is False else None
+	return None
+
+def _smirkscachepath():
+	'''
+	Location of the on-disk SMIRKSMatch assignment cache
+	Arguments:
+	----------
+		No arguments taken
+	Returns:
+	--------
+		tuple: (cache path, database.json path) side by side in the package
+	'''
+	here = os.path.dirname(os.path.abspath(__file__))
+	return (os.path.join(here, 'smirks_cache.npz'),
+		os.path.join(here, 'database.json'))
+
+def _smirkscacheread(path, sig):
+	'''
+	Read the records of an on-disk assignment cache
+	Arguments:
+	----------
+		path: str - smirks_cache.npz
+		sig:  str - database.json signature the records must carry
+	Returns:
+	--------
+		dict: {key: [last-used time, JSON record]}; empty when the file
+		is missing, unreadable or written for another database version
+	'''
+	if not sig or not os.path.exists(path): return {}
+	try:
+		with np.load(path, allow_pickle=False) as f:
+			data = json.loads(f['blob'].tobytes().decode())
+	except Exception:
+		return {}
+	return data['rows'] if data.get('sig') == sig else {}
+
+def _smirkscacheload():
+	'''
+	Load the assignment cache into memory once per database version. The
+	file is discarded when database.json has changed since it was written
+	Arguments:
+	----------
+		No arguments taken
+	Returns:
+	--------
+		dict: {key: [last-used time, JSON record]} held in _SMIRKS_CACHE
+	'''
+	path, db = _smirkscachepath()
+	try:
+		st = os.stat(db)
+		sig = '%d:%d' % (st.st_mtime_ns, st.st_size)
+	except OSError:
+		sig = ''
+	if _SMIRKS_CACHE['rows'] is not None and _SMIRKS_CACHE['sig'] == sig:
+		return _SMIRKS_CACHE['rows']
+	_SMIRKS_CACHE.update(sig=sig, rows=_smirkscacheread(path, sig),
+		dirty=False, touched=False, saved=time.time())
+	return _SMIRKS_CACHE['rows']
+
+def _smirkscachesave(final=False):
+	'''
+	Write the cache next to database.json. New records are flushed at
+	most every SMIRKS_CACHE_FLUSH seconds and the rest, with the last-use
+	times refreshed by cache hits, at interpreter exit. The file on disk
+	is merged in first, so processes sharing it keep each other's
+	records; the least recently used records above SMIRKS_CACHE_MAX are
+	then evicted and the file replaced through a unique temporary name
+	Arguments:
+	----------
+		final: bool - flush now, including hit-only changes (the atexit
+			call)
+	Returns:
+	--------
+		No return value; smirks_cache.npz is rewritten when anything changed
+	'''
+	c = _SMIRKS_CACHE
+	rows = c['rows']
+	if rows is None or not c['sig']: return
+	if not (c['dirty'] or (final and c['touched'])): return
+	if not final and time.time() - c['saved'] < SMIRKS_CACHE_FLUSH: return
+	path, db = _smirkscachepath()
+	for k, (t, d) in _smirkscacheread(path, c['sig']).items():
+		if k not in rows or rows[k][0] < t: rows[k] = [t, d]
+	if len(rows) > SMIRKS_CACHE_MAX:
+		old = sorted(rows, key=lambda k: rows[k][0])
+		for k in old[:len(rows) - SMIRKS_CACHE_MAX]: del rows[k]
+	blob = json.dumps({'sig': c['sig'], 'rows': rows},
+		separators=(',', ':')).encode()
+	tmp = None
+	try:
+		fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path),
+			prefix='.smirks_cache.', suffix='.tmp')
+		with os.fdopen(fd, 'wb') as f:
+			np.savez_compressed(f, blob=np.frombuffer(blob, dtype=np.uint8))
+		os.replace(tmp, path)
+	except OSError:
+		if tmp is not None and os.path.exists(tmp): os.remove(tmp)
+		return
+	c.update(dirty=False, touched=False, saved=time.time())
+
+atexit.register(_smirkscachesave, True)
+
+def _smirkscacheclear():
+	'''
+	Drop the SMIRKSMatch assignment cache from memory and disk, called
+	whenever database.json is rewritten
+	Arguments:
+	----------
+		No arguments taken
+	Returns:
+	--------
+		No return value
+	'''
+	_SMIRKS_CACHE.update(sig=None, rows=None, dirty=False, touched=False)
+	_SMIRKS_FFSIG.clear()
+	path, db = _smirkscachepath()
+	if os.path.exists(path): os.remove(path)
+
+def _smirksreach(smirks):
+	'''
+	Upper bound on how many bonds a SMIRKS pattern can reach from any of
+	its atoms: the number of atoms it names, recursive $(...) atoms
+	included, less one
+	Arguments:
+	----------
+		smirks: str - a SMIRKS pattern
+	Returns:
+	--------
+		int or None: bond reach; None for a disconnected ('.') pattern,
+		which can match anywhere in the molecule
+	'''
+	n, mode, k = 0, ['chain'], 0
+	while k < len(smirks):
+		c = smirks[k]
+		if mode[-1] == 'chain':
+			if c == '.': return None
+			if c == '[': n += 1; mode.append('atom')
+			elif c == '(': mode.append('chain')
+			elif c == ')' and len(mode) > 1: mode.pop()
+			elif smirks[k:k + 2] in ('Cl', 'Br'): n += 1; k += 1
+			elif c in 'BCNOPSFIbcnops*': n += 1
+		elif c == '[': n += 1; mode.append('atom')
+		elif c == ']': mode.pop()
+		elif smirks[k:k + 2] == '$(': mode.append('chain'); k += 1
+		k += 1
+	return max(n - 1, 0)
+
+def _smirksffsig(params, name):
+	'''
+	Content signature and pattern reach of a force field for the
+	SMIRKSMatch cache, memoised per params dict
+	Arguments:
+	----------
+		params: dict - force-field section dict passed to SMIRKSMatch
+		name:   str  - force-field name
+	Returns:
+	--------
+		tuple: (signature str, bond reach int or None); the reach is 3 for
+		atom-class keys, whose terms span at most four bonded atoms
+	'''
+	hit = _SMIRKS_FFSIG.get(id(params))
+	if hit is not None and hit[0] is params and hit[1] == name:
+		return hit[2], hit[3]
+	blob = json.dumps(params, sort_keys=True, default=str).encode()
+	sig = name + ':' + hashlib.sha1(blob).hexdigest()[:20]
+	reach = 3
+	for sec in ('Constraints', 'Bonds', 'Angles', 'UB', 'ProperTorsions',
+		'ImproperTorsions', 'vdW', 'LibraryCharges'):
+		for key in params.get(sec, {}) or {}:
+			if key.startswith('<'): continue
+			d = _smirksreach(key)
+			if d is None:
+				reach = None
+				break
+			reach = max(reach, d)
+		if reach is None: break
+	_SMIRKS_FFSIG[id(params)] = (params, name, sig, reach)
+	return sig, reach
+
+def _smirksrings(nbr, bo):
+	'''
+	Group atoms whose SMIRKS ring perception and Kekule assignment are
+	decided together: the connected components over ring (non-bridge)
+	bonds and aromatic 1.5-order bonds
+	Arguments:
+	----------
+		nbr: dict - {atom: [bonded atoms]}
+		bo:  dict - {(i, j): bond order}
+	Returns:
+	--------
+		dict: {atom: component id} for atoms on at least one such bond
+	'''
+	low, seen, tick, keep = {}, {}, 0, set()
+	for root in nbr:
+		if root in seen: continue
+		seen[root] = low[root] = tick; tick += 1
+		stack = [(root, None, iter(nbr[root]))]
+		while stack:
+			u, up, it = stack[-1]
+			v = next(it, None)
+			if v is None:
+				stack.pop()
+				if up is not None:
+					low[up] = min(low[up], low[u])
+					if low[u] <= seen[up]: keep.add((min(u, up), max(u, up)))
+			elif v == up: continue
+			elif v in seen:
+				low[u] = min(low[u], seen[v])
+				if seen[v] < seen[u]: keep.add((min(u, v), max(u, v)))
+			else:
+				seen[v] = low[v] = tick; tick += 1
+				stack.append((v, u, iter(nbr[v])))
+	for (i, j), v in bo.items():
+		if abs(v - 1.5) < 1e-6 and i in nbr and j in nbr:
+			keep.add((min(i, j), max(i, j)))
+	adj = defaultdict(list)
+	for i, j in keep:
+		adj[i].append(j); adj[j].append(i)
+	comp = {}
+	for a in adj:
+		if a in comp: continue
+		comp[a], todo = a, [a]
+		while todo:
+			u = todo.pop()
+			for v in adj[u]:
+				if v not in comp: comp[v] = a; todo.append(v)
+	return comp
+
+def _smirkswindows(pose, params, name):
+	'''
+	Split a pose into residue windows for the SMIRKSMatch cache. A
+	residue's terms can only depend on atoms within the force field's
+	pattern reach of its own atoms, plus the ring systems and aromatic
+	bonds those atoms share, so the key digests exactly that: the
+	force-field content, the residue and its template context, every atom
+	and bond within reach, and each ring/aromatic group it touches. Atoms
+	of the residue and its bonded neighbours are labelled 'slot:name' with
+	slot 0 for the residue itself
+	Arguments:
+	----------
+		pose:   Pose - protein, DNA, or RNA pose
+		params: dict - force-field section dict passed to SMIRKSMatch
+		name:   str  - force-field name
+	Returns:
+	--------
+		dict or None: {'order': residue keys, 'resof': {atom: residue},
+		'key': {residue: cache key or None}, 'label': {residue: {atom:
+		label}}, 'atom': {residue: {label: atom}}, 'tri': {residue: str}};
+		None when some atom belongs to no residue or a pattern can match
+		across disconnected atoms
+	'''
+	atoms = pose.data['Atoms']
+	bonds = pose.data['Bonds']
+	orders = pose.data.get('BondOrders', {}) or {}
+	fc = getattr(pose, '_formal_charges', {}) or {}
+	ffsig, reach = _smirksffsig(params, name)
+	if reach is None: return None
+	res, resof, ends = {}, {}, {}
+	for kind, tcol, head, tail in (
+		('Amino Acids', 5, ('N',), ('C',)),
+		('Nucleotides', 4, ('P', "O5'"), ("O3'",))):
+		chains = defaultdict(list)
+		for ri, rec in (pose.data.get(kind) or {}).items():
+			ats = [a for a in list(rec[2]) + list(rec[3]) if a in atoms]
+			res[(kind[0], ri)] = (str(rec[tcol]).upper(), ats, head, tail)
+			for a in ats: resof[a] = (kind[0], ri)
+			chains[rec[1]].append(ri)
+		for ris in chains.values():
+			ris.sort()
+			for ri in ris:
+				ends[(kind[0], ri)] = ('5' if ri == ris[0] else '') + \
+					('3' if ri == ris[-1] else '')
+	if not res or len(resof) != len(atoms): return None
+	order = sorted(res)
+	rank = {r: k for k, r in enumerate(order)}
+	nbr = {a: [b for b in bonds.get(a, []) if b in atoms and b != a]
+		for a in atoms}
+	bo = {}
+	for i in atoms:
+		bos = orders.get(i, [])
+		for k, j in enumerate(bonds.get(i, [])):
+			bo[(i, j)] = float(bos[k] if k < len(bos) else 1.0)
+	node = {a: (atoms[a][1], len(nbr[a]), int(fc.get(a, 0)),
+		tuple(sorted((bo[(a, b)], atoms[b][1]) for b in nbr[a])))
+		for a in atoms}
+	links, tag, rkey = {}, {}, {}
+	for r in order:
+		links[r] = defaultdict(list)
+		for a in res[r][1]:
+			for b in nbr[a]:
+				q = resof[b]
+				if q != r: links[r][q].append((atoms[a][0], atoms[b][0]))
+		tri, ats, head, tail = res[r]
+		linked = {x for q in links[r] for x, y in links[r][q]}
+		patch = ('N' if not linked & set(head) else '') + \
+			('C' if not linked & set(tail) else '')
+		tag[r] = tri + patch + (ends[r] if r[0] == 'N' else '')
+		rkey[r] = tag[r] + repr(sorted(sorted(v) for v in
+			links[r].values()))
+	comp = _smirksrings(nbr, bo)
+	members = defaultdict(list)
+	for a, c in comp.items(): members[c].append(a)
+	cdig = {}
+	for c, ats in members.items():
+		base = min(rank[resof[a]] for a in ats)
+		lab = {a: '%d:%s:%s' % (rank[resof[a]] - base, rkey[resof[a]],
+			atoms[a][0]) for a in ats}
+		graph = sorted((lab[a], node[a], tuple(sorted(lab[b] for b in nbr[a]
+			if b in lab))) for a in ats)
+		cdig[c] = (base, hashlib.sha1(repr(graph).encode()).hexdigest()[:20])
+	win = {'order': order, 'resof': resof, 'key': {}, 'label': {},
+		'atom': {}, 'tri': {}}
+	for r in order:
+		tri, ats, head, tail = res[r]
+		win['tri'][r] = tri
+		sig = {q: (tuple(sorted(links[r][q])), rkey[q]) for q in links[r]}
+		nbrs = sorted(links[r], key=lambda q: sig[q])
+		label = {}
+		for slot, q in enumerate([r] + nbrs):
+			for a in res[q][1]: label[a] = '%d:%s' % (slot, atoms[a][0])
+		inv = {v: a for a, v in label.items()}
+		win['label'][r] = label
+		win['atom'][r] = inv
+		win['key'][r] = None
+		if len(inv) != len(label): continue
+		if len({sig[q] for q in nbrs}) != len(nbrs): continue
+		ball = {a: 0 for a in ats}
+		todo = list(ats)
+		for d in range(1, reach + 1):
+			nxt = []
+			for a in todo:
+				for b in nbr[a]:
+					if b not in ball: ball[b] = d; nxt.append(b)
+			todo = nxt
+		lab = {a: label.get(a) or '%+d:%s:%s' % (rank[resof[a]] - rank[r],
+			rkey[resof[a]], atoms[a][0]) for a in ball}
+		graph = sorted((lab[a], node[a], tuple(sorted((lab[b], bo[(a, b)])
+			for b in nbr[a] if b in lab))) for a in ball)
+		rings = sorted({(cdig[comp[a]][0] - rank[r], cdig[comp[a]][1])
+			for a in ball if a in comp})
+		rks = [rkey[q] for q in [r] + nbrs]
+		digest = hashlib.sha1(repr((rks, graph, rings)).encode())
+		ctx = ','.join('%s%s' % (tag[q], '>' if rank[q] > rank[r]
+			else '<') for q in nbrs)
+		win['key'][r] = '|'.join((ffsig, tag[r], ctx,
+			digest.hexdigest()[:20]))
+	return win
+
+def _smirkscacheget(win, rows):
+	'''
+	Rebuild a full SMIRKSMatch assignment dict from cached residue records
+	Arguments:
+	----------
+		win:  dict - residue windows from _smirkswindows
+		rows: dict - loaded cache records
+	Returns:
+	--------
+		dict or None: SMIRKSMatch assignment dict, None on any miss
+	'''
+	recs = []
+	for r in win['order']:
+		key = win['key'][r]
+		if key is None or key not in rows: return None
+		recs.append((r, json.loads(rows[key][1])))
+	now = time.time()
+	for r in win['order']: rows[win['key'][r]][0] = now
+	_SMIRKS_CACHE['touched'] = True
+	out = {'bonds': {}, 'angles': {}, 'ub': {}, 'propers': {},
+		'impropers': [], 'vdw': {}, 'vdw14': {}, 'polarisation': {},
+		'charges': {}, 'constraints': set(), 'restri': {}}
+	for r, rec in recs:
+		inv = win['atom'][r]
+		try:
+			for term, n in _SMIRKS_TERMS:
+				for ent in rec.get(term, []):
+					ix = tuple(inv[lb] for lb in ent[:n])
+					val = ent[n:]
+					if term in ('bonds', 'constraints'):
+						ix = (min(ix), max(ix))
+					elif term in ('angles', 'ub'):
+						ix = (min(ix[0], ix[2]), ix[1], max(ix[0], ix[2]))
+					elif term == 'propers':
+						ix = min(ix, ix[::-1])
+					if term == 'impropers': out[term].append(ix + tuple(val))
+					elif term == 'constraints': out[term].add(ix)
+					else: out[term][ix if n > 1 else ix[0]] = val[0]
+		except KeyError:
+			return None
+		if 'restri' in rec: out['restri'][r[1]] = rec['restri']
+	return out
 
-def SMIRKSMatch(pose, params):
+def _smirkscacheput(win, rows, out):
+	'''
+	Split a SMIRKSMatch assignment dict into per-residue records. Each term
+	is owned by the first residue (in pose order) it touches and is stored
+	in that residue's window labels; residues owning a term that reaches
+	outside their window are not cached
+	Arguments:
+	----------
+		win:  dict - residue windows from _smirkswindows
+		rows: dict - loaded cache records, updated in place
+		out:  dict - SMIRKSMatch assignment dict
+	Returns:
+	--------
+		No return value; new records are added to rows
+	'''
+	resof = win['resof']
+	rank = {r: k for k, r in enumerate(win['order'])}
+	recs = {r: {} for r in win['order']}
+	bad = set()
+	for term, n in _SMIRKS_TERMS:
+		items = out[term]
+		if isinstance(items, dict): items = items.items()
+		elif term == 'impropers': items = ((e[:4], e[4:]) for e in items)
+		else: items = ((e, None) for e in items)
+		for ix, val in items:
+			ix = ix if isinstance(ix, tuple) else (ix,)
+			r = min((resof[a] for a in ix), key=rank.get)
+			label = win['label'][r]
+			if any(a not in label for a in ix):
+				bad.add(r)
+				continue
+			ent = [label[a] for a in ix]
+			if term == 'impropers': ent += list(val)
+			elif term != 'constraints': ent.append(val)
+			recs[r].setdefault(term, []).append(ent)
+	now = time.time()
+	for r in win['order']:
+		key = win['key'][r]
+		if key is None or r in bad or key in rows: continue
+		if r[0] == 'A' and r[1] in out['restri']:
+			recs[r]['restri'] = out['restri'][r[1]]
+		rows[key] = [now, json.dumps(recs[r], separators=(',', ':'))]
+		_SMIRKS_CACHE['dirty'] = True
+
+def SMIRKSMatch(pose, params, name=None):
 	'''
 	Assign force-field parameters to a pose by SMIRKS pattern matching,
 	or by atom class for the <at=...>-keyed force fields
@@ -30,6 +514,9 @@ def SMIRKSMatch(pose, params):
 		params: dict - force-field section dict containing Constraints/
 			Bonds/Angles/UB/ProperTorsions/ImproperTorsions/vdW/
 			LibraryCharges keys (typically ForceField.mol)
+		name:   str or None - force-field name; when given, per-residue
+			assignments are looked up in and saved to smirks_cache.npz
+			next to database.json so repeated residues skip matching
 	Returns:
 	--------
 		dict: 'bonds' {(i,j): [r_0, K_b]}; 'angles' and 'ub'
@@ -39,6 +526,13 @@ def SMIRKSMatch(pose, params):
 		{i: charge or None}; 'constraints' set of (i,j); 'restri'
 		{residue index: resolved tricode}
 	'''
+	win = None
+	if name is not None:
+		win = _smirkswindows(pose, params, name)
+	if win is not None:
+		rows = _smirkscacheload()
+		out = _smirkscacheget(win, rows)
+		if out is not None: return out
 	Z_TABLE = {
 		'H':1,'He':2,'Li':3,'Be':4,'B':5,'C':6,'N':7,'O':8,'F':9,'Ne':10,
 		'Na':11,'Mg':12,'Al':13,'Si':14,'P':15,'S':16,'Cl':17,'Ar':18,
@@ -589,22 +1083,57 @@ def SMIRKSMatch(pose, params):
 		return {'atoms': st['atoms'], 'bonds': st['bonds'], 'tags': st['tags']}
 	def getpat(smirks, ctx):
 		'''
-		Memoised parser: cache parsed SMIRKS across repeated lookups
+		Look a SMIRKS up in the module-level compiled-pattern registry,
+		parsing and compiling it on first use so every pattern is parsed
+		once per process however many poses or force fields use it
 		Arguments:
 		----------
 			smirks: str  - SMIRKS pattern
-			ctx:    dict - molecule tables carrying the 'parsed' cache
+			ctx:    dict - molecule tables
 		Returns:
 		--------
-			dict: parsed pattern (atoms, bonds, tags)
+			dict: compiled pattern (atoms, bonds, tags, adjacency, anchor
+			invariant memo)
 		'''
-		if smirks not in ctx['parsed']:
+		pat = _SMIRKS_PATTERNS.get(smirks)
+		if pat is None:
 			try:
-				ctx['parsed'][smirks] = parse(smirks)
+				pat = parse(smirks)
 			except ValueError as e:
 				warnings.warn(f'Unparseable SMIRKS {smirks!r}: {e}')
 				raise
-		return ctx['parsed'][smirks]
+			n = len(pat['atoms'])
+			adj = {p: [] for p in range(n)}
+			for a, b, be in pat['bonds']:
+				adj[a].append((b, be))
+				adj[b].append((a, be))
+			pat.update(n=n, adj=adj, tagorder=sorted(pat['tags'].keys()),
+				anchor={})
+			_SMIRKS_PATTERNS[smirks] = pat
+		return pat
+	def anchors(pat, ctx):
+		'''
+		Candidate atoms for pattern atom 0: only atoms whose element,
+		degree and aromaticity can satisfy its expression are kept, with
+		the verdict per invariant memoised on the compiled pattern
+		Arguments:
+		----------
+			pat: dict - compiled pattern from getpat
+			ctx: dict - molecule tables carrying the 'byinv' index
+		Returns:
+		--------
+			list: ascending atom indices worth anchoring the pattern on
+		'''
+		memo = pat['anchor']
+		expr = pat['atoms'][0]['expr']
+		out = []
+		for inv, ats in ctx['byinv'].items():
+			ok = memo.get(inv)
+			if ok is None:
+				ok = memo[inv] = _smirksanchor(expr, inv) is not False
+			if ok: out.extend(ats)
+		out.sort()
+		return out
 	def evalatom(expr, i, ctx):
 		'''
 		Evaluate a parsed atom expression against atom index i
@@ -642,7 +1171,7 @@ def SMIRKSMatch(pose, params):
 			key = (expr[1], i)
 			if key in ctx['rcache']: return ctx['rcache'][key]
 			ctx['rcache'][key] = False
-			ok = bool(match(parse(expr[1]), ctx, anchor=i))
+			ok = bool(match(getpat(expr[1], ctx), ctx, anchor=i))
 			ctx['rcache'][key] = ok
 			return ok
 		raise ValueError(f'Unknown atom-expr node {k!r}')
@@ -698,6 +1227,7 @@ def SMIRKSMatch(pose, params):
 		if p == 0 and mst['anchor'] is not None: cands = [mst['anchor']]
 		elif fixed: cands = [m for m in ctx['nbr'][mapping[fixed[0][0]]]
 			if m not in used]
+		elif p == 0: cands = anchors(mst['pat'], ctx)
 		else: cands = [a for a in ctx['ids'] if a not in used]
 		for cand in cands:
 			if cand in used: continue
@@ -717,10 +1247,10 @@ def SMIRKSMatch(pose, params):
 		return False
 	def match(pat, ctx, anchor=None):
 		'''
-		Match a parsed pattern against the molecule
+		Match a compiled pattern against the molecule
 		Arguments:
 		----------
-			pat:    dict - parsed pattern (atoms, bonds, tags)
+			pat:    dict - compiled pattern from getpat
 			ctx:    dict - molecule tables
 			anchor: int or None - when given, pin pattern atom 0 to it
 		Returns:
@@ -728,14 +1258,10 @@ def SMIRKSMatch(pose, params):
 			bool when anchor is given, else a list of tuples of atom indices
 			in ascending tag order (only tagged atoms are returned)
 		'''
-		n = len(pat['atoms'])
-		adj = {p: [] for p in range(n)}
-		for a, b, be in pat['bonds']:
-			adj[a].append((b, be))
-			adj[b].append((a, be))
-		mst = {'pat': pat, 'adj': adj, 'n': n, 'map': [-1] * n,
+		n = pat['n']
+		mst = {'pat': pat, 'adj': pat['adj'], 'n': n, 'map': [-1] * n,
 			'used': set(), 'res': [], 'seen': set(),
-			'tags': sorted(pat['tags'].keys()), 'anchor': anchor}
+			'tags': pat['tagorder'], 'anchor': anchor}
 		hit = walk(0, mst, ctx)
 		return hit if anchor is not None else mst['res']
 	def v2v3(nm):
@@ -936,7 +1462,7 @@ def SMIRKSMatch(pose, params):
 			bo[(min(i, j), max(i, j))] = float(
 				bos[k] if k < len(bos) else 1.0)
 	ctx = {'atoms': atoms, 'nbr': nbr, 'ids': ids, 'edges': edges,
-		'edgeset': set(edges), 'bo': bo, 'parsed': {}, 'rcache': {},
+		'edgeset': set(edges), 'bo': bo, 'rcache': {},
 		'Z': {i: Z_TABLE.get(atoms[i][1].capitalize(), 0) for i in ids},
 		'X': {i: len(nbr[i]) for i in ids},
 		'Hc': {i: sum(1 for j in nbr[i] if atoms[j][1] == 'H')
@@ -951,6 +1477,10 @@ def SMIRKSMatch(pose, params):
 	ctx['aromb'] = {e: (abs(bo.get(e, 1.0) - 1.5) < 1e-6) for e in edges}
 	ctx['aroma'] = {i: any(ctx['aromb'].get((min(i, j), max(i, j)), False)
 		for j in nbr[i]) for i in ids}
+	ctx['byinv'] = {}
+	for i in ids:
+		ctx['byinv'].setdefault((ctx['Z'][i], ctx['X'][i], ctx['aroma'][i]),
+			[]).append(i)
 	ctx['ringsz'] = {i: set() for i in ids}
 	for r in rings:
 		for a in r: ctx['ringsz'][a].add(len(r))
@@ -1155,9 +1685,353 @@ def SMIRKSMatch(pose, params):
 				if tp['reskey'].get(i) == tg[1][0] and \
 					tp['tname'].get(i) == tg[1][1]:
 					out['charges'][i] = float(qs[0])
+	if win is not None:
+		_smirkscacheput(win, rows, out)
+		_smirkscachesave()
 	return out
 
-def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
+def _fadunstore():
+	'''
+	Process-wide store of the FaDun spline tables, emptied whenever
+	database.json changes so tables are built once per database version
+	Arguments:
+	----------
+		No arguments taken
+	Returns:
+	--------
+		dict: {'sig': database signature, 'rot': rotameric tables by
+		amino acid, 'nrchi': semi-rotameric tables by amino acid}
+	'''
+	db = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+		'database.json')
+	try:
+		st = os.stat(db)
+		sig = '%d:%d' % (st.st_mtime_ns, st.st_size)
+	except OSError:
+		sig = ''
+	if _FADUN_STORE['sig'] != sig:
+		_FADUN_STORE.update(sig=sig, rot={}, nrchi={})
+	return _FADUN_STORE
+
+def _fadunclear():
+	'''
+	Drop the FaDun tables from memory and their on-disk form, called
+	whenever database.json is rewritten
+	Arguments:
+	----------
+		No arguments taken
+	Returns:
+	--------
+		No return value
+	'''
+	_FADUN_STORE.update(sig=None, rot={}, nrchi={})
+	here = os.path.dirname(os.path.abspath(__file__))
+	shutil.rmtree(os.path.join(here, 'fadun_tables'), ignore_errors=True)
+
+def _fadundisk(key, build):
+	'''
+	Memory-mapped on-disk form of one FaDun table, written beside
+	database.json under fadun_tables/<database signature>/ the first time
+	it is asked for. Every process that loads a table maps the same file,
+	so worker pools share the pages instead of holding private copies
+	Arguments:
+	----------
+		key:   str - table name, e.g. 'rot-LYS'
+		build: callable - returns the table as a dict of arrays
+	Returns:
+	--------
+		dict: the table's arrays as read-only np.memmap, or the built
+		arrays themselves when the directory cannot be written
+	'''
+	sig = _fadunstore()['sig'] or 'nodb'
+	here = os.path.dirname(os.path.abspath(__file__))
+	base = os.path.join(here, 'fadun_tables',
+		hashlib.sha1(sig.encode()).hexdigest()[:16])
+	root = os.path.join(base, key)
+	names = os.path.join(root, 'names.json')
+	if not os.path.exists(names):
+		arrays = build()
+		tmp = '%s.%d.tmp' % (root, os.getpid())
+		try:
+			os.makedirs(tmp, exist_ok=True)
+			for k, v in arrays.items():
+				np.save(os.path.join(tmp, k + '.npy'),
+					np.ascontiguousarray(v))
+			with open(os.path.join(tmp, 'names.json'), 'w') as f:
+				json.dump(sorted(arrays), f)
+			os.replace(tmp, root)
+		except OSError:
+			shutil.rmtree(tmp, ignore_errors=True)
+			if not os.path.exists(names): return arrays
+	with open(names) as f:
+		return {k: np.load(os.path.join(root, k + '.npy'), mmap_mode='r')
+			for k in json.load(f)}
+
+def _periodicmatrices(n):
+	'''
+	Solve matrices of the periodic cubic spline on a uniform grid (h=1)
+	Arguments:
+	----------
+		n: int - number of grid points
+	Returns:
+	--------
+		tuple: (M, P) - M maps values to second derivatives and P maps
+		values to cubic B-spline coefficients, both (n, n)
+	'''
+	if n in _PERIODIC_M: return _PERIODIC_M[n]
+	A = np.zeros((n, n))
+	B = np.zeros((n, n))
+	for i in range(n):
+		A[i, i] += 4.0
+		A[i, (i + 1) % n] += 1.0
+		A[i, (i - 1) % n] += 1.0
+		B[i, i] += -12.0
+		B[i, (i + 1) % n] += 6.0
+		B[i, (i - 1) % n] += 6.0
+	M = np.linalg.solve(A, B)
+	P = np.linalg.inv(A / 6.0)
+	_PERIODIC_M[n] = (M, P)
+	return M, P
+
+def _bsplinestencil(t, n, grad=False):
+	'''
+	Indices and weights of the periodic cubic B-spline at grid positions
+	Arguments:
+	----------
+		t:    np.ndarray - (N,) fractional grid positions
+		n:    int - number of grid points
+		grad: bool - if True also return the weights' derivatives in t
+	Returns:
+	--------
+		tuple: (idx, w) - (N, 4) wrapped grid indices and their weights;
+		(idx, w, dw) when grad=True
+	'''
+	f = np.floor(t)
+	u = t - f
+	idx = (f.astype(np.int64)[:, None] + np.arange(-1, 3)) % n
+	u2 = u * u
+	u3 = u2 * u
+	w = np.stack([(1.0 - u) ** 3, 3.0 * u3 - 6.0 * u2 + 4.0,
+		-3.0 * u3 + 3.0 * u2 + 3.0 * u + 1.0, u3], axis=1) / 6.0
+	if not grad: return idx, w
+	dw = np.stack([-3.0 * (1.0 - u) ** 2, 9.0 * u2 - 12.0 * u,
+		-9.0 * u2 + 6.0 * u + 3.0, 3.0 * u2], axis=1) / 6.0
+	return idx, w, dw
+
+def _bicubic(coef, w, fp, fs, grad=False):
+	'''
+	Periodic bicubic spline lookup for many queries at once. Equal to
+	fadun_spline_eval on the grid the coefficients were made from
+	Arguments:
+	----------
+		coef: np.ndarray - (W, ..., n, n) B-spline coefficients, phi
+			then psi on the last two axes
+		w:    np.ndarray - (N,) grid index of each query
+		fp:   np.ndarray - (N,) fractional phi grid positions
+		fs:   np.ndarray - (N,) fractional psi grid positions
+		grad: bool - if True also return the derivatives in fp and fs
+	Returns:
+	--------
+		np.ndarray: (N, ...) interpolated values; with grad=True a tuple
+		(values, d/dfp, d/dfs) of three such arrays
+	'''
+	n = coef.shape[-1]
+	flat = coef.reshape(coef.shape[0], -1, n * n)
+	shape = (len(fp),) + coef.shape[1:-2]
+	if grad:
+		ip, wp, dwp = _bsplinestencil(fp, n, grad=True)
+		js, ws, dws = _bsplinestencil(fs, n, grad=True)
+	else:
+		ip, wp = _bsplinestencil(fp, n)
+		js, ws = _bsplinestencil(fs, n)
+	cell = ip[:, :, None] * n + js[:, None, :]
+	g = flat[np.asarray(w)[:, None, None, None],
+		np.arange(flat.shape[1])[None, :, None, None], cell[:, None]]
+	out = np.einsum('ncab,na,nb->nc', g, wp, ws).reshape(shape)
+	if not grad: return out
+	d_fp = np.einsum('ncab,na,nb->nc', g, dwp, ws).reshape(shape)
+	d_fs = np.einsum('ncab,na,nb->nc', g, wp, dws).reshape(shape)
+	return out, d_fp, d_fs
+
+def _splinegrids(grid):
+	'''
+	Psi second derivatives and B-spline coefficients of periodic grids
+	Arguments:
+	----------
+		grid: np.ndarray - (..., n, n) values, phi then psi
+	Returns:
+	--------
+		tuple: (ypp_psi, coef) - both shaped like grid
+	'''
+	M, P = _periodicmatrices(grid.shape[-1])
+	return grid @ M.T, P @ grid @ P.T
+
+def _fadunrottable(tri, n_chi, entry):
+	'''
+	Contiguous rotameric FaDun table of one amino acid from its Rotamer
+	Library entry: per rotamer well, the 36x36 -log(P) grid with its
+	spline data, and the chi mean and sigma grids
+	Arguments:
+	----------
+		tri:   str - 3-letter amino acid code
+		n_chi: int - number of chi angles
+		entry: dict - Rotamer Library residue entry
+	Returns:
+	--------
+		dict: 'wells' (W,) sorted rotamer-well indices, 'neglogP', 'ypp'
+		and 'coef' (W, 36, 36), 'mu' and 'sd' (W, n_chi, 36, 36), 'has'
+		(W, 36, 36) cells with data and 'any' (W,)
+	'''
+	rot = entry['rotamers']
+	offs = rot['bin_offsets']
+	tbl = rot['table']
+	MAXE = -math.log(1e-6)
+	wells = sorted(set(r2[0] for r2 in tbl))
+	pos = {rw: w for w, rw in enumerate(wells)}
+	W = len(wells)
+	neglogP = np.full((W, 36, 36), MAXE)
+	mu = np.zeros((W, n_chi, 36, 36))
+	sd = np.ones((W, n_chi, 36, 36))
+	has = np.zeros((W, 36, 36), dtype=bool)
+	for bidx in range(36 * 36):
+		i_phi, i_psi = divmod(bidx, 36)
+		if bidx + 1 >= len(offs): continue
+		for r2 in tbl[offs[bidx]:offs[bidx+1]]:
+			Pk = r2[1]
+			if Pk <= 0.0: continue
+			Pk_clip = max(Pk, 1e-6)
+			w = pos[r2[0]]
+			if has[w, i_phi, i_psi]:
+				new_P = math.exp(-neglogP[w, i_phi, i_psi]) + Pk_clip
+				neglogP[w, i_phi, i_psi] = min(MAXE, -math.log(new_P))
+			else:
+				neglogP[w, i_phi, i_psi] = min(MAXE, -math.log(Pk_clip))
+				for ci in range(n_chi):
+					mu[w, ci, i_phi, i_psi] = r2[2 + ci]
+					sd[w, ci, i_phi, i_psi] = max(r2[2 + n_chi + ci], 0.5)
+				has[w, i_phi, i_psi] = True
+	ypp, coef = _splinegrids(neglogP)
+	return {'wells': np.array(wells, dtype=np.int64), 'neglogP': neglogP,
+		'ypp': ypp, 'coef': coef, 'mu': mu, 'sd': sd, 'has': has,
+		'any': has.reshape(W, -1).any(axis=1)}
+
+def _fadunnrchitable(entry):
+	'''
+	Contiguous semi-rotameric FaDun table of one amino acid from its
+	FaDunNrchiDensities entry: per rotameric well, the -log(P_rot) grid,
+	the chi mean and sigma grids and the -log density of every chi_last
+	bin, with their spline data
+	Arguments:
+	----------
+		entry: dict - ['FaDunNrchiDensities'][tri] score parameters
+	Returns:
+	--------
+		dict: 'wells' (W,) sorted well codes (see _fadunwellcode),
+		'neglogP_rot', 'ypp_rot', 'coef_rot' (W, 36, 36), 'chi_means'
+		and 'chi_sigmas' (W, n_disc_chi, 36, 36), 'neglogD' and
+		'ypp_dens' (W, 36, 36, chi_last_n), 'coef_dens'
+		(W, chi_last_n, 36, 36) and 'meta' (n_disc_chi, chi_last_n,
+		chi_last_low, chi_last_step)
+	'''
+	n_disc = int(entry['n_disc_chi'])
+	cn = int(entry['chi_last_n'])
+	MAXE = 13.815510557964274
+	rows = sorted(((tuple(int(x) for x in k.split(',')), v)
+		for k, v in entry['per_rot'].items()),
+		key=lambda r: _fadunwellcode(r[0]))
+	W = len(rows)
+	neglogP_rot = np.empty((W, 36, 36))
+	cm = np.empty((W, n_disc, 36, 36))
+	cs = np.empty((W, n_disc, 36, 36))
+	neglogD = np.empty((W, 36, 36, cn))
+	for w, (rt, rot_dat) in enumerate(rows):
+		neglogP_rot[w] = np.asarray(rot_dat['neglogP_rot'],
+			dtype=np.float64).reshape(36, 36)
+		cm[w] = np.asarray(rot_dat['chi_means'],
+			dtype=np.float64).reshape(n_disc, 36, 36)
+		cs[w] = np.asarray(rot_dat['chi_sigmas'],
+			dtype=np.float64).reshape(n_disc, 36, 36)
+		dens = np.asarray(rot_dat['densities'],
+			dtype=np.float64).reshape(36, 36, cn)
+		neglogD[w] = np.minimum(-np.log(np.maximum(dens, 1e-6)), MAXE)
+	ypp_rot, coef_rot = _splinegrids(neglogP_rot)
+	ypp_dens, coef_dens = _splinegrids(neglogD.transpose(0, 3, 1, 2))
+	return {
+		'wells': np.array([_fadunwellcode(r[0]) for r in rows],
+			dtype=np.int64),
+		'neglogP_rot': neglogP_rot, 'ypp_rot': ypp_rot,
+		'coef_rot': coef_rot, 'chi_means': cm, 'chi_sigmas': cs,
+		'neglogD': neglogD,
+		'ypp_dens': np.ascontiguousarray(ypp_dens.transpose(0, 2, 3, 1)),
+		'coef_dens': coef_dens,
+		'meta': np.array([n_disc, cn, float(entry['chi_last_low']),
+			float(entry['chi_last_step'])])}
+
+def _fadunwellcode(bins):
+	'''
+	Integer code of a tuple of chi well indices (1, 2 or 3 per chi),
+	the tuple length included so tuples of different lengths differ
+	Arguments:
+	----------
+		bins: sequence or np.ndarray - well indices, or (N, k) rows
+	Returns:
+	--------
+		int or np.ndarray: the code(s)
+	'''
+	b = np.asarray(bins, dtype=np.int64)
+	k = b.shape[-1]
+	code = 10000 * k + (b * 10 ** (3 - np.arange(k))).sum(axis=-1)
+	return int(code) if b.ndim == 1 else code
+
+def _faduntables(tri, n_chi=None, residues_db=None, nrchi=None,
+		scoreset=None):
+	'''
+	Shared FaDun spline table of one amino acid, built on first use and
+	then reused by every Score instance in the process until
+	database.json changes. With FADUN_MEMMAP set the table is read from
+	(or written to) its memory-mapped on-disk form, so worker processes
+	share it as well
+	Arguments:
+	----------
+		tri:         str - 3-letter amino acid code
+		n_chi:       int - number of chi angles (rotameric table)
+		residues_db: dict - database['Rotamer Library']['residues']
+			(rotameric table)
+		nrchi:       dict or None - ['FaDunNrchiDensities'][tri] from the
+			score parameters; gives the semi-rotameric table instead
+		scoreset:    str or None - name of the score set nrchi comes from;
+			its table is then keyed on (score set, amino acid), otherwise
+			on a digest of the entry's content
+	Returns:
+	--------
+		dict: the table's arrays (see _fadunrottable / _fadunnrchitable), or
+		{} when the amino acid has no entry
+	'''
+	store = _fadunstore()
+	if nrchi is not None:
+		# Score sets whose densities share a shape but not their values
+		# must not share a table, so key on the score set (the store is
+		# per database version) or, lacking one, on the content itself.
+		if scoreset is None:
+			scoreset = hashlib.sha1(json.dumps(nrchi, sort_keys=True,
+				default=str).encode()).hexdigest()[:16]
+		key = (tri, str(scoreset))
+		tables = store['nrchi']
+		name = 'nrchi-%s-%s' % key
+		build = lambda: _fadunnrchitable(nrchi)
+	else:
+		entry = (residues_db or {}).get(tri)
+		if entry is None: return {}
+		key = (tri, int(n_chi))
+		tables = store['rot']
+		name = 'rot-%s-%d' % key
+		build = lambda: _fadunrottable(tri, int(n_chi), entry)
+	if key not in tables:
+		tables[key] = _fadundisk(name, build) if FADUN_MEMMAP else build()
+	return tables[key]
+
+def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None,
+		name=None):
 	'''
 	Build the per-pose support cache used by every Score energy term
 	Arguments:
@@ -1168,6 +2042,8 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		xs_override:   dict or None - validation hook; maps combined index to XS
 			atom type
 		nrot_override: int or None - validation hook for ligand n_rot
+		name:          str or None - name of the score set params belongs
+			to, keys the process-wide FaDun tables
 	Returns:
 	--------
 		dict: 'hash', 'coords', 'atom_types', 'inter_pairs', 'intra_pairs'
@@ -1176,7 +2052,6 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 	'''
 	_FADUN_GRID_CACHE = {}
 	_FADUN_ENT_CACHE = {}
-	_RAMA_SPLINE_CACHE = {}
 	_PCS_M = {}
 	_FROZEN_ADJ = {}
 	def patternsearch(pose, params, ligand=None,
@@ -1197,7 +2072,9 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			dict: keys 'xs_types' (int array), 'xs_radii_arr',
 			'xs_is_hydrophobic_arr', 'xs_is_donor_arr',
 			'xs_is_acceptor_arr', 'coords', 'inter_pairs',
-			'intra_ligand_pairs', 'nrot', 'n_r' (receptor atom count)
+			'intra_ligand_pairs', 'intra_candidates' (every intra-ligand
+			pair outside the cutoff test), 'nrot', 'n_r' (receptor atom
+			count)
 		'''
 		if 'Atom_types' in params and 'Residue_types' in params:
 			out = fullatomcache(pose, params)
@@ -1295,7 +2172,8 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		XS atom typing and pair lists for the docking score
 		Arguments:
 		----------
-			pose:          Pose or Molecule - receptor
+			pose:          Pose or Molecule or None - receptor; None types
+				the ligand alone, as the grid-map score does
 			params:        dict - the small-molecule docking param block
 			ligand:        Molecule or None - the ligand (None for non-docking)
 			xs_override:   dict or None - {combined_index: 'XS_TYPE_NAME', ...}
@@ -1304,9 +2182,13 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		--------
 			dict: see PatternSearch
 		'''
-		r_atoms = pose.data['Atoms']
-		r_bonds = pose.data['Bonds']
-		r_coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		if pose is None:
+			r_atoms = {}; r_bonds = {}; r_coords = np.empty((0, 3))
+		else:
+			r_atoms = pose.data['Atoms']
+			r_bonds = pose.data['Bonds']
+			r_coords = np.asarray(pose.data['Coordinates'],
+				dtype=np.float64)
 		n_r = len(r_atoms)
 		if ligand is not None:
 			l_atoms = ligand.data['Atoms']
@@ -1361,7 +2243,8 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			('GLU','OE1'):'O_A', ('GLU','OE2'):'O_A',
 		})
 		r_atom_to_tri = {}
-		aas = pose.data.get('Amino Acids') or {}
+		aas = (pose.data.get('Amino Acids') if pose is not None
+			else None) or {}
 		for ri, info in aas.items():
 			if not info or len(info) < 6: continue
 			tri = info[5]
@@ -1414,6 +2297,7 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		cutoff = float(params['Constants'].get('cutoff', 8.0))
 		inter_pairs_list = []
 		intra_pairs_list = []
+		intra_cand = np.empty((0, 2), dtype=np.int64)
 		if n_l > 0:
 			r_typed = np.array([i for i in range(n_r) if xs[i] >= 0],
 				dtype=np.int64)
@@ -1429,14 +2313,14 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			l_adj = {i: set(int(j) for j in l_bonds.get(i, []))
 				for i in range(n_l)}
 			excluded = {i: bfswithin(l_adj, i, 3) for i in range(n_l)}
-			for i in range(n_l):
-				if xs[n_r + i] < 0: continue
-				for j in range(i + 1, n_l):
-					if j in excluded[i]: continue
-					if xs[n_r + j] < 0: continue
-					dij = np.linalg.norm( coords[n_r + i] - coords[n_r + j])
-					if dij < cutoff:
-						intra_pairs_list.append((n_r + i, n_r + j))
+			cand = [(n_r + i, n_r + j) for i in range(n_l)
+				if xs[n_r + i] >= 0 for j in range(i + 1, n_l)
+				if j not in excluded[i] and xs[n_r + j] >= 0]
+			if cand:
+				intra_cand = np.array(cand, dtype=np.int64)
+				dij = np.linalg.norm(coords[intra_cand[:, 0]]
+					- coords[intra_cand[:, 1]], axis=1)
+				intra_pairs_list = intra_cand[dij < cutoff].tolist()
 		if nrot_override is not None:
 			nrot = float(nrot_override)
 		elif ligand is not None:
@@ -1456,49 +2340,64 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			'coords': coords,
 			'inter_pairs': inter_pairs,
 			'intra_ligand_pairs': intra_pairs,
+			'intra_candidates': intra_cand,
 			'nrot': nrot,
 			'n_r': n_r}
-	def bfsdists(start, adj, max_depth=4):
+	def bonddistances(adj, n, max_depth=4):
 		'''
-		BFS bond-distance map from `start` up to max_depth bonds
+		Sparse table of shortest bond-path lengths up to max_depth bonds,
+		grown one bond at a time over a CSR copy of the bond graph
 		Arguments:
 		----------
-			start: int - atom index to start BFS from
 			adj: dict - atom index to set of bonded neighbours
+			n: int - number of atoms
 			max_depth: int, default 4 - maximum bond distance to expand
 		Returns:
 		--------
-			dict: {atom_index: bond_distance} for atoms at distance 1..max_depth
-		'''
-		out = {}
-		frontier = {start}
-		dist = 0
-		seen = {start}
-		while frontier and dist < max_depth:
-			dist += 1
-			nxt = set()
-			for x in frontier:
-				for y in adj.get(x, ()):
-					if y in seen: continue
-					seen.add(y); nxt.add(y)
-					out[y] = dist
-			frontier = nxt
-		return out
-	def get_bfs(atom_idx, bfs_cache, adj):
-		'''
-		Memoised wrapper around bfsdists keyed on atom_idx
+			tuple: (keys, dists) - sorted int64 keys a*n+b for every
+			ordered pair a != b within max_depth bonds, and their bond
+			distances; pairs further apart are absent
+		'''
+		src = np.array([a for a in range(n) for b in adj.get(a, ())
+			if 0 <= b < n and b != a], dtype=np.int64)
+		dst = np.array([b for a in range(n) for b in adj.get(a, ())
+			if 0 <= b < n and b != a], dtype=np.int64)
+		deg = np.bincount(src, minlength=n)
+		indptr = np.concatenate([[0], np.cumsum(deg)])
+		seen = np.unique(np.concatenate([np.arange(n) * (n + 1),
+			src * n + dst]))
+		keys, dists = [src * n + dst], [np.ones(len(src), dtype=np.int64)]
+		fa, fb = src, dst
+		for depth in range(2, int(max_depth) + 1):
+			own, off = _ragged(deg[fb])
+			nk = np.unique(fa[own] * n + dst[indptr[fb[own]] + off])
+			nk = nk[~np.isin(nk, seen, assume_unique=True)]
+			if len(nk) == 0: break
+			keys.append(nk)
+			dists.append(np.full(len(nk), depth, dtype=np.int64))
+			seen = np.union1d(seen, nk)
+			fa, fb = nk // n, nk % n
+		keys = np.concatenate(keys); dists = np.concatenate(dists)
+		order = np.argsort(keys)
+		return keys[order], dists[order]
+	def pathlookup(table, a, b, n, default=5):
+		'''
+		Vectorised lookup in a bonddistances table
 		Arguments:
 		----------
-			atom_idx: int - atom index to BFS from
-			bfs_cache: dict - memo of atom index to BFS distance map
-			adj: dict - atom index to set of bonded neighbours
+			table: tuple - (keys, dists) from bonddistances
+			a, b: ndarray - atom index arrays of the same length
+			n: int - number of atoms
+			default: int, default 5 - value for pairs beyond the table
 		Returns:
 		--------
-			dict: {atom_index: bond_distance} (same shape as bfsdists)
+			ndarray: int64 bond distance per (a, b) pair
 		'''
-		if atom_idx not in bfs_cache:
-			bfs_cache[atom_idx] = bfsdists(int(atom_idx), adj, max_depth=4)
-		return bfs_cache[atom_idx]
+		keys, dists = table
+		q = np.asarray(a, dtype=np.int64) * n + np.asarray(b, dtype=np.int64)
+		if len(keys) == 0: return np.full(len(q), default, dtype=np.int64)
+		k = np.minimum(np.searchsorted(keys, q), len(keys) - 1)
+		return np.where(keys[k] == q, dists[k], default)
 	def lookuptype(tricode, atom_name, atoms, bonds, n,
 			atom_types_db, residue_types_db, D_TO_L, N_TERM_H,
 			ai=None):
@@ -1752,19 +2651,19 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 					q_arr[ii] = TQ['disulfide_SG']
 					q_arr[jj] = TQ['disulfide_SG']
 		return n_term_res
-	def atomwaters(i, X, water_atom, water_cnt, water_off, water_xyz, LKB_WTS,
-			adj, ang_sp2, ang_sp3, atom_res, atom_types_db, dih_sp2, dih_sp3,
-			is_H, is_polar_h, opt_dist, ros_types):
-		'''
-		Append the LkBall virtual waters belonging to one atom
+	def compilewaters(n, LKB_WTS, adj, ang_sp2, ang_sp3, atom_res,
+			atom_types_db, dih_sp2, dih_sp3, is_H, is_polar_h, ros_types):
+		'''
+		Compile the LkBall virtual-water geometry of a topology into index
+		arrays, so waters can be placed for any coordinates without
+		revisiting the bond graph. Every water is one row: its owning atom
+		i, two base atoms a and b and a kind; kind 0 points from i towards
+		a (donor hydrogen), kind 1 points away from the midpoint of a and b
+		(ring acceptor) and kind 2 is placed in the frame x = i - a,
+		y = b - i at the row's angle and dihedral (sp2/sp3 acceptor)
 		Arguments:
 		----------
-			i: int - atom whose virtual waters are built
-			X: np.ndarray - (N, 3) coordinates
-			water_atom: list - owning atom per water, appended
-			water_cnt: np.ndarray - per-atom water count, filled
-			water_off: np.ndarray - per-atom water offset, filled
-			water_xyz: list - water positions, appended in place
+			n: int - number of atoms
 			LKB_WTS: dict - LkBall weights keyed by Rosetta type
 			adj: dict - atom index to set of bonded neighbours
 			ang_sp2: float - sp2 water angle in radians
@@ -1775,79 +2674,77 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			dih_sp3: list - sp3 water dihedrals in radians
 			is_H: np.ndarray - bool, atom is a hydrogen
 			is_polar_h: np.ndarray - bool, atom is a polar hydrogen
-			opt_dist: float - ideal atom-to-water distance
 			ros_types: list - per-atom Rosetta type names
 		Returns:
 		--------
-			No return value, the water_* containers are filled in place
-		'''
-		t = ros_types[i]
-		if t not in LKB_WTS: return
-		info = atom_types_db.get(t, {})
-		is_d = bool(info.get('donor', False))
-		is_a = bool(info.get('acceptor', False))
-		is_sp2 = bool(info.get('sp2', False))
-		is_sp3 = bool(info.get('sp3', False))
-		is_ring = bool(info.get('ring', False))
-		i_xyz = X[i]
-		i_waters = []
-		nbrs = adj.get(i, set())
-		heavy_nbrs = [j for j in nbrs if not is_H[j]]
-		polar_h_nbrs = [j for j in nbrs if is_polar_h[j]]
-		if is_d:
-			for h in polar_h_nbrs:
-				w = i_xyz + opt_dist * unit(X[h] - i_xyz)
-				i_waters.append(w)
-		if is_a:
-			if is_ring and len(heavy_nbrs) >= 2:
-				c1, c2 = heavy_nbrs[0], heavy_nbrs[1]
-				mid = 0.5 * (X[c1] + X[c2])
-				w = i_xyz + opt_dist * unit(i_xyz - mid)
-				i_waters.append(w)
-			elif is_sp3 and len(heavy_nbrs) >= 1 and len(polar_h_nbrs) >= 1:
-				c = heavy_nbrs[0]; h = polar_h_nbrs[0]
-				x_hat = unit(i_xyz - X[c])
-				v_OH = X[h] - i_xyz
-				y_dir = v_OH - np.dot(v_OH, x_hat) * x_hat
-				y_hat = unit(y_dir)
-				z_hat = np.cross(x_hat, y_hat)
-				cos_a = math.cos(ang_sp3)
-				sin_a = math.sin(ang_sp3)
-				for d in dih_sp3:
-					v_off = (cos_a * x_hat
-						+ sin_a * (math.cos(d) * y_hat
-							+ math.sin(d) * z_hat))
-					i_waters.append(i_xyz + opt_dist * v_off)
-			elif is_sp2 and len(heavy_nbrs) >= 1:
-				c = heavy_nbrs[0]
-				c_heavy_nbrs = [k for k in adj.get(c, set())
-					if k != i and not is_H[k]]
-				if not c_heavy_nbrs: return
-				my_res = atom_res[i]
-				same_res_nbrs = sorted(
-					k for k in c_heavy_nbrs if atom_res[k] == my_res)
-				if same_res_nbrs:
-					b2 = same_res_nbrs[0]
-				else:
-					b2 = sorted(c_heavy_nbrs)[0]
-				x_hat = unit(i_xyz - X[c])
-				v_b2 = X[b2] - i_xyz
-				y_dir = v_b2 - np.dot(v_b2, x_hat) * x_hat
-				y_hat = unit(y_dir)
-				z_hat = np.cross(x_hat, y_hat)
-				cos_a = math.cos(ang_sp2)
-				sin_a = math.sin(ang_sp2)
-				for d in dih_sp2:
-					v_off = (cos_a * x_hat
-						+ sin_a * (math.cos(d) * y_hat
-							+ math.sin(d) * z_hat))
-					i_waters.append(i_xyz + opt_dist * v_off)
-		if not i_waters: return
-		water_off[i] = len(water_xyz)
-		water_cnt[i] = len(i_waters)
-		for w in i_waters:
-			water_xyz.append(np.asarray(w, dtype=np.float64))
-			water_atom.append(i)
+			dict: 'atom', 'a', 'b', 'kind' (int arrays, one row per water
+				in placement order), 'cos_a', 'sin_a', 'cos_d', 'sin_d'
+				(frame coefficients of kind 2 rows), 'off' and 'cnt'
+				(per-atom offset into and count of the water rows)
+		'''
+		rows = []
+		water_off = np.full(n, -1, dtype=np.int64)
+		water_cnt = np.zeros(n, dtype=np.int64)
+		for i in range(n):
+			t = ros_types[i]
+			if t not in LKB_WTS: continue
+			info = atom_types_db.get(t, {})
+			is_d = bool(info.get('donor', False))
+			is_a = bool(info.get('acceptor', False))
+			is_sp2 = bool(info.get('sp2', False))
+			is_sp3 = bool(info.get('sp3', False))
+			is_ring = bool(info.get('ring', False))
+			i_rows = []
+			nbrs = adj.get(i, set())
+			heavy_nbrs = [j for j in nbrs if not is_H[j]]
+			polar_h_nbrs = [j for j in nbrs if is_polar_h[j]]
+			if is_d:
+				for h in polar_h_nbrs:
+					i_rows.append((i, h, h, 0, 0.0, 0.0))
+			if is_a:
+				if is_ring and len(heavy_nbrs) >= 2:
+					i_rows.append(
+						(i, heavy_nbrs[0], heavy_nbrs[1], 1, 0.0, 0.0))
+				elif (is_sp3 and len(heavy_nbrs) >= 1
+						and len(polar_h_nbrs) >= 1):
+					for d in dih_sp3:
+						i_rows.append((i, heavy_nbrs[0], polar_h_nbrs[0], 2,
+							ang_sp3, d))
+				elif is_sp2 and len(heavy_nbrs) >= 1:
+					c = heavy_nbrs[0]
+					c_heavy_nbrs = [k for k in adj.get(c, set())
+						if k != i and not is_H[k]]
+					if not c_heavy_nbrs: continue
+					my_res = atom_res[i]
+					same_res_nbrs = sorted(
+						k for k in c_heavy_nbrs if atom_res[k] == my_res)
+					if same_res_nbrs:
+						b2 = same_res_nbrs[0]
+					else:
+						b2 = sorted(c_heavy_nbrs)[0]
+					for d in dih_sp2:
+						i_rows.append((i, c, b2, 2, ang_sp2, d))
+			if not i_rows: continue
+			water_off[i] = len(rows)
+			water_cnt[i] = len(i_rows)
+			rows.extend(i_rows)
+		if rows:
+			cols = list(zip(*rows))
+		else:
+			cols = [()] * 6
+		ang = np.asarray(cols[4], dtype=np.float64)
+		dih = np.asarray(cols[5], dtype=np.float64)
+		return {
+			'atom':  np.asarray(cols[0], dtype=np.int64),
+			'a':     np.asarray(cols[1], dtype=np.int64),
+			'b':     np.asarray(cols[2], dtype=np.int64),
+			'kind':  np.asarray(cols[3], dtype=np.int64),
+			'cos_a': np.cos(ang),
+			'sin_a': np.sin(ang),
+			'cos_d': np.cos(dih),
+			'sin_d': np.sin(dih),
+			'off':   water_off,
+			'cnt':   water_cnt}
 	def fullatomcache(pose, params):
 		'''
 		Atom typing + pair lists for the score function
@@ -1947,22 +2844,26 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 				adj[i] = set(_frozen[i])
 		else:
 			X_arr = np.asarray(coords, dtype=np.float64)
-			heavy_mask = np.array([atoms[k][1] != 'H' for k in range(n)])
-			for i in range(n):
-				if atoms[i][1] != 'H': continue
-				dij = np.linalg.norm(X_arr - X_arr[i], axis=1)
-				dij[i] = np.inf
-				dij = np.where(heavy_mask, dij, np.inf)
-				j = int(np.argmin(dij))
-				if dij[j] < 1.3:
-					adj[i].add(j); adj[j].add(i)
-			s_idx = [i for i in range(n) if atoms[i][1] == 'S']
-			for ii in s_idx:
-				for jj in s_idx:
-					if ii >= jj: continue
-					d = float(np.linalg.norm(X_arr[ii] - X_arr[jj]))
-					if d < 2.5:
-						adj[ii].add(jj); adj[jj].add(ii)
+			is_h = np.array([atoms[k][1] == 'H' for k in range(n)],
+				dtype=bool)
+			ci, cj = _cellpairs(X_arr, 1.3)
+			cd = np.linalg.norm(X_arr[ci] - X_arr[cj], axis=1)
+			keep = (is_h[ci] != is_h[cj]) & (cd < 1.3)
+			hh = np.where(is_h[ci], ci, cj)[keep]
+			hv = np.where(is_h[ci], cj, ci)[keep]
+			order = np.lexsort((hv, cd[keep], hh))
+			hh, hv = hh[order], hv[order]
+			first = np.ones(len(hh), dtype=bool)
+			first[1:] = hh[1:] != hh[:-1]
+			for i, j in zip(hh[first].tolist(), hv[first].tolist()):
+				adj[i].add(j); adj[j].add(i)
+			s_idx = np.array([i for i in range(n) if atoms[i][1] == 'S'],
+				dtype=np.int64)
+			si, sj = _cellpairs(X_arr[s_idx], 2.5)
+			sd = np.linalg.norm(X_arr[s_idx[si]] - X_arr[s_idx[sj]], axis=1)
+			for ii, jj in zip(s_idx[si][sd < 2.5].tolist(),
+					s_idx[sj][sd < 2.5].tolist()):
+				adj[ii].add(jj); adj[jj].add(ii)
 			_FROZEN_ADJ[_sig] = {i: set(adj[i]) for i in range(n)}
 		rep_atom_idx = np.arange(n, dtype=np.int64)
 		for ri, info in aas.items():
@@ -1998,61 +2899,81 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 						or (nm_a == 'N' and nm_b == 'C')):
 					res_polymer_bonded.add(pair)
 		c0 = float(params['Constants']['fa_max_dis'])
-		pairs_i = []; pairs_j = []; pair_d = []
-		pair_w = []; pair_same_res = []; pair_path = []
-		pair_cp_path = []; pair_is_poly = []
-		bfs_cache = {}
 		typed_idx = np.where(has_score)[0]
 		X = coords
-		for ii in typed_idx:
-			dists_from_ii = get_bfs(int(ii), bfs_cache, adj)
-			dd = np.linalg.norm(X - X[ii], axis=1)
-			mask = (dd < c0) & has_score
-			mask[ii] = False
-			ri = atom_res[ii]
-			for jj in np.where(mask)[0]:
-				if jj < ii: continue
-				rj = atom_res[jj]
-				rpair = (min(ri,rj), max(ri,rj))
-				same_or_adj = (ri == rj or rpair in res_bonded)
-				is_poly = (ri == rj) or (rpair in res_polymer_bonded)
-				if same_or_adj:
-					bd = dists_from_ii.get(int(jj), 5)
-				else:
-					bd = 5
-				if is_poly:
-					if bd <= 3: w = 0.0
-					elif bd == 4: w = cp_half
-					else: w = 1.0
-				else:
-					if bd <= 2: w = 0.0
-					elif bd == 3: w = cp_half
-					else: w = 1.0
-				rep_i = int(rep_atom_idx[ii])
-				rep_j = int(rep_atom_idx[jj])
-				if not same_or_adj:
-					cp_bd = 5
-				elif rep_i == rep_j:
-					cp_bd = 0
-				elif rep_i == int(ii) and rep_j == int(jj):
-					cp_bd = bd
-				else:
-					rep_bfs = get_bfs(rep_i, bfs_cache, adj)
-					cp_bd = rep_bfs.get(rep_j, 5)
-				pairs_i.append(int(ii))
-				pairs_j.append(int(jj))
-				pair_d.append(float(dd[jj]))
-				pair_w.append(w)
-				pair_same_res.append(ri == rj and ri >= 0)
-				pair_path.append(bd)
-				pair_cp_path.append(cp_bd)
-		pairs_i = np.array(pairs_i, dtype=np.int64)
-		pairs_j = np.array(pairs_j, dtype=np.int64)
-		pair_d = np.array(pair_d, dtype=np.float64)
-		pair_w = np.array(pair_w, dtype=np.float64)
-		pair_same_res = np.array(pair_same_res, dtype=bool)
-		pair_path = np.array(pair_path, dtype=np.int64)
-		pair_cp_path = np.array(pair_cp_path, dtype=np.int64)
+		R = int(atom_res.max()) + 2 if n else 1
+		def reskeys(pairs):
+			return np.array([(a + 1) * R + b + 1 for a, b in pairs],
+				dtype=np.int64)
+		bonded_keys = reskeys(res_bonded)
+		polymer_keys = reskeys(res_polymer_bonded)
+		bdist = bonddistances(adj, n, max_depth=4)
+		def pairattrs(pairs_i, pairs_j, X):
+			'''
+			Distances and count-pair attributes of typed atom pairs
+			Arguments:
+			----------
+				pairs_i: np.ndarray - first atom of each pair
+				pairs_j: np.ndarray - second atom of each pair (> pairs_i)
+				X: np.ndarray - (n, 3) coordinates
+			Returns:
+			--------
+				dict: 'pairs_i', 'pairs_j', 'pair_d', 'pair_w',
+					'pair_path', 'pair_cp_path' and 'pair_same_res' arrays
+					for the pairs closer than fa_max_dis, in (i, j) order
+			'''
+			order = np.lexsort((pairs_j, pairs_i))
+			pairs_i, pairs_j = pairs_i[order], pairs_j[order]
+			pair_d = np.linalg.norm(X[pairs_i] - X[pairs_j], axis=1)
+			keep = pair_d < c0
+			pairs_i, pairs_j = pairs_i[keep], pairs_j[keep]
+			pair_d = pair_d[keep]
+			ri, rj = atom_res[pairs_i], atom_res[pairs_j]
+			rkey = (np.minimum(ri, rj) + 1) * R + np.maximum(ri, rj) + 1
+			same_or_adj = (ri == rj) | np.isin(rkey, bonded_keys)
+			is_poly = (ri == rj) | np.isin(rkey, polymer_keys)
+			pair_path = np.where(same_or_adj,
+				pathlookup(bdist, pairs_i, pairs_j, n), 5)
+			lim = np.where(is_poly, 3, 2)
+			pair_w = np.where(pair_path <= lim, 0.0,
+				np.where(pair_path == lim + 1, cp_half, 1.0))
+			rep_i, rep_j = rep_atom_idx[pairs_i], rep_atom_idx[pairs_j]
+			own = (rep_i == pairs_i) & (rep_j == pairs_j)
+			pair_cp_path = np.where(own, pair_path,
+				pathlookup(bdist, rep_i, rep_j, n))
+			pair_cp_path = np.where(rep_i == rep_j, 0, pair_cp_path)
+			pair_cp_path = np.where(same_or_adj, pair_cp_path, 5)
+			return {
+				'pairs_i':       pairs_i,
+				'pairs_j':       pairs_j,
+				'pair_d':        pair_d,
+				'pair_w':        pair_w,
+				'pair_path':     pair_path,
+				'pair_cp_path':  pair_cp_path,
+				'pair_same_res': (ri == rj) & (ri >= 0)}
+		def focuspairs(X, focus, grid):
+			'''
+			Typed pairs with at least one atom in a focus set, found in the
+			grid cells around the focus atoms so moved atoms need no skin
+			Arguments:
+			----------
+				X: np.ndarray - (n, 3) current coordinates
+				focus: np.ndarray - indices of the atoms that moved
+				grid: dict - focusgrid()['grid'], every other typed atom
+					binned at its position in X
+			Returns:
+			--------
+				dict: the pairattrs arrays for the focus pairs
+			'''
+			focus = np.asarray(focus, dtype=np.int64)
+			a, b = _cellfocus(grid, X, focus[has_score[focus]], c0)
+			return pairattrs(np.minimum(a, b), np.maximum(a, b), X)
+		ci, cj = _cellpairs(X[typed_idx], c0)
+		pairs = pairattrs(typed_idx[ci], typed_idx[cj], X)
+		pairs_i, pairs_j = pairs['pairs_i'], pairs['pairs_j']
+		pair_d, pair_w = pairs['pair_d'], pairs['pair_w']
+		pair_path, pair_cp_path = pairs['pair_path'], pairs['pair_cp_path']
+		pair_same_res = pairs['pair_same_res']
 		LKB_WTS = {k: tuple(v) for k, v in
 			(params.get('LkBallWtd', {}).get('atom_weights') or {}).items()}
 		if not LKB_WTS and any(
@@ -2176,11 +3097,58 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		ang_sp3 = math.radians(71.0)
 		dih_sp2 = (0.0, math.radians(180.0))
 		dih_sp3 = (math.radians(120.0), math.radians(240.0))
+		waters = compilewaters(n, LKB_WTS, adj, ang_sp2, ang_sp3, atom_res,
+			atom_types_db, dih_sp2, dih_sp3, is_H, is_polar_h, ros_types)
+		def unitrows(v):
+			'''
+			Row-wise unit vectors; zero-length rows are returned unchanged
+			Arguments:
+			----------
+				v: np.ndarray - (m, 3) vectors
+			Returns:
+			--------
+				np.ndarray: (m, 3) v / |v| per row
+			'''
+			nv = np.sqrt(np.einsum('ij,ij->i', v, v))
+			return v / np.where(nv > 1e-9, nv, 1.0)[:, None]
+		def waterframe(Xi, Xa, Xb, rows=slice(None)):
+			'''
+			Place one water per template row from its owning atom and base
+			atoms
+			Arguments:
+			----------
+				Xi: ndarray (W, 3) - owning (polar) atom of each water
+				Xa: ndarray (W, 3) - first base atom
+				Xb: ndarray (W, 3) - second base atom
+				rows: slice or ndarray - template rows being placed
+			Returns:
+			--------
+				ndarray: (W, 3) water coordinates
+			'''
+			kind = waters['kind'][rows]
+			v = np.empty_like(Xi)
+			m = kind == 0
+			v[m] = unitrows(Xa[m] - Xi[m])
+			m = kind == 1
+			v[m] = unitrows(Xi[m] - 0.5 * (Xa[m] + Xb[m]))
+			m = kind == 2
+			if np.any(m):
+				x_hat = unitrows(Xi[m] - Xa[m])
+				v_b = Xb[m] - Xi[m]
+				y_hat = unitrows(v_b - np.einsum('ij,ij->i', v_b,
+					x_hat)[:, None] * x_hat)
+				z_hat = np.cross(x_hat, y_hat)
+				ang = {k: waters[k][rows][m, None] for k in
+					('cos_a', 'sin_a', 'cos_d', 'sin_d')}
+				v[m] = (ang['cos_a'] * x_hat + ang['sin_a']
+					* (ang['cos_d'] * y_hat + ang['sin_d'] * z_hat))
+			return Xi + opt_dist * v
 		def place_waters(X):
 			'''
 			Build LkBall virtual-water positions for coordinates X from the
-			cached per-atom topology (donor/acceptor types, bond graph),
-			so waters can be refreshed on a cached re-score
+			compiled water templates (owning atom, base atoms, kind and
+			frame angles), so waters can be refreshed on a cached re-score
+			in a few array operations
 			Arguments:
 			----------
 				X: ndarray (n, 3) - current coordinates
@@ -2189,20 +3157,83 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 				tuple: (water_xyz_arr, water_off, water_cnt) - stacked water
 					coordinates, per-atom offset into them, per-atom count
 			'''
-			water_xyz = []
-			water_atom = []
-			water_off = np.full(n, -1, dtype=np.int64)
-			water_cnt = np.zeros(n, dtype=np.int64)
-			for i in range(n):
-				atomwaters(i, X, water_atom, water_cnt, water_off, water_xyz,
-					LKB_WTS, adj, ang_sp2, ang_sp3, atom_res, atom_types_db,
-					dih_sp2, dih_sp3, is_H, is_polar_h, opt_dist, ros_types)
-			if water_xyz:
-				water_xyz_arr = np.stack(water_xyz, axis=0)
-			else:
-				water_xyz_arr = np.empty((0, 3), dtype=np.float64)
-			water_atom = np.array(water_atom, dtype=np.int64)
-			return water_xyz_arr, water_off, water_cnt
+			X = np.asarray(X, dtype=np.float64)
+			water_xyz_arr = waterframe(X[waters['atom']], X[waters['a']],
+				X[waters['b']])
+			return (water_xyz_arr, waters['off'].copy(),
+				waters['cnt'].copy())
+		def move_waters(X, rows, water_xyz):
+			'''
+			Re-place some LkBall waters in an existing water array
+			Arguments:
+			----------
+				X:         ndarray (n, 3) - current coordinates
+				rows:      ndarray - water rows whose frame atoms moved
+				water_xyz: ndarray (W, 3) - water coordinates, updated in
+					place
+			Returns:
+			--------
+				No return value
+			'''
+			if len(rows) == 0: return
+			X = np.asarray(X, dtype=np.float64)
+			water_xyz[rows] = waterframe(X[waters['atom'][rows]],
+				X[waters['a'][rows]], X[waters['b'][rows]], rows)
+		def focusgrid(X):
+			'''
+			Search state for re-scoring a few moved residues, built once per
+			residue-pair graph: the typed atoms binned into fa_max_dis cells
+			for focuspairs, and per residue its atoms and the water rows its
+			atoms frame for move_waters
+			Arguments:
+			----------
+				X: ndarray (n, 3) - coordinates the graph was scored at
+			Returns:
+			--------
+				dict: 'grid' cell grid, 'atoms' {residue: atom indices} and
+					'waters' {residue: water rows}
+			'''
+			X = np.asarray(X, dtype=np.float64)
+			resatoms, reswaters = defaultdict(list), defaultdict(set)
+			for i, r in enumerate(atom_res.tolist()): resatoms[r].append(i)
+			frame = np.stack([waters['atom'], waters['a'], waters['b']], 1)
+			for w, rs in enumerate(atom_res[frame].tolist()):
+				for r in rs: reswaters[r].add(w)
+			return {'grid': _cellgrid(typed_idx, X[typed_idx], c0),
+				'atoms': {r: np.array(v, dtype=np.int64)
+					for r, v in resatoms.items()},
+				'waters': {r: np.array(sorted(v), dtype=np.int64)
+					for r, v in reswaters.items()}}
+		def water_jacobian(X, h=1e-5):
+			'''
+			Derivatives of every water position in the coordinates of the
+			three atoms that frame it, by central differences of the local
+			placement (the frame is small and smooth, so this is as good as
+			the analytic form at a fraction of the code)
+			Arguments:
+			----------
+				X: ndarray (n, 3) - current coordinates
+				h: float - finite-difference step in Angstrom
+			Returns:
+			--------
+				tuple: (atoms, J) - (W, 3) owning/a/b atom of each water and
+					(W, 3, 3, 3) d water[k] / d atom[role, l] as
+					J[w, role, k, l]
+			'''
+			X = np.asarray(X, dtype=np.float64)
+			atoms = np.stack([waters['atom'], waters['a'], waters['b']],
+				axis=1)
+			frame = [X[atoms[:, 0]], X[atoms[:, 1]], X[atoms[:, 2]]]
+			J = np.zeros((len(atoms), 3, 3, 3))
+			for role in range(3):
+				for l in range(3):
+					step = np.zeros(3); step[l] = h
+					hi = list(frame); lo = list(frame)
+					hi[role] = frame[role] + step
+					lo[role] = frame[role] - step
+					J[:, role, :, l] = (waterframe(*hi)
+						- waterframe(*lo)) / (2.0 * h)
+			return atoms, J
 		water_xyz_arr, water_off, water_cnt = place_waters(X)
 		return {
 			'ros_types': ros_types,
@@ -2227,12 +3258,16 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			'pair_same_res': pair_same_res,
 			'pair_path': pair_path,
 			'pair_cp_path': pair_cp_path,
+			'focuspairs': focuspairs,
+			'focusgrid': focusgrid,
 			'rep_atom_idx': rep_atom_idx,
 			'lkb_w_iso':   lkb_w_iso,
 			'lkb_w_ball':  lkb_w_ball,
 			'lkb_d2_low':  lkb_d2_low,
 			'lkb_water_xyz': water_xyz_arr,
 			'place_waters': place_waters,
+			'move_waters': move_waters,
+			'water_jacobian': water_jacobian,
 			'lkb_water_off': water_off,
 			'lkb_water_cnt': water_cnt,
 			'lkb_ramp_w2': LK_RAMP_W2,
@@ -2374,10 +3409,10 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		'''
 		return (amide(a, b, atoms, bonds, orders)
 			or amide(b, a, atoms, bonds, orders))
-	def countnrot(ligand):
+	def rotatablebonds(ligand):
 		'''
-		Count non-terminal, non-ring, non-amide single bonds in a ligand
-		(n_rot for the rotational-entropy penalty term).
+		List the non-terminal, non-ring, non-amide single bonds of a
+		ligand, the torsions a docking search turns
 		A bond is rotatable iff:
 			- single bond order
 			- not a ring (= bridge-edge: removing it disconnects its endpoints)
@@ -2389,12 +3424,12 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			ligand: Molecule - the ligand
 		Returns:
 		--------
-			int: estimated Nrot
+			list: (i, j) atom index pairs with i < j
 		'''
 		atoms = ligand.data['Atoms']
 		bonds = ligand.data['Bonds']
 		orders = ligand.data.get('BondOrders', {})
-		nrot = 0
+		out = []
 		seen = set()
 		for i in sorted(bonds):
 			for j in bonds[i]:
@@ -2414,8 +3449,20 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 				if not hvj and (atoms[j][1] == 'C' or not has_h_j):
 					continue
 				if isamide(i, j, atoms, bonds, orders): continue
-				nrot += 1
-		return nrot
+				out.append((i, j))
+		return out
+	def countnrot(ligand):
+		'''
+		Count the rotatable bonds of a ligand (n_rot for the
+		rotational-entropy penalty term), as listed by rotatablebonds
+		Arguments:
+		----------
+			ligand: Molecule - the ligand
+		Returns:
+		--------
+			int: estimated Nrot
+		'''
+		return len(rotatablebonds(ligand))
 	def countnumtors(ligand):
 		'''
 		Compute the rotational-entropy penalty term's "num_tors" input:
@@ -2524,14 +3571,16 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			int: hash used for cache invalidation
 		'''
 		return hash((params.get('_name',''), keyof(pose), keyof(ligand)))
-	def go(pairs, cache, pair_fn):
+	def go(pairs, cache, pair_fn, intra=False):
 		'''
-		Sum a per-pair function over one precomputed pair list
+		Sum a per-pair function over one precomputed pair list, recording
+		its forces and per-pair energies when Score asks for them
 		Arguments:
 		----------
 			pairs: np.ndarray - (M, 2) array of atom index pairs
 			cache: dict - PatternSearch result
 			pair_fn: callable - per-pair contribution function
+			intra: bool - True for the intra-ligand pair list
 		Returns:
 		--------
 			float: the summed contribution, 0.0 for an empty pair list
@@ -2540,7 +3589,13 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		ai = pairs[:, 0]; aj = pairs[:, 1]
 		coords = cache['coords']
 		rij = np.linalg.norm(coords[ai] - coords[aj], axis=1)
-		return float(pair_fn(ai, aj, rij, cache).sum())
+		if cache.get('_forces') is None:
+			e = pair_fn(ai, aj, rij, cache)
+		else:
+			e, dedr = pair_fn(ai, aj, rij, cache, grad=True)
+			tallyforces(cache, None, ai, aj, dedr, intra)
+		tallypairs(cache, None, ai, aj, e)
+		return float(e.sum())
 	def evalpairs(cache, kind, pair_fn):
 		'''
 		Apply a per-pair function and sum its result over inter and
@@ -2550,13 +3605,14 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			cache:   dict - PatternSearch result
 			kind:    str  - 'inter' or 'intra' or 'both'
 			pair_fn: callable - takes (ai, aj, rij, cache) and returns
-				a per-pair contribution array
+				a per-pair contribution array; with grad=True it returns
+				(contribution, d/drij)
 		Returns:
 		--------
 			tuple (inter_sum, intra_sum)
 		'''
 		inter_sum = go(cache['inter_pairs'], cache, pair_fn)
-		intra_sum = go(cache['intra_ligand_pairs'], cache, pair_fn)
+		intra_sum = go(cache['intra_ligand_pairs'], cache, pair_fn, True)
 		return inter_sum, intra_sum
 	def termresult(inter_raw, intra_raw, weight):
 		'''
@@ -2591,7 +3647,7 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		offset = float(p['offset']); width = float(p['width'])
 		cutoff = float(p['cutoff']); weight = float(p['weight'])
 		radii = cache['xs_radii_arr']; xs = cache['xs_types']
-		def fn(ai, aj, rij, c):
+		def fn(ai, aj, rij, c, grad=False):
 			'''
 			Per-pair kernel mapping (ai, aj, rij, c) to a contribution
 			Arguments:
@@ -2600,14 +3656,18 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 				aj: np.ndarray - per-pair second-atom indices
 				rij: np.ndarray - per-pair distance
 				c: dict - the ScoreMatch cache, unused by this kernel
+				grad: bool - if True also return the derivative in rij
 			Returns:
 			--------
-				np.ndarray: per-pair scalar contribution to the term
+				np.ndarray: per-pair scalar contribution to the term; with
+				grad=True a tuple (contribution, d/drij)
 			'''
 			ri = radii[xs[ai]]; rj = radii[xs[aj]]
 			d = rij - (ri + rj + offset)
 			gate = ((xs[ai] >= 0) & (xs[aj] >= 0) & (rij < cutoff))
-			return np.where(gate, np.exp(-(d / width) ** 2), 0.0)
+			e = np.where(gate, np.exp(-(d / width) ** 2), 0.0)
+			if not grad: return e
+			return e, -2.0 * d / (width * width) * e
 		inter_raw, intra_raw = evalpairs(cache, 'both', fn)
 		return termresult(inter_raw, intra_raw, weight)
 	def sloperamp(x, bad, good):
@@ -2647,7 +3707,7 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		hphob = cache['xs_is_hydrophobic_arr']
 		donor = cache['xs_is_donor_arr']
 		accep = cache['xs_is_acceptor_arr']
-		def fn(ai, aj, rij, c):
+		def fn(ai, aj, rij, c, grad=False):
 			'''
 			Per-pair slope-step kernel used by the slopestep wrapper
 			Arguments:
@@ -2656,9 +3716,11 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 				aj: np.ndarray - per-pair second-atom indices
 				rij: np.ndarray - per-pair distance
 				c: dict - the ScoreMatch cache, unused by this kernel
+				grad: bool - if True also return the derivative in rij
 			Returns:
 			--------
-				np.ndarray: per-pair slope-step contribution
+				np.ndarray: per-pair slope-step contribution; with
+				grad=True a tuple (contribution, d/drij)
 			'''
 			ri = radii[xs[ai]]; rj = radii[xs[aj]]
 			d = rij - (ri + rj)
@@ -2668,7 +3730,13 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			else:
 				gate = ((donor[xs[ai]] & accep[xs[aj]])
 					| (donor[xs[aj]] & accep[xs[ai]]))
-			return np.where(valid & gate, sloperamp(d, bad, good), 0.0)
+			e = np.where(valid & gate, sloperamp(d, bad, good), 0.0)
+			if not grad: return e
+			# The ramp is linear with slope 1/(good - bad) strictly
+			# between its ends and flat outside them.
+			ramp = (e > 0.0) & (e < 1.0)
+			slope = 1.0 / (good - bad) if bad != good else 0.0
+			return e, np.where(ramp, slope, 0.0)
 		inter_raw, intra_raw = evalpairs(cache, 'both', fn)
 		return termresult(inter_raw, intra_raw, weight)
 	def fullatompairs(cache, same_res=False, cp='cp4', use_cp_rep=False):
@@ -2684,16 +3752,17 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			tuple: (pi, pj, r, w) NumPy arrays for the matching pair subset
 		'''
 		cp_half = float((params.get('CountPair') or {})['half'])
-		mask = cache['pair_same_res']
+		pairs = cache.get('_focus') or cache
+		mask = pairs['pair_same_res']
 		sel = mask if same_res else ~mask
-		path = cache['pair_cp_path'] if use_cp_rep else cache['pair_path']
+		path = pairs['pair_cp_path'] if use_cp_rep else pairs['pair_path']
 		if same_res:
 			if cp == 'cp3':
 				w = np.where(path <= 2, 0.0, np.where(path == 3, cp_half, 1.0))
 			else:
 				w = np.where(path <= 3, 0.0, np.where(path == 4, cp_half, 1.0))
 		else:
-			w = cache['pair_w']
+			w = pairs['pair_w']
 			if use_cp_rep:
 				if cp == 'cp3':
 					w = np.where(path <= 2, 0.0,
@@ -2702,9 +3771,146 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 					w = np.where(path <= 3, 0.0,
 						np.where(path == 4, cp_half, 1.0))
 		sel = sel & (w > 0.0)
-		return (cache['pairs_i'][sel], cache['pairs_j'][sel],
-			cache['pair_d'][sel], w[sel])
-	def ljpair(cache, pi, pj, r):
+		return (pairs['pairs_i'][sel], pairs['pairs_j'][sel],
+			pairs['pair_d'][sel], w[sel])
+	def tallypairs(cache, tag, pi, pj, e):
+		'''
+		Record per-pair energies for the Score residue-pair energy graph;
+		a no-op unless Score has put a '_tally' list in the cache
+		Arguments:
+		----------
+			cache: dict - ScoreMatch cache
+			tag: str or None - owning energy component ('atr', 'rep' or an
+				h-bond category); None credits the term being evaluated,
+				cache['_tally_term']
+			pi: np.ndarray - first atom of each pair
+			pj: np.ndarray - second atom of each pair
+			e: np.ndarray - per-pair raw energy, already count-pair weighted
+		Returns:
+		--------
+			No return value, the tally list is appended in place
+		'''
+		tally = cache.get('_tally')
+		if tally is None or len(pi) == 0: return
+		if tag is None: tag = cache.get('_tally_term')
+		res = cache['atom_res']
+		tally.append((tag, res[pi], res[pj], np.asarray(e, dtype=np.float64)))
+	def tallyatoms(cache, tag, idx, f, intra=False):
+		'''
+		Record per-atom forces for Score(grad=True); a no-op unless Score
+		has put a '_forces' dict in the cache
+		Arguments:
+		----------
+			cache: dict - ScoreMatch cache
+			tag: str or None - owning energy component, as in tallypairs
+			idx: np.ndarray - (M,) atom index of each force row
+			f: np.ndarray - (M, 3) force rows, -dE/dx of the raw energy
+			intra: bool - True for intra-ligand pairs of the docking score
+		Returns:
+		--------
+			No return value, the per-term force array is updated in place
+		'''
+		forces = cache.get('_forces')
+		if forces is None or len(idx) == 0: return
+		if tag is None: tag = cache.get('_tally_term')
+		key = (tag, 'intra' if intra else 'inter')
+		F = forces.get(key)
+		if F is None:
+			F = forces[key] = np.zeros((len(cache['coords']), 3))
+		np.add.at(F, np.asarray(idx), f)
+	def tallyforces(cache, tag, pi, pj, dedr, intra=False):
+		'''
+		Record the forces of per-pair energies that depend on the pair
+		distance only
+		Arguments:
+		----------
+			cache: dict - ScoreMatch cache
+			tag: str or None - owning energy component, as in tallypairs
+			pi: np.ndarray - first atom of each pair
+			pj: np.ndarray - second atom of each pair
+			dedr: np.ndarray - per-pair dE/dr, already count-pair weighted
+			intra: bool - True for intra-ligand pairs of the docking score
+		Returns:
+		--------
+			No return value, the per-term force array is updated in place
+		'''
+		if cache.get('_forces') is None or len(pi) == 0: return
+		X = cache['coords']
+		d = X[pi] - X[pj]
+		r = np.maximum(np.sqrt(np.einsum('ij,ij->i', d, d)), 1e-12)
+		f = (-np.asarray(dedr, dtype=np.float64) / r)[:, None] * d
+		tallyatoms(cache, tag, np.concatenate([pi, pj]),
+			np.concatenate([f, -f]), intra)
+	def torsionforces(cache, tag, quartets, dedphi):
+		'''
+		Record the forces of energies of dihedral angles measured as
+		torsionangles does; quartets with a negative index are skipped
+		Arguments:
+		----------
+			cache: dict - ScoreMatch cache
+			tag: str or None - owning energy component, as in tallypairs
+			quartets: np.ndarray - (M, 4) atom indices
+			dedphi: np.ndarray - (M,) dE/dphi per degree
+		Returns:
+		--------
+			No return value, the per-term force array is updated in place
+		'''
+		if cache.get('_forces') is None: return
+		q = np.asarray(quartets, dtype=np.int64).reshape(-1, 4)
+		g = np.asarray(dedphi, dtype=np.float64).reshape(-1)
+		live = (q >= 0).all(axis=1) & np.isfinite(g) & (g != 0.0)
+		q = q[live]; g = g[live] * (180.0 / math.pi)
+		if not len(q): return
+		p = cache['coords'][q]
+		u1 = p[:, 1] - p[:, 0]
+		u2 = p[:, 2] - p[:, 1]
+		u3 = p[:, 3] - p[:, 2]
+		c12 = np.cross(u1, u2)
+		c23 = np.cross(u2, u3)
+		L2 = np.maximum(np.einsum('ij,ij->i', u2, u2), 1e-12)
+		L = np.sqrt(L2)
+		g0 = -(L / np.maximum(np.einsum('ij,ij->i', c12, c12),
+			1e-12))[:, None] * c12
+		g3 = (L / np.maximum(np.einsum('ij,ij->i', c23, c23),
+			1e-12))[:, None] * c23
+		a = (np.einsum('ij,ij->i', u1, u2) / L2)[:, None]
+		b = (np.einsum('ij,ij->i', u3, u2) / L2)[:, None]
+		g1 = -(1.0 + a) * g0 + b * g3
+		g2 = a * g0 - (1.0 + b) * g3
+		f = -g[:, None, None] * np.stack([g0, g1, g2, g3], axis=1)
+		tallyatoms(cache, tag, q.reshape(-1), f.reshape(-1, 3))
+	def angleforces(cache, tag, triplets, dedtheta):
+		'''
+		Record the forces of energies of bond angles a-b-c
+		Arguments:
+		----------
+			cache: dict - ScoreMatch cache
+			tag: str or None - owning energy component, as in tallypairs
+			triplets: np.ndarray - (M, 3) atom indices, vertex in the middle
+			dedtheta: np.ndarray - (M,) dE/dtheta per degree
+		Returns:
+		--------
+			No return value, the per-term force array is updated in place
+		'''
+		if cache.get('_forces') is None: return
+		t = np.asarray(triplets, dtype=np.int64).reshape(-1, 3)
+		g = np.asarray(dedtheta, dtype=np.float64).reshape(-1)
+		if not len(t): return
+		p = cache['coords'][t]
+		v1 = p[:, 0] - p[:, 1]
+		v2 = p[:, 2] - p[:, 1]
+		n1 = np.maximum(np.linalg.norm(v1, axis=1), 1e-12)[:, None]
+		n2 = np.maximum(np.linalg.norm(v2, axis=1), 1e-12)[:, None]
+		c = np.clip(np.einsum('ij,ij->i', v1, v2)[:, None] / (n1 * n2),
+			-1.0, 1.0)
+		# d(theta)/d(cos) = -1/sin, so the force is g/sin along dcos/dx.
+		k = (g * (180.0 / math.pi))[:, None] / np.maximum(
+			np.sqrt(1.0 - c * c), 1e-9)
+		fa = k * (v2 / (n1 * n2) - c * v1 / (n1 * n1))
+		fc = k * (v1 / (n1 * n2) - c * v2 / (n2 * n2))
+		tallyatoms(cache, tag, t[:, [0, 2, 1]].reshape(-1),
+			np.stack([fa, fc, -(fa + fc)], axis=1).reshape(-1, 3))
+	def ljpair(cache, pi, pj, r, grad=False):
 		'''
 		Per-pair LJ (atr, rep) using the analytic etable-evaluation
 		formula and the per-atom-type-pair LJ params:
@@ -2729,14 +3935,17 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			cache: per-pose cache from _fullatomcache
 			pi, pj: atom-i and atom-j indices (np.int64)
 			r: pair distances (np.float64)
+			grad: bool - if True also return d(atrE)/dr and d(repE)/dr
 		Returns:
 		--------
-			(atrE, repE) numpy arrays length len(pi)
+			(atrE, repE) numpy arrays length len(pi); with grad=True
+			(atrE, repE, dAtr, dRep)
 		'''
 		at_e_idx = cache.get('at_e_idx')
 		n_pairs = len(pi)
 		if at_e_idx is None or n_pairs == 0:
 			z = np.zeros(n_pairs, dtype=np.float64)
+			if grad: return z, z.copy(), z.copy(), z.copy()
 			return z, z.copy()
 		ai = at_e_idx[pi]; aj = at_e_idx[pj]
 		valid = (ai >= 0) & (aj >= 0)
@@ -2782,7 +3991,19 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		atrE = atrE * ljatr_fw
 		atrE = np.where(valid, atrE, 0.0)
 		repE = np.where(valid, repE, 0.0)
-		return atrE, repE
+		if not grad: return atrE, repE
+		dE = np.where(d2 < ljrep_ramp_d2, lj_switch_slo,
+			np.where(d < ljatr_xlo,
+				-(12.0 * lj_r12 * inv_d12 + 6.0 * lj_r6 * inv_d6) / d,
+				np.where(d < ljatr_xhi, (3.0 * c3 * d + 2.0 * c2) * d + c1,
+					0.0)))
+		dAtr = np.where(rep_neg, np.where(ljE < 0, dE, 0.0),
+			np.where(d < lj_min, 0.0, dE))
+		dRep = np.where(rep_neg, np.where(ljE >= 0, dE, 0.0),
+			np.where(d < lj_min, dE, 0.0))
+		dAtr = np.where(valid, dAtr * ljatr_fw, 0.0)
+		dRep = np.where(valid, dRep, 0.0)
+		return atrE, repE, dAtr, dRep
 	def fullatomljraw(cache, same_res):
 		'''
 		Compute raw LJ attractive + repulsive contributions over typed pairs
@@ -2792,16 +4013,28 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			same_res: bool - True for intra-residue pairs
 		Returns:
 		--------
-			tuple: (atr_sum, rep_sum) - raw scalar sums before weighting
+			tuple: (atr_sum, rep_sum) - raw scalar sums before weighting,
+				memoised for the score call when Score sets '_lj_memo'
 		'''
+		memo = cache.get('_lj_memo')
+		if memo is not None and same_res in memo: return memo[same_res]
 		pi, pj, r, w = fullatompairs(cache, same_res=same_res)
 		if len(pi) == 0: return 0.0, 0.0
-		atrE, repE = ljpair(cache, pi, pj, r)
-		return float(np.sum(w * atrE)), float(np.sum(w * repE))
+		if cache.get('_forces') is not None:
+			atrE, repE, dAtr, dRep = ljpair(cache, pi, pj, r, grad=True)
+			tallyforces(cache, 'atr', pi, pj, w * dAtr)
+			tallyforces(cache, 'rep', pi, pj, w * dRep)
+		else:
+			atrE, repE = ljpair(cache, pi, pj, r)
+		tallypairs(cache, 'atr', pi, pj, w * atrE)
+		tallypairs(cache, 'rep', pi, pj, w * repE)
+		out = float(np.sum(w * atrE)), float(np.sum(w * repE))
+		if memo is not None: memo[same_res] = out
+		return out
 	_lkb = params.get('LkBall') or {}
 	lk_max = float(_lkb.get('max_dis', 0.0))
 	lk_far_lo = float(_lkb.get('far_lo', 0.0))
-	def _eval(io_first, io_second, cache, r):
+	def _eval(io_first, io_second, cache, r, grad=False):
 		'''
 		Evaluate analytic etable lk_iso for direction (self=first).
 		Arguments:
@@ -2810,9 +4043,11 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			io_second: other-atom etable idx (npair,)
 			cache: dict - ScoreMatch cache
 			r: np.ndarray - per-pair distances
+			grad: bool - if True also return the derivatives in r
 		Returns:
 		--------
-			np.float64 array (npair,) of one-sided lk_iso values
+			np.float64 array (npair,) of one-sided lk_iso values; with
+			grad=True a tuple (values, d/dr)
 		'''
 		cs = cache['et_close_start'][io_first, io_second]
 		ce = cache['et_close_end'][io_first, io_second]
@@ -2836,8 +4071,17 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		e = np.where((d >= cs) & (d < ce), e_close, e)
 		e = np.where((d >= lk_far_lo) & (d < lk_max), e_far, e)
 		e = np.where(d >= lk_max, 0.0, e)
-		return e * fw
-	def lkisopair(cache, pi, pj, r):
+		if not grad: return e * fw
+		de = (-2.0 * exp_arg / la * lc * gauss - 2.0 * d * e_mid) \
+			/ np.maximum(d2, 1e-12)
+		de = np.where(d < cs, 0.0, de)
+		de = np.where((d >= cs) & (d < ce), (3.0 * c3 * d + 2.0 * c2) * d
+			+ c1, de)
+		de = np.where((d >= lk_far_lo) & (d < lk_max),
+			(3.0 * f3 * d + 2.0 * f2) * d + f1, de)
+		de = np.where(d >= lk_max, 0.0, de)
+		return e * fw, de * fw
+	def lkisopair(cache, pi, pj, r, grad=False):
 		'''
 		Return per-direction analytic fa_sol/lk_iso values (one-sided
 		desolvation energies) for atom pairs (pi[k], pj[k]) at distance
@@ -2856,25 +4100,33 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			pi: atom-i indices (np.int64)
 			pj: atom-j indices (np.int64)
 			r:  pair distances (np.float64)
+			grad: bool - if True also return both derivatives in r
 		Returns:
 		--------
-			(lki, lkj): tuple of np.float64 arrays length len(pi)
+			(lki, lkj): tuple of np.float64 arrays length len(pi); with
+			grad=True (lki, lkj, dlki, dlkj)
 		'''
 		at_e_idx = cache.get('at_e_idx')
 		n_pairs = len(pi)
 		if at_e_idx is None or n_pairs == 0:
-			return (np.zeros(n_pairs, dtype=np.float64),
-				np.zeros(n_pairs, dtype=np.float64))
+			z = np.zeros(n_pairs, dtype=np.float64)
+			if grad: return z, z.copy(), z.copy(), z.copy()
+			return z, z.copy()
 		ai = at_e_idx[pi]; aj = at_e_idx[pj]
 		valid = (ai >= 0) & (aj >= 0)
 		ai_safe = np.where(valid, ai, 0)
 		aj_safe = np.where(valid, aj, 0)
+		if grad:
+			lki, dlki = _eval(ai_safe, aj_safe, cache, r, grad=True)
+			lkj, dlkj = _eval(aj_safe, ai_safe, cache, r, grad=True)
+			return (np.where(valid, lki, 0.0), np.where(valid, lkj, 0.0),
+				np.where(valid, dlki, 0.0), np.where(valid, dlkj, 0.0))
 		lki = _eval(ai_safe, aj_safe, cache, r)
 		lkj = _eval(aj_safe, ai_safe, cache, r)
 		lki = np.where(valid, lki, 0.0)
 		lkj = np.where(valid, lkj, 0.0)
 		return lki, lkj
-	def solpair(cache, pi, pj, r):
+	def solpair(cache, pi, pj, r, grad=False):
 		'''
 		Combined fa_sol per-pair value matching the
 		analytic LK-evaluation algorithm (used by FaSol /
@@ -2893,14 +4145,17 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			pi: atom-i indices (np.int64)
 			pj: atom-j indices (np.int64)
 			r:  pair distances (np.float64)
+			grad: bool - if True also return the derivatives in r
 		Returns:
 		--------
-			np.float64 array: combined fa_sol per pair
+			np.float64 array: combined fa_sol per pair; with grad=True a
+			tuple (values, d/dr)
 		'''
 		at_e_idx = cache.get('at_e_idx')
 		n_pairs = len(pi)
 		if at_e_idx is None or n_pairs == 0:
-			return np.zeros(n_pairs, dtype=np.float64)
+			z = np.zeros(n_pairs, dtype=np.float64)
+			return (z, z.copy()) if grad else z
 		ai = at_e_idx[pi]; aj = at_e_idx[pj]
 		valid = (ai >= 0) & (aj >= 0)
 		a_lo = np.where(ai <= aj, ai, aj)
@@ -2934,7 +4189,17 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		e = np.where(d >= lk_max, 0.0, e)
 		e = e * fw
 		e = np.where(valid, e, 0.0)
-		return e
+		if not grad: return e
+		de = (-2.0 * (d - R1) / (la1 * la1) * lc1 * np.exp(-x1)
+			- 2.0 * (d - R2) / (la2 * la2) * lc2 * np.exp(-x2)
+			- 2.0 * d * e_mid) / np.maximum(d2, 1e-12)
+		de = np.where(d < cs, 0.0, de)
+		de = np.where((d >= cs) & (d < ce), (3.0 * c3 * d + 2.0 * c2) * d
+			+ c1, de)
+		de = np.where((d >= lk_far_lo) & (d < lk_max),
+			(3.0 * f3 * d + 2.0 * f2) * d + f1, de)
+		de = np.where(d >= lk_max, 0.0, de)
+		return e, np.where(valid, de * fw, 0.0)
 	def fullatomsolraw(cache, same_res):
 		'''
 		Lazaridis-Karplus solvation raw sum, using the
@@ -2952,7 +4217,12 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		'''
 		pi, pj, r, w = fullatompairs(cache, same_res=same_res)
 		if len(pi) == 0: return 0.0
-		e = solpair(cache, pi, pj, r)
+		if cache.get('_forces') is not None:
+			e, de = solpair(cache, pi, pj, r, grad=True)
+			tallyforces(cache, None, pi, pj, w * de)
+		else:
+			e = solpair(cache, pi, pj, r)
+		tallypairs(cache, None, pi, pj, w * e)
 		return float(np.sum(w * e))
 	def fullatomstubterm(weight_key):
 		'''
@@ -2972,9 +4242,9 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			'raw': 0.0, '_pending_full_impl': True, '_weight': w}
 	def fadun_rotwell_grid(aa, n_chi, residues_db):
 		'''
-		Build per-(AA, rotwell_index) 36x36 grids of -log(P) and chi
-		means/sigmas for the natural cubic spline interpolation. Cached
-		on first use.
+		Per-(AA, rotwell_index) 36x36 grids of -log(P) and chi
+		means/sigmas for the natural cubic spline interpolation, as
+		views into the process-wide table from _faduntables
 		Arguments:
 		----------
 			aa: amino acid 3-letter code
@@ -2982,64 +4252,21 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			residues_db: rotamer library residues dict
 		Returns:
 		--------
-			dict: rot_idx -> dict with 'neglogP', 'mu', 'sd', plus
-				cached 'ypp_psi' for each quantity (built lazily).
+			dict: rot_idx -> dict with 'neglogP', 'mu', 'sd',
+				'has_data' and 'neglogP_ypp_psi'
 		'''
-		key = aa
-		if key in _FADUN_GRID_CACHE:
-			return _FADUN_GRID_CACHE[key]
-		entry = residues_db.get(aa)
-		if entry is None:
-			_FADUN_GRID_CACHE[key] = {}
-			return {}
-		rot = entry['rotamers']
-		offs = rot['bin_offsets']
-		tbl = rot['table']
-		MAXE = -math.log(1e-6)
-		all_rotwells = set()
-		for r2 in tbl:
-			all_rotwells.add(r2[0])
+		if aa in _FADUN_GRID_CACHE:
+			return _FADUN_GRID_CACHE[aa]
+		T = _faduntables(aa, n_chi, residues_db)
 		grids = {}
-		for rw in all_rotwells:
-			grids[rw] = {
-				'neglogP': np.full((36, 36), MAXE),
-				'mu': [np.zeros((36, 36)) for _ in range(n_chi)],
-				'sd': [np.full((36, 36), 1.0)
-					for _ in range(n_chi)],
-				'has_data': np.zeros((36, 36), dtype=bool)}
-		for bidx in range(36 * 36):
-			i_phi, i_psi = divmod(bidx, 36)
-			if bidx + 1 >= len(offs): continue
-			rows = tbl[offs[bidx]:offs[bidx+1]]
-			for r2 in rows:
-				rw = r2[0]
-				if rw not in grids: continue
-				Pk = r2[1]
-				if Pk <= 0.0: continue
-				Pk_clip = max(Pk, 1e-6)
-				g = grids[rw]
-				if g['has_data'][i_phi, i_psi]:
-					old_P = math.exp(-g['neglogP'][i_phi, i_psi])
-					new_P = old_P + Pk_clip
-					g['neglogP'][i_phi, i_psi] = min(MAXE, -math.log(new_P))
-				else:
-					g['neglogP'][i_phi, i_psi] = min(MAXE, -math.log(Pk_clip))
-					for ci in range(n_chi):
-						g['mu'][ci][i_phi, i_psi] = r2[2 + ci]
-						g['sd'][ci][i_phi, i_psi] = \
-							max(r2[2 + n_chi + ci], 0.5)
-					g['has_data'][i_phi, i_psi] = True
-		for rw, g in grids.items():
-			g['neglogP_ypp_psi'] = np.array([
-				periodic_cubic_spline(g['neglogP'][i])
-				for i in range(36)])
-			g['mu_ypp_psi'] = [np.array([
-				periodic_cubic_spline(g['mu'][ci][i])
-				for i in range(36)]) for ci in range(n_chi)]
-			g['sd_ypp_psi'] = [np.array([
-				periodic_cubic_spline(g['sd'][ci][i])
-				for i in range(36)]) for ci in range(n_chi)]
-		_FADUN_GRID_CACHE[key] = grids
+		for w, rw in enumerate(T.get('wells', ())):
+			grids[int(rw)] = {
+				'neglogP': T['neglogP'][w],
+				'mu': list(T['mu'][w]),
+				'sd': list(T['sd'][w]),
+				'has_data': T['has'][w],
+				'neglogP_ypp_psi': T['ypp'][w]}
+		_FADUN_GRID_CACHE[aa] = grids
 		return grids
 	def fadun_entropy_grid(aa, residues_db):
 		'''
@@ -3101,11 +4328,26 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		ypp_phi = periodic_cubic_spline(col_f)
 		return spline_eval_1d(col_f, ypp_phi, fp, n)
 	nrchi_cache = {}
+	def fadun_nrchi_tables(tri):
+		'''
+		Process-wide semi-rotameric FaDun table of one AA, see
+		_fadunnrchitable
+		Arguments:
+		----------
+			tri: 3-letter AA code
+		Returns:
+		--------
+			dict: the table's arrays, or {} if the AA has no
+				FaDunNrchiDensities entry
+		'''
+		aa_entry = (params.get('FaDunNrchiDensities') or {}).get(tri)
+		if aa_entry is None: return {}
+		return _faduntables(tri, nrchi=aa_entry, scoreset=name)
 	def fadun_nrchi_data(tri):
 		'''
-		Load and cache the per-AA non-rotameric chi_last density tables
-		(Shapovalov backbone-dependent source) for the 8 semi-rotameric AAs.
-			Pre-computes 2nd-derivative grids
+		Per-AA non-rotameric chi_last density tables (Shapovalov
+		backbone-dependent source) for the 8 semi-rotameric AAs, as
+		views into the process-wide table, with the 2nd-derivative grids
 		for the periodic-bicubic phi/psi interpolation of -log(P_rot)
 		and of each chi_last density column.
 		Arguments:
@@ -3113,59 +4355,35 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			tri: 3-letter AA code (ASN, ASP, GLU, GLN, HIS, PHE, TRP, TYR)
 		Returns:
 		--------
-			dict: {rotwell_tuple: {neg_log_P_rot_grid, chi_means,
-				chi_sigmas, dens_grid, neg_log_dens, neg_log_dens_ypp,
-				chi_last_low, chi_last_step, chi_last_n}}, or {} if
-			missing
+			dict: {rotwell_tuple: {neglogP_rot, chi_means, chi_sigmas,
+				neglogD, ypp_rot, ypp_dens}} under 'per_rot' with
+			chi_last_low, chi_last_step, chi_last_n and n_disc_chi, or
+			{} if missing
 		'''
 		if tri in nrchi_cache:
 			return nrchi_cache[tri]
-		nrchi_db = params.get('FaDunNrchiDensities') or {}
-		aa_entry = nrchi_db.get(tri)
-		if aa_entry is None:
+		T = fadun_nrchi_tables(tri)
+		if not T:
 			nrchi_cache[tri] = {}
 			return {}
-		n_disc_chi = int(aa_entry['n_disc_chi'])
-		chi_last_n = int(aa_entry['chi_last_n'])
-		chi_last_low = float(aa_entry['chi_last_low'])
-		chi_last_step = float(aa_entry['chi_last_step'])
+		n_disc_chi, chi_last_n, chi_last_low, chi_last_step = \
+			T['meta'].tolist()
 		out = {
 			'chi_last_low':  chi_last_low,
 			'chi_last_step': chi_last_step,
-			'chi_last_n':    chi_last_n,
-			'n_disc_chi':    n_disc_chi,
+			'chi_last_n':    int(chi_last_n),
+			'n_disc_chi':    int(n_disc_chi),
 			'per_rot':       {}}
-		MAXE = 13.815510557964274
-		for rk_str, rot_dat in aa_entry['per_rot'].items():
-			rot_tuple = tuple(int(x) for x in rk_str.split(','))
-			P_rot = np.asarray(rot_dat['P_rot'],
-				dtype=np.float64).reshape(36, 36)
-			neglogP_rot = np.asarray(rot_dat['neglogP_rot'],
-				dtype=np.float64).reshape(36, 36)
-			cm = np.asarray(rot_dat['chi_means'],
-				dtype=np.float64).reshape(n_disc_chi, 36, 36)
-			cs = np.asarray(rot_dat['chi_sigmas'],
-				dtype=np.float64).reshape(n_disc_chi, 36, 36)
-			dens = np.asarray(rot_dat['densities'],
-				dtype=np.float64).reshape(36, 36, chi_last_n)
-			dens_safe = np.maximum(dens, 1e-6)
-			neglogD = -np.log(dens_safe)
-			neglogD = np.minimum(neglogD, MAXE)
-			ypp_rot = fadun_ypp_psi_grid(neglogP_rot)
-			ypp_dens = np.zeros_like(neglogD)
-			for k in range(chi_last_n):
-				ypp_dens[:, :, k] = fadun_ypp_psi_grid( neglogD[:, :, k])
-			ypp_Prot = fadun_ypp_psi_grid(P_rot)
+		for w, code in enumerate(T['wells'].tolist()):
+			k, rest = divmod(code, 10000)
+			rot_tuple = tuple(rest // 10 ** (3 - i) % 10 for i in range(k))
 			out['per_rot'][rot_tuple] = {
-				'P_rot':         P_rot,
-				'neglogP_rot':   neglogP_rot,
-				'chi_means':     cm,
-				'chi_sigmas':    cs,
-				'densities':     dens,
-				'neglogD':       neglogD,
-				'ypp_rot':       ypp_rot,
-				'ypp_Prot':      ypp_Prot,
-				'ypp_dens':      ypp_dens}
+				'neglogP_rot':   T['neglogP_rot'][w],
+				'chi_means':     T['chi_means'][w],
+				'chi_sigmas':    T['chi_sigmas'][w],
+				'neglogD':       T['neglogD'][w],
+				'ypp_rot':       T['ypp_rot'][w],
+				'ypp_dens':      T['ypp_dens'][w]}
 		nrchi_cache[tri] = out
 		return out
 	def fadun_ypp_psi_grid(grid_2d):
@@ -3302,40 +4520,6 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		return (a * y[i] + frac * y[j]
 			+ ((a*a*a - a) * ypp[i] + (frac*frac*frac - frac) * ypp[j])
 			/ 6.0)
-	def rama_spline_eval(table, fp, fs):
-		'''
-		Periodic 2D natural cubic spline on 36x36 grid. Caches the
-		ypp_psi (2nd deriv along psi for each phi row). Per-query
-		computation of ypp_phi for the column-of-f values.
-		Arguments:
-		----------
-			table: 36x36 list/array of values
-			fp: fractional phi index (0..36)
-			fs: fractional psi index (0..36)
-		Returns:
-		--------
-			float: spline-interpolated value
-		'''
-		key = id(table)
-		cached = _RAMA_SPLINE_CACHE.get(key)
-		if cached is None:
-			arr = np.asarray(table, dtype=float)
-			ypp_psi = np.zeros_like(arr)
-			for i in range(arr.shape[0]):
-				ypp_psi[i] = periodic_cubic_spline(arr[i])
-			cached = (arr, ypp_psi)
-			_RAMA_SPLINE_CACHE[key] = cached
-		arr, ypp_psi = cached
-		n = arr.shape[0]
-		i_psi = int(math.floor(fs)) % n
-		j_psi = (i_psi + 1) % n
-		frac_s = fs - math.floor(fs)
-		a = 1.0 - frac_s; b = frac_s
-		col_f = (a * arr[:, i_psi] + b * arr[:, j_psi]
-			+ ((a**3 - a) * ypp_psi[:, i_psi]
-				+ (b**3 - b) * ypp_psi[:, j_psi]) / 6.0)
-		ypp_phi = periodic_cubic_spline(col_f)
-		return spline_eval_1d(col_f, ypp_phi, fp, n)
 	def hbond_chemtype_maps():
 		'''
 		Build forward and reverse chemtype maps for HBond
@@ -3411,63 +4595,6 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		acceptor_map[('PTR', 'OH')] = 'hbacc_AHX'
 		base_map[('PTR', 'OH')] = 'CZ'
 		return donor_map, acceptor_map, base_map
-	def hbond_eval_lookup(hb):
-		'''
-		Look up the polynomial row for a donor/acceptor pair
-		Arguments:
-		----------
-			don_chem: str - donor chemical type code
-			acc_chem: str - acceptor chemical type code
-		Returns:
-		--------
-			np.ndarray or None: 4xN polynomial coefficients or None if no match
-		'''
-		key = {}
-		for e in hb['eval_table']:
-			key[(e['don'], e['acc'], e['sep'])] = e
-		return key
-	def hbond_poly_eval(poly, x):
-		'''
-		Horner evaluation of a polynomial with clamping to (xmin, xmax)
-		Arguments:
-		----------
-			poly: dict - {'xmin', 'xmax', 'min_val', 'max_val', 'coeffs'}
-				polynomial entry
-			x:    float - query value
-		Returns:
-		--------
-			float: polynomial value at x, clamped at the table endpoints
-		'''
-		if poly is None: return 0.0
-		if x <= poly['xmin']: return poly['min_val']
-		if x >= poly['xmax']: return poly['max_val']
-		c = poly['coeffs']
-		if not c: return 0.0
-		v = c[0]
-		for i in range(1, len(c)):
-			v = v * x + c[i]
-		return v
-	def hbond_fade(fade, x):
-		'''
-		Sigmoid fade-out factor for HBond energy across the distance shell
-		Arguments:
-		----------
-			r: float - donor-acceptor distance
-		Returns:
-		--------
-			float: fade weight in [0, 1]
-		'''
-		if fade is None: return 1.0
-		kind = fade.get('kind', 'smoothed')
-		mn1 = fade['min1']; mn2 = fade['min2']
-		mx1 = fade['max1']; mx2 = fade['max2']
-		if x <= mn1 or x >= mx2: return 0.0
-		if mn2 <= x <= mx1: return 1.0
-		if x < mn2:
-			t = (x - mn1) / max(mn2 - mn1, 1e-12)
-			return t * t * (3.0 - 2.0 * t)
-		t = (mx2 - x) / max(mx2 - mx1, 1e-12)
-		return t * t * (3.0 - 2.0 * t)
 	def burial_w(n):
 		'''
 		Heavy-neighbour burial weight used by LkBallWtd
@@ -3482,233 +4609,176 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 		if n < BU['nb_lo']: return BU['w_lo']
 		if n > BU['nb_hi']: return BU['w_hi']
 		return (n - BU['shift']) * BU['slope']
-	def ahd_arg(poly, AHD_rad, xD):
-		'''
-		Acceptor-hydrogen-donor angle argument used by HBond polynomials
+	HB_SEP = ('seq_sep_other', 'seq_sep_M4', 'seq_sep_M3', 'seq_sep_M2',
+		'seq_sep_PM1', 'seq_sep_P2', 'seq_sep_P3', 'seq_sep_P4')
+	HB_CATS = ('SR_BB', 'LR_BB', 'BB_SC', 'SC')
+	def hbondtables(hb):
+		'''
+		Compile the HBond_data polynomial, fade and evaluation tables into
+		arrays indexed by row, so every candidate pair can be evaluated in
+		one vectorised pass. The last polynomial row evaluates to 0 and
+		the last fade row to 1, standing in for a missing entry
 		Arguments:
 		----------
-			D: np.ndarray - donor position
-			H: np.ndarray - hydrogen position
-			A: np.ndarray - acceptor position
-			AHD_rad: float - the A-H-D angle in radians
-			xD: float - minus the cosine of the A-H-D angle
+			hb: dict - the HBond_data block of the Score parameters
 		Returns:
 		--------
-			float: cosine of the A-H-D angle
-		'''
-		if poly is None: return xD
-		return AHD_rad if poly.get('xmin', -1) > 0.5 else xD
-	def hbondpair(ix, iy, HS, acc_str_tab, acceptors, all_hbonds, atoms, coords,
-			dHA, don_str_tab, donors, eval_key, fades, polys):
+			dict: 'poly' (xmin, xmax, min_val, max_val, coeffs, use_rad),
+				'fade' (min1, min2, max1, max2, lo_w, hi_w), 'entry'
+				(per-row poly and fade indices and category), 'don_chem'
+				and 'acc_chem' (chemical type to id) and 'lookup', the
+				(donor id, acceptor id, separation code) to entry row table
 		'''
-		Score one candidate donor/acceptor pair and record it if accepted
+		polys = hb['polynomials']; fades = hb['fade_intervals']
+		pnames = list(polys); fnames = list(fades)
+		prow = {k: i for i, k in enumerate(pnames)}
+		frow = {k: i for i, k in enumerate(fnames)}
+		deg = max([len(polys[k].get('coeffs') or []) for k in pnames] + [1])
+		P = len(pnames)
+		poly = {
+			'xmin':    np.full(P + 1, np.inf),
+			'xmax':    np.full(P + 1, np.inf),
+			'min_val': np.zeros(P + 1),
+			'max_val': np.zeros(P + 1),
+			'coeffs':  np.zeros((P + 1, deg)),
+			'use_rad': np.zeros(P + 1, dtype=bool)}
+		for i, k in enumerate(pnames):
+			p = polys[k]
+			c = p.get('coeffs') or []
+			poly['xmin'][i] = p['xmin']; poly['xmax'][i] = p['xmax']
+			poly['min_val'][i] = p['min_val']
+			poly['max_val'][i] = p['max_val']
+			if c: poly['coeffs'][i, deg - len(c):] = c
+			poly['use_rad'][i] = p.get('xmin', -1) > 0.5
+		F = len(fnames)
+		fade = {
+			'min1': np.full(F + 1, -np.inf), 'min2': np.full(F + 1, -np.inf),
+			'max1': np.full(F + 1, np.inf), 'max2': np.full(F + 1, np.inf)}
+		for i, k in enumerate(fnames):
+			for key in ('min1', 'min2', 'max1', 'max2'):
+				fade[key][i] = fades[k][key]
+		fade['lo_w'] = np.ones(F + 1); fade['hi_w'] = np.ones(F + 1)
+		fade['lo_w'][:F] = np.maximum(fade['min2'][:F] - fade['min1'][:F],
+			1e-12)
+		fade['hi_w'][:F] = np.maximum(fade['max2'][:F] - fade['max1'][:F],
+			1e-12)
+		weight_cat = {'hbw_SR_BB': 0, 'hbw_LR_BB': 1, 'hbw_SR_BB_SC': 2,
+			'hbw_LR_BB_SC': 2, 'hbw_SC': 3}
+		table = hb['eval_table']
+		don_chem = {}; acc_chem = {}
+		for e in table:
+			don_chem.setdefault(e['don'], len(don_chem))
+			acc_chem.setdefault(e['acc'], len(acc_chem))
+		E = len(table)
+		entry = {k: np.empty(E, dtype=np.int64) for k in ('AHdist',
+			'cosBAH_short', 'cosAHD_short', 'fade_AHdist', 'fade_cosBAH',
+			'fade_cosAHD', 'cat')}
+		lookup = np.full((len(don_chem) + 1, len(acc_chem) + 1,
+			len(HB_SEP)), -1, dtype=np.int64)
+		for i, e in enumerate(table):
+			entry['AHdist'][i] = prow.get(e['poly_AHdist'], P)
+			entry['cosBAH_short'][i] = prow.get(e['poly_cosBAH_short'], P)
+			entry['cosAHD_short'][i] = prow.get(e['poly_cosAHD_short'], P)
+			entry['fade_AHdist'][i] = frow.get(e['fade_AHdist'], F)
+			entry['fade_cosBAH'][i] = frow.get(e['fade_cosBAH_long'], F)
+			entry['fade_cosAHD'][i] = frow.get(e['fade_cosAHD_short'], F)
+			entry['cat'][i] = weight_cat.get(e['weight'], -1)
+			if e['sep'] in HB_SEP:
+				lookup[don_chem[e['don']], acc_chem[e['acc']],
+					HB_SEP.index(e['sep'])] = i
+		other = lookup[:, :, :1]
+		lookup = np.where(lookup < 0, other, lookup)
+		return {'poly': poly, 'fade': fade, 'entry': entry,
+			'don_chem': don_chem, 'acc_chem': acc_chem, 'lookup': lookup}
+	def hbondpolyarray(poly, k, x, grad=False):
+		'''
+		Horner evaluation of compiled polynomial rows, clamped to each
+		row's (xmin, xmax)
 		Arguments:
 		----------
-			ix: int - index into the donors list
-			iy: int - index into the acceptors list
-			HS: dict - h-bond fade and strength settings
-			acc_str_tab: dict - acceptor strength table
-			acceptors: list - acceptor descriptor dicts
-			all_hbonds: list - accepted h-bonds, appended in place
-			atoms: dict - atom index to atom record
-			coords: np.ndarray - (N, 3) coordinates
-			dHA: np.ndarray - donor-H to acceptor distance matrix
-			don_str_tab: dict - donor strength table
-			donors: list - donor descriptor dicts
-			eval_key: dict - donor, acceptor and separation to params
-			fades: dict - named fade-function definitions
-			polys: dict - named polynomial definitions
+			poly: dict - compiled polynomial table from hbondtables
+			k:    np.ndarray - polynomial row per value
+			x:    np.ndarray - query values
+			grad: bool - if True also return the derivatives in x
 		Returns:
 		--------
-			No return value, an accepted h-bond is appended to all_hbonds
-		'''
-		d = donors[ix]; a = acceptors[iy]
-		if d['D'] == a['A']: return
-		if d['ri'] == a['ri']: return
-		diff = a['ri'] - d['ri']
-		if abs(diff) > 4 or diff == 0:
-			sep = 'seq_sep_other'
-		elif diff == -4: sep = 'seq_sep_M4'
-		elif diff == -3: sep = 'seq_sep_M3'
-		elif diff == -2: sep = 'seq_sep_M2'
-		elif abs(diff) == 1: sep = 'seq_sep_PM1'
-		elif diff == 2: sep = 'seq_sep_P2'
-		elif diff == 3: sep = 'seq_sep_P3'
-		elif diff == 4: sep = 'seq_sep_P4'
-		else: sep = 'seq_sep_other'
-		entry = eval_key.get((d['chem'], a['chem'], sep))
-		if entry is None:
-			entry = eval_key.get((d['chem'], a['chem'], 'seq_sep_other'))
-		if entry is None: return
-		D_xyz = coords[d['D']]; H_xyz = coords[d['H']]
-		A_xyz = coords[a['A']]; B_xyz = coords[a['B']]
-		AH = float(dHA[ix, iy])
-		vDH = D_xyz - H_xyz; vAH = A_xyz - H_xyz
-		cosAHD = float(np.dot(vDH, vAH) /
-			max(np.linalg.norm(vDH) * np.linalg.norm(vAH), 1e-12))
-		vBA = B_xyz - A_xyz; vHA = -vAH
-		cosBAH = float(np.dot(vBA, vHA) /
-			max(np.linalg.norm(vBA) * np.linalg.norm(vHA), 1e-12))
-		poly_d = polys.get(entry['poly_AHdist'])
-		poly_bah_short = polys.get(entry['poly_cosBAH_short'])
-		poly_bah_long = polys.get(entry['poly_cosBAH_long'])
-		poly_ahd_short = polys.get(entry['poly_cosAHD_short'])
-		poly_ahd_long = polys.get(entry['poly_cosAHD_long'])
-		xH = -cosBAH
-		xD = -cosAHD
-		AHD_rad = math.acos(max(-1.0, min(1.0, cosAHD)))
-		Pr = hbond_poly_eval(poly_d, AH)
-		PSxH = hbond_poly_eval(poly_bah_short, xH)
-		PLxH = hbond_poly_eval(poly_bah_long, xH)
-		PSxD = hbond_poly_eval(
-			poly_ahd_short, ahd_arg(poly_ahd_short, AHD_rad, xD))
-		PLxD = hbond_poly_eval(
-			poly_ahd_long, ahd_arg(poly_ahd_long, AHD_rad, xD))
-		FSr = hbond_fade( fades.get(entry['fade_AHdist']), AH)
-		FLr = 0.0
-		fbah_s_name = entry['fade_cosBAH_short']
-		fbah_l_name = entry['fade_cosBAH_long']
-		fbah_s = fades.get(fbah_s_name)
-		fbah_l = fades.get(fbah_l_name)
-		FxH = hbond_fade(fbah_l, xH)
-		fahd_s = fades.get(entry['fade_cosAHD_short'])
-		FxD = hbond_fade(fahd_s, xD)
-		e = (Pr * FxD * FxH
-			+ FSr * (PSxD * FxH + FxD * PSxH)
-			+ FLr * (PLxD * FxH + FxD * PLxH))
-		acc_hyb = params.get('HBond_data', {}) \
-			.get('acc_hybridization', {}).get(a['chem'])
-		s = (don_str_tab.get(d['chem'], 1.0) * acc_str_tab.get(a['chem'], 1.0))
-		e *= s
-		if acc_hyb == 'SP2_HYBRID' and a.get('B2') is not None:
-			B2_xyz = coords[a['B2']]
-			b1 = B_xyz - B2_xyz
-			b2 = A_xyz - B_xyz
-			b3 = H_xyz - A_xyz
-			n1 = np.cross(b1, b2); n2 = np.cross(b2, b3)
-			n1n = np.linalg.norm(n1); n2n = np.linalg.norm(n2)
-			if n1n > 1e-9 and n2n > 1e-9:
-				m1 = n1 / n1n; m2 = n2 / n2n
-				cos_chi = float(np.dot(m1, m2))
-				sin_chi_sign = float(np.dot(np.cross(m1, m2),
-					b2 / max(np.linalg.norm(b2), 1e-12)))
-				chi = math.atan2(sin_chi_sign, cos_chi)
-				d_p = float(HS['BAH180_rise'])
-				m_p = float(HS['fade_slope'])
-				l_p = float(HS['outer_width'])
-				PI = math.pi
-				PI_minus_BAH = math.acos( max(-1.0, min(1.0, xH)))
-				BAH = PI - PI_minus_BAH
-				H_chi = (math.cos(2 * chi) + 1) * 0.5
-				if BAH >= PI * 2.0 / 3.0:
-					F_p = d_p * 0.5 * math.cos(3 * PI_minus_BAH) \
-						+ d_p * 0.5 - 0.5
-					G_p = d_p - 0.5
-				elif BAH >= PI * (2.0 / 3.0 - l_p):
-					outer = math.cos( PI - (PI * 2.0 / 3.0 - BAH) / l_p)
-					F_p = m_p * 0.5 * outer + m_p * 0.5 - 0.5
-					G_p = (m_p - d_p) * 0.5 * outer \
-						+ (m_p - d_p) * 0.5 + d_p - 0.5
-				else:
-					F_p = m_p - 0.5; G_p = m_p - 0.5
-				e += s * (H_chi * F_p + (1 - H_chi) * G_p)
-		elif acc_hyb == 'SP3_HYBRID' and a['chem'] in (
-				'hbacc_HXL', 'hbacc_AHX') and a.get('B2') is not None:
-			B2_xyz = coords[a['B2']]
-			b1 = H_xyz - A_xyz
-			b2 = A_xyz - B_xyz
-			b3 = B_xyz - B2_xyz
-			n1 = np.cross(b1, b2); n2 = np.cross(b2, b3)
-			n1n = np.linalg.norm(n1); n2n = np.linalg.norm(n2)
-			if n1n > 1e-9 and n2n > 1e-9:
-				m1 = n1 / n1n; m2 = n2 / n2n
-				cos_chi = float(np.dot(m1, m2))
-				sin_chi_sign = float(np.dot(np.cross(m1, m2),
-					b2 / max(np.linalg.norm(b2), 1e-12)))
-				chi = math.atan2(sin_chi_sign, cos_chi)
-				PI = math.pi
-				max_penalty = float(HS['max_penalty'])
-				PI_minus_BAH = math.acos( max(-1.0, min(1.0, xH)))
-				BAH = PI - PI_minus_BAH
-				chi_scale = 0.0
-				if ((chi > PI/3 and chi < PI/2) or
-						(chi < -PI/3 and chi > -PI/2) or
-						(chi > 3*PI/2 and chi < 5*PI/3)):
-					chi_scale = (-math.cos(6 * chi) + 1) / 2
-				elif ((chi > PI/2 and chi < 3*PI/2) or
-						(chi < -PI/2 and chi > -3*PI/2)):
-					chi_scale = 1.0
-				BAH_bonus = -1.0
-				if BAH > 2 * PI / 3:
-					BAH_bonus = -math.cos(3 * BAH) / 2 - 0.5
-				sp3_acc_penalty = (s * max_penalty
-					* (1 + BAH_bonus * chi_scale))
-				e += sp3_acc_penalty
-		input_e = e
-		if input_e > HS['fade_hi']:
-			return
-		if input_e > HS['fade_lo']:
-			e = (HS['fade_c0'] + HS['fade_c1'] * input_e
-				+ HS['fade_c2'] * input_e * input_e)
-		w = entry['weight']
-		don_is_bb = atoms[d['D']][0] == 'N'
-		acc_is_bb = atoms[a['A']][0] in ('O', 'OXT', 'OT1', 'OT2')
-		all_hbonds.append({
-			'ri_d': d['ri'], 'd_atom': atoms[d['H']][0],
-			'ri_a': a['ri'], 'a_atom': atoms[a['A']][0],
-			'e': e, 'w': w,
-			'don_is_bb': don_is_bb,
-			'acc_is_bb': acc_is_bb,
-			'AH': AH, 'cosBAH': cosBAH, 'cosAHD': cosAHD})
-	def fullatomhbond(pose, cache, per_hb=None):
-		'''
-		Compute the hydrogen-bond energy with the four categories partitioned
+			np.ndarray: polynomial values, clamped at the table endpoints;
+			with grad=True a tuple (values, d/dx)
+		'''
+		c = poly['coeffs'][k]
+		v = c[:, 0].copy()
+		dv = np.zeros_like(v)
+		for i in range(1, c.shape[1]):
+			if grad: dv = dv * x + v
+			v = v * x + c[:, i]
+		hi = x >= poly['xmax'][k]; lo = x <= poly['xmin'][k]
+		v = np.where(hi, poly['max_val'][k], v)
+		v = np.where(lo, poly['min_val'][k], v)
+		if not grad: return v
+		return v, np.where(hi | lo, 0.0, dv)
+	def hbondfadearray(fade, k, x, grad=False):
+		'''
+		Smoothstep fade-out weights of compiled fade rows across the
+		distance shell
 		Arguments:
 		----------
+			fade: dict - compiled fade table from hbondtables
+			k:    np.ndarray - fade row per value
+			x:    np.ndarray - query values
+			grad: bool - if True also return the derivatives in x
+		Returns:
+		--------
+			np.ndarray: fade weights in [0, 1]; with grad=True a tuple
+			(weights, d/dx)
+		'''
+		mn1 = fade['min1'][k]; mn2 = fade['min2'][k]
+		mx1 = fade['max1'][k]; mx2 = fade['max2'][k]
+		with np.errstate(invalid='ignore', over='ignore', divide='ignore'):
+			rise = x < mn2
+			t = np.where(rise, (x - mn1) / fade['lo_w'][k],
+				(mx2 - x) / fade['hi_w'][k])
+			v = t * t * (3.0 - 2.0 * t)
+			if grad:
+				dv = 6.0 * t * (1.0 - t) * np.where(rise,
+					1.0 / fade['lo_w'][k], -1.0 / fade['hi_w'][k])
+		flat = (mn2 <= x) & (x <= mx1); out = (x <= mn1) | (x >= mx2)
+		v = np.where(flat, 1.0, v)
+		v = np.where(out, 0.0, v)
+		if not grad: return v
+		return v, np.where(flat | out, 0.0, dv)
+	def hbondindex(pose, cache):
+		'''
+		Donor and acceptor index of a topology for the vectorised h-bond
+		evaluator: atom triples, residues, chemical-type ids, strengths and
+		acceptor hybridisation, built once and kept in the cache
+		Arguments:
+		----------
+			pose:  Pose - structure being scored
 			cache: dict - ScoreMatch cache
 		Returns:
 		--------
-			dict: per-category raw and weighted contributions ('sr_bb', 'lr_bb',
-				'bb_sc', 'sc')
+			dict: donor arrays ('D', 'H', 'd_ri', 'd_chem', 'd_str',
+				'd_bb'), acceptor arrays ('A', 'B', 'B2', 'a_ri', 'a_chem',
+				'a_str', 'a_bb', 'hyb'), atom names 'd_name'/'a_name' and
+				the compiled 'tables'
 		'''
-		HS = params.get('HBondSp2') or {}
 		hb = params.get('HBond_data') or {}
-		if not hb: return {'SR_BB': 0.0, 'LR_BB': 0.0, 'BB_SC': 0.0, 'SC': 0.0}
 		donor_map, acceptor_map, base_map = hbond_chemtype_maps()
-		eval_key = hbond_eval_lookup(hb)
-		polys = hb['polynomials']; fades = hb['fade_intervals']
+		tables = hbondtables(hb)
 		don_str_tab = hb['donor_strengths']
 		acc_str_tab = hb['acceptor_strengths']
+		acc_hyb = hb.get('acc_hybridization', {})
 		atoms = pose.data['Atoms']
-		coords = np.asarray(pose.data['Coordinates'])
 		bonds = cache.get('adj') or pose.data['Bonds']
 		aas = pose.data.get('Amino Acids') or {}
 		atom_to_res = {}
 		res_atom = {}
 		for ri, info in aas.items():
 			tri = info[5] if len(info) >= 6 else None
-			if tri == 'HIS': pass
 			for ai in info[2] + info[3]:
 				ai = int(ai)
 				atom_to_res[ai] = (int(ri), tri)
 				res_atom.setdefault((int(ri), atoms[ai][0]), ai)
-		nb_count = {}
-		nb_xyz = {}
-		for ri, info in aas.items():
-			tri = info[5] if len(info) >= 6 else None
-			nb_atom = 'CA' if tri == 'GLY' else 'CB'
-			ai = res_atom.get((int(ri), nb_atom))
-			if ai is None:
-				ai = res_atom.get((int(ri), 'CA'))
-			if ai is not None:
-				nb_xyz[int(ri)] = coords[ai]
-		ri_list = list(nb_xyz.keys())
-		nb_arr = np.stack([nb_xyz[r] for r in ri_list], axis=0)
-		dd = np.linalg.norm(nb_arr[:, None, :] - nb_arr[None, :, :], axis=2)
-		within = (dd < 10.0)
-		counts = within.sum(axis=1)
-		for k, r in enumerate(ri_list):
-			nb_count[r] = int(counts[k])
 		donors = []
 		for ai, info in atoms.items():
 			if info[1] not in ('N', 'O'): continue
@@ -3721,8 +4791,7 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 				jinfo = atoms.get(int(j))
 				if jinfo is None: continue
 				if jinfo[1] != 'H': continue
-				donors.append({'D': int(ai), 'H': int(j),
-					'ri': ri, 'tri': tri, 'chem': donor_map[key]})
+				donors.append((int(ai), int(j), ri, donor_map[key]))
 		acceptors = []
 		for ai, info in atoms.items():
 			if info[1] not in ('N', 'O'): continue
@@ -3757,44 +4826,399 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 					b2_ai = sorted(same_res_nbrs)[0]
 				elif other_nbrs:
 					b2_ai = sorted(other_nbrs)[0]
-			acceptors.append({'A': int(ai), 'B': b_ai, 'B2': b2_ai,
-				'ri': ri, 'tri': tri, 'chem': chem})
+			hyb = 0
+			if b2_ai is not None:
+				if acc_hyb.get(chem) == 'SP2_HYBRID':
+					hyb = 1
+				elif acc_hyb.get(chem) == 'SP3_HYBRID' and chem in (
+						'hbacc_HXL', 'hbacc_AHX'):
+					hyb = 2
+			acceptors.append((int(ai), b_ai, -1 if b2_ai is None else b2_ai,
+				ri, chem, hyb))
+		nd = len(tables['don_chem']); na = len(tables['acc_chem'])
+		idx = {
+			'D':      np.array([d[0] for d in donors], dtype=np.int64),
+			'H':      np.array([d[1] for d in donors], dtype=np.int64),
+			'd_ri':   np.array([d[2] for d in donors], dtype=np.int64),
+			'd_chem': np.array([tables['don_chem'].get(d[3], nd)
+				for d in donors], dtype=np.int64),
+			'd_str':  np.array([don_str_tab.get(d[3], 1.0)
+				for d in donors], dtype=np.float64),
+			'd_bb':   np.array([atoms[d[0]][0] == 'N' for d in donors],
+				dtype=bool),
+			'd_name': [atoms[d[1]][0] for d in donors],
+			'A':      np.array([a[0] for a in acceptors], dtype=np.int64),
+			'B':      np.array([a[1] for a in acceptors], dtype=np.int64),
+			'B2':     np.array([a[2] for a in acceptors], dtype=np.int64),
+			'a_ri':   np.array([a[3] for a in acceptors], dtype=np.int64),
+			'a_chem': np.array([tables['acc_chem'].get(a[4], na)
+				for a in acceptors], dtype=np.int64),
+			'a_str':  np.array([acc_str_tab.get(a[4], 1.0)
+				for a in acceptors], dtype=np.float64),
+			'a_bb':   np.array([atoms[a[0]][0] in ('O', 'OXT', 'OT1', 'OT2')
+				for a in acceptors], dtype=bool),
+			'a_name': [atoms[a[0]][0] for a in acceptors],
+			'hyb':    np.array([a[5] for a in acceptors], dtype=np.int64),
+			'tables': tables}
+		return idx
+	def hbondchi(b1, b2, b3):
+		'''
+		Row-wise dihedral about b2 of three bond vectors, for the
+		acceptor-plane corrections
+		Arguments:
+		----------
+			b1, b2, b3: np.ndarray - (m, 3) bond vectors
+		Returns:
+		--------
+			tuple: (chi, ok) - dihedral in radians and a mask of rows whose
+				two plane normals are non-degenerate
+		'''
+		n1 = np.cross(b1, b2); n2 = np.cross(b2, b3)
+		n1n = np.linalg.norm(n1, axis=1); n2n = np.linalg.norm(n2, axis=1)
+		ok = (n1n > 1e-9) & (n2n > 1e-9)
+		m1 = n1 / np.where(ok, n1n, 1.0)[:, None]
+		m2 = n2 / np.where(ok, n2n, 1.0)[:, None]
+		b2n = np.maximum(np.linalg.norm(b2, axis=1), 1e-12)
+		cos_chi = np.einsum('ij,ij->i', m1, m2)
+		sin_chi = np.einsum('ij,ij->i', np.cross(m1, m2), b2 / b2n[:, None])
+		return np.arctan2(sin_chi, cos_chi), ok
+	def hbondforces(cache, live, cat, chain, idx, ix, iy, vDH, vAH, vBA,
+			dE_AH, dE_xH, dE_cos, dE_chi, chi_q):
+		'''
+		Record the per-category forces of the hydrogen bonds from the
+		derivatives of each bond's energy in its geometry
+		Arguments:
+		----------
+			cache: dict - ScoreMatch cache
+			live:  np.ndarray - mask of the scored rows kept after the fade
+			cat:   np.ndarray - category of each kept row, -1 if dropped
+			chain: np.ndarray - derivative of the soft fade per kept row
+			idx:   dict - hbondindex result
+			ix, iy: np.ndarray - donor and acceptor row of each kept row
+			vDH, vAH, vBA: np.ndarray - D-H, A-H and B-A vectors per row
+			dE_AH, dE_xH, dE_cos, dE_chi: np.ndarray - energy derivatives
+				in the A-H distance, -cosBAH, cosAHD and chi per row
+			chi_q: np.ndarray - (n, 4) atoms chi is measured on, -1 if none
+		Returns:
+		--------
+			No return value, the per-category forces are updated in place
+		'''
+		vDH = vDH[live]; vAH = vAH[live]; vBA = vBA[live]
+		g = chain[:, None]
+		nDH = np.maximum(np.linalg.norm(vDH, axis=1), 1e-12)[:, None]
+		nAH = np.maximum(np.linalg.norm(vAH, axis=1), 1e-12)[:, None]
+		nBA = np.maximum(np.linalg.norm(vBA, axis=1), 1e-12)[:, None]
+		cAHD = np.einsum('ij,ij->i', vDH, vAH)[:, None] / (nDH * nAH)
+		cBAH = -np.einsum('ij,ij->i', vBA, vAH)[:, None] / (nBA * nAH)
+		k_AH = g * dE_AH[live][:, None]
+		k_cos = g * dE_cos[live][:, None]
+		k_BAH = -g * dE_xH[live][:, None]
+		# d|H-A|, dcosAHD and dcosBAH in the D, H, A and B positions
+		gD = k_cos * (vAH / (nDH * nAH) - cAHD * vDH / (nDH * nDH))
+		gA_ahd = k_cos * (vDH / (nDH * nAH) - cAHD * vAH / (nAH * nAH))
+		gB = k_BAH * (-vAH / (nBA * nAH) - cBAH * vBA / (nBA * nBA))
+		gH_bah = k_BAH * (vBA / (nBA * nAH) + cBAH * vAH / (nAH * nAH))
+		gH = -k_AH * vAH / nAH - gD - gA_ahd + gH_bah
+		gA = k_AH * vAH / nAH + gA_ahd - gB - gH_bah
+		dchi = g[:, 0] * dE_chi[live] * (math.pi / 180.0)
+		q = chi_q[live]
+		for c, name in enumerate(HB_CATS):
+			rows = cat == c
+			if not np.any(rows): continue
+			atoms = np.concatenate([idx['D'][ix[rows]], idx['H'][ix[rows]],
+				idx['A'][iy[rows]], idx['B'][iy[rows]]])
+			tallyatoms(cache, name, atoms, -np.concatenate([gD[rows],
+				gH[rows], gA[rows], gB[rows]]))
+			torsionforces(cache, name, q[rows], dchi[rows])
+	def hbondstate(idx, Hc, Ac, bh, ba):
+		'''
+		Search state for re-scoring the hydrogen bonds of a few moved
+		residues: the hydrogens and acceptors binned into 3.2 Å cells, the
+		entries of each donor and acceptor atom, and the live
+		backbone-backbone bonds with their per-residue counts
+		Arguments:
+		----------
+			idx: dict - hbondindex tables
+			Hc:  ndarray - (nD, 3) hydrogen coordinates
+			Ac:  ndarray - (nA, 3) acceptor coordinates
+			bh:  ndarray - donor entry of each live backbone-backbone bond
+			ba:  ndarray - acceptor entry of each of them
+		Returns:
+		--------
+			dict: 'grid' (hydrogens are ids 0..nD-1, acceptors follow),
+				'don' and 'acc' {atom: entries}, 'bb_h' and 'bb_a' {entry:
+				set of partner entries}, 'dres' and 'ares' {residue: count}
+		'''
+		nD = len(Hc)
+		state = {'grid': _cellgrid(np.arange(nD + len(Ac)),
+			np.concatenate([Hc, Ac]), 3.2), 'don': defaultdict(list),
+			'acc': defaultdict(list), 'bb_h': defaultdict(set),
+			'bb_a': defaultdict(set), 'dres': defaultdict(int),
+			'ares': defaultdict(int)}
+		for k, a in enumerate(idx['D'].tolist()): state['don'][a].append(k)
+		for k, a in enumerate(idx['A'].tolist()): state['acc'][a].append(k)
+		hbondbbres(state, [], [], idx, bh, ba, [], [], True)
+		return state
+	def hbondbbres(state, fD, fA, idx, bh, ba, rd, ra, commit):
+		'''
+		Residues that keep a live backbone-backbone hydrogen bond once the
+		bonds of some donor and acceptor entries are replaced by new ones
+		Arguments:
+		----------
+			state:  dict - hbondstate, updated in place when commit is set
+			fD:     sequence - donor entries whose bonds are replaced
+			fA:     sequence - acceptor entries whose bonds are replaced
+			idx:    dict - hbondindex tables
+			bh:     ndarray - donor entry of each new live bond
+			ba:     ndarray - acceptor entry of each of them
+			rd:     ndarray - donor residues to test
+			ra:     ndarray - acceptor residues to test
+			commit: bool - store the new bonds in state
+		Returns:
+		--------
+			tuple: (donor residues, acceptor residues) of rd and ra that
+				still donate or accept a backbone-backbone bond
+		'''
+		d_ri, a_ri = idx['d_ri'], idx['a_ri']
+		old = {(h, a) for h in list(fD) for a in state['bb_h'].get(h, ())}
+		old |= {(h, a) for a in list(fA) for h in state['bb_a'].get(a, ())}
+		new = set(zip(np.asarray(bh).tolist(), np.asarray(ba).tolist()))
+		dd, da = defaultdict(int), defaultdict(int)
+		for pairs, step in ((old, -1), (new, 1)):
+			for h, a in pairs:
+				dd[int(d_ri[h])] += step; da[int(a_ri[a])] += step
+		dres = [r for r in set(np.asarray(rd).tolist())
+			if state['dres'].get(r, 0) + dd.get(r, 0) > 0]
+		ares = [r for r in set(np.asarray(ra).tolist())
+			if state['ares'].get(r, 0) + da.get(r, 0) > 0]
+		if commit:
+			for h, a in old:
+				state['bb_h'][h].discard(a); state['bb_a'][a].discard(h)
+			for h, a in new:
+				state['bb_h'][h].add(a); state['bb_a'][a].add(h)
+			for r, v in dd.items(): state['dres'][r] += v
+			for r, v in da.items(): state['ares'][r] += v
+		return (np.array(dres, dtype=np.int64),
+			np.array(ares, dtype=np.int64))
+	def fullatomhbond(pose, cache, per_hb=None):
+		'''
+		Compute the hydrogen-bond energy with the four categories partitioned;
+		when Score has set a '_focus' residue set only bonds with a donor or
+		acceptor in it are summed. With the graph's search state in
+		_focus['hbond'] only those donors and acceptors are searched, and the
+		backbone-backbone bonds that decide which backbone-sidechain bonds
+		count are taken from the state kept since Score.Graph
+		Arguments:
+		----------
+			cache: dict - ScoreMatch cache
+		Returns:
+		--------
+			dict: per-category raw and weighted contributions ('sr_bb', 'lr_bb',
+				'bb_sc', 'sc')
+		'''
+		HS = params.get('HBondSp2') or {}
+		hb = params.get('HBond_data') or {}
+		if not hb: return {'SR_BB': 0.0, 'LR_BB': 0.0, 'BB_SC': 0.0, 'SC': 0.0}
+		idx = cache.get('_hbond_index')
+		if idx is None:
+			idx = hbondindex(pose, cache)
+			cache['_hbond_index'] = idx
 		cat_totals = {'SR_BB': 0.0, 'LR_BB': 0.0, 'BB_SC': 0.0, 'SC': 0.0}
-		if not donors or not acceptors: return cat_totals
-		all_hbonds = []
-		H_idx = np.array([d['H'] for d in donors], dtype=np.int64)
-		A_idx = np.array([a['A'] for a in acceptors], dtype=np.int64)
-		Hc = coords[H_idx]; Ac = coords[A_idx]
-		dHA = np.linalg.norm( Hc[:, None, :] - Ac[None, :, :], axis=2)
-		within = np.where(dHA < 3.2)
-		for ix, iy in zip(*within):
-			hbondpair(ix, iy, HS, acc_str_tab, acceptors, all_hbonds, atoms,
-				coords, dHA, don_str_tab, donors, eval_key, fades, polys)
-		don_bbg = set()
-		acc_bbg = set()
-		for h in all_hbonds:
-			if h['don_is_bb'] and h['acc_is_bb']:
-				don_bbg.add(h['ri_d'])
-				acc_bbg.add(h['ri_a'])
-		for h in all_hbonds:
-			if h['don_is_bb'] and not h['acc_is_bb']:
-				if h['ri_d'] in don_bbg: continue
-			elif not h['don_is_bb'] and h['acc_is_bb']:
-				if h['ri_a'] in acc_bbg: continue
-			e = h['e']; w = h['w']
-			cat = None
-			if w == 'hbw_SR_BB':
-				cat_totals['SR_BB'] += e; cat = 'SR_BB'
-			elif w == 'hbw_LR_BB':
-				cat_totals['LR_BB'] += e; cat = 'LR_BB'
-			elif w in ('hbw_SR_BB_SC', 'hbw_LR_BB_SC'):
-				cat_totals['BB_SC'] += e; cat = 'BB_SC'
-			elif w == 'hbw_SC':
-				cat_totals['SC'] += e; cat = 'SC'
-			if per_hb is not None and cat is not None:
-				per_hb.append((h['ri_d'], h['d_atom'], h['ri_a'],
-					h['a_atom'], e, cat, h['AH'], h['cosBAH'],
-					h['cosAHD']))
+		nD = len(idx['H']); nA = len(idx['A'])
+		if nD == 0 or nA == 0: return cat_totals
+		tables = idx['tables']
+		coords = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		Hc = coords[idx['H']]; Ac = coords[idx['A']]
+		focus = cache.get('_focus')
+		state = focus.get('hbond') if focus is not None else None
+		if state is not None:
+			fD = np.array([k for a in focus['ids'].tolist()
+				for k in state['don'].get(a, ())], dtype=np.int64)
+			fA = np.array([k for a in focus['ids'].tolist()
+				for k in state['acc'].get(a, ())], dtype=np.int64)
+			pts = np.concatenate([Hc, Ac])
+			a, b = _cellfocus(state['grid'], pts,
+				np.concatenate([fD, fA + nD]), 3.2)
+			i = np.minimum(a, b); j = np.maximum(a, b)
+		else:
+			i, j = _cellpairs(np.concatenate([Hc, Ac]), 3.2)
+		cross = (i < nD) & (j >= nD)
+		ix = i[cross]; iy = j[cross] - nD
+		order = np.lexsort((iy, ix))
+		ix = ix[order]; iy = iy[order]
+		AH = np.linalg.norm(Hc[ix] - Ac[iy], axis=1)
+		diff = idx['a_ri'][iy] - idx['d_ri'][ix]
+		sep = np.zeros(len(diff), dtype=np.int64)
+		near = np.abs(diff) <= 4
+		sep[near] = np.array([1, 2, 3, 4, 0, 4, 5, 6, 7])[diff[near] + 4]
+		ent = tables['lookup'][idx['d_chem'][ix], idx['a_chem'][iy], sep]
+		keep = ((AH < 3.2) & (idx['D'][ix] != idx['A'][iy])
+			& (diff != 0) & (ent >= 0))
+		if focus is not None and state is None:
+			touch = focus['atoms'][idx['D'][ix]] | focus['atoms'][idx['A'][iy]]
+			keep &= touch | (idx['d_bb'][ix] & idx['a_bb'][iy])
+		ix = ix[keep]; iy = iy[keep]; AH = AH[keep]; ent = ent[keep]
+		if len(ix) == 0 and state is None: return cat_totals
+		D_xyz = coords[idx['D'][ix]]; H_xyz = Hc[ix]
+		A_xyz = Ac[iy]; B_xyz = coords[idx['B'][iy]]
+		vDH = D_xyz - H_xyz; vAH = A_xyz - H_xyz; vBA = B_xyz - A_xyz
+		nDH = np.linalg.norm(vDH, axis=1)
+		nAH = np.linalg.norm(vAH, axis=1)
+		nBA = np.linalg.norm(vBA, axis=1)
+		cosAHD = (np.einsum('ij,ij->i', vDH, vAH)
+			/ np.maximum(nDH * nAH, 1e-12))
+		cosBAH = (np.einsum('ij,ij->i', vBA, -vAH)
+			/ np.maximum(nBA * nAH, 1e-12))
+		xH = -cosBAH
+		xD = -cosAHD
+		AHD_rad = np.arccos(np.clip(cosAHD, -1.0, 1.0))
+		poly = tables['poly']; fade = tables['fade']; E = tables['entry']
+		k_ahd = E['cosAHD_short'][ent]
+		x_ahd = np.where(poly['use_rad'][k_ahd], AHD_rad, xD)
+		grad = cache.get('_forces') is not None
+		if grad:
+			Pr, dPr = hbondpolyarray(poly, E['AHdist'][ent], AH, True)
+			PSxH, dPSxH = hbondpolyarray(poly, E['cosBAH_short'][ent], xH,
+				True)
+			PSxD, dPSxD = hbondpolyarray(poly, k_ahd, x_ahd, True)
+			FSr, dFSr = hbondfadearray(fade, E['fade_AHdist'][ent], AH, True)
+			FxH, dFxH = hbondfadearray(fade, E['fade_cosBAH'][ent], xH, True)
+			FxD, dFxD = hbondfadearray(fade, E['fade_cosAHD'][ent], xD, True)
+		else:
+			Pr = hbondpolyarray(poly, E['AHdist'][ent], AH)
+			PSxH = hbondpolyarray(poly, E['cosBAH_short'][ent], xH)
+			PSxD = hbondpolyarray(poly, k_ahd, x_ahd)
+			FSr = hbondfadearray(fade, E['fade_AHdist'][ent], AH)
+			FxH = hbondfadearray(fade, E['fade_cosBAH'][ent], xH)
+			FxD = hbondfadearray(fade, E['fade_cosAHD'][ent], xD)
+		e = Pr * FxD * FxH + FSr * (PSxD * FxH + FxD * PSxH)
+		s = idx['d_str'][ix] * idx['a_str'][iy]
+		e = e * s
+		if grad:
+			# Derivatives of e in AH, xH and cosAHD, then in the acceptor
+			# plane dihedral chi (radians) of the (B2, B, A, H) quartet
+			dE_AH = s * (dPr * FxD * FxH + dFSr * (PSxD * FxH + FxD * PSxH))
+			dE_xH = s * (Pr * FxD * dFxH + FSr * (PSxD * dFxH
+				+ FxD * dPSxH))
+			dx_ahd = np.where(poly['use_rad'][k_ahd],
+				-1.0 / np.sqrt(np.maximum(1.0 - cosAHD * cosAHD, 1e-12)),
+				-1.0)
+			dE_cos = s * (FSr * FxH * dPSxD * dx_ahd
+				- dFxD * (Pr * FxH + FSr * PSxH))
+			dBAH = 1.0 / np.sqrt(np.maximum(1.0 - xH * xH, 1e-12))
+			dE_chi = np.zeros(len(e))
+			chi_q = np.full((len(e), 4), -1, dtype=np.int64)
+		hyb = idx['hyb'][iy]
+		PI = math.pi
+		m = hyb == 1
+		if np.any(m):
+			B2_xyz = coords[idx['B2'][iy[m]]]
+			chi, ok = hbondchi(B_xyz[m] - B2_xyz, A_xyz[m] - B_xyz[m],
+				H_xyz[m] - A_xyz[m])
+			d_p = float(HS['BAH180_rise'])
+			m_p = float(HS['fade_slope'])
+			l_p = float(HS['outer_width'])
+			PI_minus_BAH = np.arccos(np.clip(xH[m], -1.0, 1.0))
+			BAH = PI - PI_minus_BAH
+			H_chi = (np.cos(2 * chi) + 1) * 0.5
+			with np.errstate(divide='ignore', invalid='ignore'):
+				outer = np.cos(PI - (PI * 2.0 / 3.0 - BAH) / l_p)
+			far = BAH >= PI * 2.0 / 3.0
+			mid = ~far & (BAH >= PI * (2.0 / 3.0 - l_p))
+			F_p = np.where(far,
+				d_p * 0.5 * np.cos(3 * PI_minus_BAH) + d_p * 0.5 - 0.5,
+				np.where(mid, m_p * 0.5 * outer + m_p * 0.5 - 0.5,
+					m_p - 0.5))
+			G_p = np.where(far, d_p - 0.5,
+				np.where(mid, (m_p - d_p) * 0.5 * outer
+					+ (m_p - d_p) * 0.5 + d_p - 0.5, m_p - 0.5))
+			sp2 = s[m] * (H_chi * F_p + (1 - H_chi) * G_p)
+			e[m] = np.where(ok, e[m] + sp2, e[m])
+			if grad:
+				with np.errstate(divide='ignore', invalid='ignore'):
+					d_out = -np.sin(PI - (PI * 2.0 / 3.0 - BAH) / l_p) / l_p
+				dF = np.where(far, 1.5 * d_p * np.sin(3 * PI_minus_BAH),
+					np.where(mid, m_p * 0.5 * d_out, 0.0)) * dBAH[m]
+				dG = np.where(mid & ~far, (m_p - d_p) * 0.5 * d_out,
+					0.0) * dBAH[m]
+				dE_xH[m] += np.where(ok, s[m] * (H_chi * dF
+					+ (1 - H_chi) * dG), 0.0)
+				dE_chi[m] = np.where(ok, -s[m] * np.sin(2 * chi)
+					* (F_p - G_p), 0.0)
+				chi_q[m] = np.stack([idx['B2'][iy[m]], idx['B'][iy[m]],
+					idx['A'][iy[m]], idx['H'][ix[m]]], axis=1)
+		m = hyb == 2
+		if np.any(m):
+			B2_xyz = coords[idx['B2'][iy[m]]]
+			chi, ok = hbondchi(H_xyz[m] - A_xyz[m], A_xyz[m] - B_xyz[m],
+				B_xyz[m] - B2_xyz)
+			max_penalty = float(HS['max_penalty'])
+			BAH = PI - np.arccos(np.clip(xH[m], -1.0, 1.0))
+			ramp = (((chi > PI/3) & (chi < PI/2))
+				| ((chi < -PI/3) & (chi > -PI/2))
+				| ((chi > 3*PI/2) & (chi < 5*PI/3)))
+			flat = (((chi > PI/2) & (chi < 3*PI/2))
+				| ((chi < -PI/2) & (chi > -3*PI/2)))
+			chi_scale = np.where(ramp, (-np.cos(6 * chi) + 1) / 2,
+				np.where(flat, 1.0, 0.0))
+			BAH_bonus = np.where(BAH > 2 * PI / 3,
+				-np.cos(3 * BAH) / 2 - 0.5, -1.0)
+			sp3 = s[m] * max_penalty * (1 + BAH_bonus * chi_scale)
+			e[m] = np.where(ok, e[m] + sp3, e[m])
+			if grad:
+				# This chi runs H->B2, the negative of the (B2, B, A, H)
+				# dihedral the forces are taken on.
+				d_scale = np.where(ramp, 3.0 * np.sin(6 * chi), 0.0)
+				d_bonus = np.where(BAH > 2 * PI / 3, 1.5 * np.sin(3 * BAH),
+					0.0)
+				dE_xH[m] += np.where(ok, s[m] * max_penalty * chi_scale
+					* d_bonus * dBAH[m], 0.0)
+				dE_chi[m] = np.where(ok, -s[m] * max_penalty * BAH_bonus
+					* d_scale, 0.0)
+				chi_q[m] = np.stack([idx['B2'][iy[m]], idx['B'][iy[m]],
+					idx['A'][iy[m]], idx['H'][ix[m]]], axis=1)
+		live = ~(e > HS['fade_hi'])
+		ix = ix[live]; iy = iy[live]; ent = ent[live]; e = e[live]
+		soft = e > HS['fade_lo']
+		if grad:
+			chain = np.where(soft, HS['fade_c1'] + 2.0 * HS['fade_c2'] * e,
+				1.0)
+		e = np.where(soft, HS['fade_c0'] + HS['fade_c1'] * e
+			+ HS['fade_c2'] * e * e, e)
+		ri_d = idx['d_ri'][ix]; ri_a = idx['a_ri'][iy]
+		don_bb = idx['d_bb'][ix]; acc_bb = idx['a_bb'][iy]
+		bbbb = don_bb & acc_bb
+		if state is not None:
+			dres, ares = hbondbbres(state, fD, fA, idx, ix[bbbb], iy[bbbb],
+				ri_d, ri_a, focus['commit'])
+			if focus['commit']:
+				_cellmove(state['grid'], np.concatenate([fD, fA + nD]),
+					np.concatenate([Hc[fD], Ac[fA]]))
+		else:
+			dres, ares = ri_d[bbbb], ri_a[bbbb]
+			if focus is None and cache.get('_tally') is not None:
+				cache['_hbond_graph'] = hbondstate(idx, Hc, Ac, ix[bbbb],
+					iy[bbbb])
+		drop = ((don_bb & ~acc_bb & np.isin(ri_d, dres))
+			| (~don_bb & acc_bb & np.isin(ri_a, ares)))
+		cat = np.where(drop, -1, E['cat'][ent])
+		if focus is not None and state is None:
+			cat = np.where(focus['atoms'][idx['D'][ix]]
+				| focus['atoms'][idx['A'][iy]], cat, -1)
+		for c, name in enumerate(HB_CATS):
+			cat_totals[name] = float(np.sum(e[cat == c]))
+			tallypairs(cache, name, idx['D'][ix[cat == c]],
+				idx['A'][iy[cat == c]], e[cat == c])
+		if grad:
+			hbondforces(cache, live, cat, chain, idx, ix, iy, vDH, vAH, vBA,
+				dE_AH, dE_xH, dE_cos, dE_chi, chi_q)
+		if per_hb is not None:
+			AH = AH[live]; cosBAH = cosBAH[live]; cosAHD = cosAHD[live]
+			for k in np.flatnonzero(cat >= 0):
+				per_hb.append((int(ri_d[k]), idx['d_name'][ix[k]],
+					int(ri_a[k]), idx['a_name'][iy[k]], float(e[k]),
+					HB_CATS[cat[k]], float(AH[k]), float(cosBAH[k]),
+					float(cosAHD[k])))
 		return cat_totals
 	cache = {}
 	if 'XS_atom_types' in params:
@@ -3809,6 +5233,7 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 	cache['fullatomcache'] = fullatomcache
 	cache['bfswithin'] = bfswithin
 	cache['countnrot'] = countnrot
+	cache['rotatablebonds'] = rotatablebonds
 	cache['countnumtors'] = countnumtors
 	cache['ringatoms'] = ringatoms
 	cache['topologyhash'] = topologyhash
@@ -3817,6 +5242,11 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 	cache['gausspair'] = gausspair
 	cache['slopestep'] = slopestep
 	cache['fullatompairs'] = fullatompairs
+	cache['tallypairs'] = tallypairs
+	cache['tallyatoms'] = tallyatoms
+	cache['tallyforces'] = tallyforces
+	cache['torsionforces'] = torsionforces
+	cache['angleforces'] = angleforces
 	cache['ljpair'] = ljpair
 	cache['fullatomljraw'] = fullatomljraw
 	cache['lkisopair'] = lkisopair
@@ -3827,15 +5257,17 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 	cache['fadun_entropy_grid'] = fadun_entropy_grid
 	cache['fadun_spline_eval'] = fadun_spline_eval
 	cache['fadun_nrchi_data'] = fadun_nrchi_data
+	cache['fadun_tables'] = _faduntables
+	cache['fadun_nrchi_tables'] = fadun_nrchi_tables
+	cache['fadun_bicubic'] = _bicubic
+	cache['bspline_stencil'] = _bsplinestencil
+	cache['periodic_matrices'] = _periodicmatrices
+	cache['spline_grids'] = _splinegrids
 	cache['fadun_ypp_psi_grid'] = fadun_ypp_psi_grid
 	cache['fadun_nrchi_eval'] = fadun_nrchi_eval
 	cache['periodic_cubic_spline'] = periodic_cubic_spline
 	cache['spline_eval_1d'] = spline_eval_1d
-	cache['rama_spline_eval'] = rama_spline_eval
 	cache['hbond_chemtype_maps'] = hbond_chemtype_maps
-	cache['hbond_eval_lookup'] = hbond_eval_lookup
-	cache['hbond_poly_eval'] = hbond_poly_eval
-	cache['hbond_fade'] = hbond_fade
 	def cached_dihedral(pose, ri, dtype, chi_type=None):
 		'''
 		Memoised pose.GetDihedral: backbone phi/psi are requested per
@@ -3867,7 +5299,83 @@ def ScoreMatch(pose, params, ligand=None, xs_override=None, nrot_override=None):
 			raise
 		memo[key] = r
 		return r
+	def residuetorsions(pose):
+		'''
+		Atom quartets of every residue's phi, psi, omega and chi
+		dihedrals, as pose.GetDihedral picks them, found once per
+		topology and kept in the cache
+		Arguments:
+		----------
+			pose: Pose - structure being scored
+		Returns:
+		--------
+			dict: 'res' (R,) residue indices, 'phi', 'psi' and 'omega'
+				(R, 4) and 'chi' (R, 4, 4) atom indices; -1 where the
+				neighbouring residue is missing (GetDihedral gives NaN),
+				-2 where an atom is missing (GetDihedral raises)
+		'''
+		idx = cache.get('_torsion_index')
+		if idx is not None: return idx
+		aas = pose.data.get('Amino Acids') or {}
+		res = sorted(aas)
+		phi = np.full((len(res), 4), -1, dtype=np.int64)
+		psi = np.full((len(res), 4), -1, dtype=np.int64)
+		omega = np.full((len(res), 4), -1, dtype=np.int64)
+		chi = np.full((len(res), 4, 4), -2, dtype=np.int64)
+		def quartet(pairs):
+			try:
+				return [pose.GetAtomIdx(r, a) for r, a in pairs]
+			except Exception:
+				return -2
+		for k, ri in enumerate(res):
+			prv = pose._prevres(ri)
+			nxt = pose._nextres(ri)
+			if prv is not None:
+				phi[k] = quartet(((prv, 'C'), (ri, 'N'), (ri, 'CA'),
+					(ri, 'C')))
+			if nxt is not None:
+				psi[k] = quartet(((ri, 'N'), (ri, 'CA'), (ri, 'C'),
+					(nxt, 'N')))
+				omega[k] = quartet(((ri, 'CA'), (ri, 'C'), (nxt, 'N'),
+					(nxt, 'CA')))
+			sym = aas[ri][0].upper()
+			names = (pose.aminoacids.get(sym) or {}).get(
+				'Chi Angle Atoms') or []
+			for c, ca in enumerate(names[:4]):
+				chi[k, c] = quartet([(ri, a) for a in ca])
+		idx = {'res': np.array(res, dtype=np.int64),
+			'phi': phi, 'psi': psi, 'omega': omega, 'chi': chi}
+		cache['_torsion_index'] = idx
+		return idx
+	def torsionangles(X, quartets):
+		'''
+		Dihedral angles of many atom quartets in one pass, with the
+		formula of pose.GetDihedral
+		Arguments:
+		----------
+			X: np.ndarray - (n, 3) coordinates
+			quartets: np.ndarray - (..., 4) atom indices, negative if
+				undefined
+		Returns:
+		--------
+			np.ndarray: (...) angles in degrees, NaN where undefined
+		'''
+		q = np.asarray(quartets).reshape(-1, 4)
+		bad = (q < 0).any(axis=1)
+		p = X[np.where(q < 0, 0, q)]
+		u1 = p[:, 1] - p[:, 0]
+		u2 = p[:, 2] - p[:, 1]
+		u3 = p[:, 3] - p[:, 2]
+		c12 = np.cross(u1, u2)
+		c23 = np.cross(u2, u3)
+		a = np.einsum('ij,ij->i', u2, np.cross(c12, c23))
+		b = np.linalg.norm(u2, axis=1) * np.einsum('ij,ij->i', c12, c23)
+		out = np.degrees(np.arctan2(a, b))
+		out[bad] = np.nan
+		return out.reshape(np.shape(quartets)[:-1])
 	cache['cdih'] = cached_dihedral
+	cache['residuetorsions'] = residuetorsions
+	cache['torsionangles'] = torsionangles
 	def fullatomhbond_memo(pose, cache, per_hb=None):
 		'''
 		Memoised fullatomhbond: the four HBond terms each request the full
@@ -4424,6 +5932,8 @@ def Parameterise(cif_file, rotamer_json_file, tricode, unicode,
 	#     / ForceField / Score / Rotamers instances see the new residue
 	#     without restart.
 	DBLoad.cache_clear()
+	_smirkscacheclear()
+	_fadunclear()
 	print(f'Added {tricode} as "{unicode}" to database.json '
 		f'(Amino Acids + Rotamer Library)')
 
@@ -5856,8 +7366,99 @@ def Rotamers(index, pose):
 		if flip: mu = -mu
 		pose.RotateDihedral(index, float(mu), 'CHI', ci + 1)
 
+def _profiledelta(ff, start):
+	'''
+	ForceField profiling counters accumulated since a snapshot
+	Arguments:
+	----------
+		ff:    ForceField - evaluator with profile=True
+		start: dict - deep copy of ff.counters taken before the run
+	Returns:
+	--------
+		dict: 'calls', 'cache_builds', 'cache_seconds' and per-term
+		{'calls', 'seconds', 'fraction'} under 'terms', where fraction is
+		the term's share of the total term time
+	'''
+	now = ff.counters
+	terms = {}
+	for name, c in now['terms'].items():
+		c0 = start['terms'].get(name, {'calls': 0, 'seconds': 0.0})
+		terms[name] = {'calls': c['calls'] - c0['calls'],
+			'seconds': c['seconds'] - c0['seconds']}
+	total = sum(t['seconds'] for t in terms.values())
+	for t in terms.values():
+		t['fraction'] = t['seconds'] / total if total > 0 else 0.0
+	return {'calls': now['calls'] - start['calls'],
+		'cache_builds': now['cache_builds'] - start['cache_builds'],
+		'cache_seconds': now['cache_seconds'] - start['cache_seconds'],
+		'terms': terms}
+
+def _checkpointsave(path, kind, settings, ff, meta, arrays):
+	'''
+	Atomically write a driver checkpoint as an .npz archive
+	Arguments:
+	----------
+		path:     str - checkpoint file; the archive is written beside it
+			and moved into place, so a crash mid-write leaves the
+			previous checkpoint intact
+		kind:     str - driver name, checked again on resume
+		settings: dict - arguments a resumed run must repeat
+		ff:       ForceField or Score - its neighbour list is saved too
+		meta:     dict - JSON-safe loop scalars (the RNG bit-generator
+			state, step index, integrator and schedule state)
+		arrays:   dict - loop arrays (coordinates, velocities, forces and
+			the log so far); None entries are skipped
+	Returns:
+	--------
+		None: the file is written
+	'''
+	arrays = {k: np.asarray(a) for k, a in arrays.items() if a is not None}
+	nlist = getattr(ff, 'nlist', None)
+	if nlist is not None and nlist.pairs is not None:
+		arrays['nlist_i'], arrays['nlist_j'] = nlist.pairs
+		arrays['nlist_ref'] = nlist._ref
+		if nlist._box is not None: arrays['nlist_box'] = nlist._box
+	head = {'kind': kind, 'settings': settings, 'meta': meta}
+	tmp = '%s.tmp' % path
+	with open(tmp, 'wb') as f:
+		np.savez(f, header=np.array(json.dumps(head)), **arrays)
+	os.replace(tmp, path)
+
+def _checkpointload(path, kind, settings, ff):
+	'''
+	Read a driver checkpoint and reinstate the force field neighbour list
+	Arguments:
+	----------
+		path:     str - file written by _checkpointsave
+		kind:     str - driver name the checkpoint must come from
+		settings: dict - arguments of the resumed run; each must match
+			the value the checkpoint was written with
+		ff:       ForceField or Score - evaluator of the resumed run
+	Returns:
+	--------
+		tuple: (dict, dict) - the loop scalars and the loop arrays
+	'''
+	with np.load(path, allow_pickle=False) as z:
+		arrays = {k: z[k] for k in z.files}
+	head = json.loads(str(arrays.pop('header')))
+	if head['kind'] != kind:
+		raise ValueError('%s: %s is a %s checkpoint'
+			% (kind, path, head['kind']))
+	for key, value in settings.items():
+		if head['settings'].get(key) != value:
+			raise ValueError('%s: checkpoint was written with %s=%r, not %r'
+				% (kind, key, head['settings'].get(key), value))
+	nlist = getattr(ff, 'nlist', None)
+	if nlist is not None:
+		if 'nlist_i' in arrays:
+			nlist.restore(arrays.pop('nlist_i'), arrays.pop('nlist_j'),
+				arrays.pop('nlist_ref'), arrays.pop('nlist_box', None))
+		else: nlist.reset()
+	return head['meta'], arrays
+
 def Minimise(pose, ff=None, max_steps=500, ftol=1.0, dt_fs=0.5,
-		dt_max_fs=1.0, step_max=0.2, etol=1e-6, stall_k=10, box=None):
+		dt_max_fs=1.0, step_max=0.2, etol=1e-6, stall_k=10, box=None,
+		checkpoint=None, checkpoint_every=0, resume=None):
 	'''
 	Relax pose coordinates with FIRE2 (Guenole et al. 2020). A
 	trust-region cap bounds the per-atom displacement; a step that turns
@@ -5868,7 +7469,9 @@ def Minimise(pose, ff=None, max_steps=500, ftol=1.0, dt_fs=0.5,
 	Arguments:
 	----------
 		pose:      Pose - molecule source protein, DNA, RNA, or Molecule
-		ff:        ForceField - reusable evaluator; created if None
+		ff:        ForceField or Score - reusable evaluator; created if
+			None. A Score relaxes on its analytic gradient, and the
+			energies and forces below are then in its native unit
 		max_steps: int - maximum number of FIRE2 iterations
 		ftol:      float - convergence on max|force| (L_inf) in kJ/mol/A
 		dt_fs:     float - initial integrator step in femtoseconds
@@ -5876,14 +7479,32 @@ def Minimise(pose, ff=None, max_steps=500, ftol=1.0, dt_fs=0.5,
 		step_max:  float - trust-region cap on per-atom displacement in A
 		etol:      float - energy-stall tolerance in kJ/mol
 		stall_k:   int - consecutive stalled steps that trigger early stop
-		box:       None for no PBC; (3,) orthorhombic; (3, 3) triclinic
+		box:       None for no PBC; (3,) orthorhombic; (3, 3) triclinic;
+			ignored by a Score
+		checkpoint:       str or None - file rewritten every
+			checkpoint_every iterations with the FIRE2 state
+		checkpoint_every: int - checkpoint stride; 0 disables it
+		resume:           str or None - checkpoint to continue from; the
+			run then matches an uninterrupted one bit for bit (with a
+			Score, to rounding, as its pair cache is rebuilt)
 	Returns:
 	--------
 		tuple: (float, dict) - energy of the best frame in kJ/mol and a
 		per-step log ('energies', 'fmax', 'max_step', 'converged',
-		'n_steps')
+		'n_steps', with a cutoff force field the neighbour-list
+		'nlist_builds' and 'nlist_pairs', and with ff.profile set the
+		per-term timings under 'profile')
 	'''
 	if ff is None: ff = ForceField()
+	if checkpoint is not None and checkpoint_every <= 0:
+		raise ValueError('Minimise: a checkpoint needs checkpoint_every > 0')
+	nlist = getattr(ff, 'nlist', None)
+	builds0 = nlist.n_builds if nlist is not None else 0
+	prof0 = (copy.deepcopy(ff.counters) if getattr(ff, 'profile', False)
+		else None)
+	def evaluate():
+		if isinstance(ff, Score): return ff(pose, grad=True)
+		return ff(pose, grad=True, box=box)
 	N_MIN, F_INC, F_DEC = 5, 1.1, 0.5
 	A_START, F_ALPHA = 0.1, 0.99
 	AKMA_FS = 23.91888086
@@ -5896,12 +7517,37 @@ def Minimise(pose, ff=None, max_steps=500, ftol=1.0, dt_fs=0.5,
 	dt_min = dt * 1e-3
 	alpha, n_pos = float(A_START), 0
 	energies, fmaxes, max_steps_log = [], [], []
-	E, F = ff(pose, grad=True, box=box)
-	E = float(E)
-	best_fmax   = float(np.max(np.abs(F)))
-	best_coords = pose.data['Coordinates'].copy()
-	converged, steps_done, stall = False, 0, 0
-	for step in range(int(max_steps)):
+	settings = {'n_atoms': len(m), 'dt_fs': dt_fs,
+		'dt_max_fs': dt_max_fs, 'step_max': step_max}
+	if resume is None:
+		E, F = evaluate()
+		E = float(E)
+		best_fmax   = float(np.max(np.abs(F)))
+		best_coords = pose.data['Coordinates'].copy()
+		converged, steps_done, stall, start = False, 0, 0, 0
+	else:
+		meta, arr = _checkpointload(resume, 'Minimise', settings, ff)
+		pose.data['Coordinates'] = arr['coords']
+		v, F, best_coords = arr['v'], arr['F'], arr['best_coords']
+		energies = arr['energies'].tolist()
+		fmaxes = arr['fmax'].tolist()
+		max_steps_log = arr['max_step'].tolist()
+		E, dt, alpha = meta['E'], meta['dt'], meta['alpha']
+		n_pos, best_fmax, stall = meta['n_pos'], meta['best_fmax'], \
+			meta['stall']
+		builds0 -= meta['nlist_builds']
+		converged, steps_done, start = False, meta['step'], meta['step']
+	for step in range(start, int(max_steps)):
+		if checkpoint is not None and step > start \
+				and step % checkpoint_every == 0:
+			_checkpointsave(checkpoint, 'Minimise', settings, ff,
+				{'step': step, 'E': E, 'dt': dt, 'alpha': alpha,
+				'n_pos': n_pos, 'best_fmax': best_fmax, 'stall': stall,
+				'nlist_builds': 0 if nlist is None
+					else nlist.n_builds - builds0},
+				{'coords': pose.data['Coordinates'], 'v': v, 'F': F,
+				'best_coords': best_coords, 'energies': energies,
+				'fmax': fmaxes, 'max_step': max_steps_log})
 		fmax = float(np.max(np.abs(F)))
 		energies.append(E); fmaxes.append(fmax)
 		steps_done = step + 1
@@ -5943,7 +7589,7 @@ def Minimise(pose, ff=None, max_steps=500, ftol=1.0, dt_fs=0.5,
 		max_steps_log.append(float(np.max(np.abs(dr))))
 		x_old = pose.data['Coordinates']
 		pose.data['Coordinates'] = x_old + dr
-		E_new, F_new = ff(pose, grad=True, box=box)
+		E_new, F_new = evaluate()
 		E_new = float(E_new)
 		fmax_new = float(np.max(np.abs(F_new)))
 		# Safeguard: undo a step that is non-finite, strongly uphill, or
@@ -5963,18 +7609,23 @@ def Minimise(pose, ff=None, max_steps=500, ftol=1.0, dt_fs=0.5,
 		E, F = E_new, F_new
 	# Restore the lowest-|force| frame and report its energy.
 	pose.data['Coordinates'] = best_coords
-	E, F = ff(pose, grad=True, box=box)
+	E, F = evaluate()
 	log = {
 		'energies':  np.asarray(energies,      dtype=np.float64),
 		'fmax':      np.asarray(fmaxes,        dtype=np.float64),
 		'max_step':  np.asarray(max_steps_log, dtype=np.float64),
 		'converged': bool(converged),
 		'n_steps':   int(steps_done)}
+	if nlist is not None:
+		log['nlist_builds'] = int(nlist.n_builds - builds0)
+		log['nlist_pairs']  = nlist.stats()['pairs']
+	if prof0 is not None: log['profile'] = _profiledelta(ff, prof0)
 	return float(E), log
 
 def Anneal(pose, ff=None, n_steps=10000, T_start=2000.0, T_end=10.0,
 		sigma_small=5.0, sigma_large=30.0, p_large=0.2, p_shear=0.5,
-		target_acc=0.30, adapt_window=100, seed=None, box=None):
+		target_acc=0.30, adapt_window=100, seed=None, box=None,
+		checkpoint=None, checkpoint_every=0, resume=None):
 	'''
 	Simulated annealing with shear+single moves and adaptive small sigma
 	Arguments:
@@ -5992,6 +7643,11 @@ def Anneal(pose, ff=None, n_steps=10000, T_start=2000.0, T_end=10.0,
 		adapt_window: int - small moves between sigma_small updates
 		seed:         int or None - RNG seed for reproducibility
 		box:          None for no PBC; (3,) ortho; (3, 3) triclinic
+		checkpoint:       str or None - file rewritten every
+			checkpoint_every steps with the annealing state
+		checkpoint_every: int - checkpoint stride; 0 disables it
+		resume:           str or None - checkpoint to continue from; the
+			run then matches an uninterrupted one bit for bit
 	Returns:
 	--------
 		tuple: (float, dict) - best energy seen and per-step log
@@ -5999,10 +7655,22 @@ def Anneal(pose, ff=None, n_steps=10000, T_start=2000.0, T_end=10.0,
 	if ff is None: ff = ForceField()
 	if pose.data.get('Amino Acids') is None:
 		raise ValueError('Anneal requires a protein pose with Amino Acids')
+	if checkpoint is not None and checkpoint_every <= 0:
+		raise ValueError('Anneal: a checkpoint needs checkpoint_every > 0')
 	GAIN, SIGMA_MIN, SIGMA_MAX = 0.5, 0.5, 60.0
 	rng = np.random.default_rng(seed)
 	res_ids = np.array(sorted(pose.data['Amino Acids']), dtype=np.int64)
 	n_res = len(res_ids)
+	settings = {'n_res': n_res, 'n_steps': int(n_steps),
+		'T_start': T_start, 'T_end': T_end, 'sigma_large': sigma_large,
+		'p_large': p_large, 'p_shear': p_shear, 'target_acc': target_acc,
+		'adapt_window': adapt_window}
+	if resume is not None:
+		meta, arr = _checkpointload(resume, 'Anneal', settings, ff)
+		rng.bit_generator.state = meta['rng']
+	# Every random draw of the run is taken here, so the generator state
+	# before them is all a checkpoint needs to replay the move sequence.
+	rng0 = rng.bit_generator.state
 	kB = 8.31446262e-3
 	T_arr = T_start * (T_end / T_start) ** (
 		np.arange(n_steps) / max(n_steps - 1, 1))
@@ -6025,15 +7693,39 @@ def Anneal(pose, ff=None, n_steps=10000, T_start=2000.0, T_end=10.0,
 		pose.RotateDihedral(res, psi_old + delta, 'PSI')
 		pose.RotateDihedral(res + 1, phi_next - delta, 'PHI')
 		return True
-	E_curr = float(ff(pose, grad=False, box=box))
-	E_best = E_curr
-	coords_best = pose.data['Coordinates'].copy()
 	energies   = np.empty(n_steps, dtype=np.float64)
 	accepted   = np.zeros(n_steps, dtype=bool)
 	move_types = np.full(n_steps, 2, dtype=np.int8)  # 0=single,1=shear,2=invalid
-	sigma_history = [float(sigma_small)]
-	small_count, small_acc, best_step = 0, 0, 0
-	for s in range(int(n_steps)):
+	if resume is None:
+		E_curr = float(ff(pose, grad=False, box=box))
+		E_best = E_curr
+		coords_best = pose.data['Coordinates'].copy()
+		sigma_history = [float(sigma_small)]
+		small_count, small_acc, best_step, start = 0, 0, 0, 0
+	else:
+		start = meta['step']
+		pose.data['Coordinates'] = arr['coords']
+		coords_best = arr['coords_best']
+		energies[:start] = arr['energies']
+		accepted[:start] = arr['accepted']
+		move_types[:start] = arr['move_types']
+		sigma_history = arr['sigma_history'].tolist()
+		E_curr, E_best = meta['E_curr'], meta['E_best']
+		sigma_small = meta['sigma_small']
+		small_count, small_acc = meta['small_count'], meta['small_acc']
+		best_step = meta['best_step']
+	for s in range(start, int(n_steps)):
+		if checkpoint is not None and s > start \
+				and s % checkpoint_every == 0:
+			_checkpointsave(checkpoint, 'Anneal', settings, ff,
+				{'step': s, 'rng': rng0, 'E_curr': E_curr,
+				'E_best': E_best, 'sigma_small': sigma_small,
+				'small_count': small_count, 'small_acc': small_acc,
+				'best_step': best_step},
+				{'coords': pose.data['Coordinates'],
+				'coords_best': coords_best, 'energies': energies[:s],
+				'accepted': accepted[:s], 'move_types': move_types[:s],
+				'sigma_history': sigma_history})
 		sigma = sigma_large if large_arr[s] else sigma_small
 		delta = float(noise_arr[s] * sigma)
 		res = int(res_arr[s])
@@ -6082,8 +7774,119 @@ def Anneal(pose, ff=None, n_steps=10000, T_start=2000.0, T_end=10.0,
 		'best_step':     int(best_step)}
 	return float(E_best), log
 
+def _rotamercandidates(pose, fused=True):
+	'''
+	Rotamer Library candidate set of every repackable residue at its
+	current backbone (phi, psi). D-amino acids are looked up against the
+	L-form table with mirrored phi/psi and their mu values negated
+	Arguments:
+	----------
+		pose:  Pose - protein pose with Amino Acids dict
+		fused: bool - keep residues whose chis are fused into a ring
+	Returns:
+	--------
+		dict: residue index to (mus (K, n_chi), probs (K,) normalised,
+		n_chi)
+	'''
+	rotlib = DBLoad().get('Rotamer Library')
+	candidates = {}
+	for r, info in sorted(pose.data['Amino Acids'].items()):
+		c = info[0]
+		aa_u = c.upper()
+		aa_db = pose.aminoacids.get(aa_u, {})
+		chi_atoms = aa_db.get('Chi Angle Atoms') or []
+		if not chi_atoms: continue
+		if not fused and aa_db.get('Fused'): continue
+		three = (aa_db.get('Tricode') or [None])[0]
+		if not three: continue
+		phi = pose.GetDihedral(r, 'PHI')
+		psi = pose.GetDihedral(r, 'PSI')
+		if math.isnan(phi) or math.isnan(psi): continue
+		flip = (c != aa_u)
+		phi_q = -phi if flip else phi
+		psi_q = -psi if flip else psi
+		n_chi, rows = _rotlib_lookup(rotlib, three, phi_q, psi_q)
+		if n_chi == 0 or not rows: continue
+		# Column layout: [count, prob, chi1..N, sig1..N]
+		prob_i = 1
+		chi_i  = 2
+		K = len(rows)
+		mus   = np.empty((K, n_chi), dtype=np.float64)
+		probs = np.empty(K,          dtype=np.float64)
+		for k, row in enumerate(rows):
+			probs[k] = max(float(row[prob_i]), 0.0)
+			for ci in range(n_chi):
+				m = float(row[chi_i + ci])
+				mus[k, ci] = -m if flip else m
+		s = probs.sum()
+		if s <= 0.0: continue
+		probs /= s
+		candidates[r] = (mus, probs, n_chi)
+	return candidates
+
+def _rotamerplace(pose, r, mus):
+	'''
+	Place every rotamer of one residue at once: the side chain is copied
+	K times and each chi is set on all copies with one batched rotation,
+	the same rotation pose.RotateDihedral applies to a single copy
+	Arguments:
+	----------
+		pose: Pose - protein pose
+		r:    int - residue index
+		mus:  np.ndarray - (K, n_chi) target chi angles in degrees
+	Returns:
+	--------
+		tuple or None: (idx, xyz) - (m,) indices of the atoms chi1 moves
+		and their (K, m, 3) coordinates per rotamer; None if a chi is
+		undefined
+	'''
+	sym = pose.data['Amino Acids'][r][0].upper()
+	chis = pose.aminoacids[sym]['Chi Angle Atoms']
+	X = pose.data['Coordinates']
+	c = chis[0]
+	idx = np.array(sorted(pose._downstreamatoms(r, c[1], r, c[2])))
+	local = {int(a): i for i, a in enumerate(idx)}
+	K = len(mus)
+	xyz = np.repeat(X[idx][None], K, axis=0)
+	for ci in range(mus.shape[1]):
+		q = [pose.GetAtomIdx(r, name) for name in chis[ci]]
+		P = [xyz[:, local[a]].copy() if a in local
+			else np.broadcast_to(X[a], (K, 3)) for a in q]
+		u1 = P[1] - P[0]
+		u2 = P[2] - P[1]
+		u3 = P[3] - P[2]
+		c12 = np.cross(u1, u2)
+		c23 = np.cross(u2, u3)
+		y = np.einsum('ij,ij->i', u2, np.cross(c12, c23))
+		x = np.linalg.norm(u2, axis=1) * np.einsum('ij,ij->i', c12, c23)
+		current = np.degrees(np.arctan2(y, x))
+		if not np.all(np.isfinite(current)): return None
+		u = P[1] - P[2]
+		mag = np.linalg.norm(u, axis=1)
+		if np.any(mag < 1e-10): return None
+		u = u / mag[:, None]
+		down = [local.get(a) for a in
+			pose._downstreamatoms(r, chis[ci][1], r, chis[ci][2])]
+		if None in down: return None
+		t = np.radians(mus[:, ci] - current)
+		S, C = np.sin(t), np.cos(t)
+		ux, uy, uz = u[:, 0], u[:, 1], u[:, 2]
+		R = np.empty((K, 3, 3), dtype=np.float64)
+		R[:, 0, 0] = C + ux * ux * (1 - C)
+		R[:, 0, 1] = ux * uy * (1 - C) - uz * S
+		R[:, 0, 2] = ux * uz * (1 - C) + uy * S
+		R[:, 1, 0] = uy * ux * (1 - C) + uz * S
+		R[:, 1, 1] = C + uy * uy * (1 - C)
+		R[:, 1, 2] = uy * uz * (1 - C) - ux * S
+		R[:, 2, 0] = uz * ux * (1 - C) - uy * S
+		R[:, 2, 1] = uz * uy * (1 - C) + ux * S
+		R[:, 2, 2] = C + uz * uz * (1 - C)
+		v = xyz[:, down] - P[2][:, None]
+		xyz[:, down] = np.einsum('kai,kij->kaj', v, R) + P[2][:, None]
+	return idx, xyz
+
 def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
-		patience=400, seed=None):
+		patience=400, seed=None, graph=True):
 	'''
 	Sidechain repacking via simulated annealing on the full Rotamer Library
 	ensemble at each residue's current backbone (phi, psi).
@@ -6103,6 +7906,10 @@ def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
 	  4. Early-exit if no accepted move in `patience` consecutive steps.
 	  5. Restore best-found configuration; return its energy.
 
+	With graph=True and a full-atom Score, the pose is scored once with
+	Score.Graph and every trial with Score.Update on the moved residue, so
+	a step costs the pairs around that residue rather than a full rescore.
+
 	D-amino acids: looked up against the L-form table with mirrored phi/psi,
 	mu values negated when applied (same convention as Rotamers / _rotamer_prior).
 
@@ -6115,10 +7922,13 @@ def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
 		T_end:   float - final temperature
 		patience:int - early-exit if no acceptance in this many consecutive steps
 		seed:    int or None - RNG seed for reproducibility
+		graph:   bool - score trials incrementally through the Score
+			residue-pair energy graph when the score supports it
 	Returns:
 	--------
 		tuple: (E_best, log) where log contains 'energies', 'temperatures',
-		       'accepts', 'best_E', 'steps_run', 'converged', 'n_residues'.
+		       'accepts', 'best_E', 'steps_run', 'converged', 'n_residues',
+		       'graph'.
 	'''
 	if score is None:
 		from .energy import Score
@@ -6126,47 +7936,14 @@ def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
 	if pose.data.get('Amino Acids') is None:
 		raise ValueError('Pack requires a protein pose with Amino Acids')
 	rng = np.random.default_rng(seed)
-	rotlib = DBLoad().get('Rotamer Library')
 	# Step 1: build candidate sets per repackable residue.
-	# Each entry: (mus (K, n_chi), probs (K,) normalised, n_chi)
-	candidates = {}
-	for r, info in sorted(pose.data['Amino Acids'].items()):
-		c = info[0]
-		aa_u = c.upper()
-		aa_db = pose.aminoacids.get(aa_u, {})
-		chi_atoms = aa_db.get('Chi Angle Atoms') or []
-		if not chi_atoms: continue
-		three = (aa_db.get('Tricode') or [None])[0]
-		if not three: continue
-		phi = pose.GetDihedral(r, 'PHI')
-		psi = pose.GetDihedral(r, 'PSI')
-		if math.isnan(phi) or math.isnan(psi): continue
-		flip = (c != aa_u)
-		phi_q = -phi if flip else phi
-		psi_q = -psi if flip else psi
-		n_chi, rows = _rotlib_lookup(rotlib, three, phi_q, psi_q)
-		if n_chi == 0 or not rows: continue
-		# Column layout: [count, prob, chi1..N, sig1..N]
-		prob_i = 1
-		chi_i  = 2
-		K = len(rows)
-		mus   = np.empty((K, n_chi), dtype=np.float64)
-		probs = np.empty(K,          dtype=np.float64)
-		for k, row in enumerate(rows):
-			probs[k] = max(float(row[prob_i]), 0.0)
-			for ci in range(n_chi):
-				m = float(row[chi_i + ci])
-				mus[k, ci] = -m if flip else m
-		s = probs.sum()
-		if s <= 0.0: continue
-		probs /= s
-		candidates[r] = (mus, probs, n_chi)
+	candidates = _rotamercandidates(pose)
 	if not candidates:
 		E0 = float(score(pose))
 		return E0, {
 			'energies': np.array([E0]), 'temperatures': np.array([T_start]),
 			'accepts': np.array([], dtype=bool), 'best_E': E0, 'steps_run': 0,
-			'converged': True, 'n_residues': 0}
+			'converged': True, 'n_residues': 0, 'graph': False}
 	res_ids = list(candidates.keys())
 	# Step 2: initial energy + best-state snapshot.
 	def _snapshot():
@@ -6177,7 +7954,14 @@ def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
 			n_chi = candidates[r][2]
 			for ci in range(n_chi):
 				pose.RotateDihedral(r, float(chis[ci]), 'CHI', ci+1)
-	E_curr  = float(score(pose))
+	use_graph = bool(graph) and hasattr(score, 'Graph')
+	if use_graph:
+		try:
+			E_curr = float(score.Graph(pose))
+		except ValueError:
+			use_graph = False
+	if not use_graph:
+		E_curr = float(score(pose))
 	E_best  = E_curr
 	best_state = _snapshot()
 	# Step 3: SA loop.
@@ -6200,7 +7984,10 @@ def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
 		# Apply trial.
 		for ci in range(n_chi):
 			pose.RotateDihedral(r, float(mus[k, ci]), 'CHI', ci+1)
-		E_trial = float(score(pose))
+		if use_graph:
+			E_trial = E_curr + float(score.Update(pose, (r,)))
+		else:
+			E_trial = float(score(pose))
 		dE = E_trial - E_curr
 		if dE <= 0.0 or rng.random() < math.exp(-dE / max(T, 1e-12)):
 			E_curr = E_trial
@@ -6213,6 +8000,7 @@ def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
 			# Revert.
 			for ci in range(n_chi):
 				pose.RotateDihedral(r, float(snap[ci]), 'CHI', ci+1)
+			if use_graph: score.Update(pose, (r,))
 			accepts[step] = False
 		energies[step]     = E_curr
 		temperatures[step] = T
@@ -6230,15 +8018,758 @@ def Pack(pose, score=None, n_steps=2000, T_start=10.0, T_end=0.1,
 		'best_E':       float(E_best),
 		'steps_run':    int(steps_run),
 		'converged':    bool(steps_run < N),
-		'n_residues':   len(res_ids)}
+		'n_residues':   len(res_ids),
+		'graph':        use_graph}
+	return E_final, log
+
+def _deegoldstein(E1, nbrs, alive, eps=1e-9):
+	'''
+	Goldstein dead-end elimination over one- and two-body energy tables:
+	rotamer k of residue i is removed when some other rotamer j beats it
+	for every choice of the neighbours' remaining rotamers
+	Arguments:
+	----------
+		E1:    list - (K_i,) one-body energies per residue
+		nbrs:  list - per residue, (j, (K_i, K_j) pair table) for every
+			neighbour j
+		alive: list - (K_i,) bool masks, updated in place
+		eps:   float - margin a rotamer must lose by to be removed
+	Returns:
+	--------
+		int: number of rotamers eliminated
+	'''
+	removed = 0
+	changed = True
+	while changed:
+		changed = False
+		for i in range(len(E1)):
+			a = alive[i]
+			if a.sum() < 2: continue
+			D = E1[i][:, None] - E1[i][None, :]
+			for j, M in nbrs[i]:
+				Mj = M[:, alive[j]]
+				D = D + (Mj[:, None, :] - Mj[None, :, :]).min(axis=2)
+			D[:, ~a] = -np.inf
+			np.fill_diagonal(D, -np.inf)
+			dead = a & (D.max(axis=1) > eps)
+			if dead.any():
+				a[dead] = False
+				removed += int(dead.sum())
+				changed = True
+	return removed
+
+def PackDEE(pose, score=None, n_steps=None, T_start=10.0, T_end=0.1,
+		seed=None):
+	'''
+	Sidechain repacking on precomputed rotamer energy tables, solved by
+	dead-end elimination and a table-only simulated annealing.
+
+	Algorithm (production):
+	  1. Build each repackable residue's Rotamer Library candidate set at
+	     its backbone and place all of its rotamers in one batched pass.
+	  2. Find neighbouring residue pairs whose rotamer clouds come within
+	     the score's fa_max_dis of each other.
+	  3. With Score.Graph/Edges, evaluate the pair terms around one residue
+	     at a time to fill its one-body table (self energy plus energy
+	     with the fixed residues) and the pair tables with its
+	     neighbours, setting every later neighbour to its l-th rotamer so
+	     one evaluation fills column l of all of them.
+	  4. Goldstein dead-end elimination until no rotamer is removed.
+	  5. Simulated annealing over the surviving rotamers with geometric
+	     cooling, each move costing one table row per neighbour, then a
+	     greedy sweep to the nearest local minimum.
+	  6. Apply the best assignment and rescore the pose in full.
+
+	Terms that do not decompose into residue pairs (Score.Graph keeps
+	them whole) are left out of the tables and only enter the final
+	rescore. Residues whose chis are fused into a ring (proline) are not
+	repacked.
+
+	Arguments:
+	----------
+		pose:    Pose - protein pose with Amino Acids dict
+		score:   Score - full-atom scoring function; defaults to
+			Score('Default')
+		n_steps: int or None - annealing proposals; None uses 50 per
+			surviving rotamer (at least 1000)
+		T_start: float - initial temperature in score units
+		T_end:   float - final temperature
+		seed:    int or None - RNG seed for reproducibility
+	Returns:
+	--------
+		tuple: (E_final, log) where log contains 'energies',
+		       'temperatures', 'accepts', 'best_E' (table energy of the
+		       chosen assignment), 'steps_run', 'n_residues', 'rotamers',
+		       'eliminated', 'pairs', 'evaluations', 'table_seconds',
+		       'dee_seconds' and 'search_seconds'.
+	'''
+	if score is None:
+		score = Score('Default')
+	if pose.data.get('Amino Acids') is None:
+		raise ValueError('PackDEE requires a protein pose with Amino Acids')
+	rng = np.random.default_rng(seed)
+	# Steps 1-2: candidates, bulk placement, neighbour pairs.
+	t0 = time.perf_counter()
+	E_start = float(score.Graph(pose))
+	X = pose.data['Coordinates']
+	placed = {}
+	for r, (mus, probs, n_chi) in _rotamercandidates(pose, False).items():
+		p = _rotamerplace(pose, r, mus)
+		if p is not None: placed[r] = p
+	res_ids = sorted(placed)
+	index = {r: i for i, r in enumerate(res_ids)}
+	n = len(res_ids)
+	sizes = [len(placed[r][1]) for r in res_ids]
+	c0 = float(score.Parameters['Constants']['fa_max_dis'])
+	src = pose.data['Amino Acids']
+	centre = np.zeros((n, 3))
+	radius = np.zeros(n)
+	for i, r in enumerate(res_ids):
+		ids = list(src[r][2]) + list(src[r][3])
+		pts = np.concatenate([X[ids], placed[r][1].reshape(-1, 3)])
+		centre[i] = X[ids].mean(axis=0)
+		radius[i] = np.sqrt(((pts - centre[i]) ** 2).sum(1)).max()
+	d = np.sqrt(((centre[:, None] - centre[None]) ** 2).sum(-1))
+	near = d < radius[:, None] + radius[None, :] + c0
+	later = [[j for j in np.flatnonzero(near[i]).tolist() if j > i]
+		for i in range(n)]
+	# Step 3: one-body and pair tables.
+	E1 = [np.zeros(K) for K in sizes]
+	E2 = {(i, j): np.zeros((sizes[i], sizes[j]))
+		for i in range(n) for j in later[i]}
+	evaluations = 0
+	X0 = X.copy()
+	for i, r in enumerate(res_ids):
+		idx_r, xyz_r = placed[r]
+		L = max([sizes[j] for j in later[i]], default=1)
+		moved = [res_ids[j] for j in later[i]]
+		for k in range(sizes[i]):
+			X[idx_r] = xyz_r[k]
+			for l in range(L):
+				for j in later[i]:
+					if l < sizes[j]:
+						idx_j, xyz_j = placed[res_ids[j]]
+						X[idx_j] = xyz_j[l]
+				edges = score.Edges(pose, (r,), moved)
+				evaluations += 1
+				for (a, b), e in edges.items():
+					o = b if a == r else a
+					j = index.get(o)
+					if o == r or j is None:
+						if l == 0: E1[i][k] += e
+					elif (i, j) in E2 and l < sizes[j]:
+						E2[(i, j)][k, l] += e
+		for j in [i] + later[i]:
+			idx_j = placed[res_ids[j]][0]
+			X[idx_j] = X0[idx_j]
+	nbrs = [[] for _ in range(n)]
+	for (i, j), M in E2.items():
+		nbrs[i].append((j, M))
+		nbrs[j].append((i, M.T))
+	t1 = time.perf_counter()
+	# Step 4: dead-end elimination.
+	alive = [np.ones(K, dtype=bool) for K in sizes]
+	eliminated = _deegoldstein(E1, nbrs, alive)
+	t2 = time.perf_counter()
+	# Step 5: table-only annealing from the best one-body rotamers.
+	choices = [np.flatnonzero(a) for a in alive]
+	state = np.array([c[np.argmin(E1[i][c])] for i, c in enumerate(choices)],
+		dtype=np.int64)
+	def local(i, k):
+		e = E1[i][k]
+		for j, M in nbrs[i]: e += M[k, state[j]]
+		return e
+	def total():
+		e = sum(E1[i][state[i]] for i in range(n))
+		return e + sum(M[state[i], state[j]] for (i, j), M in E2.items())
+	movable = [i for i in range(n) if len(choices[i]) > 1]
+	N = int(n_steps) if n_steps else max(1000,
+		50 * sum(len(c) for c in choices))
+	if not movable: N = 0
+	energies     = np.empty(N, dtype=np.float64)
+	temperatures = np.empty(N, dtype=np.float64)
+	accepts      = np.empty(N, dtype=bool)
+	E_curr = float(total())
+	E_best = E_curr
+	best_state = state.copy()
+	for step in range(N):
+		T = T_start * (T_end / T_start) ** (step / max(1, N - 1))
+		i = movable[int(rng.integers(0, len(movable)))]
+		c = choices[i]
+		k = int(c[int(rng.integers(0, len(c)))])
+		dE = local(i, k) - local(i, state[i])
+		if dE <= 0.0 or rng.random() < math.exp(-dE / max(T, 1e-12)):
+			state[i] = k
+			E_curr += dE
+			accepts[step] = True
+			if E_curr < E_best:
+				E_best = E_curr
+				best_state = state.copy()
+		else:
+			accepts[step] = False
+		energies[step]     = E_curr
+		temperatures[step] = T
+	state[:] = best_state
+	changed = True
+	while changed:
+		changed = False
+		for i in movable:
+			rows = [local(i, k) for k in choices[i]]
+			k = int(choices[i][int(np.argmin(rows))])
+			if k != state[i] and min(rows) < local(i, state[i]) - 1e-12:
+				state[i] = k
+				changed = True
+	E_best = float(total())
+	t3 = time.perf_counter()
+	# Step 6: apply and rescore.
+	for i, r in enumerate(res_ids):
+		idx_r, xyz_r = placed[r]
+		X[idx_r] = xyz_r[state[i]]
+	E_final = float(score.Graph(pose)) if n else E_start
+	log = {
+		'energies':       energies,
+		'temperatures':   temperatures,
+		'accepts':        accepts,
+		'best_E':         E_best,
+		'steps_run':      int(N),
+		'n_residues':     n,
+		'rotamers':       int(sum(sizes)),
+		'eliminated':     int(eliminated),
+		'pairs':          len(E2),
+		'evaluations':    int(evaluations),
+		'table_seconds':  t1 - t0,
+		'dee_seconds':    t2 - t1,
+		'search_seconds': t3 - t2}
 	return E_final, log
 
+def _dockrotate(X, idx, a, u, theta):
+	'''
+	Rotate atoms in place about an axis through a point
+	Arguments:
+	----------
+		X:     np.ndarray - (L, 3) coordinates, updated in place
+		idx:   np.ndarray or slice - the atoms to rotate
+		a:     np.ndarray - (3,) point on the axis
+		u:     np.ndarray - (3,) unit axis, turned right-handed
+		theta: float - angle in radians
+	Returns:
+	--------
+		No return value, X is updated in place
+	'''
+	v = X[idx] - a
+	c, s = math.cos(theta), math.sin(theta)
+	X[idx] = (a + v * c + np.cross(u, v) * s
+		+ np.outer(v @ u, u) * (1.0 - c))
+
+def _docktorsions(ligand, bonds):
+	'''
+	Moving side of every rotatable bond, taken as the smaller half of
+	the ligand so a torsion turns as few atoms as possible
+	Arguments:
+	----------
+		ligand: Molecule - the ligand
+		bonds:  list - (i, j) rotatable bonds, none of them in a ring
+	Returns:
+	--------
+		list: (a, b, side) per bond - the fixed axis atom, the moving
+		axis atom and the (m,) indices of the atoms on b's side
+	'''
+	adj = ligand.data['Bonds']
+	n = len(ligand.data['Atoms'])
+	out = []
+	for i, j in bonds:
+		side = {j}
+		stk = [j]
+		while stk:
+			x = stk.pop()
+			for y in adj[x]:
+				if x == j and y == i: continue
+				if y not in side:
+					side.add(y)
+					stk.append(y)
+		a, b = i, j
+		if 2 * len(side) > n:
+			a, b = j, i
+			side = set(range(n)) - side
+		out.append((a, b, np.array(sorted(side), dtype=np.int64)))
+	return out
+
+def _dockcluster(poses, heavy, tol, limit):
+	'''
+	Greedy RMSD clustering of docked poses in order of energy: a pose
+	joins the first kept cluster whose representative lies within tol,
+	otherwise it opens a new one while fewer than limit are kept
+	Arguments:
+	----------
+		poses: list - (energy, (L, 3) coordinates) tuples
+		heavy: np.ndarray - (L,) mask of the atoms the RMSD is taken over
+		tol:   float - clustering radius in Å, in place (no superposition)
+		limit: int - maximum number of clusters kept
+	Returns:
+	--------
+		list: dicts of 'energy', 'coords' and 'members' per cluster,
+		lowest energy first
+	'''
+	kept = []
+	for E, X in sorted(poses, key=lambda p: p[0]):
+		for c in kept:
+			d = c['coords'][heavy] - X[heavy]
+			if math.sqrt(float((d * d).sum()) / max(1, len(d))) < tol:
+				c['members'] += 1
+				break
+		else:
+			if len(kept) < limit:
+				kept.append({'energy': float(E), 'coords': X, 'members': 1})
+	return kept
+
+def _dockchain(job):
+	'''
+	One Monte Carlo chain of Dock, run in a worker process. Every step
+	perturbs the position, the orientation or one torsion, relaxes the
+	ligand with BFGS over those degrees of freedom and applies the
+	Metropolis test to the relaxed energy
+	Arguments:
+	----------
+		job: dict - 'score', 'ligand', 'grid' (GridMap, or the path of
+			memory-mapped maps), 'box', 'torsions', 'heavy', 'n_steps',
+			'opt_steps', 'T', 'n_keep', 'rmsd_tol' and 'seed'
+	Returns:
+	--------
+		dict: 'poses' (energy, coordinates) of the chain's distinct
+		minima, and the counters 'steps', 'accepted', 'evaluations',
+		'opt_iterations', 'best' and 'seconds'
+	'''
+	t0 = time.perf_counter()
+	score, ligand, grid = job['score'], job['ligand'], job['grid']
+	if isinstance(grid, str): grid = score.Grid(path=grid)
+	tors = job['torsions']
+	center, size = job['box']
+	rng = np.random.default_rng(job['seed'])
+	X0 = np.asarray(ligand.data['Coordinates'], dtype=np.float64)
+	rg = max(1.0, math.sqrt(float(((X0 - X0.mean(0)) ** 2).sum(1).mean())))
+	counts = {'evaluations': 0, 'opt_iterations': 0}
+	def evaluate(X):
+		counts['evaluations'] += 1
+		ligand.data['Coordinates'] = X
+		return score(None, ligand, grad=True, grid=grid)
+	def gradient(X, F):
+		g = np.empty(6 + len(tors))
+		g[:3] = -F.sum(axis=0)
+		g[3:6] = -np.cross(X - X.mean(axis=0), F).sum(axis=0)
+		for k, (a, b, side) in enumerate(tors):
+			u = X[b] - X[a]
+			u /= np.linalg.norm(u)
+			g[6 + k] = -u @ np.cross(X[side] - X[a], F[side]).sum(axis=0)
+		return g
+	def apply(X, p):
+		X = X.copy()
+		for k, (a, b, side) in enumerate(tors):
+			if p[6 + k] == 0.0: continue
+			u = X[b] - X[a]
+			_dockrotate(X, side, X[a].copy(), u / np.linalg.norm(u),
+				p[6 + k])
+		w = np.linalg.norm(p[3:6])
+		if w > 0.0:
+			_dockrotate(X, slice(None), X.mean(axis=0), p[3:6] / w, w)
+		return X + p[:3]
+	def localopt(X, E, F):
+		g = gradient(X, F)
+		H = np.eye(len(g))
+		for it in range(int(job['opt_steps'])):
+			d = -H @ g
+			if d @ g >= 0.0:
+				H = np.eye(len(g))
+				d = -g
+			slope = float(d @ g)
+			alpha = min(1.0, 1.0 / max(float(np.abs(d).max()), 1e-12))
+			for _ in range(10):
+				Xn = apply(X, alpha * d)
+				En, Fn = evaluate(Xn)
+				if En <= E + 1e-4 * alpha * slope: break
+				alpha *= 0.5
+			else:
+				break
+			counts['opt_iterations'] += 1
+			gn = gradient(Xn, Fn)
+			s = alpha * d
+			y = gn - g
+			sy = float(s @ y)
+			if sy > 1e-10:
+				V = np.eye(len(g)) - np.outer(s, y) / sy
+				H = V @ H @ V.T + np.outer(s, s) / sy
+			X, E, F, g = Xn, En, Fn, gn
+			if np.abs(g).max() < 1e-3: break
+		return X, E, F
+	def randomise():
+		X = X0.copy()
+		for a, b, side in tors:
+			u = X[b] - X[a]
+			_dockrotate(X, side, X[a].copy(), u / np.linalg.norm(u),
+				rng.uniform(-math.pi, math.pi))
+		q = rng.normal(size=4)
+		q /= np.linalg.norm(q)
+		w = 2.0 * math.acos(min(1.0, abs(q[0])))
+		if w > 0.0:
+			_dockrotate(X, slice(None), X.mean(axis=0),
+				q[1:] / np.linalg.norm(q[1:]), w)
+		target = center + (rng.random(3) - 0.5) * size
+		return X - X.mean(axis=0) + target
+	def mutate(X):
+		p = np.zeros(6 + len(tors))
+		kind = int(rng.integers(3 if tors else 2))
+		u = rng.normal(size=3)
+		u /= np.linalg.norm(u)
+		if kind == 0:
+			p[:3] = 2.0 * u
+		elif kind == 1:
+			p[3:6] = 2.0 / rg * u
+		else:
+			p[6 + int(rng.integers(len(tors)))] = rng.uniform(
+				-math.pi, math.pi)
+		return apply(X, p)
+	T = float(job['T'])
+	X = randomise()
+	X, E, _ = localopt(X, *evaluate(X))
+	minima = [(E, X)]
+	best, accepted = E, 0
+	for step in range(int(job['n_steps'])):
+		Xc = mutate(X)
+		Xc, Ec, _ = localopt(Xc, *evaluate(Xc))
+		if Ec < E or rng.random() < math.exp(
+				max(-700.0, (E - Ec) / max(T, 1e-12))):
+			X, E = Xc, Ec
+			accepted += 1
+			minima.append((E, X))
+			best = min(best, E)
+	poses = [(c['energy'], c['coords']) for c in _dockcluster(minima,
+		job['heavy'], job['rmsd_tol'], job['n_keep'])]
+	return {'poses': poses, 'steps': int(job['n_steps']),
+		'accepted': accepted, 'best': float(best),
+		'evaluations': counts['evaluations'],
+		'opt_iterations': counts['opt_iterations'],
+		'seconds': time.perf_counter() - t0}
+
+def Dock(receptor, ligand, score=None, box=None, n_chains=8, n_steps=200,
+		opt_steps=50, T=1.2, n_poses=9, rmsd_tol=2.0, spacing=0.375,
+		path=None, n_workers=None, seed=None):
+	'''
+	Dock a flexible ligand into a rigid receptor. The receptor is mapped
+	once with Score.Grid; independent Monte Carlo chains then search the
+	ligand's position, orientation and torsions, each step relaxed by
+	BFGS on the analytic gradient, across a process pool. The chains'
+	minima are clustered by RMSD and the best pose is left in the ligand
+	Arguments:
+	----------
+		receptor:  Pose or Molecule - rigid receptor
+		ligand:    Molecule - flexible ligand, its coordinates set to the
+			best pose on return
+		score:     Score - XS-typed scoring function; defaults to
+			Score('AutoDock Vina')
+		box:       tuple or None - (center, size) of the search box in Å,
+			size a float or (3,); None centres it on the ligand with
+			10 Å added to its extent
+		n_chains:  int - independent Monte Carlo chains
+		n_steps:   int - Monte Carlo steps per chain
+		opt_steps: int - maximum BFGS iterations per local relaxation
+		T:         float - Metropolis temperature in the score's unit
+		n_poses:   int - maximum number of clustered poses returned
+		rmsd_tol:  float - heavy-atom RMSD in Å that separates clusters
+		spacing:   float - grid-map spacing in Å
+		path:      str or None - directory to keep the grid maps in; a
+			temporary one is used for a pool when None
+		n_workers: int or None - worker processes; None uses one per
+			chain up to the CPU count, 1 runs the chains in this process
+		seed:      int or None - RNG seed; the result does not depend on
+			n_workers
+	Returns:
+	--------
+		tuple: (E_best, log) where log contains 'poses' (dicts of
+		'energy', 'coords', 'members' and 'rmsd' to the best pose),
+		'chains' (per-chain counters), 'n_torsions', 'evaluations',
+		'poses_per_second', 'acceptance', 'grid_seconds',
+		'search_seconds' and 'workers'
+	'''
+	if score is None: score = Score('AutoDock Vina')
+	if 'XS_atom_types' not in score.Parameters:
+		raise ValueError('Dock: needs an XS-typed score function '
+			'(%s is not)' % score.name)
+	X0 = np.asarray(ligand.data['Coordinates'], dtype=np.float64)
+	if box is None:
+		center, size = X0.mean(axis=0), np.ptp(X0, axis=0) + 10.0
+	else:
+		center, size = box
+	center = np.asarray(center, dtype=np.float64).reshape(3)
+	size = np.broadcast_to(np.asarray(size, dtype=np.float64), (3,))
+	n_chains = int(n_chains)
+	if n_workers is None: n_workers = min(n_chains, os.cpu_count() or 1)
+	n_workers = max(1, int(n_workers))
+	t0 = time.perf_counter()
+	tmp = None
+	if n_workers > 1 and path is None:
+		tmp = tempfile.mkdtemp()
+		path = os.path.join(tmp, 'maps')
+	try:
+		grid = score.Grid(receptor, center, size, spacing, path)
+		t1 = time.perf_counter()
+		cache = ScoreMatch(None, score.Parameters, ligand, name=score.name)
+		tors = _docktorsions(ligand, cache['rotatablebonds'](ligand))
+		atoms = ligand.data['Atoms']
+		heavy = np.array([atoms[i][1] != 'H' for i in sorted(atoms)])
+		worker = copy.copy(score)
+		worker._cache = None
+		worker._topo_cache = None
+		worker._topo_refX = None
+		worker._grid_lig = None
+		worker.graph = None
+		jobs = [{'score': worker, 'ligand': copy.deepcopy(ligand),
+			'grid': grid if n_workers == 1 else path,
+			'box': (center, size), 'torsions': tors, 'heavy': heavy,
+			'n_steps': n_steps, 'opt_steps': opt_steps, 'T': T,
+			'n_keep': n_poses, 'rmsd_tol': rmsd_tol, 'seed': s}
+			for s in np.random.SeedSequence(seed).spawn(n_chains)]
+		if n_workers == 1:
+			chains = [_dockchain(job) for job in jobs]
+		else:
+			with ProcessPoolExecutor(max_workers=n_workers) as ex:
+				chains = list(ex.map(_dockchain, jobs))
+		t2 = time.perf_counter()
+	finally:
+		if tmp is not None: shutil.rmtree(tmp, ignore_errors=True)
+	poses = _dockcluster([p for c in chains for p in c['poses']],
+		heavy, rmsd_tol, n_poses)
+	best = poses[0]
+	for c in poses:
+		d = c['coords'][heavy] - best['coords'][heavy]
+		c['rmsd'] = math.sqrt(float((d * d).sum()) / max(1, len(d)))
+	ligand.data['Coordinates'] = best['coords'].copy()
+	evaluations = sum(c['evaluations'] for c in chains)
+	steps = sum(c['steps'] for c in chains)
+	log = {
+		'poses':            poses,
+		'chains':           [{k: v for k, v in c.items() if k != 'poses'}
+			for c in chains],
+		'n_torsions':       len(tors),
+		'evaluations':      int(evaluations),
+		'poses_per_second': evaluations / max(t2 - t1, 1e-12),
+		'acceptance':       sum(c['accepted'] for c in chains)
+			/ max(1, steps),
+		'grid_seconds':     t1 - t0,
+		'search_seconds':   t2 - t1,
+		'workers':          n_workers}
+	return best['energy'], log
+
+_TRAJECTORY_MAGIC = b'POSETRJ1'
+
+class Trajectory():
+	'''
+	Streaming MD trajectory file: a JSON header followed by fixed-size
+	frame records (step, float32 coordinates, optional float32
+	velocities and float64 energies), appended as they are produced and
+	read back through a memory map
+	'''
+	def __init__(self, path, n_atoms=None, mode='r', velocities=False,
+			energies=True):
+		'''
+		Open a trajectory file
+		Arguments:
+		----------
+			path:       str - file path
+			n_atoms:    int or None - atoms per frame, needed to create
+				a file and checked against an existing one
+			mode:       str - 'r' reads, 'w' creates or overwrites, 'a'
+				appends to an existing file (creating it if missing) and
+				drops a partly written last frame
+			velocities: bool - store velocities in Å/ps with each frame
+				of a new file
+			energies:   bool - store (potential, kinetic) energies with
+				each frame of a new file
+		Returns:
+		--------
+			None: instance is configured in-place
+		'''
+		if mode not in ('r', 'w', 'a'):
+			raise ValueError("Trajectory: mode must be 'r', 'w' or 'a'")
+		self.path = path
+		self.mode = mode
+		if mode == 'w' or (mode == 'a' and not os.path.exists(path)):
+			if n_atoms is None:
+				raise ValueError('Trajectory: n_atoms is needed to create '
+					'a file')
+			self.header = {'version': 1, 'n_atoms': int(n_atoms),
+				'velocities': bool(velocities), 'energies': bool(energies)}
+			text = json.dumps(self.header).encode()
+			self.offset = -(-(len(_TRAJECTORY_MAGIC) + 4 + len(text))
+				// 64) * 64
+			with open(path, 'wb') as f:
+				f.write(_TRAJECTORY_MAGIC
+					+ self.offset.to_bytes(4, 'little')
+					+ text.ljust(self.offset - 12, b' '))
+		else:
+			with open(path, 'rb') as f:
+				if f.read(8) != _TRAJECTORY_MAGIC:
+					raise ValueError('Trajectory: %s is not a trajectory '
+						'file' % path)
+				self.offset = int.from_bytes(f.read(4), 'little')
+				self.header = json.loads(f.read(self.offset - 12))
+			if n_atoms is not None and int(n_atoms) != \
+					self.header['n_atoms']:
+				raise ValueError('Trajectory: %s holds %d atoms, not %d'
+					% (path, self.header['n_atoms'], int(n_atoms)))
+		n = self.header['n_atoms']
+		fields = [('step', '<i8'), ('coords', '<f4', (n, 3))]
+		if self.header['velocities']:
+			fields.append(('velocities', '<f4', (n, 3)))
+		if self.header['energies']:
+			fields.append(('energies', '<f8', (2,)))
+		self.dtype = np.dtype(fields)
+		self._map = None
+		self._file = None
+		if mode != 'r':
+			self._file = open(path, 'r+b')
+			self._file.truncate(self.offset + len(self)
+				* self.dtype.itemsize)
+			self._file.seek(0, os.SEEK_END)
+	def __len__(self):
+		'''
+		Number of whole frames in the file
+		Returns:
+		--------
+			int: frame count
+		'''
+		size = os.path.getsize(self.path) - self.offset
+		return max(0, size) // self.dtype.itemsize
+	def __getitem__(self, k):
+		'''
+		Coordinates of one frame or a slice of frames
+		Arguments:
+		----------
+			k: int or slice - frame index
+		Returns:
+		--------
+			np.ndarray: (n, 3) or (k, n, 3) float32 coordinates in Å
+		'''
+		return self.Frames()['coords'][k]
+	def __enter__(self):
+		'''
+		Use the file as a context manager that closes it on exit
+		Returns:
+		--------
+			Trajectory: self
+		'''
+		return self
+	def __exit__(self, *exc):
+		'''
+		Close the file on leaving a with block
+		Returns:
+		--------
+			None
+		'''
+		self.Close()
+	def Frames(self):
+		'''
+		Memory map of every whole frame record
+		Returns:
+		--------
+			np.ndarray: structured (F,) read-only view with fields 'step',
+			'coords' and, when stored, 'velocities' and 'energies'
+		'''
+		F = len(self)
+		if self._map is None or len(self._map) != F:
+			self._map = (np.zeros(0, dtype=self.dtype) if F == 0
+				else np.memmap(self.path, dtype=self.dtype, mode='r',
+					offset=self.offset, shape=(F,)))
+		return self._map
+	def Write(self, step, coords, velocities=None, energies=None):
+		'''
+		Append one frame and flush it to disk
+		Arguments:
+		----------
+			step:       int - MD step the frame belongs to
+			coords:     np.ndarray - (n, 3) coordinates in Å
+			velocities: np.ndarray or None - (n, 3) velocities in Å/ps,
+				required when the file stores them
+			energies:   tuple or None - (potential, kinetic) energies,
+				NaN when the file stores them and none are given
+		Returns:
+		--------
+			None: the record is written in place
+		'''
+		if self._file is None:
+			raise ValueError('Trajectory: %s is open for reading' % self.path)
+		rec = np.zeros(1, dtype=self.dtype)
+		rec['step'] = int(step)
+		rec['coords'] = coords
+		if self.header['velocities']:
+			if velocities is None:
+				raise ValueError('Trajectory: %s stores velocities'
+					% self.path)
+			rec['velocities'] = velocities
+		if self.header['energies']:
+			rec['energies'] = (np.nan, np.nan) if energies is None \
+				else energies
+		self._file.write(rec.tobytes())
+		self._file.flush()
+	def Truncate(self, step):
+		'''
+		Drop every frame after an MD step, as when a run restarts from an
+		earlier checkpoint
+		Arguments:
+		----------
+			step: int - last step to keep
+		Returns:
+		--------
+			int: number of frames kept
+		'''
+		steps = self.Frames()['step']
+		keep = int(np.searchsorted(steps, int(step), side='right'))
+		self._map = None
+		if self._file is not None:
+			self._file.truncate(self.offset + keep * self.dtype.itemsize)
+			self._file.seek(0, os.SEEK_END)
+		else:
+			with open(self.path, 'r+b') as f:
+				f.truncate(self.offset + keep * self.dtype.itemsize)
+		return keep
+	def Close(self):
+		'''
+		Close the file handle of a writer
+		Returns:
+		--------
+			None
+		'''
+		self._map = None
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+def _energydrift(total, dt_fs):
+	'''
+	Least-squares drift of a total-energy series
+	Arguments:
+	----------
+		total: ndarray - potential plus kinetic energy per step in kJ/mol
+		dt_fs: float - time between entries in femtoseconds
+	Returns:
+	--------
+		float: slope in kJ/mol/ns; 0.0 for fewer than two entries
+	'''
+	if len(total) < 2: return 0.0
+	t = np.arange(len(total), dtype=np.float64) * (float(dt_fs) * 1e-6)
+	return float(np.polyfit(t, total, 1)[0])
+
+_RESPA_FAST = frozenset(('BondPotential', 'AnglePotential', 'UBPotential',
+	'ProperTorsionPotential', 'ImproperTorsionPotential', 'CMAPPotential'))
+
 def MolecularDynamics(pose, ff=None, n_steps=1000, dt_fs=2.0, T=300.0,
 		thermostat='nve', friction_ps=1.0, constraints='hbonds',
 		shake_tol=1e-8, shake_max=100, seed=None,
-		trajectory_every=0, box=None):
+		trajectory_every=0, box=None, trajectory=None, checkpoint=None,
+		checkpoint_every=0, resume=None, respa=1, hmr=None,
+		velocities=None):
 	'''
-	Velocity-Verlet NVE or BAOAB Langevin NVT MD with SHAKE/RATTLE
+	Velocity-Verlet NVE or BAOAB Langevin NVT MD with SHAKE/RATTLE,
+	optionally split into r-RESPA fast (bonded) and slow (non-bonded)
+	force groups
 	Arguments:
 	----------
 		pose:             Pose - molecule source pose
@@ -6251,24 +8782,82 @@ def MolecularDynamics(pose, ff=None, n_steps=1000, dt_fs=2.0, T=300.0,
 		constraints:      str - 'hbonds' constrains every X-H bond; 'none'
 		shake_tol:        float - relative tolerance on |d^2 - r0^2|/r0^2
 		shake_max:        int - max iterations for SHAKE/RATTLE projection
-		seed:             int or None - RNG seed for reproducibility
+		seed:             int, Generator or None - RNG seed for
+			reproducibility; a Generator is drawn from and advanced
 		trajectory_every: int - snapshot stride; 0 disables snapshots
 		box:              None for no PBC; (3,) ortho; (3, 3) triclinic
+		trajectory:       str or Trajectory or None - stream the
+			snapshots to this file (created with energies) or open
+			Trajectory instead of keeping them in the log
+		checkpoint:       str or None - file rewritten every
+			checkpoint_every steps with the coordinates, velocities,
+			forces, RNG state and the log so far
+		checkpoint_every: int - checkpoint stride; 0 disables it
+		resume:           str or None - checkpoint to continue from up
+			to n_steps; the run then matches an uninterrupted one bit for
+			bit, and a trajectory file is cut back to the checkpoint
+			step and appended to
+		respa:            int - r-RESPA inner steps per dt_fs; the bonded
+			terms (bonds, angles, UB, torsions, CMAP) are integrated at
+			dt_fs / respa and the remaining terms evaluated once per
+			dt_fs. 1 evaluates every term at every step
+		hmr:              float or None - hydrogen mass repartitioning:
+			every H bonded to a heavy atom is given this mass in amu
+			(3.024 is usual) and the difference is taken from its
+			partner, so the total mass is unchanged. With
+			constraints='hbonds' this allows dt_fs=4.0
+		velocities:       ndarray or None - (n, 3) starting velocities
+			in Å/ps, e.g. log['velocities'] of a previous run, instead
+			of a Maxwell-Boltzmann draw at T
 	Returns:
 	--------
-		tuple: (float, dict) - final potential energy and trajectory log
+		tuple: (float, dict) - final potential energy and trajectory log,
+		whose 'drift' is the least-squares slope of the total energy in
+		kJ/mol/ns and 'drift_dof' the same per degree of freedom (both
+		near zero for a stable NVE run), 'masses' the integrated masses
+		in amu and 'velocities' the final velocities in Å/ps;
+		with a cutoff force field the log also carries the neighbour-list
+		'nlist_builds' and 'nlist_pairs', and with ff.profile set the
+		per-term timings under 'profile'
 	'''
 	if ff is None: ff = ForceField()
+	prof0 = copy.deepcopy(ff.counters) if ff.profile else None
 	if thermostat not in ('nve', 'langevin'):
 		raise ValueError("thermostat must be 'nve' or 'langevin'")
 	if constraints not in ('hbonds', 'none'):
 		raise ValueError("constraints must be 'hbonds' or 'none'")
+	if trajectory is not None and trajectory_every <= 0:
+		raise ValueError('a trajectory needs trajectory_every > 0')
+	if checkpoint is not None and checkpoint_every <= 0:
+		raise ValueError('a checkpoint needs checkpoint_every > 0')
+	if int(respa) != respa or respa < 1:
+		raise ValueError('respa must be a positive integer')
+	k_in = int(respa)
 	rng = np.random.default_rng(seed)
 	atoms = pose.data['Atoms']
 	sorted_ids = sorted(atoms)
 	m = np.array([pose.masses[atoms[i][1]] for i in sorted_ids],
 		dtype=np.float64)
 	n = len(m)
+	if hmr is not None:
+		# Move mass onto each X-H hydrogen from its heavy partner; the
+		# fastest (X-H) vibrations slow down while the total mass, and so
+		# the thermodynamics, stay the same.
+		row = {a: k for k, a in enumerate(sorted_ids)}
+		for k, a in enumerate(sorted_ids):
+			if atoms[a][1] != 'H': continue
+			heavy = [row[b] for b in pose.data['Bonds'].get(a, ())
+				if b in row and atoms[b][1] != 'H']
+			if not heavy: continue
+			m[heavy[0]] -= float(hmr) - m[k]
+			m[k] = float(hmr)
+		if (m <= 0.0).any():
+			raise ValueError('hmr=%r leaves atom %d with no mass'
+				% (hmr, sorted_ids[int(np.argmin(m))]))
+	settings = {'n_atoms': n, 'dt_fs': dt_fs, 'T': T,
+		'thermostat': thermostat, 'friction_ps': friction_ps,
+		'constraints': constraints, 'shake_tol': shake_tol,
+		'trajectory_every': trajectory_every, 'respa': k_in, 'hmr': hmr}
 	m_col = m[:, None]
 	inv_m = 1.0 / m
 	inv_m_col = inv_m[:, None]
@@ -6278,6 +8867,13 @@ def MolecularDynamics(pose, ff=None, n_steps=1000, dt_fs=2.0, T=300.0,
 	gamma = float(friction_ps) * AKMA_FS / 1000.0
 	c1 = math.exp(-gamma * dt)
 	c2 = np.sqrt((1.0 - c1 * c1) * kB * float(T) / m)[:, None]
+	# r-RESPA: the fast group moves on the inner step h, and the
+	# Langevin O step then acts once per inner step.
+	h = dt / k_in
+	c1_h = math.exp(-gamma * h)
+	c2_h = np.sqrt((1.0 - c1_h * c1_h) * kB * float(T) / m)[:, None]
+	fast = [t for t, kw in ff.terms if t in _RESPA_FAST]
+	slow = [t for t, kw in ff.terms if t not in _RESPA_FAST]
 	if ff._cache is None or ff._cache_hash != ff._topologyhash(pose):
 		ff._prepare(pose)
 	cache = ff._cache
@@ -6323,54 +8919,493 @@ def MolecularDynamics(pose, ff=None, n_steps=1000, dt_fs=2.0, T=300.0,
 			delta_v = mu[:, None] * r
 			np.add.at(vel, i_c, -delta_v * inv_m_col[i_c])
 			np.add.at(vel, j_c,  delta_v * inv_m_col[j_c])
-	sigma_v = np.sqrt(kB * float(T) / m)[:, None]
-	v = rng.standard_normal(size=(n, 3)) * sigma_v
-	v -= ((m_col * v).sum(axis=0) / m.sum())[None, :]
-	rattle(pose.data['Coordinates'], v)
-	E, F = ff(pose, grad=True, box=box)
+	builds0 = ff.nlist.n_builds if ff.nlist is not None else 0
 	dof = max(3 * n - K - 3, 1)
 	energies = np.empty(int(n_steps), dtype=np.float64)
 	kinetics = np.empty(int(n_steps), dtype=np.float64)
 	temps    = np.empty(int(n_steps), dtype=np.float64)
 	frames = []
-	use_langevin = (thermostat == 'langevin')
-	for step in range(int(n_steps)):
-		if use_langevin:
-			v += 0.5 * dt * F / m_col
-			x_old = pose.data['Coordinates'].copy()
-			pose.data['Coordinates'] = x_old + 0.5 * dt * v
-			shake(pose.data['Coordinates'], x_old, v, 0.5 * dt)
-			v = c1 * v + c2 * rng.standard_normal(size=(n, 3))
-			rattle(pose.data['Coordinates'], v)
-			x_old = pose.data['Coordinates'].copy()
-			pose.data['Coordinates'] = x_old + 0.5 * dt * v
-			shake(pose.data['Coordinates'], x_old, v, 0.5 * dt)
-			E, F = ff(pose, grad=True, box=box)
-			v += 0.5 * dt * F / m_col
-			rattle(pose.data['Coordinates'], v)
+	F_f = None
+	if resume is None:
+		if velocities is None:
+			sigma_v = np.sqrt(kB * float(T) / m)[:, None]
+			v = rng.standard_normal(size=(n, 3)) * sigma_v
+			v -= ((m_col * v).sum(axis=0) / m.sum())[None, :]
+		else:
+			v = np.array(velocities, dtype=np.float64) * (AKMA_FS / 1000.0)
+			if v.shape != (n, 3):
+				raise ValueError('velocities must have shape (%d, 3)' % n)
+		rattle(pose.data['Coordinates'], v)
+		if k_in > 1:
+			E_f, F_f = ff(pose, grad=True, box=box, terms=fast)
+			E_s, F = ff(pose, grad=True, box=box, terms=slow)
+			E = E_f + E_s
 		else:
-			v += 0.5 * dt * F / m_col
-			x_old = pose.data['Coordinates'].copy()
-			pose.data['Coordinates'] = x_old + dt * v
-			shake(pose.data['Coordinates'], x_old, v, dt)
 			E, F = ff(pose, grad=True, box=box)
-			v += 0.5 * dt * F / m_col
-			rattle(pose.data['Coordinates'], v)
-		KE = 0.5 * float(np.sum(m_col * v * v))
-		energies[step] = float(E)
-		kinetics[step] = KE
-		temps[step] = 2.0 * KE / (dof * kB)
-		if trajectory_every > 0 and (step + 1) % trajectory_every == 0:
-			frames.append(pose.data['Coordinates'].copy())
+		start = 0
+	else:
+		meta, arr = _checkpointload(resume, 'MolecularDynamics', settings,
+			ff)
+		start = meta['step']
+		if start > int(n_steps):
+			raise ValueError('checkpoint is at step %d, past n_steps=%d'
+				% (start, int(n_steps)))
+		rng.bit_generator.state = meta['rng']
+		pose.data['Coordinates'] = arr['coords']
+		v, E, F, F_f = arr['v'], meta['E'], arr['F'], arr.get('F_fast')
+		energies[:start] = arr['energies']
+		kinetics[:start] = arr['kinetic']
+		temps[:start] = arr['temperatures']
+		if 'frames' in arr: frames = list(arr['frames'])
+		builds0 -= meta['nlist_builds']
+	use_langevin = (thermostat == 'langevin')
+	sink = trajectory
+	if isinstance(trajectory, str):
+		sink = Trajectory(trajectory, n, 'w' if resume is None else 'a')
+	try:
+		if resume is not None and sink is not None: sink.Truncate(start)
+		for step in range(start, int(n_steps)):
+			if k_in > 1:
+				# Slow half-kick, k_in fast velocity-Verlet (or BAOAB)
+				# substeps, slow half-kick; F holds the slow forces here.
+				v += 0.5 * dt * F / m_col
+				for _ in range(k_in):
+					v += 0.5 * h * F_f / m_col
+					x_old = pose.data['Coordinates'].copy()
+					if use_langevin:
+						pose.data['Coordinates'] = x_old + 0.5 * h * v
+						shake(pose.data['Coordinates'], x_old, v, 0.5 * h)
+						v = c1_h * v + c2_h * rng.standard_normal(size=(n, 3))
+						rattle(pose.data['Coordinates'], v)
+						x_old = pose.data['Coordinates'].copy()
+						pose.data['Coordinates'] = x_old + 0.5 * h * v
+						shake(pose.data['Coordinates'], x_old, v, 0.5 * h)
+					else:
+						pose.data['Coordinates'] = x_old + h * v
+						shake(pose.data['Coordinates'], x_old, v, h)
+					E_f, F_f = ff(pose, grad=True, box=box, terms=fast)
+					v += 0.5 * h * F_f / m_col
+					rattle(pose.data['Coordinates'], v)
+				E_s, F = ff(pose, grad=True, box=box, terms=slow)
+				E = E_f + E_s
+				v += 0.5 * dt * F / m_col
+				rattle(pose.data['Coordinates'], v)
+			elif use_langevin:
+				v += 0.5 * dt * F / m_col
+				x_old = pose.data['Coordinates'].copy()
+				pose.data['Coordinates'] = x_old + 0.5 * dt * v
+				shake(pose.data['Coordinates'], x_old, v, 0.5 * dt)
+				v = c1 * v + c2 * rng.standard_normal(size=(n, 3))
+				rattle(pose.data['Coordinates'], v)
+				x_old = pose.data['Coordinates'].copy()
+				pose.data['Coordinates'] = x_old + 0.5 * dt * v
+				shake(pose.data['Coordinates'], x_old, v, 0.5 * dt)
+				E, F = ff(pose, grad=True, box=box)
+				v += 0.5 * dt * F / m_col
+				rattle(pose.data['Coordinates'], v)
+			else:
+				v += 0.5 * dt * F / m_col
+				x_old = pose.data['Coordinates'].copy()
+				pose.data['Coordinates'] = x_old + dt * v
+				shake(pose.data['Coordinates'], x_old, v, dt)
+				E, F = ff(pose, grad=True, box=box)
+				v += 0.5 * dt * F / m_col
+				rattle(pose.data['Coordinates'], v)
+			KE = 0.5 * float(np.sum(m_col * v * v))
+			energies[step] = float(E)
+			kinetics[step] = KE
+			temps[step] = 2.0 * KE / (dof * kB)
+			if trajectory_every > 0 and (step + 1) % trajectory_every == 0:
+				if sink is None:
+					frames.append(pose.data['Coordinates'].copy())
+				else:
+					sink.Write(step + 1, pose.data['Coordinates'],
+						v * (1000.0 / AKMA_FS), (float(E), KE))
+			if checkpoint is not None and (step + 1) % checkpoint_every == 0:
+				_checkpointsave(checkpoint, 'MolecularDynamics', settings, ff,
+					{'step': step + 1, 'rng': rng.bit_generator.state,
+					'E': float(E), 'nlist_builds': 0 if ff.nlist is None
+						else ff.nlist.n_builds - builds0},
+					{'coords': pose.data['Coordinates'], 'v': v, 'F': F,
+					'F_fast': F_f, 'energies': energies[:step + 1],
+					'kinetic': kinetics[:step + 1],
+					'temperatures': temps[:step + 1],
+					'frames': np.array(frames) if frames else None})
+	finally:
+		if sink is not None and sink is not trajectory: sink.Close()
+	drift = _energydrift(energies + kinetics, dt_fs)
 	log = {
 		'energies':     energies,
 		'kinetic':      kinetics,
 		'temperatures': temps,
 		'frames':       frames,
 		'n_constraints': int(K),
-		'dof':           int(dof)}
+		'dof':           int(dof),
+		'drift':         drift,
+		'drift_dof':     drift / dof,
+		'masses':        m,
+		'velocities':    v * (1000.0 / AKMA_FS)}
+	if sink is not None: log['trajectory'] = sink.path
+	if ff.nlist is not None:
+		log['nlist_builds'] = int(ff.nlist.n_builds - builds0)
+		log['nlist_pairs']  = ff.nlist.stats()['pairs']
+	if prof0 is not None: log['profile'] = _profiledelta(ff, prof0)
 	return float(E), log
 
+def _replicarun(rep, T, n_steps, md):
+	'''
+	Advance one replica by a segment of Langevin MD
+	Arguments:
+	----------
+		rep:     dict - the replica's 'pose', 'ff', 'rng', 'v', 'T',
+			'step', 'path' and 'sink', updated in place
+		T:       float - temperature of this segment in Kelvin; the
+			velocities are rescaled when it differs from the last one
+		n_steps: int - integration steps in the segment
+		md:      dict - MolecularDynamics keyword arguments shared by
+			every replica
+	Returns:
+	--------
+		float: potential energy in kJ/mol at the end of the segment
+	'''
+	if rep['v'] is not None and T != rep['T']:
+		rep['v'] = rep['v'] * math.sqrt(T / rep['T'])
+	rep['T'] = T
+	E, log = MolecularDynamics(rep['pose'], rep['ff'], n_steps=n_steps,
+		T=T, thermostat='langevin', seed=rep['rng'], velocities=rep['v'],
+		**md)
+	rep['v'] = log['velocities']
+	if rep['path'] is not None and rep['sink'] is None:
+		rep['sink'] = Trajectory(rep['path'], len(rep['v']), 'w')
+	every = md['trajectory_every']
+	for j, X in enumerate(log['frames'] if rep['sink'] is not None else ()):
+		k = (j + 1) * every
+		rep['sink'].Write(rep['step'] + k, X,
+			energies=(log['energies'][k - 1], log['kinetic'][k - 1]))
+	rep['step'] += n_steps
+	return float(E)
+
+def _replicaserve(conn, reps, md):
+	'''
+	Worker loop of one ReplicaExchange process: run the replicas pinned
+	to it segment by segment, sending back only their energies
+	Arguments:
+	----------
+		conn: Connection - pipe to the driver; receives ('run', {replica:
+			T}, n_steps) and ('stop',)
+		reps: dict - replica index to the _replicarun state
+		md:   dict - MolecularDynamics keyword arguments
+	Returns:
+	--------
+		None: on 'stop' the final coordinates are sent
+	'''
+	try:
+		while True:
+			msg = conn.recv()
+			if msg[0] == 'stop': break
+			conn.send({k: _replicarun(reps[k], T, msg[2], md)
+				for k, T in msg[1].items()})
+		conn.send({k: r['pose'].data['Coordinates']
+			for k, r in reps.items()})
+	except Exception as e:
+		conn.send(e)
+	finally:
+		for r in reps.values():
+			if r['sink'] is not None: r['sink'].Close()
+		conn.close()
+
+def ReplicaExchange(pose, ff, temperatures, n_steps=1000,
+		exchange_every=100, dt_fs=2.0, friction_ps=1.0,
+		constraints='hbonds', trajectory_every=0, trajectory=None,
+		box=None, respa=1, hmr=None, n_workers=None, seed=None):
+	'''
+	Temperature replica-exchange MD. One Langevin replica per temperature
+	runs in a pool of worker processes, each with its own ForceField
+	cache; every exchange_every steps neighbouring temperatures attempt
+	a Metropolis swap (even pairs, then odd pairs on alternate rounds).
+	Only potential energies cross between processes: an accepted swap
+	exchanges the two replicas' temperatures and rescales their
+	velocities, the coordinates stay where they are
+	Arguments:
+	----------
+		pose:             Pose - molecule source pose; its coordinates are
+			set to the replica at the lowest temperature on return
+		ff:               ForceField - evaluator, copied per replica;
+			created if None
+		temperatures:     list - temperature ladder in Kelvin
+		n_steps:          int - integration steps per replica
+		exchange_every:   int - steps between swap attempts
+		dt_fs:            float - integration step in femtoseconds
+		friction_ps:      float - Langevin friction in ps^-1
+		constraints:      str - 'hbonds' constrains every X-H bond; 'none'
+		trajectory_every: int - snapshot stride; must divide
+			exchange_every; ignored without a trajectory
+		trajectory:       str or None - path prefix; replica k streams its
+			snapshots to '<prefix>.<k>.trj' as a Trajectory with energies
+		box:              None for no PBC; (3,) ortho; (3, 3) triclinic
+		respa:            int - r-RESPA inner steps per dt_fs
+		hmr:              float or None - hydrogen mass in amu for mass
+			repartitioning
+		n_workers:        int or None - worker processes; None uses one
+			per replica up to the CPU count, 1 runs every replica in
+			this process. Replicas stay pinned to one process
+		seed:             int or None - RNG seed; the result does not
+			depend on n_workers
+	Returns:
+	--------
+		tuple: (float, dict) - potential energy of the lowest-temperature
+		replica and a log with 'temperatures' (sorted ladder),
+		'energies' and 'temperature_index' ((rounds, replicas) potential
+		energy and ladder index of every replica per segment), 'attempts',
+		'accepted' and 'acceptance' (per neighbouring temperature pair),
+		'coords' (final coordinates of every replica), 'trajectories',
+		'seconds' and 'workers'
+	'''
+	if ff is None: ff = ForceField()
+	temps = np.sort(np.asarray(temperatures, dtype=np.float64))
+	R = len(temps)
+	if R < 2:
+		raise ValueError('ReplicaExchange: needs at least two temperatures')
+	if exchange_every <= 0:
+		raise ValueError('ReplicaExchange: exchange_every must be positive')
+	if trajectory is not None and (trajectory_every <= 0
+			or exchange_every % trajectory_every):
+		raise ValueError('ReplicaExchange: a trajectory needs '
+			'trajectory_every > 0 dividing exchange_every')
+	kB = 8.31446262e-3
+	# Without a trajectory the segments collect no frames at all.
+	md = {'dt_fs': dt_fs, 'friction_ps': friction_ps,
+		'constraints': constraints,
+		'trajectory_every': 0 if trajectory is None else trajectory_every,
+		'box': box, 'respa': respa, 'hmr': hmr}
+	streams = np.random.SeedSequence(seed).spawn(R + 1)
+	rng = np.random.default_rng(streams[R])
+	paths = [None if trajectory is None else '%s.%d.trj' % (trajectory, k)
+		for k in range(R)]
+	reps = [{'pose': copy.deepcopy(pose), 'ff': copy.deepcopy(ff),
+		'rng': np.random.default_rng(streams[k]), 'v': None,
+		'T': float(temps[k]), 'step': 0, 'path': paths[k], 'sink': None}
+		for k in range(R)]
+	if n_workers is None: n_workers = min(R, os.cpu_count() or 1)
+	n_workers = max(1, min(int(n_workers), R))
+	groups = [list(range(w, R, n_workers)) for w in range(n_workers)]
+	conns, procs = [], []
+	def reply(conn):
+		out = conn.recv()
+		if isinstance(out, Exception): raise out
+		return out
+	def run(slot, n):
+		if n_workers == 1:
+			return np.array([_replicarun(reps[k], float(temps[slot[k]]), n,
+				md) for k in range(R)])
+		for conn, g in zip(conns, groups):
+			conn.send(('run', {k: float(temps[slot[k]]) for k in g}, n))
+		E = np.empty(R)
+		for conn in conns:
+			for k, e in reply(conn).items(): E[k] = e
+		return E
+	n_rounds = -(-int(n_steps) // int(exchange_every))
+	energies = np.empty((n_rounds, R), dtype=np.float64)
+	index    = np.empty((n_rounds, R), dtype=np.int64)
+	attempts = np.zeros(R - 1, dtype=np.int64)
+	accepted = np.zeros(R - 1, dtype=np.int64)
+	slot = np.arange(R)
+	t0 = time.perf_counter()
+	try:
+		if n_workers > 1:
+			for g in groups:
+				here, there = multiprocessing.Pipe()
+				proc = multiprocessing.Process(target=_replicaserve,
+					args=(there, {k: reps[k] for k in g}, md), daemon=True)
+				proc.start()
+				there.close()
+				conns.append(here); procs.append(proc)
+		for r in range(n_rounds):
+			n = min(int(exchange_every), int(n_steps) - r * exchange_every)
+			index[r] = slot
+			E = energies[r] = run(slot, n)
+			if r == n_rounds - 1: break
+			at = np.argsort(slot)
+			for i in range(r % 2, R - 1, 2):
+				a, b = at[i], at[i + 1]
+				delta = (1.0 / temps[i] - 1.0 / temps[i + 1]) \
+					* (E[a] - E[b]) / kB
+				attempts[i] += 1
+				if delta >= 0.0 or rng.random() < math.exp(delta):
+					accepted[i] += 1
+					slot[a], slot[b] = i + 1, i
+		if n_workers == 1:
+			final = {k: r['pose'].data['Coordinates']
+				for k, r in enumerate(reps)}
+		else:
+			final = {}
+			for conn in conns: conn.send(('stop',))
+			for conn in conns: final.update(reply(conn))
+	finally:
+		for r in reps:
+			if r['sink'] is not None: r['sink'].Close()
+		for conn in conns: conn.close()
+		for proc in procs:
+			proc.join(timeout=5)
+			if proc.is_alive(): proc.terminate()
+	coords = np.array([final[k] for k in range(R)])
+	cold = int(np.argmin(slot))
+	pose.data['Coordinates'] = coords[cold].copy()
+	log = {
+		'temperatures':      temps,
+		'energies':          energies,
+		'temperature_index': index,
+		'attempts':          attempts,
+		'accepted':          accepted,
+		'acceptance':        accepted / np.maximum(attempts, 1),
+		'coords':            coords,
+		'trajectories':      paths if trajectory is not None else [],
+		'seconds':           time.perf_counter() - t0,
+		'workers':           n_workers}
+	return float(energies[-1, cold]), log
+
+def Benchmark(test='buildcache', lengths=(10, 50, 100, 200),
+		name='Default', repeats=3, files=(), cutoff=None, steps=200):
+	'''
+	Time or validate one pipeline stage on built poly-ALA chains of
+	increasing length (and, for 'precision', on imported structures)
+	Arguments:
+	----------
+		test:    str - stage to run; 'buildcache' times a full
+			ForceField._buildcache (topology enumeration, SMIRKS
+			assignment and parameter scatter); 'precision' reports the
+			energy and force drift of ForceField(precision='mixed') and
+			precision='single' against the float64 path; 'lkball' runs
+			Pack on a polar chain and reports the per-step cost of
+			Score.LkBallWtdPotential and of re-placing its waters
+		lengths: iterable of int - poly-ALA chain lengths to build (a
+			repeated polar sequence for 'lkball')
+		name:    str - force field name, as in ForceField(name=...),
+			or score name, as in Score(name=...), for 'lkball'
+		repeats: int - timings per structure; the fastest is reported
+		files:   iterable of str - 'precision' only, PDB/CIF files loaded
+			with Pose().Import and checked alongside the built chains
+		cutoff:  float or None - 'precision' only, non-bonded cutoff in Å
+			passed to every ForceField
+		steps:   int - 'lkball' only, Pack proposals per chain
+	Returns:
+	--------
+		dict: 'buildcache' maps chain length to {'atoms': int, 'seconds':
+		float}; 'precision' maps chain length or file name to {'atoms',
+		'energy', 'seconds'} plus per reduced precision {'dE', 'dE_rel',
+		'dF_max', 'dF_rms', 'seconds'} (energies in kJ/mol, forces in
+		kJ/mol/Å); 'lkball' maps chain length to {'atoms', 'steps',
+		'score', 'lkball', 'waters'}, the mean seconds per Pack step of
+		the whole score, of the LkBallWtd term and of water placement
+	'''
+	try:    from .pose import Pose
+	except ImportError: from pose import Pose
+	if test not in ('buildcache', 'precision', 'lkball'):
+		raise ValueError(
+			"Benchmark: unknown test=%r (allowed: 'buildcache', "
+			"'precision', 'lkball')" % (test,))
+	def timed(ff, pose):
+		'''
+		Fastest of repeats force evaluations on a warm cache
+		Arguments:
+		----------
+			ff:   ForceField - evaluator
+			pose: Pose - structure to evaluate
+		Returns:
+		--------
+			tuple: (energy, forces, seconds)
+		'''
+		E, F = ff(pose, grad=True)
+		best = float('inf')
+		for _ in range(max(1, int(repeats))):
+			t0 = time.perf_counter()
+			ff(pose, grad=True)
+			best = min(best, time.perf_counter() - t0)
+		return float(E), F, best
+	def lkball(pose):
+		'''
+		Pack a pose while timing every score call and its LkBallWtd term
+		Arguments:
+		----------
+			pose: Pose - structure to repack
+		Returns:
+		--------
+			dict: {'atoms', 'steps', 'score', 'lkball', 'waters'}
+		'''
+		score = Score(name)
+		term = score.LkBallWtdPotential
+		spent = {'score': [], 'lkball': []}
+		def timedterm(pose, cache, ligand=None, **kw):
+			t0 = time.perf_counter()
+			out = term(pose, cache, ligand=ligand, **kw)
+			spent['lkball'].append(time.perf_counter() - t0)
+			return out
+		def timedscore(pose):
+			t0 = time.perf_counter()
+			E = score(pose)
+			spent['score'].append(time.perf_counter() - t0)
+			return E
+		score.LkBallWtdPotential = timedterm
+		Pack(pose, score=timedscore, n_steps=int(steps), patience=int(steps),
+			seed=0)
+		X = np.asarray(pose.data['Coordinates'], dtype=np.float64)
+		waters = float('inf')
+		for _ in range(max(1, int(repeats))):
+			t0 = time.perf_counter()
+			score._cache['place_waters'](X)
+			waters = min(waters, time.perf_counter() - t0)
+		return {
+			'atoms':  len(pose.data['Atoms']),
+			'steps':  len(spent['score']),
+			'score':  float(np.mean(spent['score'])),
+			'lkball': float(np.mean(spent['lkball'])),
+			'waters': waters}
+	poses = []
+	for L in lengths:
+		pose = Pose()
+		if test == 'lkball':
+			pose.Build(('SKDENQRTYW' * int(L))[:int(L)])
+		else:
+			pose.Build('A' * int(L))
+		poses.append((int(L), pose))
+	if test == 'precision':
+		for path in files:
+			pose = Pose()
+			pose.Import(path)
+			poses.append((os.path.basename(path), pose))
+	out = {}
+	for label, pose in poses:
+		if test == 'lkball':
+			out[label] = lkball(pose)
+			continue
+		if test == 'buildcache':
+			ff = ForceField(name)
+			best = float('inf')
+			for _ in range(max(1, int(repeats))):
+				t0 = time.perf_counter()
+				ff._buildcache(pose, False)
+				best = min(best, time.perf_counter() - t0)
+			out[label] = {
+				'atoms':   len(pose.data['Atoms']),
+				'seconds': best}
+			continue
+		E0, F0, t_ref = timed(
+			ForceField(name, cutoff=cutoff, precision='double'), pose)
+		row = {'atoms': len(pose.data['Atoms']), 'energy': E0,
+			'seconds': t_ref}
+		for prec in ('mixed', 'single'):
+			E, F, t = timed(
+				ForceField(name, cutoff=cutoff, precision=prec), pose)
+			dF = np.linalg.norm(F - F0, axis=1)
+			row[prec] = {
+				'dE':      E - E0,
+				'dE_rel':  abs(E - E0) / max(abs(E0), 1e-12),
+				'dF_max':  float(dF.max()) if len(dF) else 0.0,
+				'dF_rms':  float(np.sqrt(np.mean(dF**2))) if len(dF) else 0.0,
+				'seconds': t}
+		out[label] = row
+	return out
+
 def Port(name='openff'):
 	'''
 	Port one force field into database.json
@@ -8710,6 +11745,8 @@ def Port(name='openff'):
 		raise
 	try: DBLoad.cache_clear()
 	except Exception: pass
+	_smirkscacheclear()
+	_fadunclear()
 	return True
 
 def Cyclise(pose, mode='head-to-tail',
@@ -8862,4 +11899,5 @@ def Cyclise(pose, mode='head-to-tail',
 	pose.data['Bonds'].setdefault(i2, []).append(i1)
 	pose.data['BondOrders'].setdefault(i2, []).append(bov)
 	pose.data.setdefault('Cyclic', []).append(rec)
+	pose._bumptopology()
 	pose.CalcCharge()